@@ -152,24 +152,11 @@ def create_app(config_name=None):
             logger.info(f"Using DATABASE_URL (internal Railway connection)")
             logger.info(f"Database type: PostgreSQL (internal)")
         
-        # Проверяем подключение к БД и выполняем миграции (не блокируем запуск при ошибке)
+        # Проверяем подключение к БД (не блокируем запуск при ошибке); схему приводит контракт ниже
         try:
             with app.app_context():
-                # Импортируем все модели, чтобы они были зарегистрированы в SQLAlchemy
-                from app.models import Reminder  # Явный импорт для создания таблицы
-                from app.models import Assignment, AssignmentTask, Submission, Answer  # Импортируем новые модели
-                db.create_all()
-                # Проверяем, что можем подключиться
                 db.session.execute(text("SELECT 1"))
                 logger.info("✓ Database connection: OK")
-                # Выполняем миграции схемы
-                from app.utils.db_migrations import ensure_schema_columns
-                try:
-                    ensure_schema_columns(app)
-                    logger.info("✓ Database schema migrations: OK")
-                except Exception as mig_error:
-                    logger.warning(f"⚠ Schema migration failed: {str(mig_error)}")
-                    logger.warning("Application will continue, migrations will retry on first request")
         except Exception as e:
             logger.warning(f"⚠ Database connection check failed: {str(e)}")
             logger.warning("Application will continue, but database operations may fail")
@@ -286,9 +273,34 @@ def create_app(config_name=None):
     # Используем декоратор @csrf.exempt прямо в remote_admin_api.py для избежания проблем с импортами
     # Здесь просто убеждаемся, что пути исключены через before_request хук
     
+    # Профилирование запросов (PROFILE_REQUESTS=1): до хуков, чтобы их SQL тоже попадал в счётчики
+    from app.utils.profiling import init_profiling
+    init_profiling(app)
+
     # Импорт и регистрация хуков before_request
     from app.utils.hooks import register_hooks
     register_hooks(app)
+
+    # Версии статики по хешу содержимого (url_for('static') -> ?v=<hash>) и долгий кеш
+    from app.designer.assets import init_asset_pipeline
+    init_asset_pipeline(app)
+
+    # Контракт схемы: миграции под advisory lock и сверка моделей с БД — один раз при старте,
+    # до планировщика и воркеров (SCHEMA_CONTRACT_MODE: migrate / strict / verify / off)
+    from app.utils.schema_contract import init_schema_contract
+    init_schema_contract(app)
+
+    # Фоновый планировщик (статусы уроков, напоминания, ретеншн аудита, прогрев кешей)
+    from app.utils.background_jobs import init_scheduler
+    init_scheduler(app)
+
+    # Воркеры очереди автопроверки сдач (GRADING_MODE: inprocess / sync / off)
+    from app.assignments.grading import init_grading
+    init_grading(app)
+
+    # Пересчёт сводок родительского дашборда после commit, вне запросов (PARENT_DIGEST_MODE)
+    from app.parents.digest import init_child_digests
+    init_child_digests(app)
     
     # Регистрация фильтра from_json для Jinja2
     @app.template_filter('from_json')
@@ -303,6 +303,100 @@ def remote_admin_status():
         return jsonify({'error': str(e)}), 500
 
 
+REMOTE_USERS_PAGE_MAX = 200
+
+
+def _remote_user_payload(u: User) -> dict:
+    return {
+        'id': u.id,
+        'username': u.username,
+        'email': u.email,
+        'role': u.role,
+        'is_active': u.is_active,
+        'created_at': u.created_at.isoformat() if u.created_at else None,
+        'last_login': u.last_login.isoformat() if u.last_login else None
+    }
+
+
+def _remote_users_roles_arg() -> list:
+    """role/roles: через запятую и/или повтором параметра"""
+    roles = []
+    for raw in request.args.getlist('roles') + request.args.getlist('role'):
+        roles.extend(r.strip() for r in raw.split(',') if r.strip())
+    return list(dict.fromkeys(roles))
+
+
+def _remote_admin_users_listing():
+    """
+    GET /internal/remote-admin/api/users
+
+    Параметры:
+    - role / roles — одна или несколько ролей (через запятую или повтором);
+    - is_active — true/false;
+    - q — подстрока логина, email или роли (без учета регистра);
+    - limit + cursor — страница с keyset-курсором (id последнего пользователя, новые сверху);
+      без limit отдается весь список, как раньше (старые клиенты);
+    - facets=1 — счетчики по ролям при тех же q/is_active (для фильтров-чипов) и total.
+    """
+    roles = _remote_users_roles_arg()
+    is_active_filter = request.args.get('is_active')
+    q = (request.args.get('q') or '').strip()
+
+    # Фильтры без роли — по ним же считаются фасеты
+    conditions = []
+    if is_active_filter not in (None, ''):
+        conditions.append(User.is_active == (is_active_filter.lower() == 'true'))
+    if q:
+        like = '%' + q.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        conditions.append(db.or_(
+            User.username.ilike(like, escape='\\'),
+            User.email.ilike(like, escape='\\'),
+            User.role.ilike(like, escape='\\'),
+        ))
+    role_conditions = conditions + ([User.role.in_(roles)] if roles else [])
+
+    payload = {'success': True}
+    facets = None
+    if request.args.get('facets') in ('1', 'true'):
+        rows = (
+            db.session.query(User.role, func.count(User.id))
+            .filter(*conditions)
+            .group_by(User.role)
+            .all()
+        )
+        facets = {role or 'unknown': int(count) for role, count in rows}
+        payload['facets'] = facets
+        payload['facets_total'] = sum(facets.values())
+
+    columns = db.load_only(User.id, User.username, User.email, User.role, User.is_active,
+                           User.created_at, User.last_login)
+    limit = request.args.get('limit', type=int)
+    if limit is None:
+        users = User.query.options(columns).filter(*role_conditions).order_by(User.created_at.desc()).all()
+        payload['users'] = [_remote_user_payload(u) for u in users]
+        return jsonify(payload)
+
+    limit = max(1, min(limit, REMOTE_USERS_PAGE_MAX))
+    query = User.query.options(columns).filter(*role_conditions)
+    cursor = request.args.get('cursor', type=int)
+    if cursor:
+        query = query.filter(User.id < cursor)
+    rows = query.order_by(User.id.desc()).limit(limit + 1).all()
+    page = rows[:limit]
+
+    if facets is not None:
+        total = sum(n for role, n in facets.items() if not roles or role in roles)
+    else:
+        total = db.session.query(func.count(User.id)).filter(*role_conditions).scalar()
+    payload.update({
+        'users': [_remote_user_payload(u) for u in page],
+        'next_cursor': page[-1].id if len(rows) > limit else None,
+        'total': int(total or 0),
+        'limit': limit,
+    })
+    return jsonify(payload)
+
+
 @admin_bp.route('/internal/remote-admin/api/users', methods=['GET', 'POST'])
 @csrf.exempt
 def remote_admin_api_users():
@@ -449,31 +543,7 @@ def remote_admin_api_users():
         
         else:
             # GET - список пользователей
-            role_filter = request.args.get('role')
-            is_active_filter = request.args.get('is_active')
-            
-            query = User.query
-            
-            if role_filter:
-                query = query.filter(User.role == role_filter)
-            if is_active_filter is not None:
-                is_active = is_active_filter.lower() == 'true'
-                query = query.filter(User.is_active == is_active)
-            
-            users = query.order_by(User.created_at.desc()).all()
-            
-            return jsonify({
-                'success': True,
-                'users': [{
-                    'id': u.id,
-                    'username': u.username,
-                    'email': u.email,
-                    'role': u.role,
-                    'is_active': u.is_active,
-                    'created_at': u.created_at.isoformat() if u.created_at else None,
-                    'last_login': u.last_login.isoformat() if u.last_login else None
-                } for u in users]
-            })
+            return _remote_admin_users_listing()
     except Exception as e:
         db.session.rollback()
         logger.error(f"Error in remote_admin_api_users: {e}", exc_info=True)
@@ -178,6 +178,12 @@ def api_student_delete(student_id):
         logger.error(f'Ошибка при удалении студента через API: {e}')
         return jsonify({'success': False, 'error': f'Ошибка при удалении студента: {str(e)}'}), 500
 
+def _task_preview(task, length: int = 200) -> str:
+    # Предрассчитанный текст задания; для строк без вариантов — как раньше, начало HTML
+    text = task.text_excerpt or task.content_html or ''
+    return text[:length] + '...' if len(text) > length else text
+
+
 @api_bp.route('/api/global-search', methods=['GET'])
 @login_required
 def api_global_search():
@@ -276,7 +282,7 @@ def api_global_search():
                 'id': task.task_id,
                 'site_task_id': task.site_task_id,
                 'task_number': task.task_number,
-                'content_preview': task.content_html[:200] + '...' if task.content_html and len(task.content_html) > 200 else (task.content_html or ''),
+                'content_preview': _task_preview(task),
                 'url': url_for('kege_generator.generate_results', task_id=task.task_id)
             })
         
@@ -0,0 +1,335 @@
+"""
+Статусы сдач (Submission) и материализованные счётчики по работам (AssignmentCounters).
+
+- set_submission_status: единственная точка смены статуса в маршрутах, проверяет переход
+  по SUBMISSION_TRANSITIONS;
+- ORM-события after_flush превращают вставки/удаления/смены статуса Submission и
+  AssignmentTask в атомарные `UPDATE ... SET col = col + delta` в той же транзакции,
+  поэтому счётчики не расходятся с данными при откате и конкурентных сдачах;
+- массовые UPDATE/DELETE в обход ORM не отслеживаются — их выравнивает
+  reconcile_assignment_counters (задача планировщика `assignment_counters`).
+
+Список работ читает счётчики JOIN'ом по первичному ключу, стоимость зависит от числа
+показанных работ, а не от числа всех сдач.
+"""
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set
+
+from sqlalchemy import event, func, insert, inspect as sa_inspect, select, update, delete
+from sqlalchemy.orm import Session
+
+from app.models import db, Assignment, AssignmentTask, AssignmentCounter, Submission, moscow_now
+from app.utils.schema_contract import schema_table_ready
+
+logger = logging.getLogger(__name__)
+
+# Статус Submission -> колонка AssignmentCounters
+STATUS_COLUMNS = {
+    'ASSIGNED': 'assigned',
+    'IN_PROGRESS': 'in_progress',
+    'SUBMITTED': 'submitted',
+    'LATE': 'late',
+    'RETURNED': 'returned',
+    'GRADED': 'graded',
+}
+COUNTER_COLUMNS = tuple(STATUS_COLUMNS.values()) + ('tasks_count',)
+
+# Допустимые переходы статусов сдачи
+SUBMISSION_TRANSITIONS = {
+    'ASSIGNED': {'IN_PROGRESS', 'SUBMITTED', 'LATE'},
+    'IN_PROGRESS': {'SUBMITTED', 'LATE'},
+    'SUBMITTED': {'GRADED', 'RETURNED'},
+    'LATE': {'GRADED', 'RETURNED'},
+    'RETURNED': {'IN_PROGRESS', 'SUBMITTED', 'LATE'},
+    'GRADED': {'RETURNED'},
+}
+
+_listeners_installed = False
+_table_exists = False
+
+
+class InvalidStatusTransition(ValueError):
+    """Переход статуса сдачи не разрешён SUBMISSION_TRANSITIONS."""
+
+
+def can_transition(current: Optional[str], new: str) -> bool:
+    current = (current or 'ASSIGNED').upper()
+    new = (new or '').upper()
+    return current == new or new in SUBMISSION_TRANSITIONS.get(current, ())
+
+
+def set_submission_status(submission: Submission, new_status: str) -> bool:
+    """
+    Меняет статус сдачи с проверкой перехода. Счётчики работы обновятся при flush.
+    Возвращает True, если статус изменился.
+    """
+    new_status = (new_status or '').upper()
+    if new_status not in STATUS_COLUMNS:
+        raise InvalidStatusTransition(f"Неизвестный статус сдачи: {new_status}")
+    current = (submission.status or '').upper() or None
+    if not can_transition(current, new_status):
+        raise InvalidStatusTransition(f"Недопустимый переход статуса: {current} -> {new_status}")
+    if current == new_status:
+        return False
+    submission.status = new_status
+    return True
+
+
+# =============================================================================
+# Чтение
+# =============================================================================
+
+def counters_summary(counter: Optional[AssignmentCounter]) -> Dict[str, int]:
+    """Производные показатели для шаблонов (как раньше считали GROUP BY / цикл по сдачам)."""
+    values = {col: int(getattr(counter, col, 0) or 0) for col in COUNTER_COLUMNS}
+    to_grade = values['submitted'] + values['late']
+    return dict(
+        values,
+        total=sum(values[col] for col in STATUS_COLUMNS.values()),
+        to_grade=to_grade,
+        needs_grading=to_grade,
+        submitted_total=to_grade + values['graded'] + values['returned'],
+        pending=values['assigned'] + values['in_progress'] + values['returned'],
+    )
+
+
+# =============================================================================
+# Пересчёт
+# =============================================================================
+
+def _recount(connection, assignment_ids: Iterable[int]) -> Dict[int, Dict[str, int]]:
+    ids = list(assignment_ids)
+    result = {aid: {col: 0 for col in COUNTER_COLUMNS} for aid in ids}
+    if not ids:
+        return result
+    rows = connection.execute(
+        select(Submission.assignment_id, Submission.status, func.count())
+        .where(Submission.assignment_id.in_(ids))
+        .group_by(Submission.assignment_id, Submission.status)
+    )
+    for aid, status, count in rows:
+        col = STATUS_COLUMNS.get((status or '').upper())
+        if col:
+            result[aid][col] += count
+    rows = connection.execute(
+        select(AssignmentTask.assignment_id, func.count())
+        .where(AssignmentTask.assignment_id.in_(ids))
+        .group_by(AssignmentTask.assignment_id)
+    )
+    for aid, count in rows:
+        result[aid]['tasks_count'] = count
+    return result
+
+
+def _insert_ignore(connection, values: Dict) -> int:
+    """INSERT строки счётчиков; 0 — если строку уже вставила другая транзакция."""
+    table = AssignmentCounter.__table__
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        return connection.execute(insert(table).values(**values)).rowcount or 0
+    stmt = dialect_insert(table).values(**values).on_conflict_do_nothing(index_elements=['assignment_id'])
+    return connection.execute(stmt).rowcount or 0
+
+
+def _now_naive() -> datetime:
+    now = moscow_now()
+    return now.replace(tzinfo=None) if now.tzinfo else now
+
+
+def reconcile_assignment_counters(assignment_ids: Optional[Iterable[int]] = None, batch_size: int = 500) -> int:
+    """
+    Пересобирает счётчики из Submissions/AssignmentTasks: исправляет расхождения, создаёт
+    недостающие строки, удаляет строки удалённых работ. Коммитит пачками, возвращает число исправлений.
+    """
+    table = AssignmentCounter.__table__
+    fixed = 0
+    last_id = 0
+    only = sorted(set(assignment_ids)) if assignment_ids is not None else None
+    while True:
+        if only is not None:
+            if not only:
+                break
+            chunk, only = only[:batch_size], only[batch_size:]
+            batch = sorted(db.session.execute(
+                select(Assignment.assignment_id).where(Assignment.assignment_id.in_(chunk))
+            ).scalars())
+            if not batch:
+                continue
+        else:
+            batch = list(db.session.execute(
+                select(Assignment.assignment_id).where(Assignment.assignment_id > last_id)
+                .order_by(Assignment.assignment_id).limit(batch_size)
+            ).scalars())
+        if not batch:
+            break
+        last_id = batch[-1]
+        connection = db.session.connection()
+        expected = _recount(connection, batch)
+        existing = {row.assignment_id: row for row in connection.execute(
+            select(table).where(table.c.assignment_id.in_(batch))
+        )}
+        now = _now_naive()
+        for aid, values in expected.items():
+            row = existing.get(aid)
+            if row is None:
+                _insert_ignore(connection, dict(values, assignment_id=aid, updated_at=now))
+                fixed += 1
+            elif any(getattr(row, col) != values[col] for col in COUNTER_COLUMNS):
+                connection.execute(update(table).where(table.c.assignment_id == aid).values(**values, updated_at=now))
+                fixed += 1
+        db.session.commit()
+
+    if assignment_ids is None:
+        # Строки работ, удалённых в обход ORM
+        result = db.session.execute(delete(table).where(
+            ~table.c.assignment_id.in_(select(Assignment.assignment_id))
+        ))
+        fixed += result.rowcount or 0
+        db.session.commit()
+    if fixed:
+        logger.info(f"Assignment counters reconciled: {fixed} rows fixed")
+    return fixed
+
+
+def reconcile_job(now: datetime) -> int:
+    """Задача планировщика `assignment_counters`."""
+    return reconcile_assignment_counters()
+
+
+# =============================================================================
+# ORM-события
+# =============================================================================
+
+def _committed_value(obj, attr: str):
+    """Значение атрибута до изменений в текущем flush."""
+    history = sa_inspect(obj).attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    if history.unchanged:
+        return history.unchanged[0]
+    return getattr(obj, attr)
+
+
+def _changed(obj, attrs) -> bool:
+    state = sa_inspect(obj)
+    return any(state.attrs[attr].history.has_changes() for attr in attrs)
+
+
+def _table_ready(connection) -> bool:
+    """Есть ли таблица AssignmentCounters (до миграции изменения данных не должны падать)."""
+    global _table_exists
+    if not _table_exists:
+        # Обычно ответ уже есть в контракте схемы, проверенном при старте; инспектор — до его проверки
+        verified = schema_table_ready(AssignmentCounter.__table__.name)
+        _table_exists = verified if verified is not None else sa_inspect(connection).has_table(AssignmentCounter.__table__.name)
+    return _table_exists
+
+
+def _apply(connection, deltas: Dict[int, Dict[str, int]], created: Set[int], deleted: Set[int]) -> None:
+    table = AssignmentCounter.__table__
+    now = _now_naive()
+    missing: List[int] = []
+    for aid, delta in deltas.items():
+        if aid in created or aid in deleted:
+            continue
+        changes = {col: table.c[col] + n for col, n in delta.items() if n}
+        if not changes:
+            continue
+        result = connection.execute(
+            update(table).where(table.c.assignment_id == aid).values(**changes, updated_at=now)
+        )
+        if not result.rowcount:
+            missing.append(aid)
+    # Новые работы и работы без строки (до бэкфилла) — полный пересчёт, он уже видит этот flush
+    recount_ids = [aid for aid in created if aid not in deleted] + missing
+    if not recount_ids:
+        return
+    existing_assignments = set(connection.execute(
+        select(Assignment.assignment_id).where(Assignment.assignment_id.in_(recount_ids))
+    ).scalars())
+    for aid, values in _recount(connection, recount_ids).items():
+        if aid not in existing_assignments:
+            continue
+        if _insert_ignore(connection, dict(values, assignment_id=aid, updated_at=now)):
+            continue
+        # Строку успела вставить другая транзакция без учёта наших изменений
+        delta = deltas.get(aid) or {}
+        changes = {col: table.c[col] + n for col, n in delta.items() if n}
+        if changes:
+            connection.execute(update(table).where(table.c.assignment_id == aid).values(**changes, updated_at=now))
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Session, 'before_flush')
+    def _remember_deleted(session, flush_context, instances):
+        # Значения удаляемых строк читаем до flush: после него строки в БД уже нет
+        # Перезаписываем на каждом flush: после неудачного flush список не должен «копиться»
+        removed = session.info['_assignment_counters_removed'] = []
+        for obj in session.deleted:
+            if isinstance(obj, Submission):
+                removed.append((_committed_value(obj, 'assignment_id'), _committed_value(obj, 'status')))
+            elif isinstance(obj, AssignmentTask):
+                removed.append((_committed_value(obj, 'assignment_id'), None))
+
+    @event.listens_for(Session, 'after_flush')
+    def _update_counters(session, flush_context):
+        removed = session.info.pop('_assignment_counters_removed', None) or []
+        deltas: Dict[int, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        created: Set[int] = set()
+        deleted: Set[int] = set()
+
+        for aid, status in removed:
+            col = 'tasks_count' if status is None else STATUS_COLUMNS.get((status or '').upper())
+            if aid is not None and col:
+                deltas[aid][col] -= 1
+        for obj in session.deleted:
+            if isinstance(obj, Assignment):
+                deleted.add(obj.assignment_id)
+
+        for obj in session.new:
+            if isinstance(obj, Submission):
+                col = STATUS_COLUMNS.get((obj.status or '').upper())
+                if obj.assignment_id is not None and col:
+                    deltas[obj.assignment_id][col] += 1
+            elif isinstance(obj, AssignmentTask):
+                if obj.assignment_id is not None:
+                    deltas[obj.assignment_id]['tasks_count'] += 1
+            elif isinstance(obj, Assignment):
+                created.add(obj.assignment_id)
+
+        for obj in session.dirty:
+            if isinstance(obj, Submission) and _changed(obj, ('status', 'assignment_id')):
+                old_col = STATUS_COLUMNS.get((_committed_value(obj, 'status') or '').upper())
+                old_aid = _committed_value(obj, 'assignment_id')
+                new_col = STATUS_COLUMNS.get((obj.status or '').upper())
+                if old_aid is not None and old_col:
+                    deltas[old_aid][old_col] -= 1
+                if obj.assignment_id is not None and new_col:
+                    deltas[obj.assignment_id][new_col] += 1
+            elif isinstance(obj, AssignmentTask) and _changed(obj, ('assignment_id',)):
+                old_aid = _committed_value(obj, 'assignment_id')
+                if old_aid is not None:
+                    deltas[old_aid]['tasks_count'] -= 1
+                if obj.assignment_id is not None:
+                    deltas[obj.assignment_id]['tasks_count'] += 1
+
+        if not deltas and not created:
+            return
+        connection = session.connection()
+        if not _table_ready(connection):
+            return
+        _apply(connection, deltas, created, deleted)
+
+
+_install_listeners()
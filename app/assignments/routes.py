@@ -10,9 +10,9 @@ from sqlalchemy.orm import joinedload
 
 from app.assignments import assignments_bp
 from app.models import (
-    db, Assignment, AssignmentTask, Submission, Answer,
+    db, Assignment, AssignmentTask, AssignmentCounter, Submission, Answer,
     Student, User, Tasks, Lesson, LessonTask, Enrollment, GradebookEntry, SubmissionAttempt, RubricTemplate,
-    TaskTemplate, TemplateTask
+    TaskTemplate, TemplateTask, GradingJob
 )
 from app.students.utils import get_sorted_assignments
 from core.db_models import SubmissionComment
@@ -20,6 +20,8 @@ from app.auth.rbac_utils import check_access, get_user_scope, has_permission
 from core.db_models import moscow_now
 from core.audit_logger import audit_logger
 from app.notifications.service import notify_student_and_parents
+from app.assignments.counters import counters_summary, set_submission_status
+from app.assignments.grading import enqueue_grading, after_submit as after_submit_grading
 from core.selector_logic import get_accepted_tasks, get_skipped_tasks, get_unique_tasks, reset_history, reset_skipped
 
 logger = logging.getLogger(__name__)
@@ -122,13 +124,13 @@ def assignment_review_bulk_update(assignment_id: int):
     skipped = 0
     for sub in subs:
         if action == 'mark_returned':
-            sub.status = 'RETURNED'
+            set_submission_status(sub, 'RETURNED')
         else:
             # mark_graded: только если есть итоговые баллы
             if sub.total_score is None or sub.max_score is None:
                 skipped += 1
                 continue
-            sub.status = 'GRADED'
+            set_submission_status(sub, 'GRADED')
             sub.graded_at = moscow_now()
         try:
             # Снимок попытки: полезно для истории пересдач (returned тоже важен)
@@ -230,7 +232,7 @@ def submission_quick_return(submission_id: int):
         flash('Эту сдачу нельзя вернуть из текущего статуса.', 'warning')
         return redirect(url_for('lessons.review_queue', status=status_filter, source=source, assignment_type=assignment_type, student=student_query))
 
-    submission.status = 'RETURNED'
+    set_submission_status(submission, 'RETURNED')
     try:
         _record_submission_attempt(submission)
     except Exception:
@@ -419,33 +421,6 @@ def get_students_for_tutor(tutor_user_id):
     return q.filter(or_(*filters)).all()
 
 
-def auto_grade_answer(answer, assignment_task):
-    """
-    Автоматическая проверка ответа
-    Возвращает (is_correct, score)
-    """
-    task = assignment_task.task
-    
-    # Для SINGLE_CHOICE (задания с одним правильным ответом)
-    if task.task_number in [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 15, 16, 17, 18, 19, 20, 21, 22, 23]:
-        # Сравниваем ответ ученика с эталоном
-        student_answer = answer.value.strip() if answer.value else ""
-        correct_answer = task.answer.strip() if task.answer else ""
-        
-        if student_answer.lower() == correct_answer.lower():
-            return True, assignment_task.max_score
-        else:
-            return False, 0
-    
-    # Для CODE (задания 24-27) - можно добавить более сложную логику
-    # Пока возвращаем None - требует ручной проверки
-    if task.task_number in [24, 25, 26, 27]:
-        return None, None
-    
-    # По умолчанию - требует ручной проверки
-    return None, None
-
-
 # ============================================================================
 # API: СОЗДАНИЕ И РАСПРЕДЕЛЕНИЕ РАБОТ (TEACHER)
 # ============================================================================
@@ -627,49 +602,18 @@ def assignments_list():
 
     now = _now_naive_msk()
 
-    subq = (
-        db.session.query(
-            Submission.assignment_id.label('assignment_id'),
-            func.count(Submission.submission_id).label('total_students'),
-            func.sum(
-                case(
-                    (Submission.status.in_(['SUBMITTED', 'LATE', 'GRADED', 'RETURNED']), 1),
-                    else_=0,
-                )
-            ).label('submitted'),
-            func.sum(
-                case(
-                    (Submission.status.in_(['SUBMITTED', 'LATE']), 1),
-                    else_=0,
-                )
-            ).label('to_grade'),
-            func.sum(case((Submission.status == 'GRADED', 1), else_=0)).label('graded'),
-            func.sum(case((Submission.status == 'RETURNED', 1), else_=0)).label('returned'),
-            func.sum(case((Submission.status == 'IN_PROGRESS', 1), else_=0)).label('in_progress'),
-            func.sum(case((Submission.status == 'ASSIGNED', 1), else_=0)).label('assigned'),
-        )
-        .group_by(Submission.assignment_id)
-        .subquery()
-    )
-
-    tasks_subq = (
-        db.session.query(
-            AssignmentTask.assignment_id.label('assignment_id'),
-            func.count(AssignmentTask.assignment_task_id).label('tasks_count'),
-        )
-        .group_by(AssignmentTask.assignment_id)
-        .subquery()
-    )
-
-    total_students_col = func.coalesce(subq.c.total_students, 0)
-    submitted_col = func.coalesce(subq.c.submitted, 0)
-    graded_col = func.coalesce(subq.c.graded, 0)
-    to_grade_col = func.coalesce(subq.c.to_grade, 0)
-    returned_col = func.coalesce(subq.c.returned, 0)
-    in_progress_col = func.coalesce(subq.c.in_progress, 0)
-    assigned_col = func.coalesce(subq.c.assigned, 0)
+    # Счётчики материализованы в AssignmentCounters (см. app/assignments/counters.py):
+    # JOIN по первичному ключу вместо GROUP BY по всем Submissions/AssignmentTasks
+    counters = AssignmentCounter.__table__.c
+    assigned_col = func.coalesce(counters.assigned, 0)
+    in_progress_col = func.coalesce(counters.in_progress, 0)
+    returned_col = func.coalesce(counters.returned, 0)
+    graded_col = func.coalesce(counters.graded, 0)
+    to_grade_col = func.coalesce(counters.submitted, 0) + func.coalesce(counters.late, 0)
+    submitted_col = to_grade_col + graded_col + returned_col
     pending_col = assigned_col + in_progress_col + returned_col
-    tasks_count_col = func.coalesce(tasks_subq.c.tasks_count, 0)
+    total_students_col = submitted_col + assigned_col + in_progress_col
+    tasks_count_col = func.coalesce(counters.tasks_count, 0)
 
     base_query = (
         db.session.query(
@@ -683,8 +627,7 @@ def assignments_list():
             assigned_col.label('assigned'),
             tasks_count_col.label('tasks_count'),
         )
-        .outerjoin(subq, subq.c.assignment_id == Assignment.assignment_id)
-        .outerjoin(tasks_subq, tasks_subq.c.assignment_id == Assignment.assignment_id)
+        .outerjoin(AssignmentCounter, AssignmentCounter.assignment_id == Assignment.assignment_id)
     )
 
     if not show_archived:
@@ -701,56 +644,23 @@ def assignments_list():
         base_query = base_query.filter(func.lower(Assignment.title).like(needle))
 
     # KPI считаем на "базовом" наборе (без status_filter и sort), чтобы табы были понятными
-    kpi_rows = base_query.all()
-
-    def _derive_flags(a: Assignment, row) -> dict:
-        total_students = _safe_int(getattr(row, 'total_students', 0))
-        to_grade = _safe_int(getattr(row, 'to_grade', 0))
-        returned = _safe_int(getattr(row, 'returned', 0))
-        in_progress = _safe_int(getattr(row, 'in_progress', 0))
-        assigned = _safe_int(getattr(row, 'assigned', 0))
-        pending = assigned + in_progress + returned
-
-        is_overdue = bool(a.deadline and a.deadline < now and pending > 0)
-        is_completed = bool(total_students > 0 and pending == 0 and to_grade == 0)
-        is_active = bool(a.deadline and a.deadline >= now and (pending > 0 or to_grade > 0))
-        return {
-            'total_students': total_students,
-            'to_grade': to_grade,
-            'returned': returned,
-            'in_progress': in_progress,
-            'assigned': assigned,
-            'pending': pending,
-            'is_overdue': is_overdue,
-            'is_completed': is_completed,
-            'is_active': is_active,
-        }
-
-    kpis = {
-        'total': 0,
-        'active': 0,
-        'needs_grading': 0,
-        'overdue': 0,
-        'returned': 0,
-        'completed': 0,
-        'archived': 0,
-    }
-    for row in kpi_rows:
-        a: Assignment = row[0]
-        flags = _derive_flags(a, row)
-        kpis['total'] += 1
-        if not a.is_active:
-            kpis['archived'] += 1
-        if flags['is_active']:
-            kpis['active'] += 1
-        if flags['to_grade'] > 0:
-            kpis['needs_grading'] += 1
-        if flags['is_overdue']:
-            kpis['overdue'] += 1
-        if flags['returned'] > 0:
-            kpis['returned'] += 1
-        if flags['is_completed']:
-            kpis['completed'] += 1
+    # Один агрегат по тем же условиям, что и табы ниже, без загрузки самих работ
+    def _count_if(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    kpi_row = base_query.with_entities(
+        func.count(Assignment.assignment_id),
+        _count_if(Assignment.is_active.is_(False)),
+        _count_if(and_(Assignment.deadline >= now, or_(pending_col > 0, to_grade_col > 0))),
+        _count_if(to_grade_col > 0),
+        _count_if(and_(Assignment.deadline < now, pending_col > 0)),
+        _count_if(returned_col > 0),
+        _count_if(and_(total_students_col > 0, pending_col == 0, to_grade_col == 0)),
+    ).one()
+    kpis = dict(zip(
+        ('total', 'archived', 'active', 'needs_grading', 'overdue', 'returned', 'completed'),
+        (_safe_int(value) for value in kpi_row),
+    ))
 
     # Применяем status_filter
     filtered_query = base_query
@@ -1341,8 +1251,8 @@ def assignment_view(assignment_id):
     try:
         assignment = Assignment.query.options(
             joinedload(Assignment.tasks).joinedload(AssignmentTask.task),
-            joinedload(Assignment.submissions).joinedload(Submission.student),
-            joinedload(Assignment.created_by)
+            joinedload(Assignment.created_by),
+            joinedload(Assignment.counters),
         ).get_or_404(assignment_id)
     except Exception as e:
         logger.error(f"Error loading assignment {assignment_id}: {e}", exc_info=True)
@@ -1366,48 +1276,30 @@ def assignment_view(assignment_id):
         status_filter = (request.args.get('status') or 'all').strip().lower()
         student_query = (request.args.get('student') or '').strip().lower()
 
-        subs_all = list(assignment.submissions or [])
-
+        # Счётчики — из AssignmentCounters, сдачи грузим уже отфильтрованные по статусу
+        summary = counters_summary(assignment.counters)
         counts = {
-            'total': 0,
-            'assigned': 0,
-            'in_progress': 0,
-            'submitted': 0,
-            'late': 0,
-            'returned': 0,
-            'graded': 0,
-            'needs_grading': 0,
+            'total': summary['total'],
+            'assigned': summary['assigned'],
+            'in_progress': summary['in_progress'],
+            'submitted': summary['to_grade'],
+            'late': summary['late'],
+            'returned': summary['returned'],
+            'graded': summary['graded'],
+            'needs_grading': summary['needs_grading'],
         }
-        for s in subs_all:
-            st = (getattr(s, 'status', '') or '').upper()
-            counts['total'] += 1
-            if st == 'ASSIGNED':
-                counts['assigned'] += 1
-            elif st == 'IN_PROGRESS':
-                counts['in_progress'] += 1
-            elif st == 'RETURNED':
-                counts['returned'] += 1
-            elif st == 'GRADED':
-                counts['graded'] += 1
-            elif st == 'LATE':
-                counts['late'] += 1
-                counts['submitted'] += 1
-                counts['needs_grading'] += 1
-            elif st == 'SUBMITTED':
-                counts['submitted'] += 1
-                counts['needs_grading'] += 1
-
-        def _matches_status(s: Submission) -> bool:
-            if status_filter in {'', 'all'}:
-                return True
-            st = (getattr(s, 'status', '') or '').upper()
-            if status_filter == 'needs_grading':
-                return st in {'SUBMITTED', 'LATE'}
-            if status_filter == 'submitted':
-                return st in {'SUBMITTED', 'LATE', 'GRADED', 'RETURNED'}
-            if status_filter == 'pending':
-                return st in {'ASSIGNED', 'IN_PROGRESS'}
-            return st.lower() == status_filter
+
+        subs_query = Submission.query.options(joinedload(Submission.student)).filter(
+            Submission.assignment_id == assignment.assignment_id
+        )
+        if status_filter == 'needs_grading':
+            subs_query = subs_query.filter(Submission.status.in_(['SUBMITTED', 'LATE']))
+        elif status_filter == 'submitted':
+            subs_query = subs_query.filter(Submission.status.in_(['SUBMITTED', 'LATE', 'GRADED', 'RETURNED']))
+        elif status_filter == 'pending':
+            subs_query = subs_query.filter(Submission.status.in_(['ASSIGNED', 'IN_PROGRESS']))
+        elif status_filter not in {'', 'all'}:
+            subs_query = subs_query.filter(func.upper(Submission.status) == status_filter.upper())
 
         def _matches_student(s: Submission) -> bool:
             if not student_query:
@@ -1420,7 +1312,8 @@ def assignment_view(assignment_id):
                 name = ''
             return student_query in name
 
-        submissions = [s for s in subs_all if _matches_status(s) and _matches_student(s)]
+        # Имя фильтруем в Python: lower() в SQLite не понимает кириллицу
+        submissions = [s for s in subs_query.all() if _matches_student(s)]
 
         def _sort_key(s: Submission):
             order = {
@@ -1607,7 +1500,7 @@ def submission_start(submission_id):
         return jsonify({'success': False, 'error': 'Дедлайн истек'}), 400
     
     # Устанавливаем статус и время начала
-    submission.status = 'IN_PROGRESS'
+    set_submission_status(submission, 'IN_PROGRESS')
     submission.started_at = now
     db.session.commit()
     
@@ -1676,7 +1569,7 @@ def submission_autosave(submission_id):
         
         # Обновляем статус, если еще не начата или возвращена на доработку
         if submission.status in ['ASSIGNED', 'RETURNED']:
-            submission.status = 'IN_PROGRESS'
+            set_submission_status(submission, 'IN_PROGRESS')
             if not submission.started_at:
                 submission.started_at = moscow_now()
         
@@ -1695,8 +1588,7 @@ def submission_autosave(submission_id):
 def submission_submit(submission_id):
     """Финальная сдача работы"""
     submission = Submission.query.options(
-        joinedload(Submission.assignment).joinedload(Assignment.tasks),
-        joinedload(Submission.answers)
+        joinedload(Submission.assignment).joinedload(Assignment.tasks)
     ).get_or_404(submission_id)
     
     # Проверка доступа
@@ -1709,75 +1601,35 @@ def submission_submit(submission_id):
         return jsonify({'success': False, 'error': 'Работа уже сдана'}), 400
     
     assignment = submission.assignment
-    now = moscow_now()
+    now = _now_naive_msk()
     
     # Проверка дедлайна
     is_late = now > assignment.deadline
     if is_late and assignment.hard_deadline:
         return jsonify({'success': False, 'error': 'Дедлайн истек, сдача невозможна'}), 403
     
-    # Устанавливаем статус
-    submission.status = 'SUBMITTED'
+    # Устанавливаем статус; проверка — в очереди (app/assignments/grading.py)
+    set_submission_status(submission, 'SUBMITTED')
     submission.submitted_at = now
     submission.is_late = is_late
-    
-    # Автоматическая проверка
-    all_auto_graded = True
-    total_score = 0
-    max_score = 0
-    
-    for assignment_task in assignment.tasks:
-        max_score += assignment_task.max_score
-        
-        answer = next((a for a in submission.answers if a.assignment_task_id == assignment_task.assignment_task_id), None)
-        
-        if not answer:
-            if not assignment_task.requires_manual_grading:
-                # Нет ответа на задачу с авто-проверкой - 0 баллов
-                answer = Answer(
-                    submission_id=submission_id,
-                    assignment_task_id=assignment_task.assignment_task_id,
-                    max_score=assignment_task.max_score,
-                    score=0,
-                    is_correct=False
-                )
-                db.session.add(answer)
-                total_score += 0
-            else:
-                all_auto_graded = False
-            continue
-        
-        # Авто-проверка, если не требует ручной проверки
-        if not assignment_task.requires_manual_grading:
-            is_correct, score = auto_grade_answer(answer, assignment_task)
-            if is_correct is not None:
-                answer.is_correct = is_correct
-                answer.score = score
-                total_score += score
-            else:
-                all_auto_graded = False
-        else:
-            all_auto_graded = False
-    
-    submission.total_score = total_score
-    submission.max_score = max_score
-    submission.percentage = (total_score / max_score * 100) if max_score > 0 else 0
-    
-    # Если все задачи проверены автоматически, сразу ставим GRADED
-    if all_auto_graded:
-        submission.status = 'GRADED'
-        submission.graded_at = now
-        # Авто-добавление в журнал
-        _upsert_gradebook_from_submission(submission, actor_user_id=current_user.id)
+    submission.max_score = sum(t.max_score or 0 for t in assignment.tasks)
 
     # Фиксируем попытку сдачи (для истории пересдач)
     try:
         _record_submission_attempt(submission)
     except Exception as e:
         logger.warning(f"Could not record SubmissionAttempt for {submission.submission_id}: {e}")
-    
+
+    job = enqueue_grading(submission.submission_id)
     db.session.commit()
-    
+
+    try:
+        after_submit_grading()
+    except Exception as e:
+        # Задание в очереди, его доберёт планировщик
+        db.session.rollback()
+        logger.warning(f"Inline grading of submission {submission_id} failed: {e}")
+
     audit_logger.log(
         action='submit_assignment',
         entity='Submission',
@@ -1786,16 +1638,41 @@ def submission_submit(submission_id):
         metadata={
             'assignment_id': assignment.assignment_id,
             'is_late': is_late,
-            'auto_graded': all_auto_graded
+            'grading_job_id': job.job_id,
         }
     )
-    
+
+    return jsonify({
+        'success': True,
+        'status': submission.status,
+        'grading': job.status,
+        'job_id': job.job_id,
+        'max_score': submission.max_score,
+    }), 200
+
+
+@assignments_bp.route('/submissions/<int:submission_id>/grading', methods=['GET'])
+@login_required
+def submission_grading_status(submission_id):
+    """Статус автопроверки сдачи (для опроса со страницы работы)"""
+    submission = Submission.query.get_or_404(submission_id)
+
+    student = get_student_by_user_id(current_user.id)
+    is_owner = bool(student and submission.student_id == student.student_id)
+    if not is_owner and not has_permission(current_user, 'assignment.grade'):
+        return jsonify({'success': False, 'error': 'Доступ запрещен'}), 403
+
+    job = (GradingJob.query
+           .filter(GradingJob.submission_id == submission_id)
+           .order_by(GradingJob.job_id.desc())
+           .first())
     return jsonify({
         'success': True,
         'status': submission.status,
-        'score': total_score,
-        'max_score': max_score,
-        'percentage': submission.percentage
+        'grading': job.status if job else None,
+        'score': submission.total_score,
+        'max_score': submission.max_score,
+        'percentage': submission.percentage,
     }), 200
 
 
@@ -2008,7 +1885,7 @@ def submission_grade_save(submission_id):
         except Exception as e:
             logger.warning(f"Failed to save rubric data for submission {submission_id}: {e}")
 
-        submission.status = status
+        set_submission_status(submission, status)
         submission.graded_at = moscow_now()
 
         # Авто-добавление/обновление записи журнала при проверке
@@ -0,0 +1,390 @@
+"""
+Конвейер статических ассетов: оптимизированные варианты, контент-хеш и кешируемые URL.
+
+- При замене файла через галерею дизайнера растровое изображение пережимается без метаданных
+  (PNG optimize, JPEG progressive q=85), рядом в static/assets-cache/ кладутся WebP и миниатюра
+  с хешем в имени; хеш и варианты записываются в static/assets-cache/manifest.json.
+- Галерея при первом просмотре только хеширует файлы; недостающие варианты создает
+  фоновый прогрев кешей порциями по ASSET_VARIANTS_BATCH (по умолчанию 10).
+- url_for('static', filename=...) по всему сайту получает ?v=<хеш содержимого> вместо времени,
+  а ответ на запрос с актуальным хешем (и на варианты в assets-cache с хешем в имени) кешируется браузером
+  на год (immutable). Новый файл — новый хеш — новый URL.
+
+Pillow — необязательная зависимость: без неё файл сохраняется как есть, хеш считается,
+варианты не создаются.
+"""
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import threading
+import time
+from typing import Dict, List, Optional
+
+from flask import current_app, request
+
+from app.utils.background_jobs import register_cache_warmer
+from app.utils.env import env_float, env_int
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - зависит от окружения
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+ASSET_DIRS = ('icons', 'images', 'img')
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'ico'}
+RASTER_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+VARIANTS_DIR = 'assets-cache'
+MANIFEST_NAME = 'manifest.json'
+THUMB_SIZE = 160
+HASH_LENGTH = 12
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# Имя варианта содержит хеш исходника (_variant_path) — только такие файлы неизменяемы
+_VARIANT_NAME = re.compile(rf'^{re.escape(VARIANTS_DIR)}/[^/]+/.+\.[0-9a-f]{{{HASH_LENGTH}}}\.(?:thumb\.)?webp$')
+
+
+def allowed_file(filename: str) -> bool:
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def _write_atomic(path: str, data: bytes) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+# =============================================================================
+# Обработка изображений
+# =============================================================================
+
+def optimize_image(data: bytes, ext: str, reencode: bool = True) -> Dict[str, Optional[bytes]]:
+    """
+    {'original': пережатый файл или None (если не меньше исходного / reencode=False), 'webp', 'thumb',
+    'size': (w, h)}.
+    Бросает ValueError, если данные не читаются как изображение заявленного типа.
+    """
+    result = {'original': None, 'webp': None, 'thumb': None, 'size': None}
+    ext = ext.lower()
+    if Image is None or ext not in RASTER_EXTENSIONS:
+        return result
+    try:
+        with Image.open(io.BytesIO(data)) as probe:
+            probe.verify()
+        img = Image.open(io.BytesIO(data))
+        img.load()
+    except Exception as e:
+        raise ValueError(f'Файл не является изображением: {e}')
+    expected = 'PNG' if ext == 'png' else 'JPEG'
+    if img.format != expected:
+        raise ValueError(f'Ожидался {expected}, загружен {img.format}')
+    result['size'] = img.size
+
+    # Пережатие без EXIF/текстовых чанков
+    if reencode:
+        out = io.BytesIO()
+        if ext == 'png':
+            img.save(out, format='PNG', optimize=True)
+        else:
+            rgb = img.convert('RGB') if img.mode not in ('RGB', 'L') else img
+            rgb.save(out, format='JPEG', quality=85, optimize=True, progressive=True)
+        if out.tell() < len(data):
+            result['original'] = out.getvalue()
+
+    has_alpha = img.mode in ('RGBA', 'LA', 'P')
+    source = img.convert('RGBA' if has_alpha else 'RGB')
+    webp = io.BytesIO()
+    # Иконки с альфой: q=90 визуально без потерь и в разы меньше lossless
+    source.save(webp, format='WEBP', quality=90 if ext == 'png' else 85, method=4)
+    if webp.tell() < len(result['original'] or data):
+        result['webp'] = webp.getvalue()
+
+    thumb_img = source.copy()
+    thumb_img.thumbnail((THUMB_SIZE, THUMB_SIZE))
+    thumb = io.BytesIO()
+    thumb_img.save(thumb, format='WEBP', quality=80, method=4)
+    result['thumb'] = thumb.getvalue()
+    return result
+
+
+# =============================================================================
+# Манифест
+# =============================================================================
+
+class AssetRegistry:
+    """
+    Манифест ассетов галереи (path -> hash, размеры, варианты) и версии остальных статических файлов.
+    Манифест общий для воркеров (файл); версии прочих файлов — по stat, не чаще
+    ASSET_STAT_INTERVAL секунд на файл.
+    """
+
+    def __init__(self, static_folder: str, stat_interval: float = 60.0):
+        self.static_folder = static_folder
+        self.stat_interval = stat_interval
+        self.manifest_path = os.path.join(static_folder, VARIANTS_DIR, MANIFEST_NAME)
+        self._entries: Dict[str, Dict] = {}
+        self._manifest_mtime: Optional[float] = None
+        self._manifest_checked_at = 0.0
+        self._scanned_at = 0.0
+        # static path -> (hash | None, mtime_ns, size, checked_at)
+        self._versions: Dict[str, tuple] = {}
+        self._lock = threading.RLock()
+
+    # ---- манифест ----
+
+    def _load_manifest(self, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._manifest_checked_at < 1.0:
+            return
+        self._manifest_checked_at = now
+        try:
+            mtime = os.stat(self.manifest_path).st_mtime
+        except OSError:
+            return
+        if not force and mtime == self._manifest_mtime:
+            return
+        try:
+            with open(self.manifest_path, encoding='utf-8') as f:
+                data = json.load(f)
+            self._entries = data.get('assets', {})
+            self._manifest_mtime = mtime
+        except (OSError, ValueError) as e:
+            logger.warning(f"Could not read asset manifest: {e}")
+
+    def _save_manifest(self) -> None:
+        payload = json.dumps({'assets': self._entries}, ensure_ascii=False, indent=1, sort_keys=True)
+        _write_atomic(self.manifest_path, payload.encode('utf-8'))
+        try:
+            self._manifest_mtime = os.stat(self.manifest_path).st_mtime
+        except OSError:
+            self._manifest_mtime = None
+
+    def _abs(self, rel_path: str) -> str:
+        return os.path.join(self.static_folder, *rel_path.split('/'))
+
+    def _variant_path(self, rel_path: str, digest: str, suffix: str) -> str:
+        folder, filename = rel_path.split('/', 1)
+        stem = filename.rsplit('.', 1)[0]
+        return f"{VARIANTS_DIR}/{folder}/{stem}.{digest}.{suffix}"
+
+    def _drop_variants(self, entry: Optional[Dict], keep: Dict[str, str]) -> None:
+        for variant in ((entry or {}).get('variants') or {}).values():
+            if variant not in keep.values():
+                try:
+                    os.remove(self._abs(variant))
+                except OSError:
+                    pass
+
+    def process(self, rel_path: str, data: Optional[bytes] = None, optimized: Optional[Dict] = None,
+                generate: bool = True, save: bool = True) -> Dict:
+        """
+        Пересчитывает хеш ассета и (если generate) его варианты; сохраняет манифест.
+        generate=False только запоминает хеш — варианты создаст фоновый прогрев (generate_pending).
+        """
+        path = self._abs(rel_path)
+        if data is None:
+            with open(path, 'rb') as f:
+                data = f.read()
+        st = os.stat(path)
+        digest = content_hash(data)
+        ext = rel_path.rsplit('.', 1)[-1].lower()
+        with self._lock:
+            if save:
+                self._load_manifest(force=True)  # изменения других воркеров
+            old = self._entries.get(rel_path)
+            entry = {'hash': digest, 'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'variants': {}}
+            if old and old.get('hash') == digest and not old.get('pending'):
+                entry['variants'] = old.get('variants') or {}
+                entry['width'], entry['height'] = old.get('width'), old.get('height')
+            elif Image is not None and ext in RASTER_EXTENSIONS:
+                if not generate:
+                    entry['pending'] = True
+                else:
+                    if optimized is None:
+                        try:
+                            optimized = optimize_image(data, ext, reencode=False)
+                        except ValueError as e:
+                            logger.warning(f"Asset {rel_path} is not a valid image: {e}")
+                            optimized = {}
+                    for name, suffix in (('webp', 'webp'), ('thumb', 'thumb.webp')):
+                        blob = optimized.get(name)
+                        if blob:
+                            variant = self._variant_path(rel_path, digest, suffix)
+                            _write_atomic(self._abs(variant), blob)
+                            entry['variants'][name] = variant
+                    if optimized.get('size'):
+                        entry['width'], entry['height'] = optimized['size']
+            self._drop_variants(old, entry['variants'])
+            self._entries[rel_path] = entry
+            self._versions.pop(rel_path, None)
+            if save:
+                self._save_manifest()
+            return entry
+
+    def replace(self, rel_path: str, data: bytes) -> Dict:
+        """Замена файла галереи: пережатие, атомарная запись, хеш и варианты."""
+        ext = rel_path.rsplit('.', 1)[-1].lower()
+        optimized = optimize_image(data, ext)  # ValueError — загружено не изображение
+        final = optimized.get('original') or data
+        _write_atomic(self._abs(rel_path), final)
+        return self.process(rel_path, data=final, optimized=optimized)
+
+    def generate_pending(self, limit: int = 10) -> int:
+        """Создает варианты для ассетов, которые галерея пока только захешировала."""
+        with self._lock:
+            self._load_manifest(force=True)
+            pending = [path for path, entry in sorted(self._entries.items()) if entry.get('pending')][:max(1, limit)]
+        done = 0
+        for rel_path in pending:
+            try:
+                self.process(rel_path)
+                done += 1
+            except OSError as e:
+                logger.warning(f"Could not generate variants for {rel_path}: {e}")
+        return done
+
+    def gallery(self) -> List[Dict]:
+        """
+        Ассеты галереи из манифеста. Папки пересканируются не чаще ASSET_RESCAN_SECONDS
+        (только stat; хешируются новые и изменённые файлы).
+        """
+        with self._lock:
+            self._load_manifest()
+            if time.monotonic() - self._scanned_at >= env_float('ASSET_RESCAN_SECONDS', 60.0) or not self._entries:
+                self._rescan()
+            return [dict(entry, path=path) for path, entry in sorted(self._entries.items())]
+
+    def _rescan(self) -> None:
+        self._scanned_at = time.monotonic()
+        self._load_manifest(force=True)
+        seen = set()
+        changed = []
+        for subdir in ASSET_DIRS:
+            full_path = os.path.join(self.static_folder, subdir)
+            if not os.path.isdir(full_path):
+                continue
+            with os.scandir(full_path) as it:
+                for item in it:
+                    if not item.is_file() or not allowed_file(item.name):
+                        continue
+                    rel_path = f"{subdir}/{item.name}"
+                    seen.add(rel_path)
+                    entry = self._entries.get(rel_path)
+                    st = item.stat()
+                    if not entry or entry.get('mtime_ns') != st.st_mtime_ns or entry.get('size') != st.st_size:
+                        changed.append(rel_path)
+        removed = [p for p in self._entries if p not in seen]
+        for rel_path in removed:
+            self._drop_variants(self._entries.pop(rel_path), {})
+        for rel_path in changed:
+            try:
+                self.process(rel_path, generate=False, save=False)
+            except OSError as e:
+                logger.warning(f"Could not process asset {rel_path}: {e}")
+        if removed or changed:
+            self._save_manifest()
+
+    # ---- версии для url_for ----
+
+    def version(self, filename: str) -> Optional[str]:
+        """
+        Контент-хеш статического файла (None — файла нет). Файл проверяется по stat не чаще
+        stat_interval; запись манифеста используется, только пока mtime/размер совпадают с диском —
+        иначе (файл обновили деплоем мимо галереи) ассет перехешируется и манифест обновляется.
+        """
+        if filename.startswith(VARIANTS_DIR + '/'):
+            return None  # хеш уже в имени файла
+        with self._lock:
+            self._load_manifest()
+            entry = self._entries.get(filename)
+            cached = self._versions.get(filename)
+            now = time.monotonic()
+            if cached and now - cached[3] < self.stat_interval:
+                return cached[0]
+        path = self._abs(filename)
+        try:
+            st = os.stat(path)
+        except OSError:
+            digest = None
+            mtime_ns = size = None
+        else:
+            mtime_ns, size = st.st_mtime_ns, st.st_size
+            if cached and cached[1] == mtime_ns and cached[2] == size:
+                digest = cached[0]
+            elif entry and entry.get('mtime_ns') == mtime_ns and entry.get('size') == size:
+                digest = entry['hash']
+            elif entry:
+                digest = self._refresh_entry(filename)
+            else:
+                with open(path, 'rb') as f:
+                    digest = content_hash(f.read())
+        with self._lock:
+            self._versions[filename] = (digest, mtime_ns, size, now)
+        return digest
+
+    def _refresh_entry(self, rel_path: str) -> Optional[str]:
+        """Ассет галереи изменился на диске: новый хеш в манифест, варианты досоздаст прогрев."""
+        try:
+            return self.process(rel_path, generate=False)['hash']
+        except OSError as e:
+            logger.warning(f"Could not refresh asset {rel_path}: {e}")
+            return None
+
+    def is_current(self, filename: str, version: Optional[str]) -> bool:
+        if _VARIANT_NAME.match(filename):
+            return True
+        return bool(version) and version == self.version(filename)
+
+
+def get_registry() -> AssetRegistry:
+    return current_app.extensions['asset_registry']
+
+
+@register_cache_warmer
+def generate_asset_variants(now) -> None:
+    """Фоновая генерация WebP/миниатюр для ассетов, добавленных мимо галереи (деплой, git)."""
+    registry = current_app.extensions.get('asset_registry')
+    if registry is None or Image is None:
+        return
+    done = registry.generate_pending(limit=env_int('ASSET_VARIANTS_BATCH', 10))
+    if done:
+        logger.info(f"Generated variants for {done} assets")
+
+
+def init_asset_pipeline(app) -> None:
+    """Версионирование url_for('static') по хешу и долгий кеш для версионированных ответов."""
+    registry = AssetRegistry(app.static_folder, stat_interval=env_float('ASSET_STAT_INTERVAL', 60.0))
+    app.extensions['asset_registry'] = registry
+
+    @app.url_defaults
+    def _static_version(endpoint, values):
+        if endpoint != 'static' or 'v' in values:
+            return
+        filename = values.get('filename')
+        if filename:
+            digest = registry.version(filename)
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def _static_cache_headers(response):
+        if request.endpoint != 'static' or response.status_code not in (200, 304):
+            return response
+        filename = (request.view_args or {}).get('filename', '')
+        if registry.is_current(filename, request.args.get('v')):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = IMMUTABLE_MAX_AGE
+            response.cache_control.immutable = True
+        return response
@@ -1,38 +1,30 @@
 import os
 from flask import render_template, request, flash, redirect, url_for, current_app
 from flask_login import login_required, current_user
-from werkzeug.utils import secure_filename
 from app.designer import designer_bp
+from app.designer.assets import ASSET_DIRS, allowed_file, get_registry
 from app.auth.rbac_utils import check_access
-import time
-
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'svg', 'ico'}
-
-def allowed_file(filename):
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 @designer_bp.route('/designer/assets')
 @login_required
 @check_access('assets.manage')
 def assets_manager():
     """Галерея ассетов для дизайнера"""
-    static_folder = current_app.static_folder
     assets = []
     
-    # Сканируем папку static/icons и static/images
-    target_dirs = ['icons', 'images', 'img']
-    
-    for subdir in target_dirs:
-        full_path = os.path.join(static_folder, subdir)
-        if os.path.exists(full_path):
-            for filename in os.listdir(full_path):
-                if allowed_file(filename):
-                    assets.append({
-                        'folder': subdir,
-                        'filename': filename,
-                        'path': f"{subdir}/{filename}",
-                        'url': url_for('static', filename=f"{subdir}/{filename}") + f"?v={int(time.time())}"
-                    })
+    # Ассеты static/icons, static/images, static/img из манифеста (хеш содержимого и варианты)
+    for entry in get_registry().gallery():
+        subdir, filename = entry['path'].split('/', 1)
+        variants = entry.get('variants') or {}
+        assets.append({
+            'folder': subdir,
+            'filename': filename,
+            'path': entry['path'],
+            'hash': entry['hash'],
+            'url': url_for('static', filename=entry['path'], v=entry['hash']),
+            'webp_url': url_for('static', filename=variants['webp']) if variants.get('webp') else None,
+            'thumb_url': url_for('static', filename=variants['thumb']) if variants.get('thumb') else None,
+        })
     
     return render_template('designer_assets.html', assets=assets)
 
@@ -55,7 +47,8 @@ def replace_asset():
         
     if file and target_folder and target_filename:
         # Проверяем безопасность путей (чтобы не вышли за пределы static)
-        if '..' in target_folder or '..' in target_filename:
+        if ('..' in target_folder or '..' in target_filename or '/' in target_filename or '\\' in target_filename
+                or target_folder not in ASSET_DIRS or not allowed_file(target_filename)):
             flash('Недопустимый путь', 'error')
             return redirect(url_for('designer.assets_manager'))
             
@@ -66,9 +59,11 @@ def replace_asset():
             return redirect(url_for('designer.assets_manager'))
             
         try:
-            # Перезаписываем файл
-            file.save(full_path)
-            flash(f'Файл {target_filename} успешно обновлен!', 'success')
+            # Пережимаем, перезаписываем файл и обновляем хеш/варианты
+            entry = get_registry().replace(f"{target_folder}/{target_filename}", file.read())
+            flash(f'Файл {target_filename} успешно обновлен! (версия {entry["hash"]})', 'success')
+        except ValueError as e:
+            flash(str(e), 'error')
         except Exception as e:
             flash(f'Ошибка при сохранении: {e}', 'error')
             
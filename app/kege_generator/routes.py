@@ -12,6 +12,7 @@ from app.kege_generator.forms import TaskSelectionForm, ResetForm, TaskSearchFor
 from app.models import Lesson, Tasks, LessonTask, StudentTaskSeen, UsageHistory, db
 from app.models import TaskTemplate, TemplateTask
 from app.auth.rbac_utils import has_permission
+from app.utils.task_catalog import get_task_catalog
 from core.selector_logic import (
     get_unique_tasks, record_usage, record_skipped, record_blacklist,
     reset_history, reset_skipped, reset_blacklist,
@@ -71,8 +72,7 @@ def kege_generator(lesson_id=None):
     search_form = TaskSearchForm()
 
     try:
-        available_types = db.session.query(Tasks.task_number).distinct().order_by(Tasks.task_number).all()
-        choices = [(t[0], f'Задание {t[0]}') for t in available_types]
+        choices = [(n, f'Задание {n}') for n in get_task_catalog().numbers]
 
         if not choices:
             flash('База данных пуста! Запустите парсер для заполнения: python scraper/playwright_parser.py', 'warning')
@@ -233,7 +233,8 @@ def _task_to_payload(task: Tasks):
         'task_number': task.task_number,
         'site_task_id': task.site_task_id,
         'source_url': task.source_url,
-        'content_html': task.content_html,
+        # Предрассчитанный при сохранении вариант (ленивые картинки с размерами, без служебной разметки)
+        'content_html': task.rendered_html,
         'answer': task.answer,
         'attached_files': task.attached_files,
     }
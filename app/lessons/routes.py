@@ -9,8 +9,6 @@ from app.uploads.service import save_uploaded_file
 from flask import render_template, request, redirect, url_for, flash, jsonify, make_response, current_app  # current_app нужен для определения типа БД (Postgres)
 from flask_login import login_required, current_user  # comment
 from sqlalchemy import text, or_  # text нужен для setval(pg_get_serial_sequence(...)) при сбитых sequences
-from sqlalchemy.exc import OperationalError, ProgrammingError
-from app.utils.db_migrations import ensure_schema_columns
 from app.auth.rbac_utils import check_access, get_user_scope
 
 from app.lessons import lessons_bp
@@ -353,32 +351,11 @@ def lesson_complete(lesson_id):
 def lesson_homework_view(lesson_id):
     """Просмотр домашних заданий урока"""
     
-    # --- AUTO-FIX FOR SCHEMA ISSUES ---
-    # Try to load lesson. If it fails due to missing columns, run migration and retry.
-    lesson = None
-    max_retries = 2
-    for attempt in range(max_retries):
-        try:
-            # Оптимизация: используем joinedload для избежания N+1 проблем
-            lesson = Lesson.query.options(
-                db.joinedload(Lesson.student),
-                db.joinedload(Lesson.homework_tasks).joinedload(LessonTask.task)
-            ).get_or_404(lesson_id)
-            break # Success
-        except (OperationalError, ProgrammingError) as e:
-            db.session.rollback()
-            if attempt < max_retries - 1 and ('column' in str(e).lower() or 'does not exist' in str(e).lower()):
-                logger.warning(f"Database schema issue detected in lesson_homework_view ({e}). Attempting auto-fix...")
-                try:
-                    ensure_schema_columns(current_app)
-                    logger.info("Schema fix applied. Retrying query...")
-                    continue
-                except Exception as fix_err:
-                    logger.error(f"Failed to auto-fix schema: {fix_err}")
-                    raise e # Re-raise original error if fix fails
-            else:
-                raise e # Re-raise if not a schema issue or retries exhausted
-    # ----------------------------------
+    # Оптимизация: используем joinedload для избежания N+1 проблем
+    lesson = Lesson.query.options(
+        db.joinedload(Lesson.student),
+        db.joinedload(Lesson.homework_tasks).joinedload(LessonTask.task)
+    ).get_or_404(lesson_id)
 
     student = lesson.student
     # Контент-блоки (конструктор): приводим к list для шаблона
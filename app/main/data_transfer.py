@@ -0,0 +1,374 @@
+"""
+Потоковый экспорт и пакетный импорт учеников и уроков.
+
+Формат NDJSON (по записи JSON на строку):
+    {"type": "meta", "format": "keg-export", "version": 2, "exported_at": "..."}
+    {"type": "student", "student_id": 12, "name": "...", "platform_id": "...", ...}
+    {"type": "lesson", "student_id": 12, "lesson_date": "...", ...}
+Сначала идут все ученики, затем уроки — импорт сопоставляет student_id из файла
+с найденными/созданными учениками, не дожидаясь конца файла.
+
+Экспорт читает строки через yield_per и отдает их частями — память не зависит от объема БД.
+Старый формат (один JSON-объект {"students": [...], "lessons": [...]}) по-прежнему
+отдается по ?format=json (тоже потоково) и принимается импортом.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import time
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import insert, select
+
+from app.models import db, Student, Lesson, moscow_now
+from app.students.forms import normalize_school_class
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMAT = 'keg-export'
+EXPORT_VERSION = 2
+YIELD_PER = 1000
+CHUNK_SIZE = 1000
+WRITE_BUFFER = 64 * 1024
+
+STUDENT_FIELDS = (
+    'name', 'platform_id', 'category', 'target_score', 'deadline', 'diagnostic_level', 'description',
+    'notes', 'strengths', 'weaknesses', 'preferences', 'overall_rating', 'school_class', 'goal_text',
+    'programming_language',
+)
+LESSON_FIELDS = (
+    'student_id', 'lesson_type', 'lesson_date', 'duration', 'status', 'topic', 'notes', 'homework',
+    'homework_status', 'homework_result_percent', 'homework_result_notes',
+)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def _dumps(record: Dict) -> str:
+    return json.dumps(record, ensure_ascii=False, default=_json_default)
+
+
+# =============================================================================
+# Экспорт
+# =============================================================================
+
+def iter_student_records() -> Iterator[Dict]:
+    columns = [Student.student_id] + [getattr(Student, f) for f in STUDENT_FIELDS]
+    stmt = select(*columns).where(Student.is_active.is_(True)).order_by(Student.student_id)
+    for row in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        record = {'type': 'student', 'student_id': row[0]}
+        record.update(zip(STUDENT_FIELDS, row[1:]))
+        yield record
+
+
+def iter_lesson_records() -> Iterator[Dict]:
+    columns = [getattr(Lesson, f) for f in LESSON_FIELDS]
+    stmt = select(*columns).order_by(Lesson.lesson_id)
+    for row in db.session.execute(stmt.execution_options(yield_per=YIELD_PER)):
+        record = {'type': 'lesson'}
+        record.update(zip(LESSON_FIELDS, row))
+        yield record
+
+
+def _buffered(lines: Iterable[str]) -> Iterator[str]:
+    """Склеивает строки в блоки ~64 КБ: меньше накладных расходов на запись в сокет."""
+    buf: List[str] = []
+    size = 0
+    for line in lines:
+        buf.append(line)
+        size += len(line)
+        if size >= WRITE_BUFFER:
+            yield ''.join(buf)
+            buf, size = [], 0
+    if buf:
+        yield ''.join(buf)
+
+
+def export_ndjson(stats: Optional[Dict] = None) -> Iterator[str]:
+    """NDJSON-экспорт; stats (если передан) заполняется счетчиками по мере выдачи."""
+    stats = stats if stats is not None else {}
+    stats.update(students=0, lessons=0)
+
+    def lines():
+        yield _dumps({'type': 'meta', 'format': EXPORT_FORMAT, 'version': EXPORT_VERSION,
+                      'exported_at': moscow_now().isoformat()}) + '\n'
+        for record in iter_student_records():
+            stats['students'] += 1
+            yield _dumps(record) + '\n'
+        for record in iter_lesson_records():
+            stats['lessons'] += 1
+            yield _dumps(record) + '\n'
+
+    return _buffered(lines())
+
+
+def export_json(stats: Optional[Dict] = None) -> Iterator[str]:
+    """Старый формат {"students": [...], "lessons": [...]}, но без сборки всего объекта в памяти."""
+    stats = stats if stats is not None else {}
+    stats.update(students=0, lessons=0)
+
+    def section(records: Iterator[Dict], key: str):
+        first = True
+        for record in records:
+            record.pop('type', None)
+            if key == 'students':
+                record.pop('student_id', None)  # как в прежнем экспорте
+            stats[key] += 1
+            yield ('\n    ' if first else ',\n    ') + _dumps(record)
+            first = False
+
+    def parts():
+        yield '{\n  "students": ['
+        yield from section(iter_student_records(), 'students')
+        yield '\n  ],\n  "lessons": ['
+        yield from section(iter_lesson_records(), 'lessons')
+        yield '\n  ]\n}\n'
+
+    return _buffered(parts())
+
+
+# =============================================================================
+# Чтение файла импорта
+# =============================================================================
+
+def iter_ndjson(stream) -> Iterator[Dict]:
+    """Записи NDJSON из бинарного потока построчно (пустые строки пропускаются)."""
+    for line_no, raw in enumerate(stream, 1):
+        line = raw.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except ValueError as e:
+            raise ValueError(f'Строка {line_no}: некорректный JSON ({e})')
+        if isinstance(record, dict):
+            yield record
+
+
+def iter_legacy_json(stream) -> Iterator[Dict]:
+    """Старый экспорт одним объектом: читается целиком, затем отдается по записям."""
+    data = json.loads(stream.read().decode('utf-8'))
+    for student in data.get('students') or []:
+        yield dict(student, type='student')
+    for lesson in data.get('lessons') or []:
+        yield dict(lesson, type='lesson')
+
+
+def iter_import_records(stream, filename: str) -> Iterator[Dict]:
+    """Записи файла импорта; stream — бинарный seekable поток (FileStorage.stream)."""
+    name = (filename or '').lower()
+    if name.endswith('.ndjson') or name.endswith('.jsonl'):
+        return iter_ndjson(stream)
+    if name.endswith('.json'):
+        # .json может оказаться NDJSON (переименованный файл): первая строка — meta-запись
+        pos = stream.tell()
+        first_line = stream.readline()
+        stream.seek(pos)
+        try:
+            first = json.loads(first_line)
+        except ValueError:
+            first = None
+        if isinstance(first, dict) and first.get('type') == 'meta':
+            return iter_ndjson(stream)
+        return iter_legacy_json(stream)
+    raise ValueError('Поддерживаются файлы .ndjson, .jsonl и .json')
+
+
+# =============================================================================
+# Импорт
+# =============================================================================
+
+def _parse_datetime(value) -> Optional[datetime]:
+    if not value:
+        return None
+    if isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+class DataImporter:
+    """
+    Пакетный импорт: ученики и уроки копятся в буферах по chunk_size записей;
+    на каждый пакет — один запрос поиска существующих, один bulk insert и commit.
+
+    Ученик считается существующим при совпадении (name, platform_id), как и раньше.
+    Урок привязывается к ученику по student_id из файла: если этот ученик был в файле —
+    к найденному/созданному ученику, иначе к ученику с таким id в базе (прежнее поведение).
+    """
+
+    def __init__(self, chunk_size: int = CHUNK_SIZE, progress: Optional[Callable[[Dict], None]] = None):
+        self.chunk_size = max(1, chunk_size)
+        self.progress = progress
+        self.stats = {'students': 0, 'students_existing': 0, 'lessons': 0, 'lessons_skipped': 0,
+                      'chunks': 0, 'elapsed_s': 0.0}
+        self._students: List[Dict] = []
+        self._lessons: List[Dict] = []
+        self._student_map: Dict[int, int] = {}  # student_id из файла -> student_id в базе
+        self._known_ids: set = set()
+        self._missing_ids: set = set()
+        self._started = time.perf_counter()
+
+    # ---- публичный API ----
+
+    def run(self, records: Iterable[Dict]) -> Dict:
+        for record in records:
+            self.feed(record)
+        return self.finish()
+
+    def feed(self, record: Dict) -> None:
+        kind = record.get('type')
+        if kind == 'student':
+            self._students.append(record)
+            if len(self._students) >= self.chunk_size:
+                self._flush_students()
+        elif kind == 'lesson':
+            if self._students:
+                self._flush_students()  # уроки могут ссылаться на учеников из буфера
+            self._lessons.append(record)
+            if len(self._lessons) >= self.chunk_size:
+                self._flush_lessons()
+
+    def finish(self) -> Dict:
+        self._flush_students()
+        self._flush_lessons()
+        self.stats['elapsed_s'] = round(time.perf_counter() - self._started, 2)
+        return self.stats
+
+    # ---- пакеты ----
+
+    def _commit_chunk(self, student_ids: Iterable[int] = ()) -> None:
+        student_ids = set(student_ids)
+        if student_ids:
+            # Bulk insert не проходит через flush: сводки по детям помечаем явно
+            from app.parents.digest import mark_dirty
+            from app.models import ChildDigest
+            try:
+                mark_dirty([ChildDigest.__table__.c.student_id.in_(student_ids)])
+            except Exception as e:
+                logger.warning(f"Could not mark child digests dirty after import: {e}")
+        db.session.commit()
+        db.session.expunge_all()  # identity map не растет от пакета к пакету
+        self.stats['chunks'] += 1
+        self.stats['elapsed_s'] = round(time.perf_counter() - self._started, 2)
+        if self.progress:
+            self.progress(dict(self.stats))
+
+    def _flush_students(self) -> None:
+        if not self._students:
+            return
+        batch, self._students = self._students, []
+        names = {s.get('name') for s in batch if s.get('name')}
+        existing: Dict[Tuple, int] = {}
+        if names:
+            rows = db.session.execute(
+                select(Student.student_id, Student.name, Student.platform_id).where(Student.name.in_(names))
+            )
+            for student_id, name, platform_id in rows:
+                existing.setdefault((name, platform_id), student_id)
+
+        new_rows: List[Dict] = []
+        new_keys: Dict[Tuple, int] = {}
+        for data in batch:
+            key = (data.get('name'), data.get('platform_id'))
+            found = existing.get(key)
+            if found is not None:
+                self.stats['students_existing'] += 1
+                self._remember(data.get('student_id'), found)
+                continue
+            if key in new_keys:
+                # Дубликат внутри пакета — связываем с уже добавляемым учеником
+                new_rows[new_keys[key]]['_aliases'].append(data.get('student_id'))
+                continue
+            row = {f: data.get(f) for f in STUDENT_FIELDS}
+            row['school_class'] = normalize_school_class(row['school_class'])
+            row['is_active'] = True
+            row['_aliases'] = [data.get('student_id')]
+            new_keys[key] = len(new_rows)
+            new_rows.append(row)
+
+        if new_rows:
+            objects = [Student(**{k: v for k, v in row.items() if k != '_aliases'}) for row in new_rows]
+            db.session.add_all(objects)
+            db.session.flush()  # нужны student_id новых учеников
+            for row, obj in zip(new_rows, objects):
+                for alias in row['_aliases']:
+                    self._remember(alias, obj.student_id)
+            self.stats['students'] += len(objects)
+        self._commit_chunk()
+
+    def _remember(self, file_id, db_id: int) -> None:
+        self._known_ids.add(db_id)
+        if file_id is not None:
+            try:
+                self._student_map[int(file_id)] = db_id
+            except (TypeError, ValueError):
+                pass
+
+    def _resolve_student_ids(self, batch: List[Dict]) -> None:
+        """Проверка существования учеников одним запросом на пакет (вместо Student.query.get на урок)."""
+        unknown = set()
+        for data in batch:
+            try:
+                sid = int(data.get('student_id'))
+            except (TypeError, ValueError):
+                continue
+            if sid not in self._student_map and sid not in self._known_ids and sid not in self._missing_ids:
+                unknown.add(sid)
+        if not unknown:
+            return
+        found = set(db.session.execute(
+            select(Student.student_id).where(Student.student_id.in_(unknown))
+        ).scalars())
+        self._known_ids |= found
+        self._missing_ids |= unknown - found
+
+    def _flush_lessons(self) -> None:
+        if not self._lessons:
+            return
+        batch, self._lessons = self._lessons, []
+        self._resolve_student_ids(batch)
+        from app.main.routes import normalize_homework_status_value
+
+        rows = []
+        now = moscow_now()
+        for data in batch:
+            try:
+                file_sid = int(data.get('student_id'))
+            except (TypeError, ValueError):
+                self.stats['lessons_skipped'] += 1
+                continue
+            sid = self._student_map.get(file_sid, file_sid)
+            if sid not in self._known_ids:
+                self.stats['lessons_skipped'] += 1
+                continue
+            imported_type = data.get('lesson_type')
+            homework_status = normalize_homework_status_value(data.get('homework_status'))
+            homework = data.get('homework')
+            if imported_type == 'introductory':
+                homework = ''
+                homework_status = 'not_assigned'
+            rows.append({
+                'student_id': sid,
+                'lesson_type': imported_type,
+                'lesson_date': _parse_datetime(data.get('lesson_date')) or now,
+                'duration': data.get('duration', 60),
+                'status': data.get('status', 'planned'),
+                'topic': data.get('topic'),
+                'notes': data.get('notes'),
+                'homework': homework,
+                'homework_status': homework_status,
+                'homework_result_percent': data.get('homework_result_percent'),
+                'homework_result_notes': data.get('homework_result_notes'),
+                'created_at': now,
+                'updated_at': now,
+            })
+        if rows:
+            db.session.execute(insert(Lesson), rows)
+            self.stats['lessons'] += len(rows)
+        self._commit_chunk(row['student_id'] for row in rows)
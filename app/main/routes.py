@@ -3,8 +3,7 @@
 """
 import logging
 import json
-import shutil
-from flask import render_template, request, send_from_directory, flash, redirect, url_for, make_response
+from flask import render_template, request, send_from_directory, flash, redirect, url_for, make_response, Response, stream_with_context, jsonify, current_app
 from flask_login import login_required
 import os
 from datetime import datetime
@@ -13,10 +12,13 @@ from app.main import main_bp
 from app.models import Student, Lesson, Tasks, UsageHistory, SkippedTasks, BlacklistTasks, db, moscow_now
 from app.models import User, Enrollment, FamilyTie, UserConsent
 from app.students.forms import normalize_school_class
+from app.main.data_transfer import export_ndjson, export_json, iter_import_records, DataImporter
+from app.utils.db_backup import start_backup, get_backup_status, list_backups
 from app.auth.rbac_utils import get_user_scope, apply_data_scope
 from sqlalchemy import func, or_
 from datetime import timedelta
 from core.audit_logger import audit_logger
+from core.scheduler import scheduler
 from flask_login import current_user
 from app import csrf
 
@@ -64,15 +66,19 @@ def legal_accept():
 def health_check():
     """
     Простейший endpoint для проверки работоспособности приложения
-    Не требует авторизации и не использует БД
+    Не требует авторизации и не использует БД (контракт схемы — результат проверки при старте)
     """
     try:
         from flask import jsonify
+        from app.utils.schema_contract import schema_contract_status
+        schema = schema_contract_status()
         return jsonify({
-            'status': 'OK',
+            'status': 'DEGRADED' if schema.get('ok') is False else 'OK',
             'message': 'Application is running',
             'environment': os.environ.get('ENVIRONMENT', 'unknown'),
             'database_url_set': 'YES' if os.environ.get('DATABASE_URL') else 'NO',
+            'scheduler': scheduler.metrics(),
+            'schema': schema,
             'timestamp': datetime.now().isoformat()
         }), 200
     except Exception as e:
@@ -760,80 +766,59 @@ logger = logging.getLogger(__name__)
 @main_bp.route('/export-data')
 @login_required
 def export_data():
-    """Экспорт данных в JSON"""
+    """Потоковый экспорт данных в NDJSON (?format=json — прежний формат)"""
     if not (current_user.is_admin() or current_user.is_creator()):
         flash('Доступ запрещен. Экспорт доступен только администратору/создателю.', 'danger')
         return redirect(url_for('main.dashboard'))
-    try:
-        logger.info('Начало экспорта данных')
-        export_data_dict = {
-            'students': [{
-                'name': s.name,
-                'platform_id': s.platform_id,
-                'category': s.category,
-                'target_score': s.target_score,
-                'deadline': s.deadline,
-                'diagnostic_level': s.diagnostic_level,
-                'description': s.description,
-                'notes': s.notes,
-                'strengths': s.strengths,
-                'weaknesses': s.weaknesses,
-                'preferences': s.preferences,
-                'overall_rating': s.overall_rating,
-                'school_class': s.school_class,
-                'goal_text': s.goal_text,
-                'programming_language': s.programming_language
-            } for s in Student.query.filter_by(is_active=True).all()],
-            'lessons': [{
-                'student_id': l.student_id,
-                'lesson_type': l.lesson_type,
-                'lesson_date': l.lesson_date.isoformat() if l.lesson_date else None,
-                'duration': l.duration,
-                'status': l.status,
-                'topic': l.topic,
-                'notes': l.notes,
-                'homework': l.homework,
-                'homework_status': l.homework_status,
-                'homework_result_percent': l.homework_result_percent,
-                'homework_result_notes': l.homework_result_notes
-            } for l in Lesson.query.all()]
-        }
-        response = make_response(json.dumps(export_data_dict, ensure_ascii=False, indent=2))
-        response.headers['Content-Type'] = 'application/json; charset=utf-8'
-        response.headers['Content-Disposition'] = f'attachment; filename=export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.json'
-        logger.info(f'Экспорт завершен: {len(export_data_dict["students"])} учеников, {len(export_data_dict["lessons"])} уроков')
-        
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        export_format = 'ndjson'
+    logger.info(f'Начало экспорта данных ({export_format})')
+    stats = {}
+    chunks = export_ndjson(stats) if export_format == 'ndjson' else export_json(stats)
+
+    def generate():
+        # Ответ отдается частями по мере чтения БД (yield_per), без сборки всего экспорта в памяти
+        try:
+            yield from chunks
+        except Exception as e:
+            logger.error(f'Ошибка при экспорте данных: {e}')
+            audit_logger.log_error(
+                action='export_data',
+                entity='Data',
+                error=str(e)
+            )
+            raise
+        logger.info(f'Экспорт завершен: {stats.get("students", 0)} учеников, {stats.get("lessons", 0)} уроков')
         audit_logger.log(
             action='export_data',
             entity='Data',
             entity_id=None,
             status='success',
             metadata={
-                'students_count': len(export_data_dict["students"]),
-                'lessons_count': len(export_data_dict["lessons"])
+                'format': export_format,
+                'students_count': stats.get('students', 0),
+                'lessons_count': stats.get('lessons', 0)
             }
         )
-        
-        return response
-    except Exception as e:
-        logger.error(f'Ошибка при экспорте данных: {e}')
-        audit_logger.log_error(
-            action='export_data',
-            entity='Data',
-            error=str(e)
-        )
-        flash(f'Ошибка при экспорте данных: {str(e)}', 'error')
-        return redirect(url_for('main.dashboard'))
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    response = Response(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Type'] = f'{mimetype}; charset=utf-8'
+    response.headers['Content-Disposition'] = f'attachment; filename=export_{datetime.now().strftime("%Y%m%d_%H%M%S")}.{export_format}'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @main_bp.route('/import-data', methods=['GET', 'POST'])
 @login_required
 def import_data():
-    """Импорт данных из JSON"""
+    """Импорт данных из NDJSON (или старого JSON-экспорта)"""
     if not (current_user.is_admin() or current_user.is_creator()):
         flash('Доступ запрещен. Импорт доступен только администратору/создателю.', 'danger')
         return redirect(url_for('main.dashboard'))
     if request.method == 'GET':
         return render_template('import_data.html')
+    importer = None
     try:
         if 'file' not in request.files:
             flash('Файл не выбран', 'error')
@@ -842,65 +827,24 @@ def import_data():
         if file.filename == '':
             flash('Файл не выбран', 'error')
             return redirect(url_for('main.import_data'))
-        if not file.filename.endswith('.json'):
-            flash('Поддерживаются только JSON файлы', 'error')
+        try:
+            records = iter_import_records(file.stream, file.filename)
+        except ValueError as e:
+            flash(str(e), 'error')
             return redirect(url_for('main.import_data'))
-        data = json.loads(file.read().decode('utf-8'))
-        imported_students = 0
-        imported_lessons = 0
-        if 'students' in data:
-            for student_data in data['students']:
-                existing = Student.query.filter_by(
-                    name=student_data.get('name'),
-                    platform_id=student_data.get('platform_id')
-                ).first()
-                if not existing:
-                    student = Student(
-                        name=student_data.get('name'),
-                        platform_id=student_data.get('platform_id'),
-                        category=student_data.get('category'),
-                        target_score=student_data.get('target_score'),
-                        deadline=student_data.get('deadline'),
-                        diagnostic_level=student_data.get('diagnostic_level'),
-                        description=student_data.get('description'),
-                        notes=student_data.get('notes'),
-                        strengths=student_data.get('strengths'),
-                        weaknesses=student_data.get('weaknesses'),
-                        preferences=student_data.get('preferences'),
-                        overall_rating=student_data.get('overall_rating'),
-                        school_class=normalize_school_class(student_data.get('school_class')),
-                        goal_text=student_data.get('goal_text'),
-                        programming_language=student_data.get('programming_language'),
-                        is_active=True
-                    )
-                    db.session.add(student)
-                    imported_students += 1
-        if 'lessons' in data:
-            for lesson_data in data['lessons']:
-                if Student.query.get(lesson_data.get('student_id')):
-                    imported_type = lesson_data.get('lesson_type')
-                    imported_homework_status = normalize_homework_status_value(lesson_data.get('homework_status'))
-                    imported_homework = lesson_data.get('homework')
-                    if imported_type == 'introductory':
-                        imported_homework = ''
-                        imported_homework_status = 'not_assigned'
-                    lesson = Lesson(
-                        student_id=lesson_data.get('student_id'),
-                        lesson_type=imported_type,
-                        lesson_date=datetime.fromisoformat(lesson_data['lesson_date']) if lesson_data.get('lesson_date') else moscow_now(),
-                        duration=lesson_data.get('duration', 60),
-                        status=lesson_data.get('status', 'planned'),
-                        topic=lesson_data.get('topic'),
-                        notes=lesson_data.get('notes'),
-                        homework=imported_homework,
-                        homework_status=imported_homework_status,
-                        homework_result_percent=lesson_data.get('homework_result_percent'),
-                        homework_result_notes=lesson_data.get('homework_result_notes')
-                    )
-                    db.session.add(lesson)
-                    imported_lessons += 1
-        db.session.commit()
-        logger.info(f'Импорт завершен: {imported_students} учеников, {imported_lessons} уроков')
+
+        def log_progress(progress):
+            if progress['chunks'] % 10 == 0:
+                logger.info(f"Импорт: {progress['students']} учеников, {progress['lessons']} уроков, "
+                            f"{progress['elapsed_s']} с")
+
+        # Пакеты по CHUNK_SIZE записей: поиск существующих одним запросом, bulk insert, commit на пакет
+        importer = DataImporter(progress=log_progress)
+        stats = importer.run(records)
+        imported_students = stats['students']
+        imported_lessons = stats['lessons']
+        logger.info(f'Импорт завершен: {imported_students} учеников, {imported_lessons} уроков '
+                    f'(пропущено уроков: {stats["lessons_skipped"]}, пакетов: {stats["chunks"]}, {stats["elapsed_s"]} с)')
         
         audit_logger.log(
             action='import_data',
@@ -910,6 +854,8 @@ def import_data():
             metadata={
                 'students_count': imported_students,
                 'lessons_count': imported_lessons,
+                'lessons_skipped': stats['lessons_skipped'],
+                'chunks': stats['chunks'],
                 'filename': file.filename
             }
         )
@@ -924,57 +870,56 @@ def import_data():
             entity='Data',
             error=str(e)
         )
-        flash(f'Ошибка при импорте данных: {str(e)}', 'error')
+        message = f'Ошибка при импорте данных: {str(e)}'
+        if importer is not None and importer.stats['chunks']:
+            # Пакеты коммитятся по отдельности — сообщаем, что уже сохранено
+            message += (f" (до ошибки сохранено {importer.stats['students']} учеников "
+                        f"и {importer.stats['lessons']} уроков)")
+        flash(message, 'error')
         return redirect(url_for('main.import_data'))
 
-@main_bp.route('/backup-db')
+@main_bp.route('/backup-db', methods=['GET', 'POST'])
 @login_required
 def backup_db():
-    """Создание резервной копии базы данных"""
+    """
+    Запуск резервного копирования базы данных в фоне (см. app/utils/db_backup.py).
+    Ход и результат — /backup-db/status. ?compress=0 — снимок SQLite без gzip.
+    """
     if not (current_user.is_admin() or current_user.is_creator()):
         flash('Доступ запрещен. Резервное копирование доступно только администратору/создателю.', 'danger')
         return redirect(url_for('main.dashboard'))
     try:
-        # Для PostgreSQL на Railway резервное копирование должно выполняться через pg_dump
-        # или через интерфейс Railway. Здесь просто логируем попытку.
-        logger.info('Попытка создания резервной копии базы данных')
-        
-        # Проверяем тип базы данных
-        db_url = os.environ.get('DATABASE_URL', '')
-        if 'postgresql' in db_url or 'postgres' in db_url:
-            flash('Для PostgreSQL резервное копирование должно выполняться через pg_dump или интерфейс Railway. Используйте экспорт данных для создания резервной копии.', 'info')
-            return redirect(url_for('main.export_data'))
-        
-        # Для SQLite (если используется локально)
-        backup_dir = os.path.join(base_dir, 'backups')
-        os.makedirs(backup_dir, exist_ok=True)
-        backup_filename = f'keg_tasks_backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}.db'
-        backup_path = os.path.join(backup_dir, backup_filename)
-        
-        # Если используется SQLite, копируем файл
-        db_path = os.path.join(base_dir, 'data', 'keg_tasks.db')
-        if os.path.exists(db_path):
-            shutil.copy2(db_path, backup_path)
-            logger.info(f'Резервная копия создана: {backup_path}')
-            
-            audit_logger.log(
-                action='backup_database',
-                entity='Database',
-                entity_id=None,
-                status='success',
-                metadata={
-                    'backup_filename': backup_filename,
-                    'backup_path': backup_path
-                }
-            )
-            flash(f'Резервная копия создана: {backup_filename}', 'success')
-        else:
-            flash('Файл базы данных не найден. Используется PostgreSQL.', 'info')
-            return redirect(url_for('main.export_data'))
-        
+        compress = request.values.get('compress')
+        compress = None if compress is None else compress not in ('0', 'false', 'no')
+        wants_json = request.is_json or request.accept_mimetypes.best == 'application/json'
+        if not start_backup(current_app._get_current_object(), compress=compress):
+            if wants_json:
+                return jsonify({'success': False, 'error': 'already_running'}), 409
+            flash('Резервное копирование уже выполняется.', 'info')
+            return redirect(url_for('main.dashboard'))
+
+        audit_logger.log(
+            action='backup_database',
+            entity='Database',
+            entity_id=None,
+            status='started',
+            metadata={'backend': db.engine.url.get_backend_name()}
+        )
+        if wants_json:
+            return jsonify({'success': True, 'status_url': url_for('main.backup_db_status')}), 202
+        flash('Резервное копирование запущено в фоне. Статус: /backup-db/status', 'success')
         return redirect(url_for('main.dashboard'))
     except Exception as e:
-        logger.error(f'Ошибка при создании резервной копии: {e}')
+        logger.error(f'Ошибка при запуске резервного копирования: {e}')
         flash(f'Ошибка при создании резервной копии: {str(e)}', 'error')
         return redirect(url_for('main.dashboard'))
 
+
+@main_bp.route('/backup-db/status')
+@login_required
+def backup_db_status():
+    """Статус текущего/последнего бэкапа и список сохранённых копий (JSON для опроса)."""
+    if not (current_user.is_admin() or current_user.is_creator()):
+        return jsonify({'success': False, 'error': 'forbidden'}), 403
+    return jsonify({'success': True, 'state': get_backup_status(), 'backups': list_backups()}), 200
+
@@ -47,6 +47,8 @@ from core.db_models import (
     Assignment,
     AssignmentTask,
     Submission,
+    AssignmentCounter,
+    GradingJob,
     Answer,
     SubmissionComment,
     LessonTaskTeacherComment,
@@ -58,7 +60,10 @@ from core.db_models import (
     UserSubscription,
     TrainerSession,
     TrainerLlmLog,
-    UserConsent
+    UserConsent,
+    SchedulerLock,
+    CacheVersion,
+    ChildDigest
 )
 
 __all__ = [
@@ -106,6 +111,8 @@ __all__ = [
     'Assignment',
     'AssignmentTask',
     'Submission',
+    'AssignmentCounter',
+    'GradingJob',
     'Answer',
     'SubmissionComment',
     'LessonTaskTeacherComment',
@@ -117,5 +124,8 @@ __all__ = [
     'UserSubscription',
     'TrainerSession',
     'TrainerLlmLog',
-    'UserConsent'
+    'UserConsent',
+    'SchedulerLock',
+    'CacheVersion',
+    'ChildDigest'
 ]
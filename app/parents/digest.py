@@ -0,0 +1,567 @@
+"""
+Сводки по детям для дашборда родителя (ChildDigests).
+
+Сводка (решено за неделю, невыполненные работы, последние сдачи, ближайшие и прошедшие
+уроки, проблемные темы, метрики) хранится одной строкой на ребенка. Дашборд и
+/api/parent/children читают строки одним запросом по первичному ключу.
+
+Актуальность:
+- ORM-события помечают сводку dirty (и увеличивают generation) в той же транзакции, где меняются
+  уроки, задачи уроков, работы, ответы, профиль ребенка или связанный Student;
+- после commit помеченные сводки пересчитывает фоновый поток процесса (child_digest_refresher,
+  PARENT_DIGEST_MODE=inprocess по умолчанию; off — только прогрев планировщика);
+- valid_until — момент, когда сводка устаревает сама (урок прошел, окно «неделя» сдвинулось),
+  но не позже PARENT_DIGEST_MAX_AGE_SECONDS (по умолчанию 3600) — для тем и метрик;
+  такие строки пересчитывает фоновый прогрев кешей.
+
+Чтение синхронно не пересчитывает: отдаётся сохранённая строка, грязная/истекшая ставится
+в фоновый пересчёт. Синхронно считается только сводка, которой ещё нет (первый заход).
+
+Массовые query.update()/delete() мимо flush сводки не помечают — их догоняет max age.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import event, func, inspect as sa_inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, joinedload
+
+from app.models import (
+    db, ChildDigest, User, UserProfile, Student, Lesson, LessonTask, Submission, Answer, Assignment, moscow_now
+)
+from app.utils.background_jobs import register_cache_warmer
+from app.utils.schema_contract import schema_table_ready
+
+logger = logging.getLogger(__name__)
+
+PENDING_STATUSES = ('ASSIGNED', 'IN_PROGRESS', 'RETURNED')
+DONE_STATUSES = ('SUBMITTED', 'GRADED')
+RECENT_SUBMISSIONS_LIMIT = 5
+RECENT_LESSONS_LIMIT = 10
+
+# Поля payload с датами: в JSON хранятся в ISO, шаблону отдаются как datetime
+_DATETIME_FIELDS = ('lesson_date', 'deadline', 'submitted_at', 'assigned_at')
+
+# Атрибуты, изменение которых влияет на сводку (None — любой атрибут)
+_WATCHED_ATTRS = {
+    Lesson: None,
+    LessonTask: None,
+    Submission: None,
+    Answer: None,
+    Assignment: frozenset({'title', 'deadline'}),
+    Student: frozenset({'name', 'email'}),
+    User: frozenset({'username', 'email'}),
+    UserProfile: frozenset({'first_name', 'last_name', 'user_id'}),
+}
+
+_listeners_installed = False
+_table_exists = False
+
+
+def _now_naive() -> datetime:
+    now = moscow_now()
+    return now.replace(tzinfo=None) if now.tzinfo else now
+
+
+def _max_age() -> timedelta:
+    try:
+        seconds = int(os.environ.get('PARENT_DIGEST_MAX_AGE_SECONDS', 3600))
+    except (TypeError, ValueError):
+        seconds = 3600
+    return timedelta(seconds=max(60, seconds))
+
+
+def _display_name(user: User, student: Optional[Student]) -> str:
+    """Имя для списка детей: профиль, затем Student.name, затем username (как раньше в дашборде)."""
+    profile = user.profile
+    if profile:
+        if profile.first_name and profile.last_name:
+            return f"{profile.first_name} {profile.last_name}"
+        if profile.first_name:
+            return profile.first_name
+        return user.username
+    if student:
+        return student.name
+    return user.username
+
+
+def _selected_name(user: User, student: Optional[Student]) -> str:
+    """Имя в заголовке выбранного ребенка: Student.name, иначе профиль/username."""
+    if student:
+        return student.name
+    profile = user.profile
+    if profile:
+        if profile.first_name and profile.last_name:
+            return f"{profile.first_name} {profile.last_name}"
+        if profile.first_name:
+            return profile.first_name
+    return user.username
+
+
+def _iso(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
+def _lesson_item(lesson: Lesson) -> Dict:
+    return {
+        'lesson_id': lesson.lesson_id,
+        'lesson_date': _iso(lesson.lesson_date),
+        'topic': lesson.topic,
+        'status': lesson.status,
+    }
+
+
+def _submission_item(sub: Submission) -> Dict:
+    assignment = sub.assignment
+    return {
+        'submission_id': sub.submission_id,
+        'status': sub.status,
+        'assigned_at': _iso(sub.assigned_at),
+        'submitted_at': _iso(sub.submitted_at),
+        'percentage': sub.percentage,
+        'assignment': {
+            'assignment_id': sub.assignment_id,
+            'title': assignment.title if assignment else '',
+            'deadline': _iso(assignment.deadline) if assignment else None,
+        },
+    }
+
+
+# =============================================================================
+# Пересчет
+# =============================================================================
+
+def _compute(user: User, now: datetime) -> Dict:
+    """Значения полей ChildDigest для ребенка (без записи в БД)."""
+    from app.students.stats_service import StatsService
+
+    student = Student.query.filter_by(email=user.email).first() if user.email else None
+    valid_until = now + _max_age()
+    payload = {
+        'selected_name': _selected_name(user, student),
+        'metrics': None,
+        'problem_topics': [],
+        'ai_summary': None,
+        'pending_assignments': [],
+        'recent_submissions': [],
+        'upcoming_lessons': [],
+        'recent_lessons': [],
+    }
+    tasks_solved_week = 0
+    pending_count = 0
+
+    if student:
+        sid = student.student_id
+        stats = StatsService(sid)
+        metrics = stats.get_summary_metrics()
+        problem_topics = stats.get_problem_topics(threshold=60)
+        gpa_data = stats.get_gpa_trend(period_days=7)  # За последнюю неделю
+
+        # Решенные задачи за неделю: уроки не старше 7 полных дней (как раньше: (now - date).days <= 7)
+        week_start = now - timedelta(days=8)
+        tasks_solved_week = db.session.query(func.count(LessonTask.lesson_task_id)).join(
+            Lesson, Lesson.lesson_id == LessonTask.lesson_id
+        ).filter(
+            Lesson.student_id == sid,
+            Lesson.lesson_date > week_start,
+            LessonTask.submission_correct.isnot(None),
+        ).scalar() or 0
+
+        payload['metrics'] = metrics
+        payload['problem_topics'] = problem_topics
+        payload['ai_summary'] = {
+            'tasks_solved_week': tasks_solved_week,
+            'problem_topic': problem_topics[0]['name'] if problem_topics else None,
+            'gpa_trend': gpa_data['scores'][-1] if gpa_data['scores'] else None,
+            'gpa_forecast': round(gpa_data['scores'][-1] * 0.8, 1) if gpa_data['scores'] else None  # Простой прогноз
+        }
+
+        submissions = Submission.query.filter(
+            Submission.student_id == sid,
+            Submission.status.in_(PENDING_STATUSES + DONE_STATUSES),
+        ).options(joinedload(Submission.assignment)).order_by(Submission.assigned_at.desc()).all()
+        for sub in submissions:
+            if sub.status in PENDING_STATUSES:
+                payload['pending_assignments'].append(_submission_item(sub))
+            elif len(payload['recent_submissions']) < RECENT_SUBMISSIONS_LIMIT:
+                payload['recent_submissions'].append(_submission_item(sub))
+        pending_count = len(payload['pending_assignments'])
+
+        week_later = now + timedelta(days=7)
+        upcoming = Lesson.query.filter(
+            Lesson.student_id == sid,
+            Lesson.lesson_date >= now,
+            Lesson.lesson_date <= week_later,
+        ).order_by(Lesson.lesson_date.asc()).all()
+        recent = Lesson.query.filter(
+            Lesson.student_id == sid,
+            Lesson.lesson_date >= now - timedelta(days=30),
+            Lesson.lesson_date < now,
+        ).order_by(Lesson.lesson_date.desc()).limit(RECENT_LESSONS_LIMIT).all()
+        payload['upcoming_lessons'] = [_lesson_item(l) for l in upcoming]
+        payload['recent_lessons'] = [_lesson_item(l) for l in recent]
+
+        # Когда сводка устареет без изменений в БД
+        boundaries = []
+        if upcoming:
+            boundaries.append(upcoming[0].lesson_date)  # ближайший урок станет прошедшим
+        next_outside = db.session.query(func.min(Lesson.lesson_date)).filter(
+            Lesson.student_id == sid, Lesson.lesson_date > week_later
+        ).scalar()
+        if next_outside:
+            boundaries.append(next_outside - timedelta(days=7))  # урок попадет в «ближайшие 7 дней»
+        oldest_recent = db.session.query(func.min(Lesson.lesson_date)).filter(
+            Lesson.student_id == sid, Lesson.lesson_date > week_start
+        ).scalar()
+        if oldest_recent:
+            boundaries.append(oldest_recent + timedelta(days=8))  # урок выпадет из «недели»
+        for boundary in boundaries:
+            if now < boundary < valid_until:
+                valid_until = boundary
+
+    return {
+        'student_id': student.student_id if student else None,
+        'username': user.username,
+        'display_name': _display_name(user, student),
+        'student_name': student.name if student else user.username,
+        'tasks_solved_week': tasks_solved_week,
+        'pending_count': pending_count,
+        'payload': payload,
+        'valid_until': valid_until,
+    }
+
+
+def refresh_child_digest(user_id: int) -> Optional[ChildDigest]:
+    """
+    Пересчитывает и сохраняет сводку ребенка (commit). None — пользователь не найден.
+    Если во время пересчета сводку снова пометили dirty, пометка сохраняется.
+    """
+    user = User.query.options(joinedload(User.profile)).filter_by(id=user_id).first()
+    if user is None:
+        return None
+    row = db.session.get(ChildDigest, user_id)
+    generation = row.generation if row is not None else 0
+    now = _now_naive()
+    values = _compute(user, now)
+    try:
+        if row is None:
+            row = ChildDigest(user_id=user_id, generation=0, dirty=False, updated_at=now, **values)
+            db.session.add(row)
+            db.session.commit()
+            return row
+        table = ChildDigest.__table__
+        result = db.session.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.generation == generation)
+            .values(dirty=False, updated_at=now, **values)
+        )
+        db.session.commit()
+        if not result.rowcount:
+            logger.debug(f"Child digest {user_id} changed during refresh, keeping it dirty")
+        return row
+    except IntegrityError:
+        # Параллельный запрос успел создать строку — берем её
+        db.session.rollback()
+        return db.session.get(ChildDigest, user_id)
+
+
+def _needs_refresh(row: Optional[ChildDigest], now: datetime, check_expiry: bool) -> bool:
+    if row is None or row.dirty:
+        return True
+    return check_expiry and (row.valid_until is None or row.valid_until <= now)
+
+
+def get_child_digests(user_ids: Iterable[int], fresh_for: Iterable[int] = ()) -> Dict[int, ChildDigest]:
+    """
+    Сводки по детям одним запросом. Сохранённые строки отдаются как есть; грязные —
+    и для fresh_for (выбранный ребенок) истекшие по valid_until — уходят в фоновый пересчёт.
+    Синхронно считаются только отсутствующие строки.
+    """
+    user_ids = [uid for uid in dict.fromkeys(user_ids) if uid is not None]
+    if not user_ids:
+        return {}
+    fresh_for = set(fresh_for)
+    rows = {row.user_id: row for row in ChildDigest.query.filter(ChildDigest.user_id.in_(user_ids)).all()}
+    now = _now_naive()
+    stale = []
+    for uid in user_ids:
+        row = rows.get(uid)
+        if row is None:
+            row = refresh_child_digest(uid)
+            if row is not None:
+                rows[uid] = row
+        elif _needs_refresh(row, now, uid in fresh_for):
+            stale.append(uid)
+    if stale:
+        child_digest_refresher.enqueue(stale)
+    return rows
+
+
+def _parse_dt(value):
+    if not isinstance(value, str):
+        return value
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _decode(item):
+    if isinstance(item, list):
+        return [_decode(v) for v in item]
+    if isinstance(item, dict):
+        return {k: (_parse_dt(v) if k in _DATETIME_FIELDS else _decode(v)) for k, v in item.items()}
+    return item
+
+
+def digest_context(row: ChildDigest) -> Dict:
+    """Содержимое payload для шаблона: даты снова datetime, остальное — словари/списки."""
+    return _decode(row.payload or {})
+
+
+# =============================================================================
+# Инвалидация
+# =============================================================================
+
+def _relevant(session: Session, obj) -> bool:
+    attrs = _WATCHED_ATTRS.get(type(obj), ())
+    if attrs is None:
+        return session.is_modified(obj)
+    state = sa_inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs if a in state.attrs)
+
+
+def _dirty_conditions(objects: List) -> list:
+    """Условия WHERE для ChildDigests по затронутым объектам (после flush ключи уже заполнены)."""
+    table = ChildDigest.__table__
+    student_ids, user_ids, lesson_ids, submission_ids, assignment_ids = set(), set(), set(), set(), set()
+    orphans = False
+    for obj, old_values in objects:
+        if isinstance(obj, (Lesson, Submission)):
+            student_ids.add(obj.student_id)
+        elif isinstance(obj, LessonTask):
+            lesson_ids.add(obj.lesson_id)
+        elif isinstance(obj, Answer):
+            submission_ids.add(obj.submission_id)
+        elif isinstance(obj, Assignment):
+            assignment_ids.add(obj.assignment_id)
+        elif isinstance(obj, Student):
+            student_ids.add(obj.student_id)
+            orphans = True  # ученик мог появиться у пользователя без связанного Student
+        elif isinstance(obj, User):
+            user_ids.add(obj.id)
+        elif isinstance(obj, UserProfile):
+            user_ids.add(obj.user_id)
+        # Смена владельца (урок/работа перенесены другому ученику) — старое значение тоже
+        student_ids.update(old_values.get('student_id', ()))
+        user_ids.update(old_values.get('user_id', ()))
+
+    conditions = []
+    student_ids.discard(None)
+    user_ids.discard(None)
+    lesson_ids.discard(None)
+    submission_ids.discard(None)
+    assignment_ids.discard(None)
+    if student_ids:
+        conditions.append(table.c.student_id.in_(student_ids))
+    if user_ids:
+        conditions.append(table.c.user_id.in_(user_ids))
+    if lesson_ids:
+        conditions.append(table.c.student_id.in_(
+            select(Lesson.student_id).where(Lesson.lesson_id.in_(lesson_ids)).scalar_subquery()
+        ))
+    if submission_ids:
+        conditions.append(table.c.student_id.in_(
+            select(Submission.student_id).where(Submission.submission_id.in_(submission_ids)).scalar_subquery()
+        ))
+    if assignment_ids:
+        conditions.append(table.c.student_id.in_(
+            select(Submission.student_id).where(Submission.assignment_id.in_(assignment_ids)).scalar_subquery()
+        ))
+    if orphans:
+        conditions.append(table.c.student_id.is_(None))
+    return conditions
+
+
+def mark_dirty(conditions: list, connection=None) -> List[int]:
+    """
+    Помечает сводки dirty (в текущей транзакции, без commit). Возвращает user_id помеченных строк;
+    пустой список, если СУБД не умеет UPDATE ... RETURNING (тогда строки догонит прогрев).
+    """
+    if not conditions:
+        return []
+    conn = connection if connection is not None else db.session.connection()
+    table = ChildDigest.__table__
+    stmt = update(table).where(or_(*conditions)).values(dirty=True, generation=table.c.generation + 1)
+    if not conn.dialect.update_returning:
+        conn.execute(stmt)
+        return []
+    return list(conn.execute(stmt.returning(table.c.user_id)).scalars())
+
+
+def _old_owner_values(obj) -> Dict[str, list]:
+    """Прежние student_id/user_id объекта, если они менялись."""
+    state = sa_inspect(obj)
+    old = {}
+    for attr in ('student_id', 'user_id'):
+        if attr in state.attrs:
+            deleted = state.attrs[attr].history.deleted
+            if deleted:
+                old[attr] = list(deleted)
+    return old
+
+
+def _table_ready(connection) -> bool:
+    """Есть ли таблица ChildDigests (до миграции изменения данных не должны падать)."""
+    global _table_exists
+    if not _table_exists:
+        # Обычно ответ уже есть в контракте схемы, проверенном при старте; инспектор — до его проверки
+        verified = schema_table_ready(ChildDigest.__table__.name)
+        _table_exists = verified if verified is not None else sa_inspect(connection).has_table(ChildDigest.__table__.name)
+    return _table_exists
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Session, 'before_flush')
+    def _remember_changes(session, flush_context, instances):
+        # Ключи новых объектов появятся только после flush — запоминаем сами объекты
+        touched = []
+        for obj in list(session.new) + list(session.deleted):
+            if type(obj) in _WATCHED_ATTRS:
+                touched.append((obj, {}))
+        for obj in session.dirty:
+            if type(obj) in _WATCHED_ATTRS and _relevant(session, obj):
+                touched.append((obj, _old_owner_values(obj)))
+        if touched:
+            session.info.setdefault('_child_digest_touched', []).extend(touched)
+
+    @event.listens_for(Session, 'after_flush')
+    def _mark_changed(session, flush_context):
+        touched = session.info.pop('_child_digest_touched', None)
+        if not touched:
+            return
+        connection = session.connection()
+        if not _table_ready(connection):
+            return
+        marked = mark_dirty(_dirty_conditions(touched), connection)
+        if marked:
+            session.info.setdefault('_child_digest_marked', set()).update(marked)
+
+    @event.listens_for(Session, 'after_commit')
+    def _refresh_marked(session):
+        marked = session.info.pop('_child_digest_marked', None)
+        if marked:
+            child_digest_refresher.enqueue(marked)
+
+    @event.listens_for(Session, 'after_rollback')
+    def _forget_marked(session):
+        session.info.pop('_child_digest_marked', None)
+
+
+# =============================================================================
+# Фоновый пересчёт после commit
+# =============================================================================
+
+class ChildDigestRefresher:
+    """Поток процесса, пересчитывающий помеченные сводки; запрос, изменивший данные, его не ждёт."""
+
+    def __init__(self):
+        self.app = None
+        self._pending: set = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, app) -> None:
+        if self._thread is not None:
+            return
+        self.app = app
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='child-digest-refresher', daemon=True)
+        self._thread.start()
+        import atexit
+        atexit.register(self.stop)
+        logger.info("Child digest refresher started")
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self._thread = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def enqueue(self, user_ids: Iterable[int]) -> None:
+        """Поставить сводки в пересчёт. Без запущенного потока — ничего: строки догонит прогрев."""
+        if not self.running:
+            return
+        with self._lock:
+            self._pending.update(uid for uid in user_ids if uid is not None)
+        self._wake.set()
+
+    def _take(self) -> List[int]:
+        with self._lock:
+            batch, self._pending = sorted(self._pending), set()
+        return batch
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            batch = self._take()
+            while batch and not self._stop.is_set():
+                with self.app.app_context():
+                    for uid in batch:
+                        try:
+                            refresh_child_digest(uid)
+                        except Exception as e:
+                            db.session.rollback()
+                            logger.warning(f"Child digest {uid} refresh failed: {e}")
+                batch = self._take()
+
+
+child_digest_refresher = ChildDigestRefresher()
+
+
+def init_child_digests(app) -> None:
+    """Запускает фоновый пересчёт сводок (PARENT_DIGEST_MODE: inprocess по умолчанию, off)."""
+    if (os.environ.get('PARENT_DIGEST_MODE') or 'inprocess').strip().lower() == 'inprocess':
+        child_digest_refresher.start(app)
+
+
+_install_listeners()
+
+
+# =============================================================================
+# Фоновый прогрев
+# =============================================================================
+
+@register_cache_warmer
+def refresh_stale_child_digests(now: datetime) -> None:
+    """Пересчитывает грязные и истекшие сводки, чтобы дашборд не считал их на запросе."""
+    now_naive = now.replace(tzinfo=None) if now.tzinfo else now
+    try:
+        batch = int(os.environ.get('PARENT_DIGEST_REFRESH_BATCH', 50))
+    except (TypeError, ValueError):
+        batch = 50
+    user_ids = [uid for (uid,) in db.session.query(ChildDigest.user_id).filter(
+        or_(ChildDigest.dirty.is_(True), ChildDigest.valid_until <= now_naive)
+    ).limit(batch).all()]
+    for uid in user_ids:
+        refresh_child_digest(uid)
+    if user_ids:
+        logger.info(f"Refreshed {len(user_ids)} child digests")
@@ -7,12 +7,9 @@ from flask import render_template, request, jsonify, flash
 from flask_login import login_required, current_user
 
 from app.parents import parents_bp
-from app.models import db, User, FamilyTie, Student, Lesson, Enrollment, Submission, Assignment
-from app.students.stats_service import StatsService
-from app.auth.rbac_utils import require_parent, get_user_scope
-from core.audit_logger import audit_logger
-from core.db_models import moscow_now
-from sqlalchemy.orm import joinedload
+from app.models import FamilyTie
+from app.parents.digest import get_child_digests, digest_context
+from app.auth.rbac_utils import require_parent
 
 logger = logging.getLogger(__name__)
 
@@ -50,124 +47,49 @@ def parent_dashboard():
             selected_student_id = family_ties[0].student_id
             selected_tie = family_ties[0]
         
+        # Сводки по всем детям — один запрос; выбранного ребенка пересчитываем, если окно истекло
+        digests = get_child_digests([ft.student_id for ft in family_ties], fresh_for=[selected_student_id])
+
         # Собираем информацию о детях
         children_data = []
         for tie in family_ties:
-            student_user = User.query.get(tie.student_id)
-            if not student_user:
+            digest = digests.get(tie.student_id)
+            if not digest:
                 continue
-            
-            # Находим связанного Student (по email)
-            # В будущем можно добавить прямую связь user_id в Student
-            student = None
-            if student_user.email:
-                student = Student.query.filter_by(email=student_user.email).first()
-            
-            # Формируем имя для отображения
-            student_name = student_user.username
-            if student_user.profile:
-                if student_user.profile.first_name and student_user.profile.last_name:
-                    student_name = f"{student_user.profile.first_name} {student_user.profile.last_name}"
-                elif student_user.profile.first_name:
-                    student_name = student_user.profile.first_name
-            elif student:
-                student_name = student.name
-            
             children_data.append({
-                'user_id': student_user.id,
-                'username': student_user.username,
-                'student_id': student.student_id if student else None,
-                'student_name': student_name,
+                'user_id': digest.user_id,
+                'username': digest.username,
+                'student_id': digest.student_id,
+                'student_name': digest.display_name,
                 'access_level': tie.access_level,
                 'is_selected': tie.student_id == selected_student_id
             })
-        
-        # Получаем статистику для выбранного ребенка
+
+        # Статистика, работы и уроки выбранного ребенка — из сводки
         child_stats = None
         upcoming_lessons = []
         recent_lessons = []
         pending_assignments = []
         recent_submissions = []
-        
-        selected_student = None
-        selected_student_user = User.query.get(selected_student_id)
-        
-        # Находим связанного Student для выбранного User
-        if selected_student_user:
-            if selected_student_user.email:
-                selected_student = Student.query.filter_by(email=selected_student_user.email).first()
-        
-        if selected_student:
-            # Статистика через StatsService
-            stats = StatsService(selected_student.student_id)
-            metrics = stats.get_summary_metrics()
-            problem_topics = stats.get_problem_topics(threshold=60)
-            
-            # Получаем GPA тренд для AI Summary
-            gpa_data = stats.get_gpa_trend(period_days=7)  # За последнюю неделю
-            
-            # Подсчитываем решенные задачи за неделю
-            lessons = Lesson.query.filter_by(student_id=selected_student.student_id).all()
-            tasks_solved_week = 0
-            # Важно: Lesson.lesson_date хранится как naive datetime (MSK), а moscow_now() timezone-aware.
-            # Приводим "сейчас" к naive, иначе будет TypeError и 500.
-            now_dt = moscow_now().replace(tzinfo=None)
-            for lesson in lessons:
-                # lesson.lesson_date обычно datetime; сравниваем datetime с datetime (иначе TypeError и 500)
-                if lesson.lesson_date and (now_dt - lesson.lesson_date).days <= 7:
-                    for hw_task in lesson.homework_tasks:
-                        if hw_task.submission_correct is not None:
-                            tasks_solved_week += 1
-            
-            # Формируем AI Summary
-            ai_summary = {
-                'tasks_solved_week': tasks_solved_week,
-                'problem_topic': problem_topics[0].name if problem_topics else None,
-                'gpa_trend': gpa_data['scores'][-1] if gpa_data['scores'] else None,
-                'gpa_forecast': round(gpa_data['scores'][-1] * 0.8, 1) if gpa_data['scores'] else None  # Простой прогноз
-            }
-            
-            child_stats = {
-                'metrics': metrics,
-                'problem_topics': problem_topics,
-                'ai_summary': ai_summary
-            }
-            
-            # Загружаем задания (Assignments)
-            try:
-                all_submissions = Submission.query.filter(
-                    Submission.student_id == selected_student.student_id
-                ).options(
-                    joinedload(Submission.assignment)
-                ).order_by(Submission.assigned_at.desc()).all()
-                
-                for sub in all_submissions:
-                    if sub.status in ['ASSIGNED', 'IN_PROGRESS', 'RETURNED']:
-                        pending_assignments.append(sub)
-                    elif sub.status in ['SUBMITTED', 'GRADED'] and len(recent_submissions) < 5:
-                        recent_submissions.append(sub)
-            except Exception as e:
-                logger.error(f"Error loading submissions for parent dashboard: {e}")
-            
-            # Предстоящие уроки (ближайшие 7 дней)
-            from datetime import timedelta
-            # повторно используем naive now_dt для корректных сравнений с Lesson.lesson_date
-            week_later_dt = now_dt + timedelta(days=7)
-            
-            upcoming_lessons = Lesson.query.filter(
-                Lesson.student_id == selected_student.student_id,
-                Lesson.lesson_date >= now_dt,
-                Lesson.lesson_date <= week_later_dt
-            ).order_by(Lesson.lesson_date.asc()).all()
-            
-            # Последние уроки (за последние 30 дней)
-            month_ago_dt = now_dt - timedelta(days=30)
-            recent_lessons = Lesson.query.filter(
-                Lesson.student_id == selected_student.student_id,
-                Lesson.lesson_date >= month_ago_dt,
-                Lesson.lesson_date < now_dt
-            ).order_by(Lesson.lesson_date.desc()).limit(10).all()
-        
+        selected_child = None
+        selected_child_name = None
+
+        selected_digest = digests.get(selected_student_id)
+        if selected_digest:
+            context = digest_context(selected_digest)
+            selected_child_name = context.get('selected_name') or selected_digest.display_name
+            if selected_digest.student_id:
+                selected_child = {'student_id': selected_digest.student_id, 'name': selected_child_name}
+                child_stats = {
+                    'metrics': context.get('metrics'),
+                    'problem_topics': context.get('problem_topics') or [],
+                    'ai_summary': context.get('ai_summary')
+                }
+                pending_assignments = context.get('pending_assignments') or []
+                recent_submissions = context.get('recent_submissions') or []
+                upcoming_lessons = context.get('upcoming_lessons') or []
+                recent_lessons = context.get('recent_lessons') or []
+
         # Финансы (пока заглушка - нужно будет добавить модель для баланса)
         # Можно использовать количество активных enrollments как "оплаченные уроки"
         financial_data = {
@@ -176,22 +98,9 @@ def parent_dashboard():
             'can_topup': selected_tie.access_level in ['full', 'financial_only']
         }
         
-        # Формируем имя выбранного ребенка
-        selected_child_name = None
-        if selected_student:
-            selected_child_name = selected_student.name
-        elif selected_student_user:
-            if selected_student_user.profile:
-                if selected_student_user.profile.first_name and selected_student_user.profile.last_name:
-                    selected_child_name = f"{selected_student_user.profile.first_name} {selected_student_user.profile.last_name}"
-                elif selected_student_user.profile.first_name:
-                    selected_child_name = selected_student_user.profile.first_name
-            if not selected_child_name:
-                selected_child_name = selected_student_user.username
-        
         return render_template('parent_dashboard.html',
                              children=children_data,
-                             selected_child=selected_student,
+                             selected_child=selected_child,
                              selected_child_name=selected_child_name,
                              selected_child_user_id=selected_student_id,
                              child_stats=child_stats,
@@ -225,22 +134,18 @@ def api_parent_children():
     try:
         family_ties = FamilyTie.query.filter_by(parent_id=current_user.id).all()
         
+        digests = get_child_digests([ft.student_id for ft in family_ties])
+
         children_data = []
         for tie in family_ties:
-            student_user = User.query.get(tie.student_id)
-            if not student_user:
+            digest = digests.get(tie.student_id)
+            if not digest:
                 continue
-            
-            # Находим связанного Student
-            student = None
-            if student_user.email:
-                student = Student.query.filter_by(email=student_user.email).first()
-            
             children_data.append({
-                'user_id': student_user.id,
-                'username': student_user.username,
-                'student_id': student.student_id if student else None,
-                'student_name': student.name if student else student_user.username,
+                'user_id': digest.user_id,
+                'username': digest.username,
+                'student_id': digest.student_id,
+                'student_name': digest.student_name,
                 'access_level': tie.access_level
             })
         
@@ -1,16 +1,14 @@
 """
 Роуты для управления напоминаниями
 """
-from flask import render_template, request, jsonify, redirect, url_for, flash, current_app
+from flask import render_template, request, jsonify, redirect, url_for, flash
 from flask_login import login_required, current_user
 from datetime import datetime
 from zoneinfo import ZoneInfo
-from sqlalchemy import inspect, text
-from sqlalchemy import case
-import json
 import logging
 
 from app.reminders import reminders_bp
+from app.reminders.service import reminders_feed, due_reminders
 from app.models import db, Reminder, moscow_now, MOSCOW_TZ
 from core.audit_logger import audit_logger
 
@@ -22,57 +20,10 @@ def reminders_list():
     """Страница со списком напоминаний"""
     try:
         show_completed = request.args.get('show_completed', 'false').lower() == 'true'
-        
-        # Убеждаемся, что таблица существует и миграции применены
-        try:
-            query = Reminder.query.filter_by(user_id=current_user.id)
-        except Exception as e:
-            # Если таблицы нет, создаем её
-            db.create_all()
-            query = Reminder.query.filter_by(user_id=current_user.id)
-        
-        # Принудительно проверяем и применяем миграцию для reminder_time
-        try:
-            inspector = inspect(db.engine)
-            table_names = inspector.get_table_names()
-            reminders_table = 'Reminders' if 'Reminders' in table_names else ('reminders' if 'reminders' in table_names else None)
-            
-            if reminders_table:
-                db_url = current_app.config.get('SQLALCHEMY_DATABASE_URI', '')
-                if 'postgresql' in db_url or 'postgres' in db_url:
-                    # Проверяем через information_schema
-                    result = db.session.execute(text("""
-                        SELECT is_nullable 
-                        FROM information_schema.columns 
-                        WHERE table_name = :table_name AND column_name = 'reminder_time'
-                    """), {'table_name': reminders_table})
-                    row = result.fetchone()
-                    if row and row[0] == 'NO':
-                        # Колонка NOT NULL, делаем её nullable
-                        db.session.execute(text(f'ALTER TABLE "{reminders_table}" ALTER COLUMN reminder_time DROP NOT NULL'))
-                        db.session.commit()
-                        logger.info(f"Made reminder_time nullable in {reminders_table}")
-        except Exception as e:
-            # Игнорируем ошибки миграции, чтобы не блокировать работу
-            logger.warning(f"Could not check/update reminder_time nullable: {e}")
-            db.session.rollback()
-        
-        if not show_completed:
-            query = query.filter_by(is_completed=False)
-        
-        # Сортируем: сначала с временем (по времени), потом без времени (по дате создания)
-        try:
-            from sqlalchemy import asc, desc
-            reminders = query.order_by(
-                case((Reminder.reminder_time.is_(None), 1), else_=0),
-                asc(Reminder.reminder_time),
-                desc(Reminder.created_at)
-            ).all()
-        except Exception as e:
-            # Если сортировка не работает, используем простую
-            import logging
-            logging.warning(f"Reminders sorting error: {e}, using simple sort")
-            reminders = query.order_by(Reminder.created_at.desc()).all()
+        cursor = request.args.get('cursor') or None
+
+        # Схема (nullable reminder_time, индексы) приводится миграциями при старте
+        reminders, next_cursor = reminders_feed(current_user.id, include_completed=show_completed, cursor=cursor)
         
         # Получаем текущее время для сравнения
         now = moscow_now()
@@ -95,6 +46,8 @@ def reminders_list():
         return render_template('reminders.html', 
                              reminders_data=reminders_data,
                              show_completed=show_completed,
+                             cursor=cursor,
+                             next_cursor=next_cursor,
                              now=now_naive)
     except Exception as e:
         import traceback
@@ -107,6 +60,25 @@ def reminders_list():
                              show_completed=False,
                              now=now_naive)
 
+@reminders_bp.route('/reminders/due')
+@login_required
+def reminders_due():
+    """API: неотправленные напоминания пользователя, наступающие в ближайшие N минут (по умолчанию 15)"""
+    minutes = max(0, min(request.args.get('minutes', 15, type=int), 7 * 24 * 60))
+    now = moscow_now()
+    now_naive = now.replace(tzinfo=None) if now.tzinfo else now
+    reminders = due_reminders(now_naive, within_minutes=minutes, limit=100, user_id=current_user.id)
+    return jsonify({
+        'success': True,
+        'reminders': [{
+            'id': r.reminder_id,
+            'title': r.title,
+            'message': r.message,
+            'reminder_time': r.reminder_time.isoformat() if r.reminder_time else None,
+            'is_overdue': r.is_overdue()
+        } for r in reminders]
+    })
+
 @reminders_bp.route('/reminders/create', methods=['GET'])
 @login_required
 def reminder_create_page():
@@ -120,29 +92,6 @@ def reminder_create_page():
 @login_required
 def reminder_create():
     """Создание нового напоминания"""
-    # Принудительно проверяем и применяем миграцию для reminder_time перед созданием
-    try:
-        inspector = inspect(db.engine)
-        table_names = inspector.get_table_names()
-        reminders_table = 'Reminders' if 'Reminders' in table_names else ('reminders' if 'reminders' in table_names else None)
-        
-        if reminders_table:
-            db_url = current_app.config.get('SQLALCHEMY_DATABASE_URI', '')
-            if 'postgresql' in db_url or 'postgres' in db_url:
-                result = db.session.execute(text("""
-                    SELECT is_nullable 
-                    FROM information_schema.columns 
-                    WHERE table_name = :table_name AND column_name = 'reminder_time'
-                """), {'table_name': reminders_table})
-                row = result.fetchone()
-                if row and row[0] == 'NO':
-                    db.session.execute(text(f'ALTER TABLE "{reminders_table}" ALTER COLUMN reminder_time DROP NOT NULL'))
-                    db.session.commit()
-                    logger.info(f"Made reminder_time nullable in {reminders_table} before create")
-    except Exception as e:
-        logger.warning(f"Could not check/update reminder_time nullable before create: {e}")
-        db.session.rollback()
-    
     try:
         data = request.get_json() if request.is_json else {}
         
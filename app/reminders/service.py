@@ -0,0 +1,110 @@
+"""
+Выборки напоминаний без работы со схемой на пути запроса.
+
+- reminders_feed: лента пользователя «сначала со временем (ближайшие первыми), затем без времени
+  (новые первыми)» с keyset-пагинацией, индекс ix_reminders_user_completed_time;
+- due_reminders: наступившие (или наступающие в ближайшие N минут) неотправленные напоминания
+  для фоновой рассылки, индекс ix_reminders_pending_time — отправленные строки не читаются.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+from app.models import Reminder
+
+REMINDERS_PAGE_SIZE = 30
+REMINDERS_PAGE_MAX = 200
+
+# Курсор: "t:<reminder_time>:<id>" — внутри части со временем, "n:<created_at>:<id>" — без времени
+_TIMED = 't'
+_UNTIMED = 'n'
+
+
+def encode_cursor(reminder: Reminder) -> str:
+    if reminder.reminder_time is not None:
+        return f"{_TIMED}:{reminder.reminder_time.isoformat()}:{reminder.reminder_id}"
+    return f"{_UNTIMED}:{reminder.created_at.isoformat()}:{reminder.reminder_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, datetime, int]]:
+    """(часть, дата, id) или None для первой страницы/битого курсора."""
+    if not cursor:
+        return None
+    try:
+        part, rest = cursor.split(':', 1)
+        stamp, reminder_id = rest.rsplit(':', 1)
+        if part not in (_TIMED, _UNTIMED):
+            return None
+        return part, datetime.fromisoformat(stamp), int(reminder_id)
+    except (ValueError, TypeError):
+        return None
+
+
+def _user_query(user_id: int, include_completed: bool):
+    query = Reminder.query.filter(Reminder.user_id == user_id)
+    if not include_completed:
+        query = query.filter(Reminder.is_completed.is_(False))
+    return query
+
+
+def reminders_feed(user_id: int, include_completed: bool = False, limit: int = REMINDERS_PAGE_SIZE,
+                   cursor: Optional[str] = None) -> Tuple[List[Reminder], Optional[str]]:
+    """
+    Страница ленты напоминаний пользователя и курсор следующей страницы (None — последняя).
+    Порядок как раньше на странице: со временем по возрастанию времени, затем без времени
+    по убыванию даты создания.
+    """
+    limit = max(1, min(int(limit or REMINDERS_PAGE_SIZE), REMINDERS_PAGE_MAX))
+    position = decode_cursor(cursor)
+    rows: List[Reminder] = []
+
+    if position is None or position[0] == _TIMED:
+        timed = _user_query(user_id, include_completed).filter(Reminder.reminder_time.isnot(None))
+        if position is not None:
+            _part, stamp, last_id = position
+            timed = timed.filter(or_(
+                Reminder.reminder_time > stamp,
+                and_(Reminder.reminder_time == stamp, Reminder.reminder_id > last_id),
+            ))
+        rows = timed.order_by(Reminder.reminder_time.asc(), Reminder.reminder_id.asc()).limit(limit + 1).all()
+        if len(rows) > limit:
+            return rows[:limit], encode_cursor(rows[limit - 1])
+        position = None  # часть со временем закончилась — продолжаем с начала части без времени
+
+    untimed = _user_query(user_id, include_completed).filter(Reminder.reminder_time.is_(None))
+    if position is not None:
+        _part, stamp, last_id = position
+        untimed = untimed.filter(or_(
+            Reminder.created_at < stamp,
+            and_(Reminder.created_at == stamp, Reminder.reminder_id < last_id),
+        ))
+    remaining = limit - len(rows)
+    more = untimed.order_by(Reminder.created_at.desc(), Reminder.reminder_id.desc()).limit(remaining + 1).all()
+    if len(more) > remaining:
+        rows.extend(more[:remaining])
+        return rows, encode_cursor(rows[-1])
+    rows.extend(more)
+    return rows, None
+
+
+def due_reminders(now: datetime, within_minutes: int = 0, limit: int = 500,
+                  user_id: Optional[int] = None, since: Optional[datetime] = None) -> List[Reminder]:
+    """
+    Неотправленные невыполненные напоминания со временем <= now + within_minutes,
+    самые ранние первыми. within_minutes=0 — только наступившие; since — не раньше этого момента.
+    """
+    until = now + timedelta(minutes=max(0, within_minutes))
+    query = Reminder.query.filter(
+        Reminder.is_sent.is_(False),
+        Reminder.is_completed.is_(False),
+        Reminder.reminder_time.isnot(None),
+        Reminder.reminder_time <= until,
+    )
+    if since is not None:
+        query = query.filter(Reminder.reminder_time >= since)
+    if user_id is not None:
+        query = query.filter(Reminder.user_id == user_id)
+    return query.order_by(Reminder.reminder_time.asc()).limit(max(1, limit)).all()
@@ -8,6 +8,9 @@ import logging
 from typing import Dict, Optional, Tuple
 from flask import session, current_app
 
+from app.remote_admin import remote_client
+from app.utils.env import env_float
+
 logger = logging.getLogger(__name__)
 
 # Конфигурация окружений - динамически загружается из переменных окружения
@@ -113,7 +116,8 @@ def is_environment_configured(env: Optional[str] = None) -> bool:
     return bool(config.get('url') and config.get('token'))
 
 
-def make_remote_request(method: str, path: str, payload: Optional[Dict] = None, env: Optional[str] = None) -> requests.Response:
+def make_remote_request(method: str, path: str, payload: Optional[Dict] = None, env: Optional[str] = None,
+                        timeout: Optional[float] = None) -> requests.Response:
     """
     Выполнить запрос к удаленному API окружения
     """
@@ -127,47 +131,17 @@ def make_remote_request(method: str, path: str, payload: Optional[Dict] = None,
     if not base_url or not token:
         # Вместо RuntimeError возвращаем мок-ответ с ошибкой, чтобы не валить приложение 500-й
         logger.warning(f"Environment {env} is not configured correctly")
-        mock_resp = requests.Response()
-        mock_resp.status_code = 503
-        mock_resp._content = b'{"error": "Environment not configured"}'
-        return mock_resp
-    
-    url = f"{base_url}{path}"
-    headers = {
-        'X-Admin-Token': token,
-        'User-Agent': 'Remote-Admin/1.0',
-        'Content-Type': 'application/json',
-        'Accept': 'application/json'  # Явно указываем, что ожидаем JSON
-    }
-    timeout = 5 # Уменьшаем таймаут до 5 секунд
+        return remote_client.error_response(503, 'Environment not configured')
     
-    logger.debug(f"Making {method} request to {url} with token: {token[:10]}...")
-    
-    try:
-        if method.upper() == 'GET':
-            resp = requests.get(url, headers=headers, timeout=timeout, allow_redirects=False)
-        elif method.upper() == 'POST':
-            resp = requests.post(url, headers=headers, json=(payload or {}), timeout=timeout, allow_redirects=False)
-        elif method.upper() == 'PUT':
-            resp = requests.put(url, headers=headers, json=(payload or {}), timeout=timeout, allow_redirects=False)
-        elif method.upper() == 'DELETE':
-            resp = requests.delete(url, headers=headers, timeout=timeout, allow_redirects=False)
-        else:
-            raise ValueError(f'Unsupported HTTP method: {method}')
-        
-        # Логируем ответ для отладки
-        logger.debug(f"Response from {url}: status={resp.status_code}, content-type={resp.headers.get('Content-Type', 'unknown')}, body-preview={resp.text[:200]}")
-        
-        if resp.status_code != 200:
-            logger.warning(f"Request to {url} returned status {resp.status_code}. Response: {resp.text[:200]}")
-        
-        return resp
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request failed to {url}: {e}")
-        mock_resp = requests.Response()
-        mock_resp.status_code = 502
-        mock_resp._content = f'{{"error": "Connection failed: {str(e)}"}}'.encode('utf-8')
-        return mock_resp
+    logger.debug(f"Making {method} request to {base_url}{path} with token: {token[:10]}...")
+
+    # Keep-alive сессия окружения + circuit breaker (см. remote_client)
+    resp = remote_client.send(env, base_url, token, method, path, payload=payload, timeout=timeout)
+
+    if resp.status_code != 200:
+        logger.warning(f"Request to {base_url}{path} returned status {resp.status_code}. Response: {resp.text[:200]}")
+
+    return resp
 
 
 def get_environment_status(env: str) -> Dict:
@@ -183,7 +157,8 @@ def get_environment_status(env: str) -> Dict:
     
     try:
         # Используем отдельный таймаут для проверки статуса
-        resp = make_remote_request('GET', '/internal/remote-admin/status', env=env)
+        resp = make_remote_request('GET', '/internal/remote-admin/status', env=env,
+                                   timeout=env_float('REMOTE_ADMIN_STATUS_TIMEOUT', 3.0))
         if resp.status_code == 200:
             try:
                 data = resp.json()
@@ -232,10 +207,48 @@ def get_environment_status(env: str) -> Dict:
         }
 
 
-def get_all_environments_status() -> Dict[str, Dict]:
-    """Получить статус всех окружений"""
-    envs = get_environments()
-    return {
-        env: get_environment_status(env)
-        for env in envs.keys()
+def _timed_out_status(env: str) -> Dict:
+    status = {
+        'configured': True,
+        'available': False,
+        'error': 'Status check timed out'
     }
+    # Пока запрос дорабатывает в фоне, следующие страницы не ждут его заново;
+    # по завершении он сам положит настоящий статус в кеш
+    remote_client.status_cache.put_if_absent(env, status)
+    return status
+
+
+def get_all_environments_status(fresh: bool = False) -> Dict[str, Dict]:
+    """
+    Получить статус всех окружений.
+
+    Свежие статусы берутся из кеша, устаревшие отдаются сразу и обновляются в фоне;
+    отсутствующие (или все при fresh=True) опрашиваются параллельно, но не дольше
+    REMOTE_ADMIN_STATUS_DEADLINE секунд на всю страницу.
+    """
+    envs = get_environments()
+    cache = remote_client.status_cache
+    result: Dict[str, Dict] = {}
+    missing = []
+    for env in envs.keys():
+        if not is_environment_configured(env):
+            result[env] = get_environment_status(env)
+            continue
+        cached, needs_refresh = (None, False) if fresh else cache.lookup(env)
+        if cached is None:
+            missing.append(env)
+            continue
+        result[env] = cached
+        if needs_refresh:
+            cache.refresh_in_background(env, get_environment_status)
+
+    def _probe(env: str) -> Dict:
+        status = get_environment_status(env)
+        cache.put(env, status)
+        return status
+
+    deadline = env_float('REMOTE_ADMIN_STATUS_DEADLINE', 4.0)
+    result.update(remote_client.fan_out(missing, _probe, deadline, _timed_out_status))
+    # Порядок окружений как в конфигурации
+    return {env: result[env] for env in envs.keys()}
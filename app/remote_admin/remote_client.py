@@ -0,0 +1,337 @@
+"""
+HTTP-клиент удаленной админки к окружениям.
+
+- keep-alive сессия на каждый URL окружения (requests.Session + пул соединений);
+- circuit breaker на окружение: после REMOTE_ADMIN_BREAKER_FAILURES ошибок подряд (сеть, таймаут, 5xx)
+  запросы REMOTE_ADMIN_BREAKER_COOLDOWN секунд не отправляются, затем пропускается одна проба;
+- параллельный опрос нескольких окружений с общим дедлайном (fan_out);
+- короткоживущий кеш статусов: свежий REMOTE_ADMIN_STATUS_TTL секунд, после этого ещё
+  REMOTE_ADMIN_STATUS_STALE секунд отдаётся старое значение, а обновление идёт в фоне.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait as wait_futures
+from typing import Callable, Dict, Iterable, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.utils.env import env_float, env_int
+
+logger = logging.getLogger(__name__)
+
+
+def error_response(status_code: int, message: str) -> requests.Response:
+    """Ответ-заглушка с JSON-ошибкой: вызывающий код работает с ним как с обычным ответом."""
+    resp = requests.Response()
+    resp.status_code = status_code
+    resp.headers['Content-Type'] = 'application/json'
+    resp._content = json.dumps({'error': message}, ensure_ascii=False).encode('utf-8')
+    return resp
+
+
+# =============================================================================
+# Сессии
+# =============================================================================
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(base_url: str) -> requests.Session:
+    """Keep-alive сессия на URL окружения (REMOTE_ADMIN_POOL_SIZE соединений, по умолчанию 8)."""
+    s = _sessions.get(base_url)
+    if s is not None:
+        return s
+    with _sessions_lock:
+        s = _sessions.get(base_url)
+        if s is None:
+            # Без автоматических ретраев: через админку идут и неидемпотентные POST/DELETE
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, env_int('REMOTE_ADMIN_POOL_SIZE', 8)),
+                                  max_retries=0)
+            s = requests.Session()
+            s.mount('http://', adapter)
+            s.mount('https://', adapter)
+            s.headers.update({
+                'User-Agent': 'Remote-Admin/1.0',
+                'Accept': 'application/json',  # Явно указываем, что ожидаем JSON
+            })
+            _sessions[base_url] = s
+        return s
+
+
+# =============================================================================
+# Circuit breaker
+# =============================================================================
+
+class CircuitBreaker:
+    """
+    closed -> (N ошибок подряд) -> open -> (cooldown) -> half-open: одна проба;
+    успех закрывает, ошибка снова открывает на cooldown.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self.last_error: Optional[str] = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state(time.monotonic())
+
+    def _state(self, now: float) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if now - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._state(time.monotonic())
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        with self._lock:
+            if self.opened_at is None:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.last_error = None
+            self._probe_in_flight = False
+
+    def record_failure(self, error: str) -> None:
+        with self._lock:
+            self.failures += 1
+            self.last_error = error
+            if self._probe_in_flight or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'state': self._state(time.monotonic()),
+                'failures': self.failures,
+                'last_error': self.last_error,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(env: str) -> CircuitBreaker:
+    with _breakers_lock:
+        breaker = _breakers.get(env)
+        if breaker is None:
+            breaker = CircuitBreaker(
+                failure_threshold=env_int('REMOTE_ADMIN_BREAKER_FAILURES', 3),
+                cooldown=env_float('REMOTE_ADMIN_BREAKER_COOLDOWN', 30.0),
+            )
+            _breakers[env] = breaker
+        return breaker
+
+
+# =============================================================================
+# Запрос
+# =============================================================================
+
+def send(env: str, base_url: str, token: str, method: str, path: str,
+         payload: Optional[Dict] = None, timeout: Optional[float] = None) -> requests.Response:
+    """
+    Запрос к окружению через его сессию и breaker. Сетевые ошибки и открытый breaker
+    превращаются в ответы 502/503 с JSON-ошибкой (как и раньше в make_remote_request).
+    """
+    method = method.upper()
+    if method not in ('GET', 'POST', 'PUT', 'DELETE'):
+        raise ValueError(f'Unsupported HTTP method: {method}')
+
+    breaker = get_breaker(env)
+    if not breaker.allow():
+        return error_response(
+            503, f'Environment {env} is unavailable, retry in {int(breaker.retry_after()) + 1}s'
+                 f' (last error: {breaker.last_error})'
+        )
+
+    url = f"{base_url}{path}"
+    read_timeout = timeout if timeout is not None else env_float('REMOTE_ADMIN_TIMEOUT', 5.0)
+    connect_timeout = min(read_timeout, env_float('REMOTE_ADMIN_CONNECT_TIMEOUT', 3.0))
+    try:
+        resp = get_session(base_url).request(
+            method,
+            url,
+            headers={'X-Admin-Token': token},
+            json=(payload or {}) if method in ('POST', 'PUT') else None,
+            timeout=(connect_timeout, read_timeout),
+            allow_redirects=False,
+        )
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Request failed to {url}: {e}")
+        breaker.record_failure(type(e).__name__)
+        return error_response(502, f'Connection failed: {e}')
+
+    if resp.status_code >= 500:
+        breaker.record_failure(f'HTTP {resp.status_code}')
+    else:
+        breaker.record_success()
+    return resp
+
+
+# =============================================================================
+# Параллельный опрос окружений
+# =============================================================================
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+# (имя функции, ключ) -> Future: повторный опрос не запускается, пока предыдущий не завершился
+_inflight: Dict[tuple, Future] = {}
+_inflight_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=max(2, env_int('REMOTE_ADMIN_FANOUT_WORKERS', 8)),
+                    thread_name_prefix='remote-admin',
+                )
+    return _executor
+
+
+def fan_out(keys: Iterable[str], func: Callable[[str], Dict], deadline: float,
+            on_timeout: Callable[[str], Dict]) -> Dict[str, Dict]:
+    """
+    Вызывает func(key) для всех ключей параллельно и ждёт не дольше deadline секунд.
+    Для не успевших ключей возвращается on_timeout(key); их запросы дорабатывают в фоне,
+    а повторный fan_out с той же func ждёт уже запущенный запрос, а не отправляет новый.
+    """
+    keys = list(keys)
+    if not keys:
+        return {}
+    futures = {}
+    with _inflight_lock:
+        for key in keys:
+            flight = (getattr(func, '__qualname__', repr(func)), key)
+            future = _inflight.get(flight)
+            if future is None:
+                future = _get_executor().submit(func, key)
+                _inflight[flight] = future
+                future.add_done_callback(lambda _f, flight=flight: _forget_flight(flight))
+            futures[key] = future
+    wait_futures(futures.values(), timeout=max(0.0, deadline))
+    results = {}
+    for key, future in futures.items():
+        if not future.done():
+            results[key] = on_timeout(key)
+            continue
+        try:
+            results[key] = future.result()
+        except Exception as e:
+            logger.error(f"Remote admin fan-out for {key} failed: {e}", exc_info=True)
+            results[key] = on_timeout(key)
+    return results
+
+
+def _forget_flight(flight: tuple) -> None:
+    with _inflight_lock:
+        _inflight.pop(flight, None)
+
+
+# =============================================================================
+# Кеш статусов
+# =============================================================================
+
+class StatusCache:
+    """key -> (status, fetched_at) с фоновым обновлением устаревших записей (stale-while-revalidate)."""
+
+    def __init__(self, ttl: float, stale: float):
+        self.ttl = ttl
+        self.stale = stale
+        self._items: Dict[str, tuple] = {}
+        self._refreshing: set = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.background_refreshes = 0
+
+    def put(self, key: str, value: Dict) -> None:
+        with self._lock:
+            self._items[key] = (value, time.monotonic())
+
+    def put_if_absent(self, key: str, value: Dict) -> None:
+        with self._lock:
+            if key not in self._items:
+                self._items[key] = (value, time.monotonic())
+
+    def invalidate(self, key: Optional[str] = None) -> None:
+        with self._lock:
+            if key is None:
+                self._items.clear()
+            else:
+                self._items.pop(key, None)
+
+    def lookup(self, key: str) -> tuple:
+        """(value | None, needs_background_refresh)."""
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                self.misses += 1
+                return None, False
+            value, fetched_at = item
+            age = time.monotonic() - fetched_at
+            if age <= self.ttl:
+                self.hits += 1
+                return value, False
+            if age <= self.ttl + self.stale:
+                self.hits += 1
+                if key in self._refreshing:
+                    return value, False
+                self._refreshing.add(key)
+                return value, True
+            self.misses += 1
+            return None, False
+
+    def refresh_in_background(self, key: str, loader: Callable[[str], Dict]) -> None:
+        def _run():
+            try:
+                self.put(key, loader(key))
+                self.background_refreshes += 1
+            except Exception as e:
+                logger.error(f"Background status refresh for {key} failed: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+        _get_executor().submit(_run)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = len(self._items)
+        return {'size': size, 'hits': self.hits, 'misses': self.misses,
+                'background_refreshes': self.background_refreshes}
+
+
+status_cache = StatusCache(
+    ttl=env_float('REMOTE_ADMIN_STATUS_TTL', 15.0),
+    stale=env_float('REMOTE_ADMIN_STATUS_STALE', 120.0),
+)
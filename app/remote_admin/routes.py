@@ -2,6 +2,8 @@
 Основные маршруты удаленной админки
 """
 import logging
+from urllib.parse import urlencode
+
 from flask import render_template, request, redirect, url_for, flash, session, jsonify
 from flask_login import login_required, current_user
 
@@ -12,6 +14,7 @@ from app.remote_admin.environment_manager import (
     get_all_environments_status, get_environments,
     make_remote_request
 )
+from app.remote_admin.remote_client import get_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -69,13 +72,39 @@ def environment_status():
     if not current_user.is_creator():
         return jsonify({'error': 'Access denied'}), 403
     
-    env_statuses = get_all_environments_status()
+    # ?fresh=1 — опросить окружения заново, минуя кеш статусов
+    env_statuses = get_all_environments_status(fresh=request.args.get('fresh') in ('1', 'true'))
     return jsonify({
         'current': get_current_environment(),
-        'environments': env_statuses
+        'environments': env_statuses,
+        'breakers': {env: get_breaker(env).snapshot() for env in env_statuses}
     })
 
 
+USERS_PAGE_SIZE = 50
+
+
+def _filter_users_locally(users, selected_roles, q):
+    """Фильтрация полного списка (окружения без серверной фильтрации): (users, role_stats)"""
+    q = q.lower()
+    if q:
+        def _hay(u):
+            return ' '.join([
+                str(u.get('username') or ''),
+                str(u.get('email') or ''),
+                str(u.get('role') or ''),
+            ]).lower()
+        users = [u for u in users if q in _hay(u)]
+    # stats for quick role filters (before role filter, как и серверные фасеты)
+    role_stats = {}
+    for u in users:
+        r = (u.get('role') or 'unknown')
+        role_stats[r] = role_stats.get(r, 0) + 1
+    if selected_roles:
+        users = [u for u in users if (u.get('role') in selected_roles)]
+    return users, role_stats
+
+
 @remote_admin_bp.route('/users')
 @login_required
 def users_list():
@@ -91,66 +120,65 @@ def users_list():
         flash(f'Окружение {environments.get(current_env, {}).get("name", current_env)} не настроено', 'error')
         return redirect(url_for('remote_admin.dashboard'))
     
+    q = (request.args.get('q') or '').strip()
+    roles_raw = (request.args.get('roles') or '').strip()
+    role_single = (request.args.get('role') or '').strip()
+    is_active_filter = (request.args.get('is_active') or '').strip().lower()
+    cursor = request.args.get('cursor', type=int)
+
+    selected_roles = []
+    if roles_raw:
+        selected_roles = [r.strip() for r in roles_raw.split(',') if r.strip()]
+    elif role_single:
+        selected_roles = [role_single]
+
+    users = []
+    role_stats = {}
+    total = 0
+    total_all = 0
+    next_cursor = None
     try:
-        # filters (applied client-side/server-side after fetch; remote API supports role/is_active)
-        q = (request.args.get('q') or '').strip().lower()
-        roles_raw = (request.args.get('roles') or '').strip()
-        role_single = (request.args.get('role') or '').strip()
-        is_active_filter = (request.args.get('is_active') or '').strip().lower()
-
-        selected_roles = []
-        if roles_raw:
-            selected_roles = [r.strip() for r in roles_raw.split(',') if r.strip()]
-        elif role_single:
-            selected_roles = [role_single]
-
-        # Build query string for remote API (only single role supported there)
-        api_path = '/internal/remote-admin/api/users'
-        qs_parts = []
-        if len(selected_roles) == 1:
-            qs_parts.append(f"role={selected_roles[0]}")
+        # Фильтры, поиск, страница и счетчики по ролям считаются на стороне окружения за один запрос
+        params = {'limit': USERS_PAGE_SIZE, 'facets': 1}
+        if selected_roles:
+            params['roles'] = ','.join(selected_roles)
         if is_active_filter in ('true', 'false'):
-            qs_parts.append(f"is_active={is_active_filter}")
-        if qs_parts:
-            api_path = api_path + '?' + '&'.join(qs_parts)
-
-        resp = make_remote_request('GET', api_path)
+            params['is_active'] = is_active_filter
+        if q:
+            params['q'] = q
+        if cursor:
+            params['cursor'] = cursor
+        resp = make_remote_request('GET', '/internal/remote-admin/api/users?' + urlencode(params))
         if resp.status_code == 200:
             data = resp.json()
             users = data.get('users', [])
+            if 'facets' in data:
+                role_stats = data.get('facets') or {}
+                total = int(data.get('total') or 0)
+                total_all = int(data.get('facets_total') or 0)
+                next_cursor = data.get('next_cursor')
+            else:
+                # Окружение со старым API: вернуло весь список, фильтруем здесь
+                users, role_stats = _filter_users_locally(users, selected_roles, q)
+                total = len(users)
+                total_all = sum(role_stats.values())
         else:
-            users = []
             flash(f'Ошибка загрузки пользователей: {resp.status_code}', 'error')
     except Exception as e:
         logger.error(f"Error loading users: {e}", exc_info=True)
         users = []
         flash(f'Ошибка загрузки пользователей: {str(e)}', 'error')
 
-    # extra filtering (multi-role and query) on remote-admin side
-    if users:
-        if selected_roles:
-            users = [u for u in users if (u.get('role') in selected_roles)]
-        if q:
-            def _hay(u):
-                return ' '.join([
-                    str(u.get('username') or ''),
-                    str(u.get('email') or ''),
-                    str(u.get('role') or ''),
-                ]).lower()
-            users = [u for u in users if q in _hay(u)]
-
-    # stats for quick role filters (within current result set)
-    role_stats = {}
-    for u in users or []:
-        r = (u.get('role') or 'unknown')
-        role_stats[r] = role_stats.get(r, 0) + 1
-
     return render_template('remote_admin/users_list.html',
                          users=users,
                          role_stats=role_stats,
+                         total=total,
+                         total_all=total_all,
+                         cursor=cursor,
+                         next_cursor=next_cursor,
                          selected_roles=selected_roles,
-                         q=(request.args.get('q') or '').strip(),
-                         is_active_filter=(request.args.get('is_active') or '').strip().lower(),
+                         q=q,
+                         is_active_filter=is_active_filter,
                          current_environment=current_env,
                          environment_name=environments.get(current_env, {}).get('name', current_env))
 
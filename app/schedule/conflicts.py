@@ -0,0 +1,115 @@
+"""
+Проверка пересечений уроков по времени.
+
+Вместо запроса «все уроки дня» на каждую проверку загружаем уроки нужного окна
+одним range-запросом и раскладываем их в отсортированные интервальные индексы:
+по каждому ученику и общий индекс преподавателя (все ученики его области видимости).
+"""
+from __future__ import annotations
+
+import bisect
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from app.models import db, Lesson
+
+# Уроки, начавшиеся до окна, тоже могут в него «залезть» — берём запас назад
+_LOOKBEHIND = timedelta(days=1)
+
+
+@dataclass
+class IntervalIndex:
+    """Интервалы [start, end), отсортированные по началу; поиск пересечения — bisect + короткий проход назад."""
+    _starts: list = field(default_factory=list)
+    _items: list = field(default_factory=list)  # (start, end, lesson_id)
+    _max_length: timedelta = timedelta(0)
+
+    def add(self, start: datetime, end: datetime, lesson_id: int | None = None) -> None:
+        pos = bisect.bisect_right(self._starts, start)
+        self._starts.insert(pos, start)
+        self._items.insert(pos, (start, end, lesson_id))
+        if end - start > self._max_length:
+            self._max_length = end - start
+
+    def find_overlap(self, start: datetime, end: datetime, exclude_lesson_id: int | None = None):
+        """Возвращает (start, end, lesson_id) первого пересекающегося интервала или None."""
+        # Кандидаты: начались раньше end и не раньше, чем start - максимальная длина
+        pos = bisect.bisect_left(self._starts, end)
+        lower = start - self._max_length
+        for i in range(pos - 1, -1, -1):
+            item_start, item_end, item_id = self._items[i]
+            if item_start < lower:
+                break
+            if exclude_lesson_id is not None and item_id == exclude_lesson_id:
+                continue
+            if item_start < end and start < item_end:
+                return self._items[i]
+        return None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+class ScheduleConflictIndex:
+    """
+    Индекс занятости ученика(ов) и преподавателя на окне дат.
+
+    tutor_student_ids=None — проверка по преподавателю не выполняется
+    (админ/создатель или пользователь не тьютор).
+    """
+
+    def __init__(self, tutor_student_ids: Iterable[int] | None = None):
+        self.by_student: dict[int, IntervalIndex] = {}
+        self.tutor_student_ids = set(tutor_student_ids) if tutor_student_ids is not None else None
+        self.tutor: IntervalIndex | None = IntervalIndex() if self.tutor_student_ids is not None else None
+
+    @classmethod
+    def load(
+        cls,
+        *,
+        range_start: datetime,
+        range_end: datetime,
+        student_ids: Iterable[int],
+        tutor_student_ids: Iterable[int] | None = None,
+    ) -> 'ScheduleConflictIndex':
+        """Один запрос на всё окно (например, неделю) по ученикам и области преподавателя."""
+        index = cls(tutor_student_ids)
+        ids = set(int(s) for s in student_ids if s)
+        if index.tutor_student_ids:
+            ids |= index.tutor_student_ids
+        if not ids:
+            return index
+
+        rows = (
+            db.session.query(Lesson.lesson_id, Lesson.student_id, Lesson.lesson_date, Lesson.duration)
+            .filter(
+                Lesson.student_id.in_(ids),
+                Lesson.lesson_date >= range_start - _LOOKBEHIND,
+                Lesson.lesson_date < range_end,
+            )
+            .order_by(Lesson.lesson_date.asc())
+            .all()
+        )
+        for lesson_id, student_id, lesson_date, duration in rows:
+            index.reserve(student_id, lesson_date, int(duration or 60), lesson_id=lesson_id)
+        return index
+
+    def reserve(self, student_id: int, start: datetime, duration_min: int, lesson_id: int | None = None) -> None:
+        """Добавляет урок в индекс (существующий или только что принятый к созданию)."""
+        end = start + timedelta(minutes=int(duration_min or 60))
+        self.by_student.setdefault(student_id, IntervalIndex()).add(start, end, lesson_id)
+        if self.tutor is not None and student_id in self.tutor_student_ids:
+            self.tutor.add(start, end, lesson_id)
+
+    def conflict(self, student_id: int, start: datetime, duration_min: int, exclude_lesson_id: int | None = None) -> str | None:
+        """'student' / 'tutor' — с кем пересекается слот, None — свободно."""
+        if not student_id or not start or not duration_min:
+            return None
+        end = start + timedelta(minutes=int(duration_min))
+        student_index = self.by_student.get(student_id)
+        if student_index is not None and student_index.find_overlap(start, end, exclude_lesson_id) is not None:
+            return 'student'
+        if self.tutor is not None and self.tutor.find_overlap(start, end, exclude_lesson_id) is not None:
+            return 'tutor'
+        return None
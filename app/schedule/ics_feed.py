@@ -0,0 +1,255 @@
+"""
+ICS-фиды расписания с версионированием и conditional GET.
+
+Календарные клиенты опрашивают /schedule/ics/<token> очень часто. Тело фида зависит только от
+(пользователь, таймзона, диапазон дат, версии расписания его учеников), поэтому:
+- ETag считается из ключа, без загрузки уроков — на совпавший If-None-Match отвечаем 304;
+- отрендеренные тела держим в небольшом LRU (ICS_FEED_CACHE_SIZE, 0 — выключить);
+- версии ведутся на владельца: 'schedule:student:<student_id>' поднимается при изменении уроков
+  и имени ученика, 'schedule:user:<user_id>' — при изменении области видимости пользователя
+  (прикрепления, семейные связи, роль). Запись урока трогает только счётчик своего ученика,
+  и ETag меняется только у фидов, где этот ученик виден;
+- область видимости кешируется в процессе по версии 'schedule:user:<id>' (и не дольше
+  ICS_SCOPE_CACHE_SECONDS), версия фида — сумма версий учеников из неё одним запросом.
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, time, timezone as dt_timezone
+from time import monotonic
+from typing import Callable
+
+from flask import Response, request
+
+from app.models import db, Lesson, Student, Enrollment, FamilyTie, User, moscow_now, MOSCOW_TZ, TOMSK_TZ
+from app.utils.cache_versions import get_version, get_version_sum, track_model_changes
+
+SCHEDULE_STUDENT_VERSION = 'schedule:student:{}'
+SCHEDULE_USER_VERSION = 'schedule:user:{}'
+# Массовые insert/update уроков мимо flush (импорт) — затронутые ученики неизвестны, счётчик общий
+SCHEDULE_BULK_VERSION = 'schedule:bulk'
+
+# Диапазон фида: от сегодня-14 до сегодня+60
+FEED_DAYS_BEFORE = 14
+FEED_DAYS_AFTER = 60
+
+# Что влияет на содержимое фида: время/длительность/тема урока, имя ученика, область видимости
+track_model_changes(Lesson, SCHEDULE_STUDENT_VERSION, attrs=('lesson_date', 'duration', 'topic', 'student_id'),
+                    key_attrs=('student_id',), bulk_name=SCHEDULE_BULK_VERSION)
+track_model_changes(Student, SCHEDULE_STUDENT_VERSION, attrs=('name',),
+                    key_attrs=('student_id',), bulk_name=SCHEDULE_BULK_VERSION)
+track_model_changes(Enrollment, SCHEDULE_USER_VERSION,
+                    key_attrs=('tutor_id', 'student_id'), bulk_name=SCHEDULE_BULK_VERSION)
+track_model_changes(FamilyTie, SCHEDULE_USER_VERSION,
+                    key_attrs=('parent_id', 'student_id'), bulk_name=SCHEDULE_BULK_VERSION)
+track_model_changes(User, SCHEDULE_USER_VERSION, attrs=('role', 'email'),
+                    key_attrs=('id',), bulk_name=SCHEDULE_BULK_VERSION)
+
+
+class IcsFeedStore:
+    """Потокобезопасный LRU отрендеренных фидов: key -> body."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._items: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        if self.max_entries <= 0:
+            return None
+        with self._lock:
+            body = self._items.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key: str, body: str) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._items[key] = body
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+
+def _store_size() -> int:
+    try:
+        return int(os.environ.get('ICS_FEED_CACHE_SIZE', 256))
+    except (TypeError, ValueError):
+        return 256
+
+
+feed_store = IcsFeedStore(_store_size())
+
+
+class ScopeCache:
+    """
+    Потокобезопасный LRU областей видимости: user_id -> (версия 'schedule:user:<id>', момент, scope).
+    Запись годна, пока версия пользователя не изменилась и не истёк ttl (ttl страхует то,
+    что версия не видит: смену email у карточки ученика).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 300):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._items: OrderedDict[int, tuple[int, float, list[int] | None]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, version: int, resolve: Callable[[], list[int] | None]) -> list[int] | None:
+        now = monotonic()
+        with self._lock:
+            item = self._items.get(user_id)
+            if item is not None and item[0] == version and now - item[1] < self.ttl_seconds:
+                self._items.move_to_end(user_id)
+                return item[2]
+        allowed = resolve()
+        if allowed is not None:
+            allowed = sorted(set(allowed))
+        if self.max_entries > 0:
+            with self._lock:
+                self._items[user_id] = (version, now, allowed)
+                self._items.move_to_end(user_id)
+                while len(self._items) > self.max_entries:
+                    self._items.popitem(last=False)
+        return allowed
+
+
+def _scope_ttl() -> float:
+    try:
+        return float(os.environ.get('ICS_SCOPE_CACHE_SECONDS', 300))
+    except (TypeError, ValueError):
+        return 300.0
+
+
+scope_cache = ScopeCache(_store_size(), _scope_ttl())
+
+
+def _feed_version(allowed: list[int] | None) -> tuple[int, datetime | None]:
+    """Сумма версий учеников, видимых в фиде: весь префикс для can_see_all, иначе список."""
+    if allowed is None:
+        return get_version_sum(names=[SCHEDULE_BULK_VERSION], prefixes=[SCHEDULE_STUDENT_VERSION.format('')])
+    names = [SCHEDULE_STUDENT_VERSION.format(student_id) for student_id in allowed]
+    return get_version_sum(names=names + [SCHEDULE_BULK_VERSION])
+
+
+def _resolve_tz(tz_param: str | None):
+    tz_param = (tz_param or '').strip().lower()
+    if tz_param not in ('moscow', 'tomsk'):
+        tz_param = 'moscow'
+    export_tz = TOMSK_TZ if tz_param == 'tomsk' else MOSCOW_TZ
+    export_tzid = 'Asia/Tomsk' if tz_param == 'tomsk' else 'Europe/Moscow'
+    return tz_param, export_tz, export_tzid
+
+
+def _to_utc(dt_naive_msk: datetime) -> datetime:
+    return dt_naive_msk.replace(tzinfo=MOSCOW_TZ).astimezone(dt_timezone.utc).replace(microsecond=0)
+
+
+def render_ics(lessons, export_tz, export_tzid: str, dtstamp_naive_msk: datetime) -> str:
+    """Текст календаря. DTSTAMP фиксированный (момент версии), чтобы тело совпадало с ETag."""
+    dtstamp = _to_utc(dtstamp_naive_msk).strftime('%Y%m%dT%H%M%SZ')
+    lines = [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//BlackNeon//Schedule//RU",
+        "CALSCALE:GREGORIAN",
+        "METHOD:PUBLISH",
+        f"X-WR-TIMEZONE:{export_tzid}",
+    ]
+    for l in lessons:
+        if not l.student:
+            continue
+        start_local = l.lesson_date.replace(tzinfo=MOSCOW_TZ).astimezone(export_tz)
+        end_local = start_local + timedelta(minutes=int(l.duration or 60))
+        summary = f"Урок: {l.student.name}"
+        if l.topic:
+            summary = f"{summary} · {l.topic}"
+        lines.extend([
+            "BEGIN:VEVENT",
+            f"UID:lesson-{l.lesson_id}@black-neon",
+            f"DTSTAMP:{dtstamp}",
+            f"DTSTART;TZID={export_tzid}:{start_local.strftime('%Y%m%dT%H%M%S')}",
+            f"DTEND;TZID={export_tzid}:{end_local.strftime('%Y%m%dT%H%M%S')}",
+            f"SUMMARY:{summary}",
+            "END:VEVENT",
+        ])
+    lines.append("END:VCALENDAR")
+    return "\r\n".join(lines) + "\r\n"
+
+
+def _load_lessons(allowed: list[int] | None, start_dt: datetime, end_dt: datetime):
+    q = (
+        Lesson.query
+        .filter(Lesson.lesson_date >= start_dt, Lesson.lesson_date <= end_dt)
+        .options(db.joinedload(Lesson.student))
+        .order_by(Lesson.lesson_date.asc())
+    )
+    if allowed is not None:
+        if not allowed:
+            return []
+        q = q.filter(Lesson.student_id.in_(allowed))
+    return q.all()
+
+
+def ics_feed_response(
+    *,
+    user_id: int,
+    resolve_allowed_student_ids: Callable[[], list[int] | None],
+    tz_param: str | None = None,
+    download_name: str | None = None,
+) -> Response:
+    """
+    Ответ с фидом пользователя. Scope (resolve_allowed_student_ids) берётся из scope_cache,
+    уроки загружаются только если клиентская копия устарела и тела нет в LRU.
+    """
+    tz_param, export_tz, export_tzid = _resolve_tz(tz_param)
+    scope_version, scope_updated_at = get_version(SCHEDULE_USER_VERSION.format(user_id))
+    allowed = scope_cache.get(user_id, scope_version, resolve_allowed_student_ids)
+    version, version_updated_at = _feed_version(allowed)
+
+    today = moscow_now().date()
+    day_start = datetime.combine(today, time.min)
+    # Окно сдвигается раз в сутки, поэтому фид меняется и в полночь
+    last_modified_naive = max(version_updated_at or day_start, scope_updated_at or day_start, day_start)
+
+    scope_hash = 'all' if allowed is None else hashlib.sha1(','.join(map(str, allowed)).encode()).hexdigest()[:16]
+    key = f"{user_id}:{tz_param}:{today.isoformat()}:{scope_version}:{scope_hash}:{version}"
+    etag = hashlib.sha1(key.encode('utf-8')).hexdigest()
+    last_modified = _to_utc(last_modified_naive)
+
+    headers = {
+        'Cache-Control': 'private, max-age=300',
+    }
+    if download_name:
+        headers['Content-Disposition'] = f'attachment; filename="{download_name}"'
+
+    not_modified = False
+    if request.if_none_match:
+        not_modified = request.if_none_match.contains(etag)
+    elif request.if_modified_since is not None:
+        not_modified = last_modified <= request.if_modified_since
+
+    if not_modified:
+        response = Response(status=304, headers=headers)
+    else:
+        body = feed_store.get(key)
+        if body is None:
+            start_dt = datetime.combine(today - timedelta(days=FEED_DAYS_BEFORE), time.min)
+            end_dt = datetime.combine(today + timedelta(days=FEED_DAYS_AFTER), time.max)
+            lessons = _load_lessons(allowed, start_dt, end_dt)
+            body = render_ics(lessons, export_tz, export_tzid, last_modified_naive)
+            feed_store.put(key, body)
+        response = Response(body, mimetype="text/calendar; charset=utf-8", headers=headers)
+
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    return response
@@ -9,6 +9,8 @@ from flask_login import login_required, current_user
 from app.schedule import schedule_bp
 from app.models import Lesson, Student, User, RecurringLessonSlot, db, moscow_now, MOSCOW_TZ, TOMSK_TZ
 from app.auth.rbac_utils import get_user_scope, has_permission
+from app.schedule.conflicts import ScheduleConflictIndex
+from app.schedule.ics_feed import ics_feed_response
 from core.audit_logger import audit_logger
 import secrets
 
@@ -164,39 +166,6 @@ def _parse_date(value: str | None):
     except Exception:
         return None
 
-def _dt_to_ics_utc(dt_naive_msk: datetime) -> str:
-    """Lessons.lesson_date хранится naive как MSK. Конвертим в UTC для .ics."""
-    try:
-        from zoneinfo import ZoneInfo
-        if getattr(dt_naive_msk, 'tzinfo', None) is None:
-            dt = dt_naive_msk.replace(tzinfo=MOSCOW_TZ).astimezone(ZoneInfo("UTC"))
-        else:
-            dt = dt_naive_msk.astimezone(ZoneInfo("UTC"))
-    except Exception:
-        if getattr(dt_naive_msk, 'tzinfo', None) is None:
-            dt = dt_naive_msk.replace(tzinfo=MOSCOW_TZ)
-        else:
-            dt = dt_naive_msk
-    return dt.strftime('%Y%m%dT%H%M%SZ')
-
-
-def _dt_to_ics_local(dt_naive_msk: datetime, tz) -> str:
-    """
-    Возвращаем datetime в локальной таймзоне (без 'Z'), чтобы импорт в Google Calendar
-    совпадал с отображением в UI (wall time).
-    """
-    try:
-        if getattr(dt_naive_msk, 'tzinfo', None) is None:
-            aware = dt_naive_msk.replace(tzinfo=MOSCOW_TZ)
-        else:
-            aware = dt_naive_msk
-        local = aware.astimezone(tz)
-    except Exception:
-        # fallback: считаем, что dt уже в нужной зоне как naive
-        local = dt_naive_msk
-    return local.strftime('%Y%m%dT%H%M%S')
-
-
 def _parse_local_datetime(date_str: str, time_str: str, timezone: str):
     input_tz = TOMSK_TZ if timezone == 'tomsk' else MOSCOW_TZ
     lesson_datetime_str = f"{date_str} {time_str}"
@@ -206,68 +175,34 @@ def _parse_local_datetime(date_str: str, time_str: str, timezone: str):
     return base_lesson_datetime
 
 
-def _student_has_overlap(student_id: int, start_dt: datetime, duration_min: int, exclude_lesson_id: int | None = None) -> bool:
-    if not student_id or not start_dt or not duration_min:
-        return False
-    end_dt = start_dt + timedelta(minutes=duration_min)
-
-    day_start = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-    day_end = day_start + timedelta(days=1)
-
-    q = Lesson.query.filter(
-        Lesson.student_id == student_id,
-        Lesson.lesson_date >= day_start,
-        Lesson.lesson_date < day_end
-    )
-    if exclude_lesson_id:
-        q = q.filter(Lesson.lesson_id != exclude_lesson_id)
-
-    candidates = q.all()
-    for l in candidates:
-        l_start = l.lesson_date
-        l_end = l.lesson_date + timedelta(minutes=int(l.duration or 60))
-        if (l_start < end_dt) and (start_dt < l_end):
-            return True
-
-    return False
-
-
-def _tutor_has_overlap(tutor_user_id: int, start_dt: datetime, duration_min: int, exclude_lesson_id: int | None = None) -> bool:
+def _tutor_conflict_scope(allowed_student_ids: list[int] | None) -> list[int] | None:
     """
-    Проверка пересечения по преподавателю (чтобы не поставить 2 урока одновременно).
-    Работает по области видимости тьютора (через Enrollment→scope→student_ids→Student.student_id).
+    Область преподавателя для проверки пересечений (чтобы не поставить 2 урока одновременно).
+    None — не проверяем: не тьютор или admin/creator (scope без ограничений).
     """
-    if not tutor_user_id or not start_dt or not duration_min:
-        return False
-    end_dt = start_dt + timedelta(minutes=duration_min)
-
-    # ограничим поиском дня
-    day_start = start_dt.replace(hour=0, minute=0, second=0, microsecond=0)
-    day_end = day_start + timedelta(days=1)
+    if not current_user.is_tutor() or not allowed_student_ids:
+        return None
+    return allowed_student_ids
 
-    # tutor scope -> Student.student_id
-    allowed_student_ids = _resolve_accessible_student_ids_for_current_user()
-    if allowed_student_ids is None:
-        # admin/creator — не проверяем
-        return False
-    if not allowed_student_ids:
-        return False
 
-    q = Lesson.query.filter(
-        Lesson.student_id.in_(allowed_student_ids),
-        Lesson.lesson_date >= day_start,
-        Lesson.lesson_date < day_end
+def _find_schedule_conflict(student_id: int, start_dt: datetime, duration_min: int, exclude_lesson_id: int | None = None) -> str | None:
+    """Разовая проверка слота: один range-запрос по ученику и области преподавателя."""
+    if not student_id or not start_dt or not duration_min:
+        return None
+    allowed = _resolve_accessible_student_ids_for_current_user() if current_user.is_tutor() else None
+    index = ScheduleConflictIndex.load(
+        range_start=start_dt,
+        range_end=start_dt + timedelta(minutes=int(duration_min)),
+        student_ids=[student_id],
+        tutor_student_ids=_tutor_conflict_scope(allowed),
     )
-    if exclude_lesson_id:
-        q = q.filter(Lesson.lesson_id != exclude_lesson_id)
+    return index.conflict(student_id, start_dt, duration_min, exclude_lesson_id=exclude_lesson_id)
+
 
-    candidates = q.all()
-    for l in candidates:
-        l_start = l.lesson_date
-        l_end = l.lesson_date + timedelta(minutes=int(l.duration or 60))
-        if (l_start < end_dt) and (start_dt < l_end):
-            return True
-    return False
+_CONFLICT_ERRORS = {
+    'student': 'Есть пересечение по времени для этого ученика',
+    'tutor': 'У вас уже есть урок в это время',
+}
 
 @schedule_bp.route('/schedule')
 @login_required
@@ -578,25 +513,32 @@ def schedule_create_lesson():
         else:
             lessons_to_create = 1
 
+        # Все недели повтора проверяем по одному индексу (один запрос на весь диапазон)
+        conflict_index = ScheduleConflictIndex.load(
+            range_start=base_lesson_datetime,
+            range_end=base_lesson_datetime + timedelta(weeks=lessons_to_create - 1, minutes=duration),
+            student_ids=[student_id],
+            tutor_student_ids=_tutor_conflict_scope(allowed_student_ids),
+        )
+
         created_lessons = []
         for week_offset in range(lessons_to_create):
             lesson_datetime = base_lesson_datetime + timedelta(weeks=week_offset)
-            
-            if _student_has_overlap(student_id, lesson_datetime, duration):
+
+            conflict = conflict_index.conflict(student_id, lesson_datetime, duration)
+            if conflict == 'student':
                 logger.warning(
                     f"Пересечение уроков: student_id={student_id}, "
                     f"start={lesson_datetime}, duration={duration}. Пропускаем."
                 )
                 continue
-
-            # Пересечение по преподавателю (только для тьютора)
-            if current_user.is_tutor() and _tutor_has_overlap(current_user.id, lesson_datetime, duration):
+            if conflict == 'tutor':
                 logger.warning(
                     f"Пересечение уроков у преподавателя: tutor_id={current_user.id}, "
                     f"start={lesson_datetime}, duration={duration}. Пропускаем."
                 )
                 continue
-            
+
             new_lesson = Lesson(
                 student_id=student_id,
                 lesson_date=lesson_datetime,
@@ -606,6 +548,7 @@ def schedule_create_lesson():
             )
             db.session.add(new_lesson)
             created_lessons.append(new_lesson)
+            conflict_index.reserve(student_id, lesson_datetime, duration)
 
         try:
             db.session.commit()
@@ -729,10 +672,9 @@ def schedule_reschedule_lesson(lesson_id: int):
         return jsonify({'success': False, 'error': f'Ошибка формата даты/времени: {e}'}), 400
 
     duration = int(lesson.duration or 60)
-    if _student_has_overlap(lesson.student_id, new_dt, duration, exclude_lesson_id=lesson.lesson_id):
-        return jsonify({'success': False, 'error': 'Есть пересечение по времени для этого ученика'}), 409
-    if current_user.is_tutor() and _tutor_has_overlap(current_user.id, new_dt, duration, exclude_lesson_id=lesson.lesson_id):
-        return jsonify({'success': False, 'error': 'У вас уже есть урок в это время'}), 409
+    conflict = _find_schedule_conflict(lesson.student_id, new_dt, duration, exclude_lesson_id=lesson.lesson_id)
+    if conflict:
+        return jsonify({'success': False, 'error': _CONFLICT_ERRORS[conflict]}), 409
 
     try:
         old_dt = lesson.lesson_date
@@ -858,10 +800,9 @@ def schedule_update_lesson(lesson_id: int):
     check_duration = duration if duration is not None else (lesson.duration or 60)
     
     if new_lesson_date is not None or duration is not None:
-        if _student_has_overlap(lesson.student_id, check_date, check_duration, exclude_lesson_id=lesson.lesson_id):
-            return jsonify({'success': False, 'error': 'Есть пересечение по времени для этого ученика'}), 409
-        if current_user.is_tutor() and _tutor_has_overlap(current_user.id, check_date, check_duration, exclude_lesson_id=lesson.lesson_id):
-            return jsonify({'success': False, 'error': 'У вас уже есть урок в это время'}), 409
+        conflict = _find_schedule_conflict(lesson.student_id, check_date, check_duration, exclude_lesson_id=lesson.lesson_id)
+        if conflict:
+            return jsonify({'success': False, 'error': _CONFLICT_ERRORS[conflict]}), 409
 
     try:
         old = {
@@ -1019,60 +960,12 @@ def schedule_export_ics():
         return redirect(url_for('schedule.schedule'))
 
     # Экспортируем в выбранной таймзоне (как в UI), чтобы Google Calendar не "раскидывал" события.
-    tz_param = (request.args.get('timezone') or '').strip().lower()
-    if tz_param not in ('moscow', 'tomsk'):
-        tz_param = 'moscow'
-    export_tz = TOMSK_TZ if tz_param == 'tomsk' else MOSCOW_TZ
-    export_tzid = 'Asia/Tomsk' if tz_param == 'tomsk' else 'Europe/Moscow'
-
-    # диапазон: от сегодня-14 до сегодня+60
-    today = moscow_now().date()
-    start_dt = datetime.combine(today - timedelta(days=14), time.min)
-    end_dt = datetime.combine(today + timedelta(days=60), time.max)
-
-    q = Lesson.query.filter(Lesson.lesson_date >= start_dt, Lesson.lesson_date <= end_dt).options(db.joinedload(Lesson.student)).order_by(Lesson.lesson_date.asc())
-    allowed = _resolve_accessible_student_ids_for_current_user()
-    if allowed is not None:
-        if not allowed:
-            q = q.filter(False)
-        else:
-            q = q.filter(Lesson.student_id.in_(allowed))
-
-    lessons = q.all()
-    lines = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        "PRODID:-//BlackNeon//Schedule//RU",
-        "CALSCALE:GREGORIAN",
-        "METHOD:PUBLISH",
-        f"X-WR-TIMEZONE:{export_tzid}",
-    ]
-    for l in lessons:
-        if not l.student:
-            continue
-        dt_start_local = _dt_to_ics_local(l.lesson_date, export_tz)
-        dt_end_local = _dt_to_ics_local(l.lesson_date + timedelta(minutes=int(l.duration or 60)), export_tz)
-        summary = f"Урок: {l.student.name}"
-        if l.topic:
-            summary = f"{summary} · {l.topic}"
-        uid = f"lesson-{l.lesson_id}@black-neon"
-        lines.extend([
-            "BEGIN:VEVENT",
-            f"UID:{uid}",
-            f"DTSTAMP:{_dt_to_ics_utc(moscow_now().replace(tzinfo=None))}",
-            f"DTSTART;TZID={export_tzid}:{dt_start_local}",
-            f"DTEND;TZID={export_tzid}:{dt_end_local}",
-            f"SUMMARY:{summary}",
-            "END:VEVENT",
-        ])
-    lines.append("END:VCALENDAR")
-    ics = "\r\n".join(lines) + "\r\n"
-
-    from flask import Response
-    return Response(
-        ics,
-        mimetype="text/calendar; charset=utf-8",
-        headers={"Content-Disposition": "attachment; filename=\"schedule.ics\""},
+    # Тело кешируется по версии расписания, повторный запрос с If-None-Match получает 304.
+    return ics_feed_response(
+        user_id=current_user.id,
+        resolve_allowed_student_ids=_resolve_accessible_student_ids_for_current_user,
+        tz_param=request.args.get('timezone'),
+        download_name='schedule.ics',
     )
 
 
@@ -1089,57 +982,12 @@ def schedule_export_ics_by_token(token: str):
         from flask import abort
         abort(404)
 
-    tz_param = (request.args.get('timezone') or '').strip().lower()
-    if tz_param not in ('moscow', 'tomsk'):
-        tz_param = 'moscow'
-    export_tz = TOMSK_TZ if tz_param == 'tomsk' else MOSCOW_TZ
-    export_tzid = 'Asia/Tomsk' if tz_param == 'tomsk' else 'Europe/Moscow'
-
-    # диапазон: от сегодня-14 до сегодня+60
-    today = moscow_now().date()
-    start_dt = datetime.combine(today - timedelta(days=14), time.min)
-    end_dt = datetime.combine(today + timedelta(days=60), time.max)
-
-    q = Lesson.query.filter(Lesson.lesson_date >= start_dt, Lesson.lesson_date <= end_dt).options(db.joinedload(Lesson.student)).order_by(Lesson.lesson_date.asc())
-    allowed = _resolve_accessible_student_ids_for_user(user)
-    if allowed is not None:
-        if not allowed:
-            q = q.filter(False)
-        else:
-            q = q.filter(Lesson.student_id.in_(allowed))
-
-    lessons = q.all()
-    lines = [
-        "BEGIN:VCALENDAR",
-        "VERSION:2.0",
-        "PRODID:-//BlackNeon//Schedule//RU",
-        "CALSCALE:GREGORIAN",
-        "METHOD:PUBLISH",
-        f"X-WR-TIMEZONE:{export_tzid}",
-    ]
-    for l in lessons:
-        if not l.student:
-            continue
-        dt_start_local = _dt_to_ics_local(l.lesson_date, export_tz)
-        dt_end_local = _dt_to_ics_local(l.lesson_date + timedelta(minutes=int(l.duration or 60)), export_tz)
-        summary = f"Урок: {l.student.name}"
-        if l.topic:
-            summary = f"{summary} · {l.topic}"
-        uid = f"lesson-{l.lesson_id}@black-neon"
-        lines.extend([
-            "BEGIN:VEVENT",
-            f"UID:{uid}",
-            f"DTSTAMP:{_dt_to_ics_utc(moscow_now().replace(tzinfo=None))}",
-            f"DTSTART;TZID={export_tzid}:{dt_start_local}",
-            f"DTEND;TZID={export_tzid}:{dt_end_local}",
-            f"SUMMARY:{summary}",
-            "END:VEVENT",
-        ])
-    lines.append("END:VCALENDAR")
-    ics = "\r\n".join(lines) + "\r\n"
-
-    from flask import Response
-    return Response(ics, mimetype="text/calendar; charset=utf-8")
+    # Календарные клиенты опрашивают этот URL часто: 304 по ETag без загрузки уроков
+    return ics_feed_response(
+        user_id=user.id,
+        resolve_allowed_student_ids=lambda: _resolve_accessible_student_ids_for_user(user),
+        tz_param=request.args.get('timezone'),
+    )
 
 
 @schedule_bp.route('/schedule/ics-token/regenerate', methods=['POST'])
@@ -1359,47 +1207,66 @@ def schedule_templates_apply_week():
     if not (current_user.is_admin() or current_user.is_creator()):
         q = q.filter(RecurringLessonSlot.owner_user_id == current_user.id)
     templates = q.all()
+    if not templates:
+        return jsonify({'success': True, 'created_lessons': []}), 200
 
-    created_payload = []
+    # Кандидаты недели в порядке времени (sorted sweep): каждый проверяется по индексу,
+    # куда уже добавлены существующие уроки и принятые ранее кандидаты.
+    candidates = []
     for t in templates:
         day = week_start + timedelta(days=int(t.weekday))
-        dt = _parse_local_datetime(day.strftime('%Y-%m-%d'), t.time_hhmm, t.timezone)
-
-        # не создавать, если уже есть урок в этот момент (с точностью +/- 1 мин)
-        exists = Lesson.query.filter(
-            Lesson.student_id == t.student_id,
-            Lesson.lesson_date >= (dt - timedelta(minutes=1)),
-            Lesson.lesson_date <= (dt + timedelta(minutes=1)),
-        ).first()
-        if exists:
+        try:
+            dt = _parse_local_datetime(day.strftime('%Y-%m-%d'), t.time_hhmm, t.timezone)
+        except Exception:
             continue
-
-        # пересечения
-        if _student_has_overlap(t.student_id, dt, int(t.duration or 60)):
+        candidates.append((dt, t))
+    candidates.sort(key=lambda item: (item[0], item[1].student_id))
+
+    range_start = datetime.combine(week_start, time.min) - timedelta(days=1)
+    range_end = datetime.combine(week_end, time.min) + timedelta(days=2)
+    conflict_index = ScheduleConflictIndex.load(
+        range_start=range_start,
+        range_end=range_end,
+        student_ids={t.student_id for t in templates},
+        tutor_student_ids=_tutor_conflict_scope(allowed),
+    )
+    students_by_id = {
+        s.student_id: s
+        for s in Student.query.filter(Student.student_id.in_({t.student_id for t in templates})).all()
+    }
+
+    new_lessons = []
+    for dt, t in candidates:
+        st = students_by_id.get(t.student_id)
+        if not st:
             continue
-        if current_user.is_tutor() and _tutor_has_overlap(current_user.id, dt, int(t.duration or 60)):
+        duration = int(t.duration or 60)
+        # пересечения (в т.ч. урок уже стоит в этот момент) — пропускаем
+        if conflict_index.conflict(t.student_id, dt, duration):
             continue
-
-        l = Lesson(
+        conflict_index.reserve(t.student_id, dt, duration)
+        new_lessons.append((Lesson(
             student_id=t.student_id,
             lesson_date=dt,
-            duration=int(t.duration or 60),
+            duration=duration,
             lesson_type=t.lesson_type,
             status='planned'
-        )
-        db.session.add(l)
-        try:
-            db.session.flush()
-        except Exception:
-            db.session.rollback()
-            continue
+        ), st))
+
+    # Одна транзакция: все уроки вставляются одним flush (id нужны для payload), затем commit
+    try:
+        db.session.add_all([l for l, _ in new_lessons])
+        db.session.flush()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        # payload для отрисовки на фронте (в выбранной таймзоне интерфейса)
-        display_tz = TOMSK_TZ if (data.get('timezone') or 'moscow') == 'tomsk' else MOSCOW_TZ
+    # payload для отрисовки на фронте (в выбранной таймзоне интерфейса);
+    # собираем до commit, чтобы не перечитывать каждый объект после expire
+    display_tz = TOMSK_TZ if (data.get('timezone') or 'moscow') == 'tomsk' else MOSCOW_TZ
+    created_payload = []
+    for l, st in new_lessons:
         dt_display = l.lesson_date.replace(tzinfo=MOSCOW_TZ).astimezone(display_tz)
-        st = Student.query.get(t.student_id)
-        if not st:
-            continue
         created_payload.append({
             'lesson_id': l.lesson_id,
             'student': st.name,
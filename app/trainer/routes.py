@@ -1,11 +1,13 @@
 from __future__ import annotations
 
+import json
 import logging
 import os
+import time
 from urllib.parse import urlencode
 from typing import Any
 
-from flask import render_template, request, abort, jsonify
+from flask import render_template, request, abort, jsonify, Response, stream_with_context
 from flask_login import login_required, current_user
 
 from app.trainer import trainer_bp
@@ -13,6 +15,7 @@ from app.auth.rbac_utils import has_permission
 from app.auth.permissions import ALL_PERMISSIONS
 from app.models import db, User, Tasks, Student, Lesson, LessonTask, TrainerSession, StudentTaskSeen, AuditLog, TrainerLlmLog, moscow_now
 from app.utils.trainer_tokens import issue_trainer_token, verify_trainer_token, TrainerTokenError
+from app.utils.task_catalog import task_stats_response
 from core.audit_logger import audit_logger
 from app import csrf
 
@@ -69,7 +72,8 @@ def _task_to_payload(task: Tasks) -> dict[str, Any] | None:
         'task_number': task.task_number,
         'site_task_id': task.site_task_id,
         'source_url': task.source_url,
-        'content_html': task.content_html,
+        # Предрассчитанный при сохранении вариант (ленивые картинки с размерами, без служебной разметки)
+        'content_html': task.rendered_html,
         'answer': task.answer,
         'attached_files': task.attached_files,
     }
@@ -234,7 +238,6 @@ def trainer_llm_ping():
     user = _get_trainer_user_from_token(require_permission='trainer.use')
     try:
         from trainer_app.llm.providers import get_llm_client, get_llm_info
-        import time
 
         started = time.time()
         info = get_llm_info()
@@ -247,6 +250,7 @@ def trainer_llm_ping():
             messages=[{'role': 'system', 'content': 'Answer with a single word OK.'}, {'role': 'user', 'content': 'ping'}],
             temperature=0.0,
             max_tokens=5,
+            use_cache=False,  # ping проверяет доступность провайдера, кеш здесь не нужен
         )
         duration_ms = int((time.time() - started) * 1000)
         # Store to DB (best-effort)
@@ -335,9 +339,10 @@ def trainer_llm_chat():
     except Exception:
         task_type = None
 
+    # stream=true или Accept: text/event-stream — ответ по мере генерации (SSE)
+    stream = bool(data.get('stream')) or 'text/event-stream' in (request.headers.get('Accept') or '')
     try:
         from trainer_app.llm.providers import get_llm_client, get_llm_info
-        import time
 
         info = get_llm_info()
         llm = get_llm_client()
@@ -345,82 +350,121 @@ def trainer_llm_chat():
             _audit_log_token_user(user, action='trainer_llm_chat', status='error', metadata={'error': 'not_configured', 'llm': info})
             return jsonify({'success': False, 'error': 'not_configured', 'llm': info}), 400
 
+        if stream:
+            return _trainer_llm_chat_stream(
+                user=user, llm=llm, info=info, messages=messages, temperature=temperature,
+                max_tokens=max_tokens, task_id=task_id, task_type=task_type,
+            )
+
         started = time.time()
         answer = llm.chat(messages=messages, temperature=temperature, max_tokens=max_tokens)
         duration_ms = int((time.time() - started) * 1000)
+        _finish_llm_chat(user=user, info=info, messages=messages, max_tokens=max_tokens,
+                         task_id=task_id, task_type=task_type, answer=answer, duration_ms=duration_ms)
+        return jsonify({'success': True, 'answer': (answer or ''), 'llm': info, 'duration_ms': duration_ms})
+    except Exception as e:
+        _fail_llm_chat(user=user, messages=messages, task_id=task_id, task_type=task_type, error=e)
+        return jsonify({'success': False, 'error': str(e)}), 500
 
-        # Store to DB (best-effort)
-        try:
-            picked = (info.get('picked') or {}) if isinstance(info, dict) else {}
-            st = _map_user_to_student(user) if getattr(user, 'role', None) == 'student' else None
-            ans_txt = (answer or '')
-            if isinstance(ans_txt, str) and len(ans_txt) > 12000:
-                ans_txt = ans_txt[:12000] + ' …'
-            rec = TrainerLlmLog(
-                user_id=user.id,
-                student_id=(st.student_id if st else None),
-                task_id=task_id,
-                task_type=task_type,
-                request_kind='chat',
-                provider=(picked.get('provider') if isinstance(picked, dict) else None),
-                model=(picked.get('model') if isinstance(picked, dict) else None),
-                messages=messages,
-                answer=ans_txt if isinstance(ans_txt, str) else None,
-                error=None,
-                duration_ms=duration_ms,
-            )
-            db.session.add(rec)
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
 
-        _audit_log_token_user(
-            user,
-            action='trainer_llm_chat',
-            status='success',
-            metadata={
-                'llm': info,
-                'messages_count': len(messages),
-                'chars_in': sum(len(m.get('content') or '') for m in messages),
-                'max_tokens': max_tokens,
-            },
+def _store_llm_chat_log(*, user: User, info: dict[str, Any] | None, messages: list[dict[str, str]],
+                        task_id: int | None, task_type: int | None, answer: str | None,
+                        error: str | None, duration_ms: int | None) -> None:
+    """Запись TrainerLlmLog (best-effort)."""
+    try:
+        picked = (info.get('picked') or {}) if isinstance(info, dict) else {}
+        st = _map_user_to_student(user) if getattr(user, 'role', None) == 'student' else None
+        ans_txt = answer
+        if isinstance(ans_txt, str) and len(ans_txt) > 12000:
+            ans_txt = ans_txt[:12000] + ' …'
+        rec = TrainerLlmLog(
+            user_id=user.id,
+            student_id=(st.student_id if st else None),
+            task_id=task_id,
+            task_type=task_type,
+            request_kind='chat',
+            provider=(picked.get('provider') if isinstance(picked, dict) else None),
+            model=(picked.get('model') if isinstance(picked, dict) else None),
+            messages=messages,
+            answer=ans_txt if isinstance(ans_txt, str) else None,
+            error=error,
             duration_ms=duration_ms,
         )
-        return jsonify({'success': True, 'answer': (answer or ''), 'llm': info, 'duration_ms': duration_ms})
-    except Exception as e:
-        # Store error (best-effort)
-        try:
-            info2 = None
-            try:
-                from trainer_app.llm.providers import get_llm_info as _info
-                info2 = _info()
-            except Exception:
-                info2 = None
-            picked = (info2.get('picked') or {}) if isinstance(info2, dict) else {}
-            st = _map_user_to_student(user) if getattr(user, 'role', None) == 'student' else None
-            rec = TrainerLlmLog(
-                user_id=user.id,
-                student_id=(st.student_id if st else None),
-                task_id=task_id,
-                task_type=task_type,
-                request_kind='chat',
-                provider=(picked.get('provider') if isinstance(picked, dict) else None),
-                model=(picked.get('model') if isinstance(picked, dict) else None),
-                messages=messages,
-                answer=None,
-                error=str(e)[:4000],
-                duration_ms=None,
-            )
-            db.session.add(rec)
-            db.session.commit()
-        except Exception:
-            db.session.rollback()
+        db.session.add(rec)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+
+
+def _finish_llm_chat(*, user: User, info: dict[str, Any], messages: list[dict[str, str]], max_tokens: int,
+                     task_id: int | None, task_type: int | None, answer: str | None, duration_ms: int,
+                     first_token_ms: int | None = None) -> None:
+    _store_llm_chat_log(user=user, info=info, messages=messages, task_id=task_id, task_type=task_type,
+                        answer=(answer or ''), error=None, duration_ms=duration_ms)
+    metadata = {
+        'llm': info,
+        'messages_count': len(messages),
+        'chars_in': sum(len(m.get('content') or '') for m in messages),
+        'max_tokens': max_tokens,
+    }
+    if first_token_ms is not None:
+        metadata['stream'] = True
+        metadata['first_token_ms'] = first_token_ms
+    _audit_log_token_user(user, action='trainer_llm_chat', status='success', metadata=metadata, duration_ms=duration_ms)
+
+
+def _fail_llm_chat(*, user: User, messages: list[dict[str, str]], task_id: int | None,
+                   task_type: int | None, error: Exception) -> None:
+    info = None
+    try:
+        from trainer_app.llm.providers import get_llm_info as _info
+        info = _info()
+    except Exception:
+        info = None
+    _store_llm_chat_log(user=user, info=info, messages=messages, task_id=task_id, task_type=task_type,
+                        answer=None, error=str(error)[:4000], duration_ms=None)
+    try:
+        _audit_log_token_user(user, action='trainer_llm_chat', status='error', metadata={'error': str(error)[:500]})
+    except Exception:
+        pass
+
 
+def _sse(event: str, payload: dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _trainer_llm_chat_stream(*, user: User, llm, info: dict[str, Any], messages: list[dict[str, str]],
+                             temperature: float, max_tokens: int, task_id: int | None, task_type: int | None) -> Response:
+    """
+    SSE-вариант trainer_llm_chat: события `delta` ({"text": ...}) по мере генерации,
+    в конце `done` (полный ответ + метрики) или `error`.
+    """
+    def generate():
+        started = time.time()
+        first_token_ms = None
+        parts: list[str] = []
         try:
-            _audit_log_token_user(user, action='trainer_llm_chat', status='error', metadata={'error': str(e)[:500]})
-        except Exception:
-            pass
-        return jsonify({'success': False, 'error': str(e)}), 500
+            for delta in llm.stream_chat(messages=messages, temperature=temperature, max_tokens=max_tokens):
+                if first_token_ms is None:
+                    first_token_ms = int((time.time() - started) * 1000)
+                parts.append(delta)
+                yield _sse('delta', {'text': delta})
+            answer = ''.join(parts)
+            duration_ms = int((time.time() - started) * 1000)
+            _finish_llm_chat(user=user, info=info, messages=messages, max_tokens=max_tokens, task_id=task_id,
+                             task_type=task_type, answer=answer, duration_ms=duration_ms,
+                             first_token_ms=first_token_ms or duration_ms)
+            yield _sse('done', {'success': True, 'answer': answer, 'llm': info,
+                                'duration_ms': duration_ms, 'first_token_ms': first_token_ms})
+        except Exception as e:
+            _fail_llm_chat(user=user, messages=messages, task_id=task_id, task_type=task_type, error=e)
+            yield _sse('error', {'success': False, 'error': str(e)})
+
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx: не буферизовать поток, иначе первый токен придёт вместе с последним
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @trainer_bp.route('/internal/trainer/task/<int:task_id>', methods=['GET'])
@@ -435,14 +479,7 @@ def trainer_task_get(task_id: int):
 @trainer_bp.route('/internal/trainer/task/stats', methods=['GET'])
 def trainer_task_stats():
     _ = _get_trainer_user_from_token(require_permission='trainer.use')
-    rows = (
-        db.session.query(Tasks.task_number, db.func.count(Tasks.task_id))
-        .group_by(Tasks.task_number)
-        .order_by(Tasks.task_number.asc())
-        .all()
-    )
-    counts = {int(n): int(c) for (n, c) in rows if n is not None}
-    return jsonify({'success': True, 'counts_by_task_number': counts})
+    return task_stats_response()
 
 
 @trainer_bp.route('/internal/trainer/task/stream/start', methods=['POST'])
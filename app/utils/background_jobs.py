@@ -0,0 +1,171 @@
+"""
+Периодические задачи обслуживания, которые раньше выполнялись в before_request.
+
+Все задачи принимают `now` (naive MSK datetime) от часов планировщика,
+поэтому их можно прогонять офлайн с `FakeClock`.
+"""
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Callable, List
+
+from sqlalchemy import delete, text
+
+from app.models import db, Lesson, AuditLog
+from app.utils.env import env_int
+from core.scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+# Прогревы кешей регистрируют модули, которым они нужны (ICS, каталог задач и т.п.)
+_cache_warmers: List[Callable[[datetime], None]] = []
+
+
+def register_cache_warmer(func: Callable[[datetime], None]) -> Callable[[datetime], None]:
+    """Добавляет функцию прогрева кеша в задачу `cache_warmup`. Можно использовать как декоратор."""
+    if func not in _cache_warmers:
+        _cache_warmers.append(func)
+    return func
+
+
+def complete_finished_lessons(now: datetime) -> int:
+    """Переводит запланированные уроки в 'completed', если время окончания прошло."""
+    db_url = str(db.engine.url)
+    try:
+        if 'postgresql' in db_url or 'postgres' in db_url:
+            # lesson_date хранится как naive datetime, считаем что это московское время
+            result = db.session.execute(text("""
+                UPDATE "Lessons"
+                SET status = 'completed', updated_at = :now
+                WHERE status = 'planned'
+                AND (lesson_date + (duration || ' minutes')::interval) <= :now
+            """), {'now': now})
+        else:
+            result = db.session.execute(text("""
+                UPDATE Lessons
+                SET status = 'completed', updated_at = :now
+                WHERE status = 'planned'
+                AND datetime(lesson_date, '+' || duration || ' minutes') <= :now
+            """), {'now': now})
+        updated_count = result.rowcount or 0
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        # Fallback: уроки за последние сутки, сравнение в Python
+        logger.warning(f"Ошибка при массовом обновлении статусов, используем старый метод: {e}")
+        updated_count = 0
+        planned_lessons = Lesson.query.filter(
+            Lesson.status == 'planned',
+            Lesson.lesson_date >= now - timedelta(days=1),
+            Lesson.lesson_date <= now,
+        ).all()
+        for lesson in planned_lessons:
+            lesson_date = lesson.lesson_date.replace(tzinfo=None) if lesson.lesson_date.tzinfo else lesson.lesson_date
+            if lesson_date + timedelta(minutes=lesson.duration or 0) <= now:
+                lesson.status = 'completed'
+                lesson.updated_at = now
+                updated_count += 1
+        if updated_count:
+            db.session.commit()
+
+    if updated_count > 5:
+        logger.info(f"Автоматически обновлено статусов уроков: {updated_count}")
+    return updated_count
+
+
+def fire_due_reminders(now: datetime, batch_size: int = 500) -> int:
+    """
+    Создаёт in-app уведомления по наступившим напоминаниям и помечает их отправленными.
+    Берутся только наступившие за последние REMINDER_FIRE_WINDOW_MINUTES (по умолчанию 60):
+    старые записи никогда не помечались отправленными, и разослать их задним числом нельзя.
+    """
+    from app.notifications.service import notify_user
+    from app.reminders.service import due_reminders
+
+    since = now - timedelta(minutes=max(1, env_int('REMINDER_FIRE_WINDOW_MINUTES', 60)))
+    due = due_reminders(now, limit=batch_size, since=since)
+    if not due:
+        return 0
+
+    for reminder in due:
+        notify_user(
+            reminder.user_id,
+            kind='reminder',
+            title=reminder.title,
+            body=reminder.message,
+            link_url='/reminders',
+            meta={'reminder_id': reminder.reminder_id},
+        )
+        reminder.is_sent = True
+    db.session.commit()
+    return len(due)
+
+
+def purge_old_audit_logs(now: datetime) -> int:
+    """Удаляет записи AuditLog старше AUDIT_RETENTION_DAYS (по умолчанию 90 дней, 0 — не удалять)."""
+    retention_days = env_int('AUDIT_RETENTION_DAYS', 90)
+    if retention_days <= 0:
+        return 0
+    cutoff = now - timedelta(days=retention_days)
+    result = db.session.execute(delete(AuditLog).where(AuditLog.timestamp < cutoff))
+    db.session.commit()
+    deleted = result.rowcount or 0
+    if deleted:
+        logger.info(f"Audit retention: удалено {deleted} записей старше {cutoff:%Y-%m-%d}")
+    return deleted
+
+
+def warm_caches(now: datetime) -> int:
+    """Вызывает зарегистрированные прогревы кешей; ошибка одного не мешает остальным."""
+    warmed = 0
+    for warmer in list(_cache_warmers):
+        try:
+            warmer(now)
+            warmed += 1
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Cache warmer {getattr(warmer, '__name__', warmer)} failed: {e}")
+    return warmed
+
+
+def register_maintenance_jobs(target=None):
+    """Регистрирует стандартный набор задач в планировщике (интервалы настраиваются через env)."""
+    target = target or scheduler
+    target.register('lesson_status', complete_finished_lessons, env_int('SCHEDULER_LESSON_STATUS_INTERVAL', 60))
+    target.register('reminders', fire_due_reminders, env_int('SCHEDULER_REMINDERS_INTERVAL', 60))
+    target.register('audit_retention', purge_old_audit_logs, env_int('SCHEDULER_AUDIT_RETENTION_INTERVAL', 6 * 3600))
+    target.register('cache_warmup', warm_caches, env_int('SCHEDULER_CACHE_WARMUP_INTERVAL', 300))
+    from app.assignments.counters import reconcile_job
+    target.register('assignment_counters', reconcile_job, env_int('SCHEDULER_ASSIGNMENT_COUNTERS_INTERVAL', 6 * 3600))
+    # Добор очереди автопроверки: задания без воркеров (GRADING_MODE=off) и с истёкшей арендой
+    from app.assignments.grading import drain_grading_queue
+    target.register('grading_queue', drain_grading_queue, env_int('SCHEDULER_GRADING_INTERVAL', 30))
+    # Варианты показа заданий для строк без них или со старой версией рендера (импортом ставятся и ORM-события)
+    from app.utils.task_variants import render_stale_tasks
+    target.register('task_render', render_stale_tasks, env_int('SCHEDULER_TASK_RENDER_INTERVAL', 600))
+    # Плановый бэкап по умолчанию выключен (0); при включении первый запуск — через интервал
+    backup_interval = env_int('SCHEDULER_BACKUP_INTERVAL', 0)
+    if backup_interval > 0:
+        from app.utils.db_backup import scheduled_backup
+        target.register('db_backup', scheduled_backup, backup_interval, run_immediately=False)
+    return target
+
+
+def init_scheduler(app):
+    """
+    Подключает планировщик к приложению.
+
+    SCHEDULER_MODE:
+    - inprocess (по умолчанию): поток в каждом воркере, задачи выполняет только лидер;
+    - sidecar: в веб-процессах планировщик не стартует, его запускает scripts/run_scheduler.py;
+    - off: не запускать вовсе.
+    """
+    scheduler.init_app(app)
+    register_maintenance_jobs(scheduler)
+
+    mode = (os.environ.get('SCHEDULER_MODE') or 'inprocess').strip().lower()
+    if mode == 'inprocess':
+        scheduler.start_worker()
+    else:
+        logger.info(f"JobScheduler not started in web process (SCHEDULER_MODE={mode})")
+    return scheduler
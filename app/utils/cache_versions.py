@@ -0,0 +1,201 @@
+"""
+Версии наборов данных (CacheVersions) для инвалидации кешей между воркерами.
+
+`track_model_changes(Model, 'task_bank')` подписывает ORM-события: при insert/update/delete
+объектов модели в той же транзакции выполняется `version = version + 1`.
+Поэтому кеши, ключ которых содержит версию, сбрасываются сразу во всех процессах,
+а проверка актуальности — одно чтение строки по первичному ключу.
+
+Версия может быть и на объект-владельца: `track_model_changes(Lesson, 'schedule:student:{}',
+key_attrs=('student_id',))` поднимает только счётчики затронутых учеников (старого и нового
+значения ключа). Так параллельные записи про разных владельцев не ждут блокировку одной строки.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import event, func, insert, inspect as sa_inspect, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.models import db, CacheVersion, moscow_now
+
+logger = logging.getLogger(__name__)
+
+# model class -> [(version name | шаблон имени, attrs | None, key_attrs | None, bulk name | None)]
+_tracked: dict[type, list[tuple[str, frozenset | None, tuple | None, str | None]]] = {}
+_listeners_installed = False
+# Сколько раз версия поднималась в этом процессе — позволяет in-memory кешам
+# видеть свои изменения сразу, не перечитывая CacheVersions на каждый запрос
+_local_bumps: dict[str, int] = {}
+
+
+def _now_naive() -> datetime:
+    now = moscow_now()
+    return now.replace(tzinfo=None) if now.tzinfo else now
+
+
+def get_version(name: str) -> tuple[int, datetime | None]:
+    """(version, updated_at) набора; (0, None), если счётчик ещё не создавался."""
+    row = db.session.get(CacheVersion, name)
+    if row is None:
+        return 0, None
+    return int(row.version or 0), row.updated_at
+
+
+def get_version_sum(names: Iterable[str] = (), prefixes: Iterable[str] = ()) -> tuple[int, datetime | None]:
+    """
+    (сумма версий, последнее изменение) по набору счётчиков — одним запросом.
+    Версии только растут, поэтому сумма меняется при любом bump любого счётчика набора.
+    """
+    names, prefixes = list(names), list(prefixes)
+    conditions = [CacheVersion.name.like(f'{prefix}%') for prefix in prefixes]
+    if names:
+        conditions.append(CacheVersion.name.in_(names))
+    if not conditions:
+        return 0, None
+    total, updated_at = db.session.execute(
+        select(func.coalesce(func.sum(CacheVersion.version), 0), func.max(CacheVersion.updated_at))
+        .where(or_(*conditions))
+    ).one()
+    return int(total or 0), updated_at
+
+
+def local_bump_count(name: str) -> int:
+    return _local_bumps.get(name, 0)
+
+
+def _insert_ignore(connection, name: str, now: datetime) -> None:
+    """Строка счётчика с версией 0; если её уже вставила другая транзакция — ничего не делает."""
+    table = CacheVersion.__table__
+    values = {'name': name, 'version': 0, 'updated_at': now}
+    dialect = connection.dialect.name
+    if dialect == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    elif dialect == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    else:
+        connection.execute(insert(table).values(**values))
+        return
+    connection.execute(dialect_insert(table).values(**values).on_conflict_do_nothing(index_elements=['name']))
+
+
+def bump_version(name: str, connection=None) -> None:
+    """Увеличивает версию набора (в текущей транзакции, без commit)."""
+    _local_bumps[name] = _local_bumps.get(name, 0) + 1
+    conn = connection if connection is not None else db.session.connection()
+    table = CacheVersion.__table__.name
+    params = {'name': name, 'now': _now_naive()}
+    bump = text(f'UPDATE "{table}" SET version = version + 1, updated_at = :now WHERE name = :name')
+    if not conn.execute(bump, params).rowcount:
+        # Первый bump: параллельная транзакция может вставить ту же строку — конфликт не должен
+        # откатить сохранение пользователя (bump идёт внутри его flush), поэтому insert-ignore и UPDATE
+        _insert_ignore(conn, name, params['now'])
+        conn.execute(bump, params)
+
+
+def _changed(obj, attrs: frozenset | None) -> bool:
+    if attrs is None:
+        return True
+    state = sa_inspect(obj)
+    return any(state.attrs[a].history.has_changes() for a in attrs if a in state.attrs)
+
+
+def _old_key_names(obj, name: str, key_attrs: tuple) -> set[str]:
+    """Имена по прежним значениям ключей (объект перенесли другому владельцу)."""
+    state = sa_inspect(obj)
+    return {
+        name.format(value)
+        for attr in key_attrs if attr in state.attrs
+        for value in state.attrs[attr].history.deleted if value is not None
+    }
+
+
+def _collect_bumps(session: Session) -> tuple[set[str], list]:
+    """
+    Имена версий, известные до flush, и (объект, шаблон, key_attrs) — имена по текущим
+    ключам считаются после flush, когда у новых объектов заполнены внешние ключи.
+    """
+    names: set[str] = set()
+    keyed: list = []
+
+    def add(obj, name, key_attrs):
+        if key_attrs is None:
+            names.add(name)
+        else:
+            names.update(_old_key_names(obj, name, key_attrs))
+            keyed.append((obj, name, key_attrs))
+
+    for obj in list(session.new) + list(session.deleted):
+        for name, _attrs, key_attrs, _bulk in _tracked.get(type(obj), ()):
+            add(obj, name, key_attrs)
+    for obj in session.dirty:
+        for name, attrs, key_attrs, _bulk in _tracked.get(type(obj), ()):
+            if (key_attrs is not None or name not in names) and session.is_modified(obj) and _changed(obj, attrs):
+                add(obj, name, key_attrs)
+    return names, keyed
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Session, 'before_flush')
+    def _remember_changes(session, flush_context, instances):
+        # История атрибутов доступна только до flush — запоминаем, какие версии поднять
+        names, keyed = _collect_bumps(session)
+        if names:
+            session.info.setdefault('_cache_version_bumps', set()).update(names)
+        if keyed:
+            session.info.setdefault('_cache_version_keyed', []).extend(keyed)
+
+    @event.listens_for(Session, 'after_flush')
+    def _bump_changed(session, flush_context):
+        names = session.info.pop('_cache_version_bumps', None) or set()
+        for obj, name, key_attrs in session.info.pop('_cache_version_keyed', None) or ():
+            for attr in key_attrs:
+                value = getattr(obj, attr, None)
+                if value is not None:
+                    names.add(name.format(value))
+        if not names:
+            return
+        connection = session.connection()
+        for name in sorted(names):
+            bump_version(name, connection)
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def _bump_bulk(orm_execute_state):
+        # Массовые query.update()/delete() и bulk insert (session.execute(insert(Model), rows)) не проходят через flush
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        mapper = orm_execute_state.bind_mapper
+        model = mapper.class_ if mapper is not None else None
+        # Затронутые строки здесь неизвестны — для версий по владельцу поднимается общий bulk-счётчик
+        for name in sorted({bulk or name for name, _attrs, _key_attrs, bulk in _tracked.get(model, ())}):
+            bump_version(name, orm_execute_state.session.connection())
+
+
+def track_model_changes(model: type, name: str, attrs: Iterable[str] | None = None,
+                        key_attrs: Iterable[str] | None = None, bulk_name: str | None = None) -> None:
+    """
+    Поднимать версию `name` при изменениях `model`.
+    attrs — учитывать update только этих атрибутов (insert/delete учитываются всегда).
+    key_attrs — версия на владельца: `name` — шаблон ('schedule:student:{}'), поднимаются
+    счётчики для старых и новых значений этих атрибутов; массовые операции мимо flush
+    поднимают bulk_name (обязателен вместе с key_attrs).
+    """
+    if key_attrs is not None and not bulk_name:
+        raise ValueError('bulk_name is required with key_attrs')
+    entries = _tracked.setdefault(model, [])
+    entry = (
+        name,
+        frozenset(attrs) if attrs is not None else None,
+        tuple(key_attrs) if key_attrs is not None else None,
+        bulk_name if key_attrs is not None else None,
+    )
+    if entry not in entries:
+        entries.append(entry)
+    _install_listeners()
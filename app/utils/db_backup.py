@@ -0,0 +1,486 @@
+"""
+Резервное копирование базы данных вне пути запроса.
+
+SQLite:
+- копия снимается online backup API (`sqlite3.Connection.backup`) порциями по
+  BACKUP_STEP_PAGES страниц с паузой BACKUP_STEP_PAUSE_MS между шагами — блокировка
+  чтения держится только на время шага, писатели успевают закоммитить между шагами;
+- если источник меняется слишком часто и копия перезапускается больше
+  BACKUP_MAX_RESTARTS раз, докопируем одним шагом (это и есть согласованный снимок);
+- снимок пишется во временный файл, проверяется (`PRAGMA quick_check` + сверка числа
+  строк по таблицам с источником), при необходимости сжимается в .db.gz и только потом
+  переименовывается в итоговое имя;
+- плановый запуск пропускается, если файл не менялся с прошлого снимка
+  (счётчик изменений из заголовка SQLite, не работает в WAL — тогда копируем всегда).
+
+PostgreSQL:
+- все таблицы выгружаются `COPY ... TO STDOUT (FORMAT csv, HEADER)` в одной транзакции
+  REPEATABLE READ READ ONLY, поэтому архив согласован; данные потоково пишутся в zip
+  (tables/<table>.csv + manifest.json с числом строк), проверка перечитывает архив.
+
+Запуск из веба — `start_backup()` (фоновый поток, статус в `get_backup_status()` и файле
+backup_status.json, чтобы его видели все воркеры), плановый — задача `db_backup`
+в планировщике при SCHEDULER_BACKUP_INTERVAL > 0. Хранится BACKUP_KEEP последних копий.
+
+Восстановление SQLite: `gunzip keg_tasks_backup_*.db.gz` и подменить data/keg_tasks.db.
+"""
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+import zipfile
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import text
+
+from app.models import db
+from app.utils.env import env_int
+
+logger = logging.getLogger(__name__)
+
+_base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+SQLITE_PREFIX = 'keg_tasks_backup_'
+POSTGRES_PREFIX = 'keg_pg_backup_'
+_BACKUP_SUFFIXES = ('.db', '.db.gz', '.zip')
+_STATUS_FILE = 'backup_status.json'
+_LOCK_FILE = 'backup.lock'
+# Блокировка старше этого считается оставшейся от упавшего процесса
+_LOCK_STALE_SECONDS = 6 * 3600
+
+
+def backup_dir() -> str:
+    path = os.environ.get('BACKUP_DIR') or os.path.join(_base_dir, 'backups')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class BackupError(Exception):
+    """Снимок не создан или не прошёл проверку."""
+
+
+class BackupInProgress(BackupError):
+    """Другая резервная копия уже выполняется (в этом или другом процессе)."""
+
+
+# ---------------------------------------------------------------------------
+# Статус
+# ---------------------------------------------------------------------------
+
+_STATE_LOCK = threading.Lock()
+_STATE: Dict = {'running': False}
+
+
+def _write_status(state: Dict) -> None:
+    path = os.path.join(backup_dir(), _STATUS_FILE)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(state, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"Не удалось записать статус бэкапа: {e}")
+
+
+def _update_state(**changes) -> None:
+    with _STATE_LOCK:
+        _STATE.update(changes)
+        snapshot = dict(_STATE)
+    _write_status(snapshot)
+
+
+def get_backup_status() -> Dict:
+    """Статус текущего/последнего бэкапа: из памяти процесса, иначе из backup_status.json."""
+    with _STATE_LOCK:
+        if _STATE.get('job_id'):
+            return dict(_STATE)
+    try:
+        with open(os.path.join(backup_dir(), _STATUS_FILE), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'running': False}
+
+
+def _acquire_file_lock(job_id: str) -> bool:
+    path = os.path.join(backup_dir(), _LOCK_FILE)
+    for _attempt in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < _LOCK_STALE_SECONDS:
+                    return False
+                os.remove(path)
+            except OSError:
+                return False
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(f"{os.getpid()}:{job_id}")
+        return True
+    return False
+
+
+def _release_file_lock() -> None:
+    try:
+        os.remove(os.path.join(backup_dir(), _LOCK_FILE))
+    except OSError:
+        pass
+
+
+# ---------------------------------------------------------------------------
+# SQLite
+# ---------------------------------------------------------------------------
+
+class _RestartLimit(Exception):
+    pass
+
+
+def _sqlite_fingerprint(path: str) -> Optional[str]:
+    """
+    Счётчик изменений файла из заголовка SQLite (байты 24 и 92) + число страниц.
+    None — если счётчику нельзя доверять (WAL или старый заголовок).
+    """
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(100)
+    except OSError:
+        return None
+    if len(header) < 100 or header[18] == 2:
+        return None
+    change_counter, page_count = struct.unpack('>II', header[24:32])
+    version_valid_for = struct.unpack('>I', header[92:96])[0]
+    if change_counter != version_valid_for:
+        return None
+    return f"{change_counter}:{page_count}"
+
+
+def _table_counts(conn: sqlite3.Connection) -> Dict[str, int]:
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+    )]
+    return {name: conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0] for name in tables}
+
+
+def _data_version(conn: sqlite3.Connection) -> int:
+    return conn.execute('PRAGMA data_version').fetchone()[0]
+
+
+def copy_sqlite(source_path: str, dest_path: str, step_pages: int = 256, pause_ms: int = 5,
+                max_restarts: int = 3, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """
+    Снимает копию SQLite-файла online backup API и сверяет её с источником.
+    Возвращает {'pages', 'restarts', 'tables', 'rows', 'source_changed'}; BackupError при расхождении.
+    """
+    src = sqlite3.connect(source_path, timeout=30)
+    dst = sqlite3.connect(dest_path)
+    restarts = 0
+    try:
+        state = {'remaining': None}
+
+        def on_step(_status, remaining, total):
+            nonlocal restarts
+            if state['remaining'] is not None and remaining > state['remaining']:
+                # Источник изменился другим соединением — SQLite начал копирование заново
+                restarts += 1
+                if restarts > max_restarts:
+                    raise _RestartLimit()
+            state['remaining'] = remaining
+            if progress is not None:
+                progress(total - remaining, total)
+            if pause_ms > 0 and remaining:
+                time.sleep(pause_ms / 1000.0)
+
+        try:
+            src.backup(dst, pages=max(1, step_pages), progress=on_step)
+        except _RestartLimit:
+            logger.info(f"Бэкап SQLite: источник часто меняется ({restarts} перезапусков), копируем одним шагом")
+            src.backup(dst, pages=-1)
+
+        version_at_copy = _data_version(src)
+        pages = dst.execute('PRAGMA page_count').fetchone()[0]
+
+        check = dst.execute('PRAGMA quick_check').fetchone()[0]
+        if check != 'ok':
+            raise BackupError(f"quick_check снимка: {check}")
+
+        snapshot_counts = _table_counts(dst)
+        src.execute('BEGIN')
+        try:
+            source_counts = _table_counts(src)
+        finally:
+            src.execute('COMMIT')
+        source_changed = _data_version(src) != version_at_copy
+
+        mismatched = sorted(name for name in set(snapshot_counts) | set(source_counts)
+                            if snapshot_counts.get(name) != source_counts.get(name))
+        if mismatched and not source_changed:
+            details = ', '.join(f"{name}: {snapshot_counts.get(name)} != {source_counts.get(name)}"
+                                for name in mismatched[:5])
+            raise BackupError(f"Число строк снимка не совпадает с источником ({details})")
+        return {
+            'pages': pages,
+            'restarts': restarts,
+            'tables': len(snapshot_counts),
+            'rows': sum(snapshot_counts.values()),
+            # Источник успели изменить после снимка — расхождение в числе строк ожидаемо
+            'source_changed': bool(mismatched) and source_changed,
+        }
+    finally:
+        dst.close()
+        src.close()
+
+
+def _gzip_file(source: str, dest: str) -> None:
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb', compresslevel=6) as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def backup_sqlite(source_path: str, compress: bool = False, skip_unchanged: bool = False,
+                  progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Полный цикл для SQLite: копия -> проверка -> сжатие -> атомарное переименование."""
+    if not os.path.exists(source_path):
+        raise BackupError(f"Файл базы данных не найден: {source_path}")
+    directory = backup_dir()
+    fingerprint = _sqlite_fingerprint(source_path)
+    if skip_unchanged and fingerprint is not None and fingerprint == _last_fingerprint():
+        return {'skipped': True, 'fingerprint': fingerprint}
+
+    filename = f"{SQLITE_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+    if compress:
+        filename += '.gz'
+    final_path = os.path.join(directory, filename)
+    tmp_db = os.path.join(directory, f".{uuid.uuid4().hex}.db.partial")
+    tmp_gz = f"{tmp_db}.gz"
+    try:
+        result = copy_sqlite(
+            source_path, tmp_db,
+            step_pages=env_int('BACKUP_STEP_PAGES', 256),
+            pause_ms=env_int('BACKUP_STEP_PAUSE_MS', 5),
+            max_restarts=env_int('BACKUP_MAX_RESTARTS', 3),
+            progress=progress,
+        )
+        if compress:
+            _gzip_file(tmp_db, tmp_gz)
+            os.replace(tmp_gz, final_path)
+        else:
+            os.replace(tmp_db, final_path)
+    finally:
+        for leftover in (tmp_db, tmp_gz):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+    result.update({
+        'filename': filename,
+        'path': final_path,
+        'size': os.path.getsize(final_path),
+        'fingerprint': fingerprint,
+    })
+    return result
+
+
+def _last_fingerprint() -> Optional[str]:
+    status = get_backup_status()
+    last = status.get('last_success') or {}
+    return last.get('fingerprint')
+
+
+# ---------------------------------------------------------------------------
+# PostgreSQL
+# ---------------------------------------------------------------------------
+
+def _postgres_tables(conn) -> List[str]:
+    """Таблицы схемы public: сначала в порядке зависимостей моделей, затем остальные по имени."""
+    names = [row[0] for row in conn.execute(text(
+        "SELECT tablename FROM pg_tables WHERE schemaname = 'public' ORDER BY tablename"
+    ))]
+    known = [table.name for table in db.metadata.sorted_tables if table.name in names]
+    return known + [name for name in names if name not in known]
+
+
+def dump_postgres(engine, progress: Optional[Callable[[int, int], None]] = None) -> Dict:
+    """Потоковая выгрузка всех таблиц PostgreSQL в zip (CSV на таблицу) из одного снимка."""
+    filename = f"{POSTGRES_PREFIX}{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    final_path = os.path.join(backup_dir(), filename)
+    tmp_path = os.path.join(backup_dir(), f".{uuid.uuid4().hex}.zip.partial")
+    counts: Dict[str, int] = {}
+    try:
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level='REPEATABLE READ', postgresql_readonly=True)
+            tables = _postgres_tables(conn)
+            raw = conn.connection.dbapi_connection
+            with zipfile.ZipFile(tmp_path, 'w', compression=zipfile.ZIP_DEFLATED, allowZip64=True) as archive:
+                for index, table in enumerate(tables, start=1):
+                    counts[table] = conn.execute(text(f'SELECT COUNT(*) FROM "{table}"')).scalar() or 0
+                    with archive.open(f"tables/{table}.csv", 'w', force_zip64=True) as member:
+                        with raw.cursor() as cursor:
+                            cursor.copy_expert(f'COPY "{table}" TO STDOUT WITH (FORMAT csv, HEADER)', member)
+                    if progress is not None:
+                        progress(index, len(tables))
+                manifest = {
+                    'format': 'keg-pg-dump',
+                    'version': 1,
+                    'created_at': datetime.now().isoformat(),
+                    'tables': counts,
+                }
+                archive.writestr('manifest.json', json.dumps(manifest, ensure_ascii=False, indent=2))
+            conn.rollback()
+        verify_postgres_dump(tmp_path)
+        os.replace(tmp_path, final_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return {
+        'filename': filename,
+        'path': final_path,
+        'size': os.path.getsize(final_path),
+        'tables': len(counts),
+        'rows': sum(counts.values()),
+    }
+
+
+def verify_postgres_dump(path: str) -> Dict[str, int]:
+    """Перечитывает архив и сверяет число строк CSV с manifest.json."""
+    with zipfile.ZipFile(path) as archive:
+        manifest = json.loads(archive.read('manifest.json'))
+        for table, expected in manifest['tables'].items():
+            with archive.open(f"tables/{table}.csv") as member:
+                reader = csv.reader(io.TextIOWrapper(member, encoding='utf-8', newline=''))
+                rows = sum(1 for _row in reader) - 1  # без заголовка
+            if rows != expected:
+                raise BackupError(f"Таблица {table}: в архиве {rows} строк, ожидалось {expected}")
+    return manifest['tables']
+
+
+# ---------------------------------------------------------------------------
+# Ротация и запуск
+# ---------------------------------------------------------------------------
+
+def list_backups() -> List[Dict]:
+    directory = backup_dir()
+    items = []
+    for name in os.listdir(directory):
+        if name.startswith((SQLITE_PREFIX, POSTGRES_PREFIX)) and name.endswith(_BACKUP_SUFFIXES):
+            path = os.path.join(directory, name)
+            items.append({'filename': name, 'size': os.path.getsize(path), 'mtime': os.path.getmtime(path)})
+    # Имя содержит время создания — сортировка по имени внутри префикса, новые первыми
+    items.sort(key=lambda item: (item['filename'].split('_backup_', 1)[-1], item['mtime']), reverse=True)
+    return items
+
+
+def rotate_backups(keep: Optional[int] = None) -> int:
+    """Оставляет `keep` (BACKUP_KEEP, по умолчанию 7) последних копий, остальные удаляет."""
+    keep = env_int('BACKUP_KEEP', 7) if keep is None else keep
+    if keep <= 0:
+        return 0
+    removed = 0
+    for item in list_backups()[keep:]:
+        try:
+            os.remove(os.path.join(backup_dir(), item['filename']))
+            removed += 1
+        except OSError as e:
+            logger.warning(f"Не удалось удалить старую копию {item['filename']}: {e}")
+    return removed
+
+
+def run_backup(compress: Optional[bool] = None, skip_unchanged: bool = False, trigger: str = 'manual') -> Dict:
+    """
+    Снимает резервную копию текущей БД приложения (нужен app context) и обновляет статус.
+    Бросает BackupInProgress, если другая копия ещё выполняется.
+    """
+    job_id = uuid.uuid4().hex[:12]
+    if not _acquire_file_lock(job_id):
+        raise BackupInProgress('Резервное копирование уже выполняется')
+    return _run_locked_backup(job_id, compress, skip_unchanged, trigger)
+
+
+def _run_locked_backup(job_id: str, compress: Optional[bool], skip_unchanged: bool, trigger: str) -> Dict:
+    """Тело run_backup: блокировка уже взята вызывающим, здесь она освобождается."""
+    if compress is None:
+        compress = os.environ.get('BACKUP_COMPRESS', '1').strip().lower() not in ('0', 'false', 'no')
+    try:
+        engine = db.engine
+        backend = engine.url.get_backend_name()
+        previous = get_backup_status().get('last_success')
+        started = time.time()
+        _update_state(running=True, job_id=job_id, trigger=trigger, backend=backend, phase='copy',
+                      started_at=started, finished_at=None, ok=None, error=None,
+                      progress=None, result=None, last_success=previous)
+    except Exception:
+        _release_file_lock()
+        raise
+
+    last_report = [0.0]
+
+    def progress(done: int, total: int) -> None:
+        now = time.time()
+        if now - last_report[0] >= 1.0 or done >= total:
+            last_report[0] = now
+            _update_state(progress={'done': done, 'total': total})
+
+    try:
+        if backend == 'sqlite':
+            source_path = os.path.abspath(engine.url.database)
+            result = backup_sqlite(source_path, compress=compress, skip_unchanged=skip_unchanged,
+                                   progress=progress)
+        elif backend == 'postgresql':
+            result = dump_postgres(engine, progress=progress)
+        else:
+            raise BackupError(f"Резервное копирование для {backend} не поддерживается")
+        if not result.get('skipped'):
+            result['rotated'] = rotate_backups()
+            previous = dict(result, finished_at=time.time())
+        result['duration_ms'] = int((time.time() - started) * 1000)
+        _update_state(running=False, phase='done', ok=True, finished_at=time.time(),
+                      result=result, last_success=previous)
+        if not result.get('skipped'):
+            logger.info(f"Резервная копия создана: {result['filename']} ({result['size']} байт, "
+                        f"{result['duration_ms']} мс)")
+        return result
+    except Exception as e:
+        _update_state(running=False, phase='failed', ok=False, finished_at=time.time(), error=str(e)[:500])
+        logger.error(f"Ошибка при создании резервной копии: {e}", exc_info=True)
+        raise
+    finally:
+        _release_file_lock()
+
+
+def start_backup(app, compress: Optional[bool] = None) -> bool:
+    """
+    Запускает копию в фоновом потоке. Блокировка берётся здесь, в вызывающем потоке, и
+    передаётся воркеру — False, если копия уже выполняется (ответ «запущено» только для
+    копии, которая действительно начнётся).
+    """
+    job_id = uuid.uuid4().hex[:12]
+    if not _acquire_file_lock(job_id):
+        return False
+
+    def worker():
+        with app.app_context():
+            try:
+                _run_locked_backup(job_id, compress, skip_unchanged=False, trigger='manual')
+            except Exception:
+                logger.exception(f"Фоновое резервное копирование {job_id} завершилось с ошибкой")
+
+    try:
+        threading.Thread(target=worker, name='db-backup', daemon=True).start()
+    except Exception:
+        _release_file_lock()
+        raise
+    return True
+
+
+def scheduled_backup(now: datetime) -> int:
+    """Задача планировщика: копия, только если база изменилась с прошлого снимка."""
+    try:
+        result = run_backup(skip_unchanged=True, trigger='scheduled')
+    except BackupInProgress:
+        return 0
+    return 0 if result.get('skipped') else 1
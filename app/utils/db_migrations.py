@@ -22,7 +22,8 @@ from core.db_models import (
     SubmissionAttempt,
     MaterialAsset, LessonMaterialLink, LessonRoomTemplate, RubricTemplate,
     RecurringLessonSlot,
-    TariffPlan, TariffGroup, UserSubscription, TrainerSession, TrainerLlmLog, UserConsent
+    TariffPlan, TariffGroup, UserSubscription, TrainerSession, TrainerLlmLog, UserConsent,
+    SchedulerLock, CacheVersion, ChildDigest, Assignment, AssignmentCounter
 )
 from app.auth.permissions import DEFAULT_ROLE_PERMISSIONS
 
@@ -560,6 +561,86 @@ def ensure_schema_columns(app):
                 except Exception as e:
                     logger.warning(f"Could not create UserConsents table: {e}")
                     db.session.rollback()
+
+            # Фоновый планировщик: строка-аренда лидера
+            if 'SchedulerLocks' not in table_names and 'schedulerlocks' not in table_names:
+                try:
+                    SchedulerLock.__table__.create(db.engine)
+                    logger.info("SchedulerLocks table created")
+                except Exception as e:
+                    logger.warning(f"Could not create SchedulerLocks table: {e}")
+                    db.session.rollback()
+
+            # Версии наборов данных для инвалидации кешей (ICS-фиды и т.п.)
+            if 'CacheVersions' not in table_names and 'cacheversions' not in table_names:
+                try:
+                    CacheVersion.__table__.create(db.engine)
+                    logger.info("CacheVersions table created")
+                except Exception as e:
+                    logger.warning(f"Could not create CacheVersions table: {e}")
+                    db.session.rollback()
+
+            # Сводки по детям для дашборда родителя
+            if 'ChildDigests' not in table_names and 'childdigests' not in table_names:
+                try:
+                    ChildDigest.__table__.create(db.engine)
+                    logger.info("ChildDigests table created")
+                except Exception as e:
+                    logger.warning(f"Could not create ChildDigests table: {e}")
+                    db.session.rollback()
+
+            # Материализованные счётчики сдач по работам: таблицу создаёт create_all,
+            # здесь — первичное заполнение для уже существующих работ
+            try:
+                if (db.session.query(AssignmentCounter.assignment_id).first() is None
+                        and db.session.query(Assignment.assignment_id).first() is not None):
+                    from app.assignments.counters import reconcile_assignment_counters
+                    filled = reconcile_assignment_counters()
+                    logger.info(f"AssignmentCounters backfilled: {filled} rows")
+            except Exception as e:
+                logger.warning(f"Could not backfill AssignmentCounters: {e}")
+                db.session.rollback()
+
+            # Банк заданий: content_hash и индексы по естественным ключам для upsert парсера
+            if _resolve_table_name(table_names, 'Tasks'):
+                try:
+                    from scraper.task_upsert import ensure_task_upsert_schema
+                    ensure_task_upsert_schema(db.session.connection())
+                    db.session.commit()
+                except Exception as e:
+                    logger.warning(f"Could not prepare Tasks for upsert: {e}")
+                    db.session.rollback()
+
+            # Ответы: один на (сдача, задача). Дубли нулевых ответов от повторной автопроверки
+            # схлопываем к самому раннему, затем уникальный индекс
+            answers_table = _resolve_table_name(table_names, 'Answers')
+            if answers_table and 'ux_answers_submission_task' not in {
+                index['name'] for index in inspector.get_indexes(answers_table)
+            }:
+                try:
+                    db.session.execute(text(f'''
+                        DELETE FROM "{answers_table}" WHERE answer_id NOT IN (
+                            SELECT MIN(answer_id) FROM "{answers_table}" GROUP BY submission_id, assignment_task_id
+                        )
+                    '''))
+                    db.session.execute(text(
+                        f'CREATE UNIQUE INDEX IF NOT EXISTS ux_answers_submission_task '
+                        f'ON "{answers_table}"(submission_id, assignment_task_id)'
+                    ))
+                    db.session.commit()
+                except Exception as e:
+                    logger.warning(f"Could not create ux_answers_submission_task: {e}")
+                    db.session.rollback()
+
+            # Список пользователей удаленной админки: фильтр по роли + keyset-пагинация по id
+            users_index_table = _resolve_table_name(table_names, 'Users')
+            if users_index_table:
+                try:
+                    db.session.execute(text(f'CREATE INDEX IF NOT EXISTS ix_users_role_id ON "{users_index_table}"(role, id)'))
+                    db.session.commit()
+                except Exception as e:
+                    logger.warning(f"Could not create ix_users_role_id: {e}")
+                    db.session.rollback()
             lessons_table = 'Lessons' if 'Lessons' in table_names else ('lessons' if 'lessons' in table_names else None)
             students_table = 'Students' if 'Students' in table_names else ('students' if 'students' in table_names else None)
             lesson_tasks_table = 'LessonTasks' if 'LessonTasks' in table_names else ('lessontasks' if 'lessontasks' in table_names else None)
@@ -853,6 +934,16 @@ def ensure_schema_columns(app):
                 else:
                     # SQLite не поддерживает ALTER COLUMN, но это не критично
                     logger.warning("SQLite does not support ALTER COLUMN, reminder_time will remain NOT NULL")
+
+                # Лента напоминаний (user_id, is_completed, reminder_time) и выборка наступивших для рассылки
+                for index_name, columns in (
+                    ('ix_reminders_user_completed_time', 'user_id, is_completed, reminder_time'),
+                    ('ix_reminders_pending_time', 'is_sent, is_completed, reminder_time'),
+                ):
+                    try:
+                        db.session.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON "{reminders_table}"({columns})'))
+                    except Exception as e:
+                        logger.warning(f"Could not create {index_name}: {e}")
             
             # Проверяем и обновляем таблицу Users
             users_table = _resolve_table_name(table_names, 'Users')
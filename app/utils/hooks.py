@@ -4,24 +4,18 @@
 import logging
 import base64
 import urllib.parse
-from datetime import timedelta
 from flask import request, redirect, url_for
 from flask_login import current_user
-from sqlalchemy import text
 from datetime import datetime
-from app.models import db, Lesson, Student, moscow_now, MOSCOW_TZ, UserSubscription, TariffPlan
+from app.models import db, Student, moscow_now, UserSubscription, TariffPlan
 from app.utils.subscription_access import get_effective_access_for_user, mark_subscription_expired_if_needed
-from app.utils.db_migrations import ensure_schema_columns
 from core.audit_logger import audit_logger
 
 logger = logging.getLogger(__name__)
 
-# Флаг для отслеживания, была ли выполнена инициализация схемы
-_schema_initialized = False
-
-# Кеш для отслеживания времени последней проверки уроков
-_last_lesson_check = None
-_lesson_check_interval = timedelta(minutes=5)  # Проверяем не чаще раза в 5 минут для оптимизации
+# Переход уроков planned -> completed выполняет фоновый планировщик
+# (app/utils/background_jobs.py), а не случайный пользовательский запрос.
+# Схема БД приводится при старте (app/utils/schema_contract.py), в запросах DDL нет.
 
 def register_hooks(app):
     """
@@ -34,128 +28,6 @@ def register_hooks(app):
         if not audit_logger.is_running:
             audit_logger.start_worker()
     
-    @app.before_request
-    def initialize_on_first_request():
-        """Инициализация схемы БД при первом запросе"""
-        global _schema_initialized
-        
-        # Инициализируем схему БД при первом запросе
-        if not _schema_initialized:
-            try:
-                ensure_schema_columns(app)
-                _schema_initialized = True
-                logger.info("Database schema initialized successfully")
-            except Exception as e:
-                logger.error(f"Failed to initialize database schema: {e}", exc_info=True)
-                # Не блокируем запрос, если миграция не удалась
-                _schema_initialized = True  # Помечаем как инициализированную, чтобы не повторять
-                logger.info("Database schema initialized")
-        
-        # Запускаем worker thread для audit logger при первом запросе
-        if not audit_logger.is_running:
-            audit_logger.start_worker()
-    
-    @app.before_request
-    def auto_update_lesson_status():
-        """Автоматически обновляет статус запланированных уроков на 'completed' после их окончания"""
-        global _last_lesson_check
-        
-        # Пропускаем статические файлы
-        if request.endpoint in ('static', 'favicon') or request.path.startswith('/static/'):
-            return
-        
-        try:
-            # Проверяем не чаще чем раз в минуту
-            now = moscow_now()
-            # В БД lesson_date хранится как naive MSK; а moscow_now() может быть aware.
-            # Храним и сравниваем _last_lesson_check как naive, чтобы не ловить
-            # "can't compare offset-naive and offset-aware datetimes".
-            now_naive = now.replace(tzinfo=None) if getattr(now, 'tzinfo', None) else now
-            last = _last_lesson_check
-            last_naive = last.replace(tzinfo=None) if (last and getattr(last, 'tzinfo', None)) else last
-            if last_naive and (now_naive - last_naive) < _lesson_check_interval:
-                return
-            
-            _last_lesson_check = now_naive
-            
-            # Оптимизация: обновляем статусы напрямую через SQL, без загрузки всех уроков
-            # Находим уроки, которые должны быть завершены (время окончания прошло)
-            # lesson_date + duration <= now означает, что урок уже закончился
-            try:
-                # Используем SQL для массового обновления
-                # Проверяем тип БД и используем соответствующий синтаксис
-                db_url = app.config.get('SQLALCHEMY_DATABASE_URI', '')
-                
-                # now_naive уже подготовлен выше
-                
-                if 'postgresql' in db_url or 'postgres' in db_url:
-                    # PostgreSQL синтаксис
-                    # lesson_date хранится как naive datetime, считаем что это московское время
-                    result = db.session.execute(text("""
-                        UPDATE "Lessons" 
-                        SET status = 'completed', updated_at = :now
-                        WHERE status = 'planned' 
-                        AND (lesson_date + (duration || ' minutes')::interval) <= :now
-                    """), {'now': now_naive})
-                else:
-                    # SQLite синтаксис
-                    result = db.session.execute(text("""
-                        UPDATE Lessons 
-                        SET status = 'completed', updated_at = :now
-                        WHERE status = 'planned' 
-                        AND datetime(lesson_date, '+' || duration || ' minutes') <= :now
-                    """), {'now': now_naive})
-                
-                updated_count = result.rowcount
-                
-                if updated_count > 0:
-                    db.session.commit()
-                    # Уменьшаем логирование - только если обновлено больше 0
-                    if updated_count > 5:  # Логируем только если обновлено много уроков
-                        logger.info(f"Автоматически обновлено статусов уроков: {updated_count}")
-            except Exception as e:
-                # Fallback на старый метод, если SQL не работает
-                logger.warning(f"Ошибка при массовом обновлении статусов, используем старый метод: {e}")
-                try:
-                    # Фильтруем только уроки, которые могли закончиться (за последние 24 часа)
-                    # Конвертируем now в naive для сравнения с lesson_date в БД
-                    yesterday = now_naive - timedelta(days=1)
-                    
-                    planned_lessons = Lesson.query.filter(
-                        Lesson.status == 'planned',
-                        Lesson.lesson_date >= yesterday
-                    ).all()
-                    
-                    if not planned_lessons:
-                        return
-                    
-                    updated_count = 0
-                    now_with_tz = now if getattr(now, 'tzinfo', None) else now.replace(tzinfo=MOSCOW_TZ)
-                    for lesson in planned_lessons:
-                        # lesson.lesson_date может быть naive, нужно добавить timezone для сравнения
-                        lesson_date_with_tz = lesson.lesson_date
-                        if lesson_date_with_tz.tzinfo is None:
-                            # Если naive, считаем что это московское время
-                            lesson_date_with_tz = lesson_date_with_tz.replace(tzinfo=MOSCOW_TZ)
-                        
-                        lesson_end_time = lesson_date_with_tz + timedelta(minutes=lesson.duration)
-                        if now_with_tz >= lesson_end_time:
-                            lesson.status = 'completed'
-                            lesson.updated_at = now_naive
-                            updated_count += 1
-                    
-                    if updated_count > 0:
-                        db.session.commit()
-                        logger.info(f"Автоматически обновлено статусов уроков: {updated_count}")
-                except Exception as e2:
-                    logger.error(f"Ошибка при обновлении статусов уроков: {e2}", exc_info=True)
-                    db.session.rollback()
-        
-        except Exception as e:
-            logger.error(f"Ошибка при автоматическом обновлении статуса уроков: {e}", exc_info=True)
-            # Не блокируем запрос при ошибке
-            db.session.rollback()
-    
     @app.before_request
     def check_maintenance_mode():
         """Проверка режима технических работ в песочнице - ДО проверки авторизации"""
@@ -281,7 +153,7 @@ def register_hooks(app):
             logger.info(f"require_login hook: path={request.path}, endpoint={request.endpoint}, authenticated={current_user.is_authenticated if hasattr(current_user, 'is_authenticated') else False}")
         
         # Исключаем маршруты, которые не требуют авторизации
-        excluded_endpoints = ('auth.login', 'auth.logout', 'static', 'main.font_files', 'admin.maintenance_status_api', 'admin.maintenance_page', 'main.setup_first_user', 'main.health_check', 'main.landing', 'main.index', 'main.legal_offer', 'main.legal_privacy', 'billing.billing_plans_public')
+        excluded_endpoints = ('auth.login', 'auth.logout', 'static', 'main.font_files', 'admin.maintenance_status_api', 'admin.maintenance_page', 'main.setup_first_user', 'main.health_check', 'main.landing', 'main.index', 'main.legal_offer', 'main.legal_privacy', 'billing.billing_plans_public', 'schedule.schedule_export_ics_by_token')
         excluded_paths = ('/', '/landing', '/index', '/home', '/legal/offer', '/legal/privacy', '/billing/plans/public')
         
         if (request.endpoint in excluded_endpoints or 
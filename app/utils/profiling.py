@@ -0,0 +1,268 @@
+"""
+Профилирование HTTP-запросов: SQL-запросы, время в БД и рендер шаблонов по endpoint'ам.
+
+Включается явно (PROFILE_REQUESTS=1 или app.config['PROFILE_REQUESTS']) — в обычном режиме
+ни слушателей, ни заголовков нет. На каждый запрос считаются:
+- число SQL-запросов и суммарное время в БД (события движка before/after_cursor_execute);
+- повторы: один и тот же текст запроса с точностью до параметров — подпись N+1;
+- время рендера шаблонов (сигналы before_render_template / template_rendered) и всего запроса.
+
+Результат:
+- заголовки ответа X-Query-Count, X-Query-Duplicates, X-DB-Time-Ms, X-Render-Time-Ms и Server-Timing
+  (видно во вкладке Network браузера);
+- сводка по endpoint'ам в памяти процесса: GET /_profiling (только с localhost, ?reset=1 — обнулить)
+  и файл PROFILE_REPORT_PATH при выходе процесса.
+
+Бюджеты запросов по ключевым страницам проверяет scripts/check_query_budgets.py.
+"""
+import atexit
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from flask import (
+    abort, before_render_template, g, has_request_context, jsonify, request, request_started, template_rendered,
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+# Подпись считается N+1, если запрос повторился в одном HTTP-запросе столько раз и больше
+REPEATED_THRESHOLD = 3
+# Сколько повторяющихся подписей хранить в сводке на endpoint
+_REPORT_SIGNATURES = 10
+# Длинный SELECT в сводке: начало и хвост (FROM/WHERE), список колонок посередине не нужен
+_SIGNATURE_HEAD = 80
+_SIGNATURE_TAIL = 220
+_SKIP_ENDPOINTS = ('static', 'profiling_report')
+_LOOPBACK = ('127.0.0.1', '::1')
+
+_SIG_WS = re.compile(r'\s+')
+_SIG_LITERAL = re.compile(r"'(?:[^']|'')*'|(?<![\w.])-?\d+(?:\.\d+)?\b")
+_SIG_PARAM = r'(?:\?|%s|%\(\w+\)s|:\w+)'
+_SIG_PARAM_LIST = re.compile(rf'\(\s*{_SIG_PARAM}(?:\s*,\s*{_SIG_PARAM})*\s*\)')
+
+_listeners_installed = False
+_report_lock = threading.Lock()
+_report: Dict[str, 'EndpointStats'] = {}
+
+
+def statement_signature(statement: str) -> str:
+    """Текст запроса без литералов и с IN (...) любой длины в одну форму — для поиска повторов."""
+    signature = _SIG_WS.sub(' ', statement).strip()
+    signature = _SIG_LITERAL.sub('?', signature)
+    return _SIG_PARAM_LIST.sub('(?)', signature)
+
+
+def _short_signature(signature: str) -> str:
+    if len(signature) <= _SIGNATURE_HEAD + _SIGNATURE_TAIL:
+        return signature
+    return f'{signature[:_SIGNATURE_HEAD]} … {signature[-_SIGNATURE_TAIL:]}'
+
+
+@dataclass
+class RequestProfile:
+    started: float = field(default_factory=time.perf_counter)
+    queries: int = 0
+    db_seconds: float = 0.0
+    render_seconds: float = 0.0
+    signatures: Counter = field(default_factory=Counter)
+    render_started: List[float] = field(default_factory=list)
+
+    def record_query(self, statement: str, seconds: float) -> None:
+        self.queries += 1
+        self.db_seconds += seconds
+        self.signatures[statement_signature(statement)] += 1
+
+    @property
+    def duplicates(self) -> int:
+        """Лишние выполнения: всё, что сверх первого, для каждой повторившейся подписи."""
+        return sum(count - 1 for count in self.signatures.values() if count > 1)
+
+    def repeated(self, threshold: int = REPEATED_THRESHOLD) -> Dict[str, int]:
+        return {sig: count for sig, count in self.signatures.most_common() if count >= threshold}
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    queries_total: int = 0
+    queries_max: int = 0
+    duplicates_max: int = 0
+    db_ms_total: float = 0.0
+    db_ms_max: float = 0.0
+    render_ms_total: float = 0.0
+    total_ms_total: float = 0.0
+    total_ms_max: float = 0.0
+    repeated: Dict[str, int] = field(default_factory=dict)
+
+    def add(self, profile: RequestProfile, total_ms: float) -> None:
+        db_ms = profile.db_seconds * 1000
+        self.requests += 1
+        self.queries_total += profile.queries
+        self.queries_max = max(self.queries_max, profile.queries)
+        self.duplicates_max = max(self.duplicates_max, profile.duplicates)
+        self.db_ms_total += db_ms
+        self.db_ms_max = max(self.db_ms_max, db_ms)
+        self.render_ms_total += profile.render_seconds * 1000
+        self.total_ms_total += total_ms
+        self.total_ms_max = max(self.total_ms_max, total_ms)
+        for signature, count in profile.repeated().items():
+            self.repeated[signature] = max(self.repeated.get(signature, 0), count)
+        if len(self.repeated) > _REPORT_SIGNATURES:
+            top = sorted(self.repeated.items(), key=lambda item: -item[1])[:_REPORT_SIGNATURES]
+            self.repeated = dict(top)
+
+    def as_dict(self) -> Dict:
+        n = self.requests or 1
+        return {
+            'requests': self.requests,
+            'queries_avg': round(self.queries_total / n, 1),
+            'queries_max': self.queries_max,
+            'duplicates_max': self.duplicates_max,
+            'db_ms_avg': round(self.db_ms_total / n, 2),
+            'db_ms_max': round(self.db_ms_max, 2),
+            'render_ms_avg': round(self.render_ms_total / n, 2),
+            'total_ms_avg': round(self.total_ms_total / n, 2),
+            'total_ms_max': round(self.total_ms_max, 2),
+            'repeated': [
+                {'statement': _short_signature(signature), 'count': count}
+                for signature, count in sorted(self.repeated.items(), key=lambda item: -item[1])
+            ],
+        }
+
+
+def profiling_enabled(app) -> bool:
+    value = app.config.get('PROFILE_REQUESTS')
+    if value is None:
+        value = os.environ.get('PROFILE_REQUESTS', '')
+    if isinstance(value, str):
+        return value.strip().lower() in ('1', 'true', 'yes', 'on')
+    return bool(value)
+
+
+def current_profile() -> Optional[RequestProfile]:
+    """Профиль текущего HTTP-запроса; None вне запроса (фоновые задачи, воркеры) или без профилирования."""
+    if not has_request_context():
+        return None
+    return g.get('_request_profile')
+
+
+def profiling_report() -> Dict[str, Dict]:
+    """Сводка по endpoint'ам с момента старта процесса (или последнего сброса)."""
+    with _report_lock:
+        return {endpoint: stats.as_dict() for endpoint, stats in sorted(_report.items())}
+
+
+def reset_profiling_report() -> None:
+    with _report_lock:
+        _report.clear()
+
+
+def write_profiling_report(path: str) -> None:
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(profiling_report(), f, ensure_ascii=False, indent=2)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None and current_profile() is not None:
+        context._profiling_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_profiling_started', None)
+    profile = current_profile()
+    if started is None or profile is None:
+        return
+    profile.record_query(statement, time.perf_counter() - started)
+
+
+def _start_request(sender, **extra):
+    g._request_profile = RequestProfile()
+
+
+def _before_render(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is not None:
+        profile.render_started.append(time.perf_counter())
+
+
+def _after_render(sender, template, context, **extra):
+    profile = current_profile()
+    if profile is None or not profile.render_started:
+        return
+    started = profile.render_started.pop()
+    # Вложенный render_template уже входит во время внешнего
+    if not profile.render_started:
+        profile.render_seconds += time.perf_counter() - started
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _finish_request(response):
+    profile = current_profile()
+    if profile is None:
+        return response
+    total_ms = (time.perf_counter() - profile.started) * 1000
+    db_ms = profile.db_seconds * 1000
+    render_ms = profile.render_seconds * 1000
+
+    response.headers['X-Query-Count'] = str(profile.queries)
+    response.headers['X-Query-Duplicates'] = str(profile.duplicates)
+    response.headers['X-DB-Time-Ms'] = f'{db_ms:.2f}'
+    response.headers['X-Render-Time-Ms'] = f'{render_ms:.2f}'
+    response.headers.add(
+        'Server-Timing',
+        f'db;dur={db_ms:.2f};desc="{profile.queries} queries", tpl;dur={render_ms:.2f}, app;dur={total_ms:.2f}',
+    )
+
+    endpoint = request.endpoint or request.path
+    if endpoint not in _SKIP_ENDPOINTS:
+        with _report_lock:
+            _report.setdefault(endpoint, EndpointStats()).add(profile, total_ms)
+        repeated = profile.repeated()
+        if repeated:
+            signature, count = next(iter(repeated.items()))
+            logger.info(f"profiling: {endpoint} ran {profile.queries} queries, repeated {count}x: {_short_signature(signature)}")
+    return response
+
+
+def _report_view():
+    if request.remote_addr not in _LOOPBACK:
+        abort(404)
+    report = profiling_report()
+    if request.args.get('reset'):
+        reset_profiling_report()
+    return jsonify(report)
+
+
+def init_profiling(app) -> bool:
+    """Подключает профилирование, если оно включено. True — профилирование активно."""
+    if not profiling_enabled(app):
+        return False
+    _install_listeners()
+    request_started.connect(_start_request, app)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_after_render, app)
+    app.after_request(_finish_request)
+    app.add_url_rule('/_profiling', 'profiling_report', _report_view)
+
+    report_path = os.environ.get('PROFILE_REPORT_PATH')
+    if report_path:
+        atexit.register(write_profiling_report, report_path)
+    logger.info("Request profiling enabled: X-Query-Count / Server-Timing headers, report at /_profiling")
+    return True
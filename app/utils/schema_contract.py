@@ -0,0 +1,188 @@
+"""
+Контракт схемы БД: объявленные модели (core/db_models.py) против живой базы.
+
+Схема проверяется и мигрируется один раз при старте процесса (init_schema_contract),
+а не в обработчиках запросов: раньше отдельные view ловили OperationalError,
+вызывали ensure_schema_columns посреди запроса и брали блокировки DDL под трафиком.
+
+SCHEMA_CONTRACT_MODE:
+- migrate (по умолчанию): ensure_schema_columns под advisory lock, затем проверка;
+- strict: то же, но при нарушении контракта приложение не стартует (RuntimeError);
+- verify: только проверка (миграции — релизным шагом `scripts/check_schema_contract.py --migrate`);
+- off: ничего не делать.
+
+Результат последней проверки отдаёт /health (`schema_contract_status`).
+"""
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from sqlalchemy import inspect, text
+
+from app.models import db, moscow_now
+from app.utils.env import env_int
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_CONTRACT_MODES = ('migrate', 'strict', 'verify', 'off')
+
+# Ключ pg_advisory_lock для миграций схемы (общий для всех веб-процессов и скриптов)
+SCHEMA_LOCK_KEY = 7_340_048
+
+# SQLite advisory locks не умеет — сериализуем хотя бы потоки процесса, запись сериализует сама БД
+_local_lock = threading.Lock()
+_status_lock = threading.Lock()
+_last_result: Dict = {'mode': None, 'ok': None, 'checked_at': None}
+
+
+def schema_contract_mode() -> str:
+    mode = (os.environ.get('SCHEMA_CONTRACT_MODE') or 'migrate').strip().lower()
+    return mode if mode in SCHEMA_CONTRACT_MODES else 'migrate'
+
+
+def schema_contract_status() -> Dict:
+    """Результат последней проверки контракта (для /health)."""
+    with _status_lock:
+        return dict(_last_result)
+
+
+def schema_table_ready(table_name: str) -> Optional[bool]:
+    """
+    Есть ли таблица по результату проверки при старте — без обращения к БД.
+    None, если проверка не выполнялась или завершилась ошибкой (решает вызывающий).
+    """
+    with _status_lock:
+        if _last_result.get('ok') is None or _last_result.get('error'):
+            return None
+        return table_name not in _last_result.get('missing_tables', ())
+
+
+def _store_result(result: Dict) -> None:
+    global _last_result
+    with _status_lock:
+        _last_result = dict(result)
+
+
+@contextmanager
+def schema_migration_lock(engine, timeout_seconds: int = 120) -> Iterator[bool]:
+    """
+    Advisory lock на время миграций: в PostgreSQL — pg_advisory_lock на отдельном соединении,
+    ждём не дольше timeout_seconds. Отдаёт True, если блокировка получена.
+    """
+    if engine.dialect.name != 'postgresql':
+        acquired = _local_lock.acquire(timeout=timeout_seconds)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                _local_lock.release()
+        return
+
+    with engine.connect() as conn:
+        deadline = time.monotonic() + timeout_seconds
+        acquired = False
+        while True:
+            acquired = bool(conn.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': SCHEMA_LOCK_KEY}).scalar())
+            conn.commit()
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(0.5)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                conn.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': SCHEMA_LOCK_KEY})
+                conn.commit()
+
+
+def verify_schema_contract(engine, metadata=None) -> Dict:
+    """
+    Сверяет таблицы и колонки моделей с базой. Имена сравниваются без учёта регистра
+    (в старых базах PostgreSQL таблицы бывают в нижнем регистре); лишние колонки в базе и
+    расхождения типов контракт не нарушают.
+    """
+    metadata = metadata if metadata is not None else db.metadata
+    inspector = inspect(engine)
+    live_tables = {name.lower(): name for name in inspector.get_table_names()}
+    live_columns = {
+        table_name.lower(): {column['name'].lower() for column in columns}
+        for (_schema, table_name), columns in inspector.get_multi_columns().items()
+    }
+
+    missing_tables = []
+    missing_columns = {}
+    for table in metadata.sorted_tables:
+        key = table.name.lower()
+        if key not in live_tables:
+            missing_tables.append(table.name)
+            continue
+        columns = live_columns.get(key, set())
+        absent = [column.name for column in table.columns if column.name.lower() not in columns]
+        if absent:
+            missing_columns[table.name] = absent
+
+    return {
+        'ok': not missing_tables and not missing_columns,
+        'tables': len(metadata.tables),
+        'missing_tables': missing_tables,
+        'missing_columns': missing_columns,
+    }
+
+
+def run_schema_contract(app, mode: Optional[str] = None) -> Dict:
+    """Миграции (если режим их допускает) под advisory lock и проверка контракта; результат — в статус."""
+    mode = mode or schema_contract_mode()
+    if mode == 'off':
+        result = {'mode': mode, 'ok': None, 'checked_at': None}
+        _store_result(result)
+        return result
+
+    from app.utils.db_migrations import ensure_schema_columns
+
+    started = time.perf_counter()
+    migrated = False
+    with app.app_context():
+        try:
+            if mode in ('migrate', 'strict'):
+                with schema_migration_lock(db.engine, env_int('SCHEMA_LOCK_TIMEOUT', 120)) as acquired:
+                    if acquired:
+                        ensure_schema_columns(app)
+                        migrated = True
+                    else:
+                        logger.warning("Schema migration lock not acquired in time, verifying only")
+            result = verify_schema_contract(db.engine)
+        except Exception as e:
+            db.session.rollback()
+            result = {'ok': False, 'error': str(e)}
+        finally:
+            db.session.remove()
+
+    result.update(
+        mode=mode,
+        migrated=migrated,
+        checked_at=moscow_now().isoformat(),
+        duration_ms=int((time.perf_counter() - started) * 1000),
+    )
+    _store_result(result)
+    return result
+
+
+def init_schema_contract(app) -> Dict:
+    """Проверка схемы при старте приложения; в режиме strict нарушение контракта останавливает запуск."""
+    result = run_schema_contract(app)
+    if result['ok'] is None:
+        logger.info(f"Schema contract check disabled (SCHEMA_CONTRACT_MODE={result['mode']})")
+    elif result['ok']:
+        logger.info(f"✓ Schema contract: OK ({result['tables']} tables, {result['duration_ms']} ms, mode={result['mode']})")
+    else:
+        details = result.get('error') or {
+            'missing_tables': result['missing_tables'],
+            'missing_columns': result['missing_columns'],
+        }
+        logger.error(f"✗ Schema contract violated (mode={result['mode']}): {details}")
+        if result['mode'] == 'strict':
+            raise RuntimeError(f"Database schema does not match models: {details}")
+    return result
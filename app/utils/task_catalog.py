@@ -0,0 +1,131 @@
+"""
+Каталог банка заданий: сколько заданий каждого номера ЕГЭ есть в Tasks.
+
+Банк меняется только при импорте (парсер, админка), а читается постоянно
+(тренажёр опрашивает статистику, страница генератора строит список номеров).
+Поэтому каталог считается одним GROUP BY и живёт в памяти, пока не изменится
+версия 'task_bank' (её поднимают ORM-события Tasks и парсер после импорта).
+"""
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time as _time
+from dataclasses import dataclass, field
+from datetime import datetime
+
+from flask import Response, jsonify, request
+
+from app.models import db, Tasks
+from app.utils.background_jobs import register_cache_warmer
+from app.utils.cache_versions import bump_version, get_version, local_bump_count, track_model_changes
+
+TASK_BANK_VERSION = 'task_bank'
+
+track_model_changes(Tasks, TASK_BANK_VERSION)
+
+
+def _recheck_seconds() -> float:
+    # Как часто сверять версию с БД (изменения из других процессов видны не позже этого срока)
+    try:
+        return float(os.environ.get('TASK_CATALOG_RECHECK_SECONDS', 5))
+    except (TypeError, ValueError):
+        return 5.0
+
+
+@dataclass
+class TaskCatalog:
+    version: int
+    updated_at: datetime | None
+    counts: dict[int, int] = field(default_factory=dict)
+
+    @property
+    def numbers(self) -> list[int]:
+        return sorted(self.counts)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def etag(self) -> str:
+        return hashlib.sha1(f'{TASK_BANK_VERSION}:{self.version}:{self.total}'.encode('utf-8')).hexdigest()
+
+
+class _CatalogHolder:
+    def __init__(self):
+        self._catalog: TaskCatalog | None = None
+        self._checked_at = 0.0
+        self._local_bumps = -1
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    def get(self) -> TaskCatalog:
+        catalog = self._catalog
+        if (
+            catalog is not None
+            and self._local_bumps == local_bump_count(TASK_BANK_VERSION)
+            and _time.monotonic() - self._checked_at < _recheck_seconds()
+        ):
+            return catalog
+
+        with self._lock:
+            bumps = local_bump_count(TASK_BANK_VERSION)
+            version, updated_at = get_version(TASK_BANK_VERSION)
+            catalog = self._catalog
+            if catalog is None or catalog.version != version or self._local_bumps != bumps:
+                rows = (
+                    db.session.query(Tasks.task_number, db.func.count(Tasks.task_id))
+                    .group_by(Tasks.task_number)
+                    .all()
+                )
+                catalog = TaskCatalog(
+                    version=version,
+                    updated_at=updated_at,
+                    counts={int(n): int(c) for (n, c) in rows if n is not None},
+                )
+                self._catalog = catalog
+                self.rebuilds += 1
+            self._local_bumps = bumps
+            self._checked_at = _time.monotonic()
+            return catalog
+
+    def reset(self) -> None:
+        with self._lock:
+            self._catalog = None
+            self._local_bumps = -1
+
+
+_holder = _CatalogHolder()
+
+
+def get_task_catalog() -> TaskCatalog:
+    """Текущий каталог (из памяти; БД — только при смене версии или раз в TASK_CATALOG_RECHECK_SECONDS)."""
+    return _holder.get()
+
+
+def bump_task_bank_version(connection=None) -> None:
+    """Для массовых импортов в обход ORM-событий (bulk_save_objects, сырой SQL)."""
+    bump_version(TASK_BANK_VERSION, connection)
+
+
+def task_stats_response(*, max_age: int = 60) -> Response:
+    """Ответ со статистикой банка: ETag по версии банка, 304 на совпавший If-None-Match."""
+    catalog = get_task_catalog()
+    if request.if_none_match and request.if_none_match.contains(catalog.etag):
+        response = Response(status=304)
+    else:
+        response = jsonify({
+            'success': True,
+            'counts_by_task_number': catalog.counts,
+            'bank_version': catalog.version,
+        })
+    response.set_etag(catalog.etag)
+    response.headers['Cache-Control'] = f'private, max-age={int(max_age)}'
+    return response
+
+
+@register_cache_warmer
+def warm_task_catalog(now: datetime) -> None:
+    get_task_catalog()
@@ -0,0 +1,74 @@
+"""
+Варианты показа заданий (display_html, text_excerpt) для правок через ORM и фоновый досчёт.
+
+Парсер пишет варианты сам (scraper/task_upsert.py). Здесь:
+- before_flush: задания, созданные или изменённые через ORM (админка, ручное создание),
+  получают новый content_hash и варианты в том же flush;
+- render_stale_tasks: задача планировщика для строк без вариантов или с вариантами
+  старой версии рендера (TASK_RENDER_VERSION) — пачками, вне запросов пользователей.
+"""
+import logging
+from datetime import datetime
+
+from sqlalchemy import event, inspect as sa_inspect, or_
+from sqlalchemy.orm import Session
+
+from app.models import db, Tasks
+from scraper.task_render import TASK_RENDER_VERSION, render_task_variants, task_render_key
+from scraper.task_upsert import task_content_hash
+
+logger = logging.getLogger(__name__)
+
+_CONTENT_ATTRS = ('content_html', 'answer', 'attached_files')
+
+_listeners_installed = False
+
+
+def refresh_task_variants(task: Tasks) -> bool:
+    """Пересчитывает content_hash и, если он изменился, варианты показа. True — варианты обновлены."""
+    content_hash = task_content_hash(task.content_html, task.answer, task.attached_files)
+    render_key = task_render_key(content_hash)
+    if task.content_hash != content_hash:
+        task.content_hash = content_hash
+    if task.render_key == render_key:
+        return False
+    variants = render_task_variants(task.content_html)
+    task.display_html = variants['display_html']
+    task.text_excerpt = variants['text_excerpt']
+    task.render_key = render_key
+    return True
+
+
+def render_stale_tasks(now: datetime, batch_size: int = 200) -> int:
+    """Задача планировщика: досчитать варианты для пачки заданий с пустым или устаревшим render_key."""
+    tasks = (
+        Tasks.query
+        .filter(or_(Tasks.render_key.is_(None), ~Tasks.render_key.startswith(f'{TASK_RENDER_VERSION}:')))
+        .order_by(Tasks.task_id)
+        .limit(batch_size)
+        .all()
+    )
+    rendered = sum(1 for task in tasks if refresh_task_variants(task))
+    if tasks:
+        db.session.commit()
+        logger.info(f"task_render: rendered {rendered} of {len(tasks)} stale tasks")
+    return rendered
+
+
+def _install_listeners() -> None:
+    global _listeners_installed
+    if _listeners_installed:
+        return
+    _listeners_installed = True
+
+    @event.listens_for(Session, 'before_flush')
+    def _render_changed_tasks(session, flush_context, instances):
+        for obj in list(session.new) + list(session.dirty):
+            if not isinstance(obj, Tasks):
+                continue
+            state = sa_inspect(obj)
+            if state.pending or any(state.attrs[attr].history.has_changes() for attr in _CONTENT_ATTRS):
+                refresh_task_variants(obj)
+
+
+_install_listeners()
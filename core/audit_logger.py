@@ -147,16 +147,8 @@ class AuditLogger:
             db.session.rollback()
             error_msg = str(e)
             if 'user_id' in error_msg.lower() or 'column' in error_msg.lower():
+                # Схему приводит контракт при старте (app/utils/schema_contract.py), см. /health
                 logger.error(f"Database schema error in AuditLog: {e}. Table may need migration.")
-                # Пытаемся вызвать миграцию
-                try:
-                    from app.utils.db_migrations import ensure_schema_columns
-                    from flask import current_app
-                    ensure_schema_columns(current_app)
-                    logger.info("Attempted to fix AuditLog schema, retrying log write...")
-                    # Не повторяем запись автоматически, чтобы избежать бесконечного цикла
-                except Exception as migration_error:
-                    logger.error(f"Failed to migrate AuditLog schema: {migration_error}")
             else:
                 logger.error(f"Database error writing audit log: {e}")
         except Exception as e:
@@ -33,12 +33,29 @@ class Tasks(db.Model):
     answer = db.Column(db.Text, nullable=True)
     attached_files = db.Column(db.Text, nullable=True)
     last_scraped = db.Column(db.DateTime, default=moscow_now)
+    # sha256 от (content_html, answer, attached_files): повторный парсинг пишет только изменившиеся задания
+    content_hash = db.Column(db.String(64), nullable=True)
+    # Варианты для показа считаются при сохранении (scraper/task_render.py), пересчёт — при смене render_key
+    display_html = db.Column(db.Text, nullable=True)
+    text_excerpt = db.Column(db.Text, nullable=True)
+    render_key = db.Column(db.String(80), nullable=True)
+
+    # Естественные ключи задания на сайте-источнике (upsert парсера)
+    __table_args__ = (
+        db.Index('ix_tasks_source_url', 'source_url'),
+        db.Index('ix_tasks_site_task_id', 'site_task_id'),
+    )
 
     usage_history = db.relationship('UsageHistory', back_populates='task', lazy=True)
     skipped_tasks = db.relationship('SkippedTasks', back_populates='task', lazy=True)
     blacklist_tasks = db.relationship('BlacklistTasks', back_populates='task', lazy=True)
     topics = db.relationship('Topic', secondary=task_topics, backref='tasks', lazy=True)
 
+    @property
+    def rendered_html(self):
+        """HTML для показа: предрассчитанный display_html, пока его нет — исходный content_html."""
+        return self.display_html or self.content_html
+
 class TaskReview(db.Model):
     """Результат ручной проверки задания (фундамент для формироватора банка заданий)."""
     __tablename__ = 'TaskReviews'
@@ -758,6 +775,11 @@ class Reminder(db.Model):
     updated_at = db.Column(db.DateTime, default=moscow_now, onupdate=moscow_now, nullable=False)
     
     user = db.relationship('User', foreign_keys=[user_id])
+
+    __table_args__ = (
+        Index('ix_reminders_user_completed_time', 'user_id', 'is_completed', 'reminder_time'),  # лента пользователя
+        Index('ix_reminders_pending_time', 'is_sent', 'is_completed', 'reminder_time'),  # рассылка наступивших
+    )
     
     def is_overdue(self):
         """Проверяет, просрочено ли напоминание"""
@@ -1121,6 +1143,7 @@ class Assignment(db.Model):
     tasks = db.relationship('AssignmentTask', back_populates='assignment', lazy=True, cascade='all, delete-orphan')
     submissions = db.relationship('Submission', back_populates='assignment', lazy=True, cascade='all, delete-orphan')
     rubric_template = db.relationship('RubricTemplate', foreign_keys=[rubric_template_id])
+    counters = db.relationship('AssignmentCounter', uselist=False, lazy=True, cascade='all, delete-orphan')
     
     def __repr__(self):
         return f'<Assignment {self.assignment_id}: {self.title} ({self.assignment_type})>'
@@ -1203,12 +1226,65 @@ class Submission(db.Model):
     student = db.relationship('Student', backref='submissions')
     answers = db.relationship('Answer', back_populates='submission', lazy=True, cascade='all, delete-orphan')
     attempts = db.relationship('SubmissionAttempt', back_populates='submission', lazy=True, cascade='all, delete-orphan')
+    grading_jobs = db.relationship('GradingJob', lazy=True, cascade='all, delete-orphan')
     rubric_template = db.relationship('RubricTemplate', foreign_keys=[rubric_template_id])
     
     def __repr__(self):
         return f'<Submission {self.submission_id}: student {self.student_id}, assignment {self.assignment_id}, status {self.status}>'
 
 
+class AssignmentCounter(db.Model):
+    """
+    Материализованные счётчики сдач по работе (одна строка на Assignment).
+
+    Поддерживаются дельтами в той же транзакции, что и смена статуса Submission
+    (см. app/assignments/counters.py); задача reconcile пересобирает их из Submissions.
+    """
+    __tablename__ = 'AssignmentCounters'
+
+    assignment_id = db.Column(db.Integer, db.ForeignKey('Assignments.assignment_id'), primary_key=True)
+    assigned = db.Column(db.Integer, default=0, nullable=False)
+    in_progress = db.Column(db.Integer, default=0, nullable=False)
+    submitted = db.Column(db.Integer, default=0, nullable=False)  # статус SUBMITTED
+    late = db.Column(db.Integer, default=0, nullable=False)  # статус LATE
+    returned = db.Column(db.Integer, default=0, nullable=False)
+    graded = db.Column(db.Integer, default=0, nullable=False)
+    tasks_count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=moscow_now, nullable=False)
+
+    def __repr__(self):
+        return f'<AssignmentCounter {self.assignment_id}>'
+
+
+class GradingJob(db.Model):
+    """
+    Задание очереди автопроверки сдачи (см. app/assignments/grading.py).
+
+    queued -> running (воркер держит аренду lease_until) -> done | failed;
+    задание с истёкшей арендой снова забирается другим воркером.
+    """
+    __tablename__ = 'GradingJobs'
+
+    job_id = db.Column(db.Integer, primary_key=True)
+    submission_id = db.Column(db.Integer, db.ForeignKey('Submissions.submission_id'), nullable=False, index=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, done, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    locked_by = db.Column(db.String(120), nullable=True)
+    lease_until = db.Column(db.DateTime, nullable=True)
+    result = db.Column(db.JSON, nullable=True)  # итог по задачам (для учителя и отладки)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=moscow_now, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        Index('ix_grading_jobs_status_id', 'status', 'job_id'),
+    )
+
+    def __repr__(self):
+        return f'<GradingJob {self.job_id}: submission {self.submission_id} {self.status}>'
+
+
 class Answer(db.Model):
     """
     Модель ответа ученика на конкретную задачу
@@ -1238,6 +1314,9 @@ class Answer(db.Model):
     # Связи
     submission = db.relationship('Submission', back_populates='answers')
     assignment_task = db.relationship('AssignmentTask', back_populates='answers')
+
+    # Один ответ на задачу в сдаче (повторная автопроверка не должна плодить строки)
+    __table_args__ = (Index('ux_answers_submission_task', 'submission_id', 'assignment_task_id', unique=True),)
     
     # Уникальность: один ответ на задачу в одной сдаче
     __table_args__ = (
@@ -1345,3 +1424,60 @@ class GradebookEntry(db.Model):
     __table_args__ = (
         Index('ix_gradebook_student_kind', 'student_id', 'kind'),
     )
+
+
+# ============================================================================
+# ФОНОВЫЕ ЗАДАЧИ (ПЛАНИРОВЩИК)
+# ============================================================================
+
+class SchedulerLock(db.Model):
+    """
+    Строка-аренда для выбора лидера планировщика.
+
+    Все gunicorn-воркеры (и sidecar-процесс) пытаются занять строку с одним name;
+    периодические задачи выполняет только владелец непросроченной аренды.
+    """
+    __tablename__ = 'SchedulerLocks'
+
+    name = db.Column(db.String(100), primary_key=True)
+    owner = db.Column(db.String(200), nullable=True)
+    acquired_at = db.Column(db.DateTime, nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+
+class CacheVersion(db.Model):
+    """
+    Счётчик версии набора данных для инвалидации кешей между процессами.
+
+    Например, 'schedule:student:<id>' увеличивается при изменении уроков ученика, и кеш
+    ICS-фидов, где он виден (ключ = пользователь + диапазон + версии), устаревает во всех воркерах.
+    """
+    __tablename__ = 'CacheVersions'
+
+    name = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=moscow_now, nullable=False)
+
+
+class ChildDigest(db.Model):
+    """
+    Готовая сводка по ребенку для дашборда родителя (одна строка на ученика-пользователя).
+
+    Пересчитывается только при изменениях уроков, заданий, работ и профиля ребенка
+    (dirty = True ставят ORM-события) или когда истекает окно valid_until
+    (ближайший урок прошел, сдвинулась «неделя»). Чтение дашборда — выборка по первичному ключу.
+    """
+    __tablename__ = 'ChildDigests'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('Users.id'), primary_key=True)
+    student_id = db.Column(db.Integer, nullable=True, index=True)  # Students.student_id (связь по email)
+    username = db.Column(db.String(80), nullable=True)
+    display_name = db.Column(db.String(300), nullable=True)  # Имя из профиля / Student.name / username
+    student_name = db.Column(db.String(300), nullable=True)  # Student.name или username (для API)
+    tasks_solved_week = db.Column(db.Integer, default=0, nullable=False)
+    pending_count = db.Column(db.Integer, default=0, nullable=False)
+    payload = db.Column(db.JSON, nullable=True)  # метрики, темы, работы, уроки
+    dirty = db.Column(db.Boolean, default=False, nullable=False)
+    generation = db.Column(db.Integer, default=0, nullable=False)  # растет при каждой пометке dirty
+    valid_until = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=moscow_now, nullable=False)
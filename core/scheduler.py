@@ -0,0 +1,305 @@
+"""
+Планировщик периодических задач (вне пути запроса).
+
+- задачи регистрируются через `register(name, func, interval_seconds)`;
+- в каждом процессе крутится свой поток, но задачи выполняет только лидер —
+  процесс, который держит аренду строки `SchedulerLocks` (см. `DbLeaderLease`);
+- по каждой задаче собираются метрики (запуски, ошибки, длительность);
+- время берётся из `Clock`, поэтому в офлайне можно подставить `FakeClock`
+  и «прокручивать» время вручную, вызывая `run_pending()`.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+
+from .db_models import db, SchedulerLock, moscow_now
+
+logger = logging.getLogger(__name__)
+
+
+class Clock:
+    """Реальное время: naive MSK для БД и monotonic для интервалов."""
+
+    def now(self) -> datetime:
+        now = moscow_now()
+        return now.replace(tzinfo=None) if now.tzinfo else now
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+class FakeClock(Clock):
+    """Управляемое время для офлайн-проверок: `advance()` двигает оба счётчика."""
+
+    def __init__(self, start: Optional[datetime] = None):
+        self._now = start or datetime(2025, 1, 1, 12, 0, 0)
+        self._mono = 0.0
+
+    def now(self) -> datetime:
+        return self._now
+
+    def monotonic(self) -> float:
+        return self._mono
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        self._now = self._now + timedelta(seconds=seconds)
+        self._mono += seconds
+
+
+@dataclass
+class JobMetrics:
+    runs: int = 0
+    failures: int = 0
+    last_started_at: Optional[datetime] = None
+    last_duration_ms: Optional[int] = None
+    total_duration_ms: int = 0
+    last_result: Optional[int] = None
+    last_error: Optional[str] = None
+
+    def as_dict(self) -> dict:
+        return {
+            'runs': self.runs,
+            'failures': self.failures,
+            'last_started_at': self.last_started_at.isoformat() if self.last_started_at else None,
+            'last_duration_ms': self.last_duration_ms,
+            'avg_duration_ms': int(self.total_duration_ms / self.runs) if self.runs else None,
+            'last_result': self.last_result,
+            'last_error': self.last_error,
+        }
+
+
+@dataclass
+class Job:
+    name: str
+    func: Callable[[datetime], Optional[int]]
+    interval_seconds: float
+    next_run_at: float = 0.0
+    metrics: JobMetrics = field(default_factory=JobMetrics)
+
+
+class DbLeaderLease:
+    """
+    Аренда лидерства через строку в таблице SchedulerLocks.
+
+    Захват/продление — один атомарный UPDATE с условием «строка моя или аренда истекла»,
+    поэтому работает одинаково в SQLite и PostgreSQL без advisory locks.
+    """
+
+    def __init__(self, name: str = 'maintenance', ttl_seconds: int = 90, owner: Optional[str] = None):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    def acquire(self, now: datetime) -> bool:
+        expires_at = now + timedelta(seconds=self.ttl_seconds)
+        try:
+            result = db.session.execute(
+                update(SchedulerLock)
+                .where(SchedulerLock.name == self.name)
+                .where(or_(
+                    SchedulerLock.owner == self.owner,
+                    SchedulerLock.expires_at.is_(None),
+                    SchedulerLock.expires_at < now,
+                ))
+                .values(owner=self.owner, acquired_at=now, expires_at=expires_at)
+            )
+            if result.rowcount == 1:
+                db.session.commit()
+                return True
+            db.session.rollback()
+
+            if db.session.get(SchedulerLock, self.name) is not None:
+                return False
+
+            # Строки ещё нет — первый вставивший становится лидером
+            db.session.add(SchedulerLock(name=self.name, owner=self.owner, acquired_at=now, expires_at=expires_at))
+            db.session.commit()
+            return True
+        except IntegrityError:
+            db.session.rollback()
+            return False
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Scheduler lease '{self.name}' acquire failed: {e}")
+            return False
+
+    def release(self) -> None:
+        try:
+            db.session.execute(
+                update(SchedulerLock)
+                .where(SchedulerLock.name == self.name, SchedulerLock.owner == self.owner)
+                .values(owner=None, expires_at=None)
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.warning(f"Scheduler lease '{self.name}' release failed: {e}")
+
+
+class JobScheduler:
+
+    def __init__(self, app=None, clock: Optional[Clock] = None, lease: Optional[DbLeaderLease] = None,
+                 tick_seconds: float = 5.0):
+
+        self.app = app
+        self.clock = clock or Clock()
+        self.lease = lease or DbLeaderLease()
+        self.tick_seconds = tick_seconds
+        self.jobs: Dict[str, Job] = {}
+        self.is_leader = False
+        self.is_running = False
+        self.worker_thread = None
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+
+        if app:
+            self.init_app(app)
+
+    def init_app(self, app):
+
+        self.app = app
+
+        import atexit
+        atexit.register(self.stop_worker)
+
+    def register(self, name: str, func: Callable[[datetime], Optional[int]], interval_seconds: float,
+                 run_immediately: bool = True) -> Job:
+        """Регистрирует задачу. func(now_naive_msk) может вернуть число обработанных записей."""
+        interval = float(interval_seconds)
+        first_run_at = 0.0 if run_immediately else self.clock.monotonic() + interval
+        job = Job(name=name, func=func, interval_seconds=interval, next_run_at=first_run_at)
+        with self._lock:
+            self.jobs[name] = job
+        return job
+
+    def run_pending(self) -> List[str]:
+        """
+        Один «тик»: продлить/захватить лидерство и выполнить задачи, чей срок подошёл.
+        Возвращает имена выполненных задач (удобно для офлайн-проверок с FakeClock).
+        """
+        if self.app is not None:
+            with self.app.app_context():
+                return self._run_pending()
+        return self._run_pending()
+
+    def _run_pending(self) -> List[str]:
+        now = self.clock.now()
+        was_leader = self.is_leader
+        self.is_leader = self.lease.acquire(now)
+        if self.is_leader != was_leader:
+            logger.info(f"Scheduler leadership {'acquired' if self.is_leader else 'lost'} ({self.lease.owner})")
+        if not self.is_leader:
+            return []
+
+        executed = []
+        with self._lock:
+            due = [job for job in self.jobs.values() if job.next_run_at <= self.clock.monotonic()]
+        for index, job in enumerate(due):
+            # Задачи идут последовательно и тик может пережить аренду — продлеваем её перед каждой
+            # следующей; если лидерство уже у другого процесса, оставшиеся задачи выполнит он
+            if index and not self.lease.acquire(self.clock.now()):
+                self.is_leader = False
+                logger.warning(f"Scheduler leadership lost mid-tick, skipping {len(due) - index} job(s) ({self.lease.owner})")
+                break
+            self._run_job(job)
+            executed.append(job.name)
+        return executed
+
+    def _run_job(self, job: Job) -> None:
+        metrics = job.metrics
+        started_mono = self.clock.monotonic()
+        started_wall = time.perf_counter()
+        metrics.last_started_at = self.clock.now()
+        try:
+            result = job.func(self.clock.now())
+            metrics.last_result = result if isinstance(result, int) else None
+            metrics.last_error = None
+        except Exception as e:
+            metrics.failures += 1
+            metrics.last_error = str(e)[:500]
+            logger.error(f"Scheduled job '{job.name}' failed: {e}", exc_info=True)
+            try:
+                db.session.rollback()
+            except Exception:
+                pass
+        finally:
+            duration_ms = int((time.perf_counter() - started_wall) * 1000)
+            metrics.runs += 1
+            metrics.last_duration_ms = duration_ms
+            metrics.total_duration_ms += duration_ms
+            # Следующий запуск считаем от начала текущего, чтобы не «уплывать» на длительность задачи
+            job.next_run_at = started_mono + job.interval_seconds
+
+    def start_worker(self):
+
+        if self.is_running:
+            return
+
+        if not self.app:
+            logger.warning("Cannot start scheduler worker: app not initialized")
+            return
+
+        self.is_running = True
+        self._stop_event.clear()
+        self.worker_thread = threading.Thread(target=self._worker_loop, name='job-scheduler', daemon=True)
+        self.worker_thread.start()
+        logger.info(f"JobScheduler worker thread started ({self.lease.owner})")
+
+    def stop_worker(self):
+
+        if not self.is_running:
+            return
+        self.is_running = False
+        self._stop_event.set()
+        if self.worker_thread:
+            self.worker_thread.join(timeout=5)
+        if self.is_leader and self.app is not None:
+            try:
+                with self.app.app_context():
+                    self.lease.release()
+            except Exception:
+                pass
+        self.is_leader = False
+        logger.info("JobScheduler worker thread stopped")
+
+    def _worker_loop(self):
+
+        # Небольшая задержка, чтобы приложение успело полностью инициализироваться
+        self._stop_event.wait(1.0)
+
+        while self.is_running and not self._stop_event.is_set():
+            try:
+                self.run_pending()
+            except Exception as e:
+                logger.error(f"Error in scheduler worker: {e}", exc_info=True)
+            self._stop_event.wait(self.tick_seconds)
+
+    def metrics(self) -> dict:
+        """Снимок метрик без обращения к БД (для /health и админки)."""
+        with self._lock:
+            jobs = {name: dict(job.metrics.as_dict(), interval_seconds=job.interval_seconds)
+                    for name, job in self.jobs.items()}
+        return {
+            'running': self.is_running,
+            'leader': self.is_leader,
+            'owner': self.lease.owner,
+            'jobs': jobs,
+        }
+
+
+scheduler = JobScheduler()
@@ -0,0 +1,311 @@
+"""
+Очистка HTML заданий после парсинга: один разбор BeautifulSoup и преобразования дерева.
+
+Раньше clean_html_content сериализовал и заново разбирал HTML после каждого шага
+(до пяти разборов) и гонял ~25 некомпилированных re.sub по всей строке. Здесь те же
+правила применяются к узлам дерева:
+
+- фамилии авторов и «Файлы к заданию» — в одном проходе по текстовым узлам;
+- ответы/видео (№ 6), пустые абзацы и цепочки <br> (№ 5, общий случай) — операциями над деревом;
+- склейка соседних текстовых узлов заменяет повторный разбор, чтобы последующие правила
+  видели то же дерево, что и раньше;
+- нормализация пробелов — скомпилированными выражениями по итоговой строке.
+
+Результат побайтно совпадает с прежней реализацией на фикстурах tasks.json
+(scripts/check_html_sanitizer.py), скорость — scripts/benchmark_html_sanitizer.py.
+"""
+import re
+
+from bs4 import BeautifulSoup, NavigableString, Tag
+
+# 1. Фамилии авторов: (И.О. Фамилия), (И.Фамилия), (И. Фамилия), (Фамилия), Фамилия И.О., Фамилия И., Фамилия Имя
+_AUTHOR_PATTERNS = tuple(re.compile(p) for p in (
+    r'\(\s*[А-ЯЁ]\.\s*[А-ЯЁ]\.\s*[А-ЯЁ][а-яё]+\s*\)',
+    r'\(\s*[А-ЯЁ]\.[А-ЯЁ][а-яё]+\s*\)',
+    r'\(\s*[А-ЯЁ]\.\s*[А-ЯЁ][а-яё]+\s*\)',
+    r'\(\s*[А-ЯЁ][а-яё]{3,}\s*\)',
+    r'\b[А-ЯЁ][а-яё]{3,}\s+[А-ЯЁ]\.\s*[А-ЯЁ]\.',
+    r'\b[А-ЯЁ][а-яё]{3,}\s+[А-ЯЁ]\.',
+    r'\b[А-ЯЁ][а-яё]{3,}\s+[А-ЯЁ][а-яё]{2,}',
+))
+# Быстрый отсев: без заглавной кириллицы ни одно из правил выше не сработает
+_HAS_CAPITAL_CYRILLIC = re.compile(r'[А-ЯЁ]')
+_MULTI_SPACE = re.compile(r'\s{2,}')
+_LEADING_WS = re.compile(r'^\s+')
+
+# 2. «Файлы к заданию», «Прикреплённый файл» и т.п.
+_FILES_PATTERNS = tuple(re.compile(p, re.IGNORECASE) for p in (
+    r'[Фф]айлы?\s+к\s+заданию[:\s-]*[^\n<]*',
+    r'[Фф]айлы?\s+к\s+задаче[:\s-]*[^\n<]*',
+    r'[Пп]рикреплен[а-яё]*\s+файл[а-яё]*[:\s-]*[^\n<]*',
+))
+_FILES_HINT = re.compile(r'файл', re.IGNORECASE)
+
+# 3. Задание 6: ответы и видео
+_ANSWER_OR_VIDEO = re.compile(r'[Оо]твет|[Вв]идео', re.IGNORECASE)
+_ANSWER_HINT = re.compile(r'[Оо]твет|<iframe|<video', re.IGNORECASE)
+_ANSWER_BLOCK = re.compile(r'<[^>]*>.*?[Оо]твет[а-яё]*[:\s]*[^<]*</[^>]*>', re.IGNORECASE | re.DOTALL)
+_ANSWER_LINE = re.compile(r'[Оо]твет[а-яё]*[:\s]*[^\n<]+', re.IGNORECASE)
+_IFRAME_BLOCK = re.compile(r'<iframe[^>]*>.*?</iframe>', re.IGNORECASE | re.DOTALL)
+_VIDEO_BLOCK = re.compile(r'<video[^>]*>.*?</video>', re.IGNORECASE | re.DOTALL)
+
+# Итоговая нормализация строки
+_WS = re.compile(r'\s+')
+_SPACES_TABS = re.compile(r'[ \t]+')
+_BLANK_LINES_BETWEEN_TAGS = re.compile(r'>\s*\n\s*\n\s*<')
+_MANY_NEWLINES = re.compile(r'\n{3,}')
+_DOUBLE_SPACES = re.compile(r' {2,}')
+
+_KEEP_IF_EMPTY = ['img', 'iframe', 'video', 'ul', 'ol', 'table']
+
+
+def _replace_string(node, value: str) -> None:
+    # Тип узла (комментарий, CDATA) сохраняется — как после повторного разбора строки
+    node.replace_with(type(node)(value))
+
+
+def _clean_author_text(text: str) -> str:
+    if _HAS_CAPITAL_CYRILLIC.search(text):
+        for pattern in _AUTHOR_PATTERNS:
+            text = pattern.sub('', text)
+    return _MULTI_SPACE.sub(' ', text)
+
+
+def _clean_text_nodes(soup: BeautifulSoup) -> None:
+    """Фамилии авторов, лишние пробелы и «Файлы к заданию» — один проход по текстовым узлам."""
+    for node in list(soup.descendants):
+        if isinstance(node, Tag):
+            # Прежняя реализация применяла правила ко всей строке, включая значения атрибутов
+            for name, value in list(node.attrs.items()):
+                if isinstance(value, str):
+                    node.attrs[name] = _clean_author_text(value)
+                elif isinstance(value, list):
+                    joined = ' '.join(value)
+                    cleaned = _clean_author_text(joined)
+                    if cleaned != joined:
+                        node.attrs[name] = cleaned.split()
+            continue
+
+        text = str(node)
+        cleaned = _clean_author_text(text)
+        if not cleaned and type(node) is NavigableString:
+            node.extract()
+            continue
+
+        if node.parent is not None and node.parent.name not in ['script', 'style'] and _FILES_HINT.search(cleaned):
+            stripped = cleaned
+            for pattern in _FILES_PATTERNS:
+                stripped = pattern.sub('', stripped)
+            if stripped != cleaned:
+                # Как раньше: replace_with(str) превращает узел в обычный текст
+                node.replace_with(stripped)
+                continue
+
+        if cleaned != text:
+            _replace_string(node, cleaned)
+
+
+_ASCII_SPACES = frozenset(' \n\t\x0c\r')
+_PRESERVE_WHITESPACE = ('pre', 'textarea')
+
+
+def _reparsed_text(text: str, preserve: bool) -> str:
+    # BeautifulSoup сводит строку только из ASCII-пробелов к '\n' или ' ' (кроме <pre>/<textarea>)
+    if preserve or not text or not all(ch in _ASCII_SPACES for ch in text):
+        return text
+    return '\n' if '\n' in text else ' '
+
+
+def _merge_strings(soup: BeautifulSoup) -> None:
+    """Склеивает соседние текстовые узлы и нормализует их — дерево как после повторного разбора строки."""
+    stack = [(soup, False)]
+    while stack:
+        tag, preserve = stack.pop()
+        contents = tag.contents
+        if not contents:
+            continue
+        preserve = preserve or tag.name in _PRESERVE_WHITESPACE
+        stack.extend((child, preserve) for child in contents if isinstance(child, Tag))
+        index = 0
+        while index < len(contents):
+            node = contents[index]
+            if type(node) is not NavigableString:
+                index += 1
+                continue
+            end = index + 1
+            while end < len(contents) and type(contents[end]) is NavigableString:
+                end += 1
+            original = ''.join(contents[index:end])
+            text = _reparsed_text(original, preserve)
+            for extra in contents[index + 1:end]:
+                extra.extract()
+            if not text:
+                node.extract()
+                continue
+            if end - index > 1 or text != original:
+                node.replace_with(NavigableString(text))
+            index += 1
+
+
+def _is_plain_br(node) -> bool:
+    return isinstance(node, Tag) and node.name == 'br' and not node.attrs
+
+
+def _is_blank_string(node) -> bool:
+    return type(node) is NavigableString and not str(node).strip()
+
+
+def _replace_br_runs(soup: BeautifulSoup, min_run: int) -> None:
+    """
+    `(<br/>\\s*)+` -> ' ' по сериализованной строке: цепочки <br> без атрибутов вместе
+    с пробельными узлами между ними и сразу после. Цепочки короче min_run заменяются
+    на пробел без поглощения хвостовых пробелов (`<br/>` -> ' ').
+    """
+    for br in soup.find_all('br'):
+        if br.parent is None or not _is_plain_br(br):
+            continue
+        previous = br.previous_sibling
+        if _is_plain_br(previous) or (_is_blank_string(previous) and _is_plain_br(previous.previous_sibling)):
+            continue  # не начало цепочки — её уже обработали
+        run = [br]
+        node = br.next_sibling
+        while node is not None:
+            if _is_blank_string(node):
+                run.append(node)
+            elif _is_plain_br(node):
+                run.append(node)
+            else:
+                break
+            node = node.next_sibling
+        count = sum(1 for item in run if _is_plain_br(item))
+        if count < min_run:
+            # Одиночный <br> в общем шаге -> пробел, пробелы после него остаются
+            br.replace_with(NavigableString(' '))
+            continue
+        # Регулярное выражение съедало и начальные пробелы следующего текста
+        if type(node) is NavigableString:
+            rest = _LEADING_WS.sub('', str(node), count=1)
+            if rest != str(node):
+                if rest:
+                    node.replace_with(NavigableString(rest))
+                else:
+                    node.extract()
+        run[0].replace_with(NavigableString(' '))
+        for item in run[1:]:
+            item.extract()
+
+
+def _remove_blank_blocks(soup: BeautifulSoup, name: str) -> None:
+    """`<p>\\s*</p>` / `<div>\\s*</div>`: тег без атрибутов, внутри только пробелы; без каскада на родителя."""
+    doomed = [
+        tag for tag in soup.find_all(name)
+        if not tag.attrs and all(_is_blank_string(child) for child in tag.contents)
+    ]
+    for tag in doomed:
+        tag.decompose()
+
+
+def _strip_answers_and_video(soup: BeautifulSoup) -> BeautifulSoup:
+    # Удаление всех элементов, содержащих слово "ответ" или "видео"
+    for elem in soup.find_all(string=_ANSWER_OR_VIDEO):
+        # Узел мог уйти вместе с уже удалённым предком (раньше здесь падало с AttributeError)
+        parent = getattr(elem, 'parent', None)
+        if parent is not None and not parent.decomposed:
+            # Удаляем весь родительский элемент, если он содержит ответ/видео
+            if any(keyword in parent.get_text().lower() for keyword in ['ответ', 'видео']):
+                parent.decompose()
+
+    # Удаление iframe и video тегов
+    for tag in soup.find_all(['iframe', 'video']):
+        tag.decompose()
+
+    # Остатки «ответа» (например, в атрибутах) — редкий путь через строковые правила
+    html_str = str(soup)
+    if not soup.decomposed and not _ANSWER_HINT.search(html_str):
+        return soup
+    html_str = _ANSWER_BLOCK.sub('', html_str)
+    html_str = _ANSWER_LINE.sub('', html_str)
+    html_str = _IFRAME_BLOCK.sub('', html_str)
+    html_str = _VIDEO_BLOCK.sub('', html_str)
+    # Обрезки тегов после regex (`<></>`) html.parser стабилизирует только со второго разбора
+    return BeautifulSoup(str(BeautifulSoup(html_str, 'html.parser')), 'html.parser')
+
+
+def clean_html_content(html: str, task_number: int = None) -> str:
+    """Очистка HTML-контента заданий: удаление фамилий, пустых строк, ответов, видео"""
+    if not html:
+        return html
+
+    soup = BeautifulSoup(html, 'html.parser')
+
+    # 1–2. Фамилии авторов, пробелы, «Файлы к заданию»
+    _clean_text_nodes(soup)
+
+    # 3. Для 6-х заданий: удаление ответов и видео
+    if task_number == 6:
+        soup = _strip_answers_and_video(soup)
+        _merge_strings(soup)
+
+    # 3.1. Для 5-х заданий: все цепочки <br> -> пробел, пустые абзацы и div
+    if task_number == 5:
+        # Все три замены шли по одной строке до повторного разбора — склеиваем узлы только в конце
+        _replace_br_runs(soup, min_run=1)
+        _remove_blank_blocks(soup, 'p')
+        _remove_blank_blocks(soup, 'div')
+        _merge_strings(soup)
+
+    # 3.2. Для 8-х заданий: перенос строки между элементами списков
+    if task_number == 8:
+        for list_tag in soup.find_all(['ul', 'ol']):
+            for li in list_tag.find_all('li', recursive=False):
+                if li.next_sibling and li.next_sibling.name == 'li':
+                    li.insert_after('\n')
+
+    # 4. <br>: цепочки из 2+ и одиночные -> пробел
+    _replace_br_runs(soup, min_run=2)
+    _merge_strings(soup)
+
+    # Удаляем пустые параграфы и div (включая те, что содержат только пробелы)
+    for tag in soup.find_all(['p', 'div']):
+        text_content = tag.get_text(strip=True)
+        if not text_content or text_content.isspace():
+            # Но сохраняем, если внутри есть важные элементы (изображения, списки)
+            if not tag.find_all(_KEEP_IF_EMPTY):
+                tag.decompose()
+
+    # Удаляем пустые теги, которые не несут смысла (содержимое сохраняется)
+    for tag in soup.find_all(['span', 'strong', 'em', 'b', 'i']):
+        if not tag.get_text(strip=True):
+            tag.unwrap()
+
+    # Пробелы в текстовых узлах и data-v-* атрибуты — один проход по тегам
+    for tag in soup.find_all(True):
+        if tag.string:
+            normalized = _WS.sub(' ', tag.string)
+            if normalized != tag.string:
+                tag.string = normalized
+        data_v = [attr for attr in tag.attrs if attr.startswith('data-v-')]
+        for attr in data_v:
+            del tag[attr]
+
+    # 6. Нормализация пробелов и пустых строк
+    html = str(soup)
+    html = _SPACES_TABS.sub(' ', html)
+    html = _BLANK_LINES_BETWEEN_TAGS.sub('><', html)
+    html = _MANY_NEWLINES.sub('\n', html)
+
+    # 7. Не больше одной пустой строки подряд, строки без отступов
+    cleaned_lines = []
+    prev_empty = False
+    for line in html.split('\n'):
+        stripped = line.strip()
+        if not stripped:
+            if not prev_empty:
+                cleaned_lines.append('')
+            prev_empty = True
+        else:
+            cleaned_lines.append(stripped)
+            prev_empty = False
+
+    html = '\n'.join(cleaned_lines).strip()
+    return _DOUBLE_SPACES.sub(' ', html)
@@ -5,7 +5,8 @@ import json
 from playwright.sync_api import sync_playwright, Page
 from playwright_stealth import Stealth
 from urllib.robotparser import RobotFileParser
-from bs4 import BeautifulSoup
+import queue
+import threading
 import time
 
 SITE_DOMAIN = "https://kompege.ru"
@@ -53,171 +54,37 @@ project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(project_root)
 
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
-from core.db_models import Tasks, moscow_now
+from core.db_models import CacheVersion, Tasks
+from scraper.html_sanitizer import clean_html_content
+from scraper.task_upsert import ensure_task_upsert_schema, upsert_tasks
 
 db_path = os.path.join(project_root, 'data', 'keg_tasks.db')
-engine = create_engine(f'sqlite:///{db_path}')
-Session = sessionmaker(bind=engine)
-session = Session()
-
-def clean_html_content(html: str, task_number: int = None) -> str:
-    """Очистка HTML-контента заданий: удаление фамилий, пустых строк, ответов, видео"""
-    if not html:
-        return html
-    
-    # Парсим HTML с помощью BeautifulSoup для более точной обработки
-    soup = BeautifulSoup(html, 'html.parser')
-    
-    # 1. УДАЛЕНИЕ ФАМИЛИЙ (более агрессивное)
-    # Сначала обрабатываем весь HTML как строку для более надежного удаления
-    html_str = str(soup)
-    
-    # Удаление фамилий в скобках (все возможные форматы):
-    # (И.О. Фамилия), (И.О.Фамилия), (И. Фамилия), (И.Фамилия), (Фамилия)
-    html_str = re.sub(r'\(\s*[А-ЯЁ]\.\s*[А-ЯЁ]\.\s*[А-ЯЁ][а-яё]+\s*\)', '', html_str)  # (И.О. Фамилия) или (И.О.Фамилия)
-    html_str = re.sub(r'\(\s*[А-ЯЁ]\.[А-ЯЁ][а-яё]+\s*\)', '', html_str)  # (И.Фамилия) - БЕЗ пробела после точки
-    html_str = re.sub(r'\(\s*[А-ЯЁ]\.\s*[А-ЯЁ][а-яё]+\s*\)', '', html_str)  # (И. Фамилия) - С пробелом
-    html_str = re.sub(r'\(\s*[А-ЯЁ][а-яё]{3,}\s*\)', '', html_str)  # (Фамилия) - только фамилия в скобках
-    
-    # Удаление фамилий без скобок: Фамилия И.О., Фамилия И., Фамилия Имя
-    html_str = re.sub(r'\b[А-ЯЁ][а-яё]{3,}\s+[А-ЯЁ]\.\s*[А-ЯЁ]\.', '', html_str)  # Фамилия И.О.
-    html_str = re.sub(r'\b[А-ЯЁ][а-яё]{3,}\s+[А-ЯЁ]\.', '', html_str)  # Фамилия И.
-    html_str = re.sub(r'\b[А-ЯЁ][а-яё]{3,}\s+[А-ЯЁ][а-яё]{2,}', '', html_str)  # Фамилия Имя
-    
-    # Удаляем множественные пробелы, оставшиеся после удаления фамилий
-    html_str = re.sub(r'\s{2,}', ' ', html_str)
-    
-    # Пересоздаем soup после удаления фамилий
-    soup = BeautifulSoup(html_str, 'html.parser')
-    
-    # 2. УДАЛЕНИЕ СТРОК "Файлы к заданию" и подобных
-    for text_node in soup.find_all(string=True):
-        if text_node.parent and text_node.parent.name not in ['script', 'style']:
-            text = str(text_node)
-            cleaned = re.sub(r'[Фф]айлы?\s+к\s+заданию[:\s-]*[^\n<]*', '', text, flags=re.IGNORECASE)
-            cleaned = re.sub(r'[Фф]айлы?\s+к\s+задаче[:\s-]*[^\n<]*', '', cleaned, flags=re.IGNORECASE)
-            cleaned = re.sub(r'[Пп]рикреплен[а-яё]*\s+файл[а-яё]*[:\s-]*[^\n<]*', '', cleaned, flags=re.IGNORECASE)
-            if cleaned != text:
-                text_node.replace_with(cleaned)
-    
-    # 3. ДЛЯ 6-Х ЗАДАНИЙ: удаление ответов и видео
-    if task_number == 6:
-        # Удаление всех элементов, содержащих слово "ответ" или "видео"
-        for elem in soup.find_all(string=re.compile(r'[Оо]твет|[Вв]идео', re.IGNORECASE)):
-            parent = elem.parent
-            if parent:
-                # Удаляем весь родительский элемент, если он содержит ответ/видео
-                if any(keyword in parent.get_text().lower() for keyword in ['ответ', 'видео']):
-                    parent.decompose()
-        
-        # Удаление iframe и video тегов
-        for tag in soup.find_all(['iframe', 'video']):
-            tag.decompose()
-        
-        # Удаление блоков с ответами через регулярные выражения (на случай, если BeautifulSoup не поймал)
-        html_str = str(soup)
-        html_str = re.sub(r'<[^>]*>.*?[Оо]твет[а-яё]*[:\s]*[^<]*</[^>]*>', '', html_str, flags=re.IGNORECASE | re.DOTALL)
-        html_str = re.sub(r'[Оо]твет[а-яё]*[:\s]*[^\n<]+', '', html_str, flags=re.IGNORECASE)
-        html_str = re.sub(r'<iframe[^>]*>.*?</iframe>', '', html_str, flags=re.IGNORECASE | re.DOTALL)
-        html_str = re.sub(r'<video[^>]*>.*?</video>', '', html_str, flags=re.IGNORECASE | re.DOTALL)
-        soup = BeautifulSoup(html_str, 'html.parser')
-    
-    # 3.1. ДЛЯ 5-Х ЗАДАНИЙ: особо агрессивное удаление пустых строк
-    if task_number == 5:
-        # Удаляем все множественные <br> сразу
-        html_str = str(soup)
-        html_str = re.sub(r'(<br\s*/?>[\s\n]*)+', ' ', html_str, flags=re.IGNORECASE)
-        # Удаляем пустые параграфы и div более агрессивно
-        html_str = re.sub(r'<p>\s*</p>', '', html_str, flags=re.IGNORECASE)
-        html_str = re.sub(r'<div>\s*</div>', '', html_str, flags=re.IGNORECASE)
-        soup = BeautifulSoup(html_str, 'html.parser')
-    
-    # 3.2. ДЛЯ 8-Х ЗАДАНИЙ: правильная обработка списков
-    if task_number == 8:
-        # Убеждаемся, что списки (ul, ol) правильно форматируются
-        for list_tag in soup.find_all(['ul', 'ol']):
-            # Добавляем переносы строк между элементами списка
-            for li in list_tag.find_all('li', recursive=False):
-                if li.next_sibling and li.next_sibling.name == 'li':
-                    # Вставляем перенос строки между элементами
-                    li.insert_after('\n')
-    
-    # 4. УДАЛЕНИЕ ПУСТЫХ СТРОК И ЛИШНИХ ПРОБЕЛОВ (АГРЕССИВНОЕ)
-    html_str = str(soup)
-    
-    # Удаляем ВСЕ множественные <br> (более 1 подряд заменяем на пробел, затем удалим лишние пробелы)
-    html_str = re.sub(r'(<br\s*/?>[\s\n]*){2,}', ' ', html_str, flags=re.IGNORECASE)
-    # Удаляем одиночные <br>, заменяя на пробел
-    html_str = re.sub(r'<br\s*/?>', ' ', html_str, flags=re.IGNORECASE)
-    
-    soup = BeautifulSoup(html_str, 'html.parser')
-    
-    # Удаляем пустые параграфы и div (включая те, что содержат только пробелы)
-    for tag in soup.find_all(['p', 'div']):
-        text_content = tag.get_text(strip=True)
-        # Удаляем, если нет текста или только пробелы/переносы строк
-        if not text_content or text_content.isspace():
-            # Но сохраняем, если внутри есть важные элементы (изображения, списки)
-            if not tag.find_all(['img', 'iframe', 'video', 'ul', 'ol', 'table']):
-                tag.decompose()
-    
-    # Удаляем пустые теги, которые не несут смысла
-    for tag in soup.find_all(['span', 'strong', 'em', 'b', 'i']):
-        if not tag.get_text(strip=True):
-            tag.unwrap()  # Удаляем тег, но сохраняем содержимое (если есть)
-    
-    # Удаляем множественные пробелы внутри тегов
-    for tag in soup.find_all(True):
-        if tag.string:
-            # Нормализуем пробелы в текстовых узлах
-            normalized = re.sub(r'\s+', ' ', tag.string)
-            if normalized != tag.string:
-                tag.string = normalized
-    
-    # 5. УДАЛЕНИЕ data-v-* атрибутов
-    for tag in soup.find_all(True):
-        attrs_to_remove = [attr for attr in tag.attrs if attr.startswith('data-v-')]
-        for attr in attrs_to_remove:
-            del tag[attr]
-    
-    # 6. НОРМАЛИЗАЦИЯ ПРОБЕЛОВ И УДАЛЕНИЕ ПУСТЫХ СТРОК
-    html = str(soup)
-    
-    # Нормализация пробелов: множественные пробелы/табы заменяем на один пробел
-    html = re.sub(r'[ \t]+', ' ', html)
-    
-    # Удаляем пустые строки между тегами (множественные переносы строк)
-    html = re.sub(r'>\s*\n\s*\n\s*<', '><', html)  # Удаляем пустые строки между тегами
-    html = re.sub(r'\n{3,}', '\n', html)  # Более 2 переносов строк заменяем на 1
-    
-    # 7. ФИНАЛЬНАЯ ОЧИСТКА ПУСТЫХ СТРОК (АГРЕССИВНАЯ)
-    lines = html.split('\n')
-    cleaned_lines = []
-    prev_empty = False
-    
-    for line in lines:
-        stripped = line.strip()
-        # Если строка содержит только пробелы, табы или пуста - считаем её пустой
-        if not stripped or stripped.isspace():
-            # Оставляем максимум ОДНУ пустую строку подряд
-            if not prev_empty:
-                cleaned_lines.append('')
-            prev_empty = True
-        else:
-            # Непустая строка
-            cleaned_lines.append(stripped)
-            prev_empty = False
-    
-    html = '\n'.join(cleaned_lines)
-    
-    # Финальная очистка: удаляем пустые строки в начале и конце
-    html = html.strip()
-    
-    # Дополнительно: удаляем множественные пробелы, которые могли остаться
-    html = re.sub(r' {2,}', ' ', html)
-    
-    return html
+engine = create_engine(os.environ.get('SCRAPER_DATABASE_URL') or f'sqlite:///{db_path}')
+_save_lock = threading.Lock()
+
+
+def configure_engine(url: str) -> None:
+    """Переключает парсер на другую БД (replay во временную SQLite, бенчмарки)."""
+    global engine
+    engine = create_engine(url)
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.environ.get(name, default))
+    except (TypeError, ValueError):
+        return default
+
+
+def _bump_task_bank_version():
+    """Upsert идёт Core-запросами мимо ORM-событий — сообщаем веб-приложению об изменении банка явно."""
+    try:
+        from app.utils.task_catalog import bump_task_bank_version
+        with engine.begin() as conn:
+            bump_task_bank_version(conn)
+    except Exception as e:
+        print(f"[ETL] Предупреждение: не удалось обновить версию банка заданий: {e}")
+
 
 def check_robots_txt():
     print(f"[ETL] 1. Проверка {ROBOTS_URL} для User-Agent: {USER_AGENT}...")
@@ -242,449 +109,560 @@ def check_robots_txt():
         print(f"[ETL] Ошибка при чтении robots.txt: {e}. (Продолжаем с осторожностью)")
         return True
 
-def fetch_tasks(page: Page, task_number: int, task_value_url: str):
-    print(f"[ETL] 3. Выбор типа задания {task_number} (value='{task_value_url}')...")
+class RateLimiter:
+    """
+    Глобальная «вежливость» к сайту: не чаще одного запроса в min_interval секунд
+    на все контексты браузера вместе (интервал — Crawl-delay из robots.txt).
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = max(0.0, float(min_interval or 0))
+        self._next_at = 0.0
+        self._lock = threading.Lock()
+        self.waited = 0.0
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            start_at = max(now, self._next_at)
+            self._next_at = start_at + self.min_interval
+            delay = start_at - now
+            self.waited += delay
+        if delay > 0:
+            time.sleep(delay)
+
+
+class ScrapeStats:
+    """Потокобезопасные счётчики прогона (по всем типам заданий)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {'items': 0, 'added': 0, 'updated': 0, 'unchanged': 0, 'failed_types': 0}
+        self.by_type = {}
+
+    def add(self, task_number: int, items: int, saved: dict) -> None:
+        with self._lock:
+            self.totals['items'] += items
+            for key in ('added', 'updated', 'unchanged'):
+                self.totals[key] += saved.get(key, 0)
+            self.by_type[task_number] = dict(saved, items=items)
+
+    def failed(self, task_number: int) -> None:
+        with self._lock:
+            self.totals['failed_types'] += 1
+            self.by_type[task_number] = {'error': True}
+
+    @property
+    def changed(self) -> bool:
+        return bool(self.totals['added'] or self.totals['updated'])
+
+
+# =============================================================================
+# Общий конвейер: сырые записи страницы -> очистка -> upsert (и для сайта, и для replay)
+# =============================================================================
+
+def _full_url(href: str) -> str:
+    if not href:
+        return href
+    if href.startswith('http'):
+        return href
+    if href.startswith('/'):
+        return f"{SITE_DOMAIN}{href}"
+    return f"{SITE_DOMAIN}/{href}"
+
+
+def build_task_rows(task_number: int, items: list) -> list:
+    """Очищает HTML и собирает строки для upsert из записей вида {'taskId', 'contentHtml', 'files', 'answer'}."""
+    rows = []
+    for it in items:
+        if not it.get('taskId'):
+            continue
+
+        content_html = it.get('contentHtml') or ''
+        if not content_html or len(content_html.strip()) < 10:
+            continue
+
+        content_html = clean_html_content(content_html, task_number=task_number)
+        if not content_html or len(content_html.strip()) < 10:
+            continue
+
+        attached_files = []
+        for f in it.get('files', []):
+            href = f.get('href')
+            text = (f.get('text') or '').strip()
+            url = _full_url(href)
+            name = text if text else (href.split('/')[-1] if href else '')
+            if url:
+                attached_files.append({'name': name, 'url': url})
+
+        rows.append({
+            'site_task_id': it.get('taskId'),
+            'source_url': f"{SITE_DOMAIN}/task?id={it['taskId']}",
+            'content_html': content_html,
+            'answer': (it.get('answer') or '').strip(),
+            'attached_files': json.dumps(attached_files, ensure_ascii=False) if attached_files else None,
+        })
+    return rows
+
+
+def save_task_rows(task_number: int, rows: list) -> dict:
+    """Upsert по source_url/site_task_id: task_id сохраняются, пишутся только изменившиеся строки."""
+    # SQLite — один писатель; пишем из воркеров по очереди
+    with _save_lock:
+        with engine.begin() as conn:
+            return upsert_tasks(conn, task_number, rows)
+
+
+def process_task_items(task_number: int, items: list, stats: ScrapeStats = None) -> dict:
+    rows = build_task_rows(task_number, items)
+    saved = save_task_rows(task_number, rows)
+    if stats is not None:
+        stats.add(task_number, len(items), saved)
+    print(f"[ETL] Задание {task_number}: добавлено {saved['added']}, обновлено {saved['updated']}, "
+          f"без изменений {saved['unchanged']} (записей на странице: {len(items)}).")
+    return saved
+
+
+def _prepare_database() -> None:
+    with engine.begin() as conn:
+        # Пустая БД (replay во временную SQLite): таблицы банка и версий кешей
+        Tasks.__table__.create(conn, checkfirst=True)
+        CacheVersion.__table__.create(conn, checkfirst=True)
+        ensure_task_upsert_schema(conn)
+
+
+# =============================================================================
+# Живой сайт: ожидания по событиям страницы вместо фиксированных пауз
+# =============================================================================
+
+_EXTRACT_ROWS_JS = """
+    () => {
+        const rows = document.querySelectorAll('table tbody tr');
+        const result = [];
+        rows.forEach(row => {
+            const taskIdCell = row.querySelector('td:first-child a');
+            const contentCell = row.querySelector('td:nth-child(2) div.task-text');
+            const detailsCell = row.querySelector('td:nth-child(2) span.details');
+            const fileLinks = row.querySelectorAll('td:nth-child(2) a[href*="/file/"]');
+
+            if (!taskIdCell || !contentCell) return;
+
+            const taskId = taskIdCell.getAttribute('href')?.match(/id=(\\d+)/)?.[1];
+            if (!taskId) return;
+
+            const contentHtml = contentCell.innerHTML || '';
+            const details = detailsCell ? detailsCell.textContent.trim() : '';
+
+            const files = [];
+            fileLinks.forEach(link => {
+                const href = link.getAttribute('href') || '';
+                const text = link.textContent.trim();
+                files.push({ href: href, text: text });
+            });
+
+            // Извлекаем ответ, если он есть на странице
+            let answer = '';
+            const answerCell = row.querySelector('td:nth-child(2) .answer, td:nth-child(2) [class*="answer"], td:nth-child(2) [id*="answer"]');
+            if (answerCell) {
+                answer = answerCell.textContent.trim() || answerCell.innerText.trim();
+            }
+            // Также проверяем кнопку "Показать ответ"
+            const showAnswerBtn = row.querySelector('button[onclick*="answer"], button[onclick*="Ответ"], .show-answer, [class*="show-answer"]');
+            if (showAnswerBtn && !answer) {
+                // Пытаемся найти ответ рядом с кнопкой
+                const answerNearBtn = showAnswerBtn.closest('td')?.querySelector('.answer-text, [class*="answer"]');
+                if (answerNearBtn) {
+                    answer = answerNearBtn.textContent.trim();
+                }
+            }
+
+            result.push({
+                taskId: taskId,
+                contentHtml: contentHtml,
+                details: details,
+                files: files,
+                answer: answer
+            });
+        });
+        return result;
+    }
+"""
+
+# Подпись таблицы результатов: по её смене понимаем, что поиск отработал
+_TABLE_SIGNATURE_JS = """
+    () => {
+        const rows = document.querySelectorAll('table tbody tr');
+        const link = rows.length ? rows[0].querySelector('td:first-child a') : null;
+        return rows.length + ':' + (link ? link.getAttribute('href') : '');
+    }
+"""
+
+_TABLE_CHANGED_JS = """
+    (before) => {
+        const rows = document.querySelectorAll('table tbody tr');
+        const link = rows.length ? rows[0].querySelector('td:first-child a') : null;
+        const signature = rows.length + ':' + (link ? link.getAttribute('href') : '');
+        return rows.length > 0 && signature !== before;
+    }
+"""
+
+DROPDOWN_SELECTORS = [
+    DROPDOWN_SELECTOR,
+    "select[name='tasktype']",
+    "select#tasktype",
+    "select.tasktype",
+    "select",
+]
+
+ANSWER_SELECTORS = [
+    '.answer',
+    '[class*="answer"]',
+    '[id*="answer"]',
+    '.solution',
+    '[class*="solution"]',
+    'button[onclick*="answer"]',
+    'button[onclick*="Ответ"]'
+]
+
+SHOW_ANSWER_SELECTOR = 'button:has-text("Показать ответ"), button:has-text("показать ответ"), button[onclick*="answer"]'
+
+
+def _find_dropdown(page: Page, timeout: int = 10000) -> str:
+    """Ждёт появления выпадающего списка типов и возвращает рабочий селектор."""
+    page.wait_for_selector("select", state='visible', timeout=timeout)
+    for selector in DROPDOWN_SELECTORS:
+        try:
+            if page.locator(selector).count() > 0:
+                print(f"[ETL] Селектор найден: {selector}")
+                return selector
+        except Exception:
+            continue
+    raise Exception("Не удалось найти выпадающий список на странице")
 
-    try:
-        if page.is_closed():
-            print(f"[ETL] Ошибка: Страница была закрыта. Перезагружаем...")
-            page.goto(MAIN_PAGE_URL, wait_until='domcontentloaded', timeout=60000)
-            page.wait_for_timeout(2000)
-
-        dropdown_found = False
-        actual_selector = DROPDOWN_SELECTOR
-
-        selectors_to_try = [
-            DROPDOWN_SELECTOR,
-            "select[name='tasktype']",
-            "select#tasktype",
-            "select.tasktype",
-            "select",
-        ]
-
-        for selector in selectors_to_try:
-            try:
-                if page.locator(selector).count() > 0:
-                    page.wait_for_selector(selector, state='visible', timeout=5000)
-                    actual_selector = selector
-                    dropdown_found = True
-                    print(f"[ETL] Селектор найден: {selector}")
-                    break
-            except:
-                continue
 
-        if not dropdown_found:
-            raise Exception("Не удалось найти выпадающий список на странице")
+def open_task_list(page: Page, limiter: RateLimiter) -> str:
+    limiter.wait()
+    page.goto(MAIN_PAGE_URL, wait_until='domcontentloaded', timeout=60000)
+    return _find_dropdown(page)
+
 
+def _click_search(page: Page) -> bool:
+    button_selectors = [
+        "input[type='button'][value='Найти все задачи']",
+        "input[type='button'][value*='Найти все задачи']",
+        "input[value='Найти все задачи']",
+        "input[type='button']",
+    ]
+
+    for button_selector in button_selectors:
         try:
-            # Получаем все доступные значения опций из селекта
-            available_options = page.evaluate("""
-                (selector) => {
-                    const select = document.querySelector(selector);
-                    if (!select) return [];
-                    return Array.from(select.options).map(opt => opt.value);
-                }
-            """, actual_selector)
-
-            if task_value_url not in available_options:
-                print(f"[ETL] ПРЕДУПРЕЖДЕНИЕ: Опция '{task_value_url}' недоступна для задания {task_number}. Доступны: {available_options}")
-                print(f"[ETL] Пропускаем задание {task_number}.")
-                return 0
-
-            page.select_option(actual_selector, value=task_value_url, timeout=10000)
-            print(f"[ETL] Выбрана опция: {task_value_url}")
-        except Exception as e:
-            print(f"[ETL] ОШИБКА при выборе опции '{task_value_url}' для задания {task_number}: {e}")
-            print(f"[ETL] Пропускаем задание {task_number}.")
-            return 0
-
-        button_found = False
-        button_selectors = [
-            "input[type='button'][value='Найти все задачи']",
-            "input[type='button'][value*='Найти все задачи']",
-            "input[value='Найти все задачи']",
-            "input[type='button']",
-        ]
-
-        for button_selector in button_selectors:
-            try:
-                button_locator = page.locator(button_selector)
-                if button_locator.count() > 0:
-                    if button_selector == "input[type='button']":
-                        all_buttons = button_locator.all()
-                        for btn in all_buttons:
-                            try:
-                                value = btn.get_attribute('value') or ''
-                                if 'найти' in value.lower() and 'задач' in value.lower():
-                                    btn.scroll_into_view_if_needed()
-                                    btn.click()
-                                    print(f"[ETL] Нажата кнопка поиска (найдена по value): {value}")
-                                    button_found = True
-                                    break
-                            except:
-                                continue
-                        if button_found:
-                            break
-                    else:
-                        button_locator.first.scroll_into_view_if_needed()
-                        page.wait_for_selector(button_selector, state='visible', timeout=5000)
-                        button_locator.first.click()
-                        print(f"[ETL] Нажата кнопка поиска: {button_selector}")
-                        button_found = True
-                        break
-            except Exception as e:
+            button_locator = page.locator(button_selector)
+            if button_locator.count() == 0:
                 continue
+            if button_selector == "input[type='button']":
+                for btn in button_locator.all():
+                    try:
+                        value = btn.get_attribute('value') or ''
+                        if 'найти' in value.lower() and 'задач' in value.lower():
+                            btn.scroll_into_view_if_needed()
+                            btn.click()
+                            print(f"[ETL] Нажата кнопка поиска (найдена по value): {value}")
+                            return True
+                    except Exception:
+                        continue
+            else:
+                button_locator.first.scroll_into_view_if_needed()
+                button_locator.first.click(timeout=5000)
+                print(f"[ETL] Нажата кнопка поиска: {button_selector}")
+                return True
+        except Exception:
+            continue
+    return False
 
-        if not button_found:
-            raise Exception("Не удалось найти и нажать кнопку 'Найти все задачи'")
-
-        page.wait_for_timeout(2000)  # Увеличиваем ожидание после нажатия кнопки
 
-        # Ждем появления таблицы с заданиями
+def _read_answer(answer_page: Page) -> str:
+    for selector in ANSWER_SELECTORS:
         try:
-            page.wait_for_selector("table tbody tr", timeout=20000)
-        except Exception as e:
-            print(f"[ETL] Предупреждение: таблица не найдена за 20 сек: {e}")
-            # Пытаемся найти альтернативные селекторы
-            try:
-                page.wait_for_selector("table tr", timeout=5000)
-            except:
-                pass
-        
+            answer_elem = answer_page.locator(selector).first
+            if answer_elem.count() > 0:
+                answer_text = answer_elem.inner_text(timeout=2000)
+                if answer_text and len(answer_text.strip()) > 0:
+                    return answer_text.strip()
+        except Exception:
+            continue
+    return ''
+
+
+def fetch_answer(answer_page: Page, site_task_id: str, limiter: RateLimiter) -> str:
+    """Ответ со страницы задания (отдельная вкладка — список результатов остаётся на месте)."""
+    limiter.wait()
+    answer_page.goto(f"{SITE_DOMAIN}/task?id={site_task_id}", wait_until='domcontentloaded', timeout=30000)
+    try:
+        answer_page.wait_for_selector(', '.join(ANSWER_SELECTORS), state='attached', timeout=3000)
+    except Exception:
+        pass
+    answer = _read_answer(answer_page)
+
+    # Если ответ не найден, пытаемся нажать кнопку "Показать ответ"
+    if not answer:
         try:
-            page.wait_for_selector("div.task-text", timeout=5000, state='visible')
+            show_answer_btn = answer_page.locator(SHOW_ANSWER_SELECTOR).first
+            if show_answer_btn.count() > 0:
+                show_answer_btn.click()
+                answer_page.wait_for_selector('.answer, [class*="answer"], [id*="answer"]', state='visible', timeout=3000)
+                answer = _read_answer(answer_page)
         except Exception:
             pass
-        
-        # Дополнительное ожидание для полной загрузки
-        page.wait_for_timeout(1000)
-        
-        # Отладочная информация
-        rows_count = page.locator("table tbody tr").count()
-        print(f"[ETL] Найдено строк в таблице: {rows_count}")
-        
-        print(f"[ETL] Данные для задания {task_number} загружены.")
+    return answer
+
+
+def fetch_task_items(page: Page, task_number: int, task_value_url: str, limiter: RateLimiter) -> list:
+    """Выбирает тип задания, ждёт таблицу результатов и возвращает сырые записи (с ответами)."""
+    print(f"[ETL] 3. Выбор типа задания {task_number} (value='{task_value_url}')...")
+
+    if page.is_closed():
+        raise Exception("Страница была закрыта")
+    actual_selector = _find_dropdown(page, timeout=5000)
+
+    # Получаем все доступные значения опций из селекта
+    available_options = page.evaluate("""
+        (selector) => {
+            const select = document.querySelector(selector);
+            if (!select) return [];
+            return Array.from(select.options).map(opt => opt.value);
+        }
+    """, actual_selector)
+
+    if task_value_url not in available_options:
+        print(f"[ETL] ПРЕДУПРЕЖДЕНИЕ: Опция '{task_value_url}' недоступна для задания {task_number}. Доступны: {available_options}")
+        print(f"[ETL] Пропускаем задание {task_number}.")
+        return []
+
+    page.select_option(actual_selector, value=task_value_url, timeout=10000)
+    print(f"[ETL] Выбрана опция: {task_value_url}")
+
+    before = page.evaluate(_TABLE_SIGNATURE_JS)
+    limiter.wait()
+    if not _click_search(page):
+        raise Exception("Не удалось найти и нажать кнопку 'Найти все задачи'")
+
+    # Ждём, пока таблица результатов сменится, затем — пока не стихнут запросы страницы
+    try:
+        page.wait_for_function(_TABLE_CHANGED_JS, arg=before, timeout=20000)
+    except Exception as e:
+        print(f"[ETL] Предупреждение: таблица не обновилась за 20 сек: {e}")
+    try:
+        page.wait_for_load_state('networkidle', timeout=10000)
+    except Exception:
+        pass
+    try:
+        page.wait_for_selector("div.task-text", timeout=5000, state='visible')
+    except Exception:
+        pass
+
+    items = page.evaluate(_EXTRACT_ROWS_JS)
+    print(f"[ETL] Задание {task_number}: получено {len(items)} записей.")
 
+    missing = [it for it in items if it.get('taskId') and not (it.get('answer') or '').strip()]
+    if missing:
+        answer_page = page.context.new_page()
         try:
-            print("[ETL] Быстрый режим: извлекаем задания через evaluate()...")
-            items = page.evaluate("""
-                () => {
-                    const rows = document.querySelectorAll('table tbody tr');
-                    const result = [];
-                    rows.forEach(row => {
-                        const taskIdCell = row.querySelector('td:first-child a');
-                        const contentCell = row.querySelector('td:nth-child(2) div.task-text');
-                        const detailsCell = row.querySelector('td:nth-child(2) span.details');
-                        const fileLinks = row.querySelectorAll('td:nth-child(2) a[href*="/file/"]');
-                        
-                        if (!taskIdCell || !contentCell) return;
-                        
-                        const taskId = taskIdCell.getAttribute('href')?.match(/id=(\\d+)/)?.[1];
-                        if (!taskId) return;
-                        
-                        const contentHtml = contentCell.innerHTML || '';
-                        const details = detailsCell ? detailsCell.textContent.trim() : '';
-                        
-                        const files = [];
-                        fileLinks.forEach(link => {
-                            const href = link.getAttribute('href') || '';
-                            const text = link.textContent.trim();
-                            files.push({ href: href, text: text });
-                        });
-                        
-                        // Извлекаем ответ, если он есть на странице
-                        let answer = '';
-                        const answerCell = row.querySelector('td:nth-child(2) .answer, td:nth-child(2) [class*="answer"], td:nth-child(2) [id*="answer"]');
-                        if (answerCell) {
-                            answer = answerCell.textContent.trim() || answerCell.innerText.trim();
-                        }
-                        // Также проверяем кнопку "Показать ответ"
-                        const showAnswerBtn = row.querySelector('button[onclick*="answer"], button[onclick*="Ответ"], .show-answer, [class*="show-answer"]');
-                        if (showAnswerBtn && !answer) {
-                            // Пытаемся найти ответ рядом с кнопкой
-                            const answerNearBtn = showAnswerBtn.closest('td')?.querySelector('.answer-text, [class*="answer"]');
-                            if (answerNearBtn) {
-                                answer = answerNearBtn.textContent.trim();
-                            }
-                        }
-                        
-                        result.push({
-                            taskId: taskId,
-                            contentHtml: contentHtml,
-                            details: details,
-                            files: files,
-                            answer: answer
-                        });
-                    });
-                    return result;
-                }
-            """)
-            print(f"[ETL] Быстрый режим: получено {len(items)} записей.")
-
-            def _full_url(href: str) -> str:
-                if not href:
-                    return href
-                if href.startswith('http'):
-                    return href
-                if href.startswith('/'):
-                    return f"{SITE_DOMAIN}{href}"
-                return f"{SITE_DOMAIN}/{href}"
-
-            pre_urls = []
-            for idx, it in enumerate(items, 1):
-                if it.get('taskId'):
-                    pre_urls.append(f"{SITE_DOMAIN}/task?id={it['taskId']}")
-            existing_by_url = {}
-            if pre_urls:
-                try:
-                    existing_tasks = session.query(Tasks).filter(Tasks.source_url.in_(pre_urls)).all()
-                    existing_by_url = {t.source_url: t for t in existing_tasks}
-                except Exception as e:
-                    print(f"[ETL] Предупреждение: не удалось выполнить пакетный запрос существующих задач: {e}")
-                    existing_by_url = {}
-
-            count_added = 0
-            count_skipped = 0
-            count_updated = 0
-            new_tasks_bulk = []
-
-            for idx, it in enumerate(items, 1):
-                if not it.get('taskId'):
-                    continue
-
-                content_html = it.get('contentHtml') or ''
-                if not content_html or len(content_html.strip()) < 10:
-                    continue
-
-                real_task_number = task_number
-                content_html = clean_html_content(content_html, task_number=real_task_number)
-
-                if not content_html or len(content_html.strip()) < 10:
-                    continue
-
-                attached_files = []
-                for f in it.get('files', []):
-                    href = f.get('href')
-                    text = (f.get('text') or '').strip()
-                    url = _full_url(href)
-                    name = text if text else (href.split('/')[-1] if href else '')
-                    if url:
-                        attached_files.append({'name': name, 'url': url})
-                attached_files_json = json.dumps(attached_files, ensure_ascii=False) if attached_files else None
-
-                source_url = f"{SITE_DOMAIN}/task?id={it['taskId']}"
-                
-                # Извлекаем ответ с отдельной страницы задания
-                answer = it.get('answer', '').strip()
-                if not answer and it.get('taskId'):
-                    try:
-                        # Открываем страницу задания для извлечения ответа
-                        task_page_url = f"{SITE_DOMAIN}/task?id={it['taskId']}"
-                        page.goto(task_page_url, wait_until='domcontentloaded', timeout=30000)
-                        page.wait_for_timeout(1000)  # Небольшая задержка для загрузки
-                        
-                        # Ищем ответ на странице
-                        answer_selectors = [
-                            '.answer',
-                            '[class*="answer"]',
-                            '[id*="answer"]',
-                            '.solution',
-                            '[class*="solution"]',
-                            'button[onclick*="answer"]',
-                            'button[onclick*="Ответ"]'
-                        ]
-                        
-                        for selector in answer_selectors:
-                            try:
-                                answer_elem = page.locator(selector).first
-                                if answer_elem.count() > 0:
-                                    answer_text = answer_elem.inner_text(timeout=2000)
-                                    if answer_text and len(answer_text.strip()) > 0:
-                                        answer = answer_text.strip()
-                                        break
-                            except:
-                                continue
-                        
-                        # Если ответ не найден, пытаемся нажать кнопку "Показать ответ"
-                        if not answer:
-                            try:
-                                show_answer_btn = page.locator('button:has-text("Показать ответ"), button:has-text("показать ответ"), button[onclick*="answer"]').first
-                                if show_answer_btn.count() > 0:
-                                    show_answer_btn.click()
-                                    page.wait_for_timeout(500)
-                                    # Теперь ищем ответ
-                                    for selector in answer_selectors:
-                                        try:
-                                            answer_elem = page.locator(selector).first
-                                            if answer_elem.count() > 0:
-                                                answer_text = answer_elem.inner_text(timeout=2000)
-                                                if answer_text and len(answer_text.strip()) > 0:
-                                                    answer = answer_text.strip()
-                                                    break
-                                        except:
-                                            continue
-                            except:
-                                pass
-                        
-                        # Возвращаемся на страницу списка
-                        page.goto(f"{MAIN_PAGE_URL}?tasktype={task_value_url}", wait_until='domcontentloaded', timeout=30000)
-                        page.wait_for_timeout(500)
-                    except Exception as e:
-                        print(f"[ETL] Предупреждение: не удалось извлечь ответ для задания {it.get('taskId')}: {e}")
-                        # Продолжаем работу даже если не удалось извлечь ответ
-
-                existing_task = existing_by_url.get(source_url)
-
-                if existing_task:
-                    updated = False
-                    if existing_task.content_html != content_html:
-                        existing_task.content_html = content_html
-                        existing_task.last_scraped = moscow_now()
-                        updated = True
-                    if existing_task.attached_files != attached_files_json:
-                        existing_task.attached_files = attached_files_json
-                        existing_task.last_scraped = moscow_now()
-                        updated = True
-                    # Обновляем ответ, если он извлечен
-                    if answer and existing_task.answer != answer:
-                        existing_task.answer = answer
-                        existing_task.last_scraped = moscow_now()
-                        updated = True
-                    if it.get('taskId') and not existing_task.site_task_id:
-                        existing_task.site_task_id = it.get('taskId')
-                        updated = True
-                    if updated:
-                        count_updated += 1
-                    else:
-                        count_skipped += 1
-                else:
-                    new_tasks_bulk.append(Tasks(
-                        task_number=real_task_number,
-                        site_task_id=it.get('taskId'),
-                        source_url=source_url,
-                        content_html=content_html,
-                        answer=answer if answer else None,
-                        attached_files=attached_files_json,
-                        last_scraped=moscow_now()
-                    ))
-                    count_added += 1
-
-            if new_tasks_bulk:
+            for it in missing:
                 try:
-                    session.bulk_save_objects(new_tasks_bulk)
+                    it['answer'] = fetch_answer(answer_page, it['taskId'], limiter)
                 except Exception as e:
-                    print(f"[ETL] Предупреждение: пакетная вставка не удалась, сохраняем по одной: {e}")
-                    for obj in new_tasks_bulk:
-                        session.add(obj)
+                    print(f"[ETL] Предупреждение: не удалось извлечь ответ для задания {it.get('taskId')}: {e}")
+                    # Продолжаем работу даже если не удалось извлечь ответ
+        finally:
+            answer_page.close()
+    return items
 
-            try:
-                session.commit()
-            except Exception as e:
-                print(f"[ETL] ОШИБКА при сохранении (быстрый режим): {e}")
-                session.rollback()
-
-            print(f"[ETL] (FAST) Добавлено {count_added}, обновлено {count_updated}, пропущено {count_skipped} для типа {task_number}.")
-            return count_added
-        except Exception as fast_e:
-            print(f"[ETL] КРИТИЧЕСКАЯ ОШИБКА: Быстрый режим не сработал для задания {task_number}: {fast_e}")
-            import traceback
-            traceback.print_exc()
-            try:
-                session.rollback()
-            except Exception:
-                pass
-            return 0
+
+def fetch_tasks(page: Page, task_number: int, task_value_url: str, limiter: RateLimiter = None, stats: ScrapeStats = None):
+    """Один тип задания: выгрузка со страницы и сохранение. Возвращает число добавленных заданий."""
+    limiter = limiter or RateLimiter(CRAWL_DELAY_SEC)
+    try:
+        items = fetch_task_items(page, task_number, task_value_url, limiter)
+        return process_task_items(task_number, items, stats)['added']
     except Exception as e:
         print(f"[ETL] КРИТИЧЕСКАЯ ОШИБКА при обработке задания {task_number}: {e}")
         import traceback
         traceback.print_exc()
-        try:
-            session.rollback()
-        except Exception:
-            pass
+        if stats is not None:
+            stats.failed(task_number)
         print(f"[ETL] Пропускаем задание {task_number} и продолжаем работу.")
         return 0
 
-def run_parser():
-    if not check_robots_txt():
-        return
-
-    print("[ETL] 2. Запуск 'стелс' Playwright в 'ВИДИМОМ' и 'МЕДЛЕННОМ' режиме...")
 
+def _scrape_worker(index: int, work: "queue.Queue", limiter: RateLimiter, stats: ScrapeStats) -> None:
+    """
+    Воркер пула: свой экземпляр Playwright (sync API привязан к потоку) и свой контекст браузера,
+    берёт типы заданий из общей очереди, пока она не опустеет.
+    """
     stealth = Stealth()
     with stealth.use_sync(sync_playwright()) as p:
-
         browser = p.chromium.launch(headless=True)
-
-        context = browser.new_context(user_agent=USER_AGENT)
-        page = context.new_page()
-
         try:
-            print(f"[ETL] Загрузка главной страницы: {MAIN_PAGE_URL}...")
-
-            page.goto(MAIN_PAGE_URL, wait_until='domcontentloaded', timeout=60000)
-
-            print("[ETL] Ожидание полного рендеринга страницы...")
-            page.wait_for_timeout(3000)
-
-            print("[ETL] Поиск выпадающего списка...")
-            dropdown_found = False
-            selectors_to_try = [
-                DROPDOWN_SELECTOR,
-                "select[name='tasktype']",
-                "select#tasktype",
-                "select.tasktype",
-                "select",
-            ]
-
-            for selector in selectors_to_try:
-                try:
-                    if page.locator(selector).count() > 0:
-                        page.wait_for_selector(selector, state='visible', timeout=10000)
-                        print(f"[ETL] Селектор найден и видим: {selector}")
-                        dropdown_found = True
-                        break
-                except Exception as e:
-                    continue
-
-            if not dropdown_found:
-                print(f"[ETL] Отладочная информация:")
+            context = browser.new_context(user_agent=USER_AGENT)
+            page = context.new_page()
+            try:
+                print(f"[ETL] [w{index}] Загрузка главной страницы: {MAIN_PAGE_URL}...")
+                open_task_list(page, limiter)
+            except Exception as e:
+                print(f"[ETL] [w{index}] КРИТИЧЕСКАЯ ОШИБКА: Не удалось загрузить главную страницу или найти селектор. {e}")
                 print(f"[ETL] Текущий URL = {page.url}")
-                try:
-                    print(f"[ETL] Заголовок страницы: {page.title()}")
-                except:
-                    print("[ETL] Не удалось получить заголовок")
+                return
 
+            while True:
                 try:
-                    body_text = page.locator('body').inner_text()[:500] if page.locator('body').count() > 0 else "Не удалось получить текст"
-                    print(f"[ETL] Первые 500 символов страницы: {body_text}")
-                except:
-                    print("[ETL] Не удалось получить текст страницы")
-
-                raise Exception("Не удалось найти выпадающий список на странице")
+                    task_num, task_value = work.get_nowait()
+                except queue.Empty:
+                    break
+                if page.is_closed():
+                    page = context.new_page()
+                    open_task_list(page, limiter)
+                fetch_tasks(page, task_num, task_value, limiter, stats)
+        finally:
+            browser.close()
 
-            print("[ETL] Главная страница и селектор готовы.")
 
-        except Exception as e:
-            print(f"[ETL] КРИТИЧЕСКАЯ ОШИБКА: Не удалось загрузить главную страницу или найти селектор. {e}")
-            print(f"[ETL] Тип ошибки: {type(e).__name__}")
-            try:
-                browser.close()
-            except:
-                pass
-            return
+def run_parser(workers: int = None, task_numbers=None):
+    if not check_robots_txt():
+        return
 
-        total_added = 0
+    _prepare_database()
+
+    types = [(num, value) for num, value in TASKS_TO_SCRAPE.items() if not task_numbers or num in task_numbers]
+    workers = max(1, min(workers or _env_int('SCRAPER_WORKERS', 2), len(types) or 1))
+    limiter = RateLimiter(CRAWL_DELAY_SEC)
+    stats = ScrapeStats()
+    work = queue.Queue()
+    for item in types:
+        work.put(item)
+
+    print(f"[ETL] 2. Запуск Playwright: {workers} контекст(ов) браузера, не чаще 1 запроса в {CRAWL_DELAY_SEC} сек...")
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=_scrape_worker, args=(index, work, limiter, stats), name=f'scraper-{index}')
+        for index in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if stats.changed:
+        _bump_task_bank_version()
+    totals = stats.totals
+    print(f"[ETL] --- Процесс парсинга завершен за {time.monotonic() - started:.1f} сек "
+          f"(ожидание вежливости {limiter.waited:.1f} сек). Всего добавлено новых заданий: {totals['added']}, "
+          f"обновлено: {totals['updated']}, без изменений: {totals['unchanged']}, ошибок по типам: {totals['failed_types']} ---")
+    return stats
+
+
+# =============================================================================
+# Replay: фикстуры (tasks.json / tasks_html_samples_*.json) через тот же конвейер, без сайта
+# =============================================================================
+
+def load_replay_fixture(path: str) -> dict:
+    """
+    Читает выгрузку extract_tasks_html.py ({"<номер>": {"tasks": [...]}}) или плоский список заданий
+    и приводит записи к виду, который возвращает страница: {'taskId', 'contentHtml', 'files', 'answer'}.
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if isinstance(data, dict):
+        tasks = []
+        for number, group in data.items():
+            for task in (group.get('tasks') if isinstance(group, dict) else group) or []:
+                tasks.append(dict(task, task_number=task.get('task_number') or int(number)))
+    else:
+        tasks = list(data)
+
+    items_by_number = {}
+    for task in tasks:
+        try:
+            files = json.loads(task.get('attached_files') or '[]')
+        except (TypeError, ValueError):
+            files = []
+        site_task_id = task.get('site_task_id')
+        if not site_task_id and task.get('source_url'):
+            match = re.search(r'id=(\d+)', task['source_url'])
+            site_task_id = match.group(1) if match else None
+        items_by_number.setdefault(int(task['task_number']), []).append({
+            'taskId': site_task_id,
+            'contentHtml': task.get('content_html') or '',
+            'files': [{'href': f.get('url'), 'text': f.get('name')} for f in files if isinstance(f, dict)],
+            'answer': task.get('answer') or '',
+        })
+    return items_by_number
+
+
+def run_replay(paths: list, repeat: int = 1) -> dict:
+    """Прогоняет фикстуры через очистку и upsert; возвращает время и скорость по фазам для каждого прохода."""
+    _prepare_database()
+    fixtures = {}
+    for path in paths:
+        for number, items in load_replay_fixture(path).items():
+            fixtures.setdefault(number, []).extend(items)
+    total_items = sum(len(items) for items in fixtures.values())
+
+    passes = []
+    for pass_no in range(1, max(1, repeat) + 1):
+        clean_seconds = save_seconds = 0.0
+        totals = {'added': 0, 'updated': 0, 'unchanged': 0}
+        for number in sorted(fixtures):
+            started = time.perf_counter()
+            rows = build_task_rows(number, fixtures[number])
+            clean_seconds += time.perf_counter() - started
+            started = time.perf_counter()
+            saved = save_task_rows(number, rows)
+            save_seconds += time.perf_counter() - started
+            for key in totals:
+                totals[key] += saved[key]
+        elapsed = clean_seconds + save_seconds
+        passes.append(dict(
+            totals,
+            pass_no=pass_no,
+            items=total_items,
+            clean_seconds=round(clean_seconds, 3),
+            save_seconds=round(save_seconds, 3),
+            items_per_s=int(total_items / elapsed) if elapsed else None,
+        ))
+        if totals['added'] or totals['updated']:
+            _bump_task_bank_version()
+    return {'fixtures': paths, 'task_types': len(fixtures), 'passes': passes}
+
+
+def main() -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Парсер заданий kompege.ru (живой сайт или replay фикстур)')
+    parser.add_argument('--workers', type=int, default=None, help='Контекстов браузера параллельно (SCRAPER_WORKERS, по умолчанию 2)')
+    parser.add_argument('--types', default='', help='Номера заданий через запятую (по умолчанию все)')
+    parser.add_argument('--replay', nargs='+', metavar='FIXTURE', help='Фикстуры tasks.json / tasks_html_samples_*.json вместо сайта')
+    parser.add_argument('--repeat', type=int, default=2, help='Проходов replay (второй и далее — путь «без изменений»)')
+    parser.add_argument('--db', default=None, help='URL БД (по умолчанию data/keg_tasks.db; для replay — временная SQLite)')
+    args = parser.parse_args()
+
+    if args.replay:
+        if not args.db:
+            import tempfile
+            args.db = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='scraper_replay_'), 'replay.db')}"
+        configure_engine(args.db)
+        print(f"[ETL] Replay в БД: {args.db}")
+        print(json.dumps(run_replay(args.replay, repeat=args.repeat), ensure_ascii=False, indent=2))
+        return 0
 
-        for task_num, task_value in TASKS_TO_SCRAPE.items():
-            total_added += fetch_tasks(page, task_num, task_value)
-            print(f"[ETL] Ожидание {CRAWL_DELAY_SEC} сек...")
-            time.sleep(CRAWL_DELAY_SEC)
+    if args.db:
+        configure_engine(args.db)
+    print("--- Запуск ETL-скрипта для заполнения базы данных (v10, parallel) ---")
+    print(f"База данных: {engine.url}")
+    task_numbers = {int(x) for x in args.types.split(',') if x.strip()} or None
+    stats = run_parser(workers=args.workers, task_numbers=task_numbers)
+    return 1 if stats is not None and stats.totals['failed_types'] else 0
 
-        browser.close()
-        print(f"[ETL] --- Процесс парсинга завершен. Всего добавлено новых заданий: {total_added} ---")
 
 if __name__ == "__main__":
-    print("--- Запуск ETL-скрипта для заполнения базы данных (v9, Reinstall) ---")
-    print(f"База данных: {db_path}")
-    run_parser()
+    sys.exit(main())
@@ -0,0 +1,139 @@
+"""
+Варианты HTML задания, которые считаются один раз при сохранении (парсер, админка),
+а не в браузере при каждом показе.
+
+- display_html — HTML для показа: без <script>/<style>, обработчиков on* и javascript:-ссылок,
+  без служебных комментариев Vue (<!---->); у картинок loading="lazy", decoding="async"
+  и явные width/height (из атрибутов, inline-стиля или заголовка data:-картинки),
+  у iframe — loading="lazy". Формулы в банке уже свёрстаны KaTeX — разметка не трогается.
+- text_excerpt — простой текст для списков и поиска: формулы KaTeX — их TeX-исходником.
+
+render_key = "<TASK_RENDER_VERSION>:<content_hash>" — варианты пересчитываются только
+при смене содержимого задания или правил рендера.
+"""
+import base64
+import re
+import struct
+from typing import Dict, Optional, Tuple
+
+from bs4 import BeautifulSoup, Comment, NavigableString
+
+TASK_RENDER_VERSION = 1
+EXCERPT_LENGTH = 300
+
+_DROP_TAGS = ('script', 'style', 'noscript', 'object', 'embed')
+_URL_ATTRS = ('href', 'src', 'action', 'formaction')
+_UNSAFE_SCHEMES = ('javascript:', 'vbscript:')
+_BLOCK_TAGS = ('p', 'div', 'br', 'li', 'tr', 'td', 'th', 'table', 'ul', 'ol', 'h1', 'h2', 'h3', 'h4')
+_STYLE_SIZE = re.compile(r'(?<![-\w])(width|height)\s*:\s*(\d+(?:\.\d+)?)px', re.IGNORECASE)
+_DATA_URI = re.compile(r'data:image/[\w.+-]+;base64,', re.IGNORECASE)
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+_WS = re.compile(r'\s+')
+# Для GIF/PNG хватает заголовка, JPEG читаем до маркера SOF
+_DATA_URI_DECODE_LIMIT = 256 * 1024
+
+
+def task_render_key(content_hash: Optional[str]) -> Optional[str]:
+    return f'{TASK_RENDER_VERSION}:{content_hash}' if content_hash else None
+
+
+def _image_size(data: bytes) -> Optional[Tuple[int, int]]:
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        return struct.unpack('<HH', data[6:10])
+    if data[:8] == b'\x89PNG\r\n\x1a\n' and len(data) >= 24:
+        return struct.unpack('>II', data[16:24])
+    if data[:2] == b'\xff\xd8':
+        index = 2
+        while index + 9 < len(data) and data[index] == 0xFF:
+            marker = data[index + 1]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                height, width = struct.unpack('>HH', data[index + 5:index + 9])
+                return width, height
+            index += 2 + struct.unpack('>H', data[index + 2:index + 4])[0]
+    return None
+
+
+def _data_uri_size(src: str) -> Optional[Tuple[int, int]]:
+    match = _DATA_URI.match(src)
+    if not match:
+        return None
+    payload = src[match.end():match.end() + _DATA_URI_DECODE_LIMIT]
+    payload = payload[:len(payload) - len(payload) % 4]
+    try:
+        return _image_size(base64.b64decode(payload))
+    except (ValueError, struct.error):
+        return None
+
+
+def _number(value) -> Optional[float]:
+    match = _NUMBER.fullmatch(str(value or '').strip())
+    return float(match.group()) if match else None
+
+
+def _set_image_size(img) -> None:
+    """Явные width/height резервируют место под картинку до загрузки (без сдвига вёрстки)."""
+    width, height = _number(img.get('width')), _number(img.get('height'))
+    if width is None or height is None:
+        style = {name.lower(): float(value) for name, value in _STYLE_SIZE.findall(img.get('style') or '')}
+        width = width if width is not None else style.get('width')
+        height = height if height is not None else style.get('height')
+    if width is None or height is None:
+        natural = _data_uri_size(img.get('src') or '')
+        if natural and natural[0] and natural[1]:
+            if width is None and height is None:
+                width, height = natural
+            elif height is None:
+                height = width * natural[1] / natural[0]
+            else:
+                width = height * natural[0] / natural[1]
+    if width is not None and height is not None:
+        img['width'] = str(round(width))
+        img['height'] = str(round(height))
+
+
+def _excerpt(text: str, length: int = EXCERPT_LENGTH) -> str:
+    if len(text) <= length:
+        return text
+    cut = text[:length]
+    space = cut.rfind(' ')
+    if space > length * 0.6:
+        cut = cut[:space]
+    return cut.rstrip(' ,;:.-—') + '…'
+
+
+def _plain_text(soup: BeautifulSoup) -> str:
+    # Формула KaTeX — видимая вёрстка + MathML-копия; в текст идёт один TeX-исходник
+    for formula in soup.find_all(class_='katex'):
+        annotation = formula.find('annotation')
+        formula.replace_with(NavigableString(f' {annotation.get_text()} ' if annotation else formula.get_text('')))
+    for tag in soup.find_all(_BLOCK_TAGS):
+        tag.insert_after(NavigableString(' '))
+    return _WS.sub(' ', soup.get_text('')).strip()
+
+
+def render_task_variants(content_html: Optional[str]) -> Dict[str, Optional[str]]:
+    """{'display_html', 'text_excerpt'} для content_html задания."""
+    if not content_html:
+        return {'display_html': content_html, 'text_excerpt': ''}
+
+    soup = BeautifulSoup(content_html, 'html.parser')
+    for comment in soup.find_all(string=lambda node: isinstance(node, Comment)):
+        comment.extract()
+    for tag in soup.find_all(_DROP_TAGS):
+        tag.decompose()
+    for tag in soup.find_all(True):
+        for attr in [name for name in tag.attrs if name.lower().startswith('on')]:
+            del tag[attr]
+        for attr in _URL_ATTRS:
+            value = tag.get(attr)
+            if isinstance(value, str) and value.strip().lower().startswith(_UNSAFE_SCHEMES):
+                del tag[attr]
+        if tag.name == 'img':
+            tag['loading'] = 'lazy'
+            tag['decoding'] = 'async'
+            _set_image_size(tag)
+        elif tag.name == 'iframe':
+            tag['loading'] = 'lazy'
+    display_html = str(soup)
+
+    return {'display_html': display_html, 'text_excerpt': _excerpt(_plain_text(soup))}
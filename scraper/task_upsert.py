@@ -0,0 +1,188 @@
+"""
+Upsert заданий банка по естественному ключу (source_url, затем site_task_id).
+
+Повторный парсинг обновляет существующие строки Tasks на месте — task_id не меняется,
+поэтому SkippedTasks / BlacklistTasks / UsageHistory / LessonTasks / AssignmentTasks
+остаются валидными без выгрузки и восстановления связей.
+
+Изменение определяется по content_hash (sha256 от content_html, answer, attached_files):
+неизменившиеся задания не трогаются вовсе, изменившиеся обновляются одним executemany,
+новые вставляются одним INSERT. Вместе с содержимым пишутся варианты для показа
+(scraper/task_render.py); для неизменившихся они досчитываются, только если устарел render_key.
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import bindparam, inspect, insert, select, text, update
+
+from core.db_models import Tasks, moscow_now
+from scraper.task_render import render_task_variants, task_render_key
+
+# Ограничение на число параметров в IN (SQLite по умолчанию — 999 в старых сборках)
+LOOKUP_CHUNK = 500
+
+
+def task_content_hash(content_html: Optional[str], answer: Optional[str], attached_files: Optional[str]) -> str:
+    payload = json.dumps([content_html or '', answer or '', attached_files or ''], ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# Колонки, добавленные в Tasks после создания первых БД
+_ADDED_COLUMNS = (
+    ('content_hash', 'VARCHAR(64)'),
+    ('display_html', 'TEXT'),
+    ('text_excerpt', 'TEXT'),
+    ('render_key', 'VARCHAR(80)'),
+)
+
+
+def ensure_task_upsert_schema(conn) -> None:
+    """Колонки content_hash / вариантов показа и индексы по естественным ключам (для БД, созданных до их появления)."""
+    columns = {col['name'] for col in inspect(conn).get_columns(Tasks.__tablename__)}
+    for name, column_type in _ADDED_COLUMNS:
+        if name not in columns:
+            conn.execute(text(f'ALTER TABLE "{Tasks.__tablename__}" ADD COLUMN {name} {column_type}'))
+    for index_name, column in (('ix_tasks_source_url', 'source_url'), ('ix_tasks_site_task_id', 'site_task_id')):
+        conn.execute(text(f'CREATE INDEX IF NOT EXISTS {index_name} ON "{Tasks.__tablename__}"({column})'))
+
+
+def _chunks(values: List, size: int = LOOKUP_CHUNK) -> Iterable[List]:
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _load_existing(conn, source_urls: List[str], site_ids: List[str]) -> List[Dict]:
+    found = {}
+    columns = (Tasks.task_id, Tasks.site_task_id, Tasks.source_url, Tasks.content_hash, Tasks.answer, Tasks.render_key)
+    for column, values in ((Tasks.source_url, source_urls), (Tasks.site_task_id, site_ids)):
+        for chunk in _chunks(values):
+            for row in conn.execute(select(*columns).where(column.in_(chunk))).mappings():
+                found[row['task_id']] = dict(row)
+
+    # Строки без хеша (сохранены до его появления) — хеш считаем по сохранённому содержимому
+    legacy_ids = [task_id for task_id, row in found.items() if row['content_hash'] is None]
+    for chunk in _chunks(legacy_ids):
+        for row in conn.execute(
+            select(Tasks.task_id, Tasks.content_html, Tasks.answer, Tasks.attached_files).where(Tasks.task_id.in_(chunk))
+        ).mappings():
+            found[row['task_id']]['stored_hash'] = task_content_hash(row['content_html'], row['answer'], row['attached_files'])
+    return sorted(found.values(), key=lambda r: r['task_id'])
+
+
+def upsert_tasks(conn, task_number: int, items: List[Dict]) -> Dict[str, int]:
+    """
+    items: [{'site_task_id', 'source_url', 'content_html', 'answer', 'attached_files'}, ...]
+    Пустой ответ со страницы не затирает уже сохранённый (как и раньше в парсере).
+    Возвращает {'added', 'updated', 'unchanged'}; транзакцией управляет вызывающий.
+    """
+    # Дубликаты внутри выдачи: последняя запись по ключу выигрывает
+    incoming: Dict[str, Dict] = {}
+    for item in items:
+        key = item.get('source_url') or item.get('site_task_id')
+        if key:
+            incoming[key] = item
+    if not incoming:
+        return {'added': 0, 'updated': 0, 'unchanged': 0}
+
+    existing = _load_existing(
+        conn,
+        [i['source_url'] for i in incoming.values() if i.get('source_url')],
+        [i['site_task_id'] for i in incoming.values() if i.get('site_task_id')],
+    )
+    by_url = {}
+    by_site_id = {}
+    for row in existing:
+        # При дублях в старых данных берём самую раннюю строку — на неё обычно и ссылаются
+        if row['source_url']:
+            by_url.setdefault(row['source_url'], row)
+        if row['site_task_id']:
+            by_site_id.setdefault(row['site_task_id'], row)
+
+    now = moscow_now()
+    to_insert, to_update, to_backfill = [], [], []
+    unchanged = 0
+    seen_ids = set()
+    for item in incoming.values():
+        row = by_url.get(item.get('source_url')) or by_site_id.get(item.get('site_task_id'))
+        if row is not None and row['task_id'] in seen_ids:
+            continue
+        answer = (item.get('answer') or '').strip() or None
+        if row is None:
+            content_hash = task_content_hash(item['content_html'], answer, item.get('attached_files'))
+            to_insert.append({
+                'task_number': task_number,
+                'site_task_id': item.get('site_task_id'),
+                'source_url': item.get('source_url'),
+                'content_html': item['content_html'],
+                'answer': answer,
+                'attached_files': item.get('attached_files'),
+                'content_hash': content_hash,
+                'render_key': task_render_key(content_hash),
+                'last_scraped': now,
+                **render_task_variants(item['content_html']),
+            })
+            continue
+
+        seen_ids.add(row['task_id'])
+        answer = answer or row['answer']
+        new_hash = task_content_hash(item['content_html'], answer, item.get('attached_files'))
+        stored_hash = row['content_hash'] or row.get('stored_hash')
+        keys_missing = (not row['site_task_id'] and item.get('site_task_id')) or (not row['source_url'] and item.get('source_url'))
+        if new_hash != stored_hash:
+            to_update.append({
+                'b_task_id': row['task_id'],
+                'content_html': item['content_html'],
+                'answer': answer,
+                'attached_files': item.get('attached_files'),
+                'content_hash': new_hash,
+                'render_key': task_render_key(new_hash),
+                'site_task_id': row['site_task_id'] or item.get('site_task_id'),
+                'source_url': row['source_url'] or item.get('source_url'),
+                'last_scraped': now,
+                **render_task_variants(item['content_html']),
+            })
+        else:
+            unchanged += 1
+            if row['content_hash'] is None or keys_missing or row['render_key'] != task_render_key(new_hash):
+                # Данные те же — дописываем хеш/ключ и варианты показа, last_scraped не трогаем
+                to_backfill.append({
+                    'b_task_id': row['task_id'],
+                    'content_hash': new_hash,
+                    'render_key': task_render_key(new_hash),
+                    'site_task_id': row['site_task_id'] or item.get('site_task_id'),
+                    'source_url': row['source_url'] or item.get('source_url'),
+                    **render_task_variants(item['content_html']),
+                })
+
+    if to_update:
+        conn.execute(
+            update(Tasks.__table__).where(Tasks.__table__.c.task_id == bindparam('b_task_id')).values(
+                content_html=bindparam('content_html'),
+                answer=bindparam('answer'),
+                attached_files=bindparam('attached_files'),
+                content_hash=bindparam('content_hash'),
+                display_html=bindparam('display_html'),
+                text_excerpt=bindparam('text_excerpt'),
+                render_key=bindparam('render_key'),
+                site_task_id=bindparam('site_task_id'),
+                source_url=bindparam('source_url'),
+                last_scraped=bindparam('last_scraped'),
+            ),
+            to_update,
+        )
+    if to_backfill:
+        conn.execute(
+            update(Tasks.__table__).where(Tasks.__table__.c.task_id == bindparam('b_task_id')).values(
+                content_hash=bindparam('content_hash'),
+                display_html=bindparam('display_html'),
+                text_excerpt=bindparam('text_excerpt'),
+                render_key=bindparam('render_key'),
+                site_task_id=bindparam('site_task_id'),
+                source_url=bindparam('source_url'),
+            ),
+            to_backfill,
+        )
+    if to_insert:
+        conn.execute(insert(Tasks.__table__), to_insert)
+    return {'added': len(to_insert), 'updated': len(to_update), 'unchanged': unchanged}
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк загрузки knowledge-паков тренажёра: чтение с диска на каждый rerun против KnowledgeStore.
+
+  python scripts/bench_trainer_knowledge.py --packs 27 --reruns 2000
+
+Во временной папке создаются `--packs` паков по образцу trainer_knowledge/tasks (по 27 номерам ЕГЭ),
+затем имитируется rerun Streamlit-скрипта: загрузка пака текущей задачи.
+"""
+
+import os
+import sys
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from trainer_app.knowledge import KnowledgeStore, _read_task_knowledge, _tasks_dir  # noqa: E402
+
+
+def _sample_pack() -> dict:
+    for name in sorted(os.listdir(_tasks_dir())):
+        if name[0].isdigit() and name.endswith('.json'):
+            with open(os.path.join(_tasks_dir(), name), encoding='utf-8') as f:
+                return json.load(f)
+    return {'task_id': 1, 'task_number': 1, 'hint_ladder': [{'level': 1, 'hint': 'x'}], 'tests': []}
+
+
+def _make_packs(root: str, count: int) -> list:
+    sample = _sample_pack()
+    ids = []
+    for i in range(count):
+        pack = dict(sample, task_id=100000 + i, task_number=(i % 27) + 1)
+        with open(os.path.join(root, f'{100000 + i}.json'), 'w', encoding='utf-8') as f:
+            json.dump(pack, f, ensure_ascii=False, indent=2)
+        ids.append(100000 + i)
+    return ids
+
+
+def _timeit(label: str, fn, ids: list, reruns: int) -> float:
+    started = time.perf_counter()
+    for n in range(reruns):
+        fn(ids[n % len(ids)])
+    per_rerun_us = (time.perf_counter() - started) / reruns * 1e6
+    print(f"{label:<10} {per_rerun_us:9.1f} us/rerun")
+    return per_rerun_us
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк knowledge-паков: диск vs KnowledgeStore')
+    parser.add_argument('--packs', type=int, default=27)
+    parser.add_argument('--reruns', type=int, default=2000)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='trainer_knowledge_')
+    try:
+        ids = _make_packs(root, args.packs)
+
+        before = _timeit('disk', lambda tid: _read_task_knowledge(os.path.join(root, f'{tid}.json'), strict=False),
+                         ids, args.reruns)
+
+        store = KnowledgeStore(root)
+        t0 = time.perf_counter()
+        loaded = store.preload()
+        print(f"preload    {loaded} packs in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        after = _timeit('store', store.get, ids, args.reruns)
+
+        # Изменение файла подхватывается без перезапуска
+        path = os.path.join(root, f'{ids[0]}.json')
+        with open(path, encoding='utf-8') as f:
+            pack = json.load(f)
+        pack['title'] = 'changed'
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(pack, f, ensure_ascii=False)
+        reloaded = store.get(ids[0])
+        print(f"speedup    x{before / after:.1f}  stats={store.stats()}  reload_ok={reloaded.get('title') == 'changed'}")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк раннера тренажёра: spawn-per-run против пула (fork-сервер).
+
+  python scripts/bench_trainer_runner.py --runs 60 --concurrency 4 --pool-size 4
+
+Для каждого режима прогоняется одна и та же короткая программа с solve(s) и парой тестов,
+печатаются runs/s и p50/p95 латентности одного запуска.
+"""
+
+import os
+import sys
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from trainer_app.runner.sandbox import SandboxPool, _run_spawn, _get_allowed_imports  # noqa: E402
+
+CODE = """
+def solve(s):
+    return sum(int(c) for c in str(s))
+"""
+TESTS = [
+    {'name': 't1', 'input': 12345, 'expected': '15'},
+    {'name': 't2', 'input': 999, 'expected': '27'},
+]
+
+
+def _job():
+    return {'mode': 'solve', 'code': CODE, 'tests': TESTS,
+            'allow_imports': _get_allowed_imports(), 'out_limit': 12000, 'cpu_seconds': 3}
+
+
+def _bench(name, run_one, runs, concurrency):
+    latencies = []
+
+    def task(_):
+        t0 = time.perf_counter()
+        res = run_one()
+        latencies.append(time.perf_counter() - t0)
+        return res
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as ex:
+        results = list(ex.map(task, range(runs)))
+    elapsed = time.perf_counter() - started
+
+    failed = sum(1 for r in results if not (r.get('ok') and all(t.get('ok') for t in r.get('results') or [])))
+    latencies.sort()
+    p95 = latencies[max(0, int(len(latencies) * 0.95) - 1)]
+    print(f"{name:<8} runs={runs} conc={concurrency} {runs / elapsed:7.1f} runs/s  "
+          f"p50={statistics.median(latencies) * 1000:6.1f}ms  p95={p95 * 1000:6.1f}ms  failed={failed}")
+    return runs / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарк раннера: spawn-per-run vs пул воркеров')
+    parser.add_argument('--runs', type=int, default=60)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=4)
+    parser.add_argument('--timeout', type=float, default=5.0)
+    args = parser.parse_args()
+
+    spawn_rps = _bench('spawn', lambda: _run_spawn(_job(), args.timeout), args.runs, args.concurrency)
+
+    pool = SandboxPool(size=args.pool_size, max_queue=args.runs, queue_timeout=60)
+    pool.prestart()
+    time.sleep(0.5)  # дать fork-серверу загрузиться, как в долгоживущем процессе
+    try:
+        pool_rps = _bench('pool', lambda: pool.run(_job(), args.timeout), args.runs, args.concurrency)
+    finally:
+        pool.close()
+
+    print(f"speedup: x{pool_rps / spawn_rps:.2f}  pool stats: {pool.stats}")
+
+
+if __name__ == '__main__':
+    main()
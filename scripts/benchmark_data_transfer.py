@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк потокового экспорта/импорта (app/main/data_transfer.py) на временной SQLite.
+
+  python scripts/benchmark_data_transfer.py --lessons 100000 --max-mb 64
+
+Генерирует NDJSON-файл (ученики + уроки), импортирует его DataImporter'ом пакетами,
+затем потоково экспортирует обратно и сверяет количество. Печатает время, скорость
+и пик памяти Python (tracemalloc) для каждой фазы; код выхода 1, если пик превысил --max-mb
+или количество записей не сошлось. Под tracemalloc время примерно вдвое больше реального.
+"""
+
+import os
+import sys
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def write_fixture(path: str, students: int, lessons: int, seed: int) -> None:
+    rnd = random.Random(seed)
+    start = datetime(2024, 9, 1, 10, 0)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(json.dumps({'type': 'meta', 'format': 'keg-export', 'version': 2}) + '\n')
+        for i in range(1, students + 1):
+            f.write(json.dumps({'type': 'student', 'student_id': i, 'name': f'Ученик {i}',
+                                'platform_id': f'p{i}', 'category': 'ЕГЭ', 'school_class': 11},
+                               ensure_ascii=False) + '\n')
+        for i in range(lessons):
+            f.write(json.dumps({
+                'type': 'lesson',
+                'student_id': rnd.randint(1, students),
+                'lesson_type': 'regular',
+                'lesson_date': (start + timedelta(hours=i % 5000)).isoformat(),
+                'duration': 60,
+                'status': 'completed',
+                'topic': f'Тема {i % 27}',
+                'notes': 'Заметка ' * rnd.randint(0, 8),
+                'homework': 'ДЗ',
+                'homework_status': 'assigned_done',
+            }, ensure_ascii=False) + '\n')
+
+
+def measure(func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak / (1024 * 1024)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк потокового экспорта/импорта')
+    parser.add_argument('--students', type=int, default=300)
+    parser.add_argument('--lessons', type=int, default=100000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--max-mb', type=float, default=64.0, help='Потолок пика памяти Python на фазу, МБ')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix='data_transfer_')
+    fixture = os.path.join(tmp, 'export.ndjson')
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+    os.environ.setdefault('SCHEDULER_MODE', 'off')
+
+    write_fixture(fixture, args.students, args.lessons, args.seed)
+
+    import logging
+    logging.disable(logging.INFO)
+    from app import create_app
+    from app.models import db, Lesson, Student
+    from app.main.data_transfer import DataImporter, iter_import_records, export_ndjson
+
+    app = create_app()
+    report = {'fixture_mb': round(os.path.getsize(fixture) / (1024 * 1024), 1)}
+    problems = []
+    with app.app_context():
+        db.create_all()
+
+        def do_import():
+            with open(fixture, 'rb') as f:
+                return DataImporter(chunk_size=args.chunk_size).run(iter_import_records(f, fixture))
+
+        stats, elapsed, peak = measure(do_import)
+        report['import'] = {'seconds': round(elapsed, 2), 'lessons_per_s': int(stats['lessons'] / elapsed),
+                            'peak_mb': round(peak, 1), **stats}
+
+        def do_export():
+            size = 0
+            counts = {}
+            for chunk in export_ndjson(counts):
+                size += len(chunk.encode('utf-8'))
+            return size, counts
+
+        (size, counts), elapsed, peak = measure(do_export)
+        report['export'] = {'seconds': round(elapsed, 2), 'mb': round(size / (1024 * 1024), 1),
+                            'peak_mb': round(peak, 1), **counts}
+        report['db'] = {'students': db.session.query(Student).count(), 'lessons': db.session.query(Lesson).count()}
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if report['import']['lessons'] != args.lessons:
+        problems.append(f"imported {report['import']['lessons']} of {args.lessons} lessons")
+    if report['export']['lessons'] != report['db']['lessons']:
+        problems.append('export lesson count does not match database')
+    for phase in ('import', 'export'):
+        if report[phase]['peak_mb'] > args.max_mb:
+            problems.append(f"{phase} peak {report[phase]['peak_mb']} MB exceeds {args.max_mb} MB")
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
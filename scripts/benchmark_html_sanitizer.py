@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк очистки HTML заданий (scraper/html_sanitizer.py): заданий в секунду.
+
+  python scripts/benchmark_html_sanitizer.py --repeat 5
+
+Прогоняет clean_html_content по заданиям фикстур (tasks.json, tasks_html_samples_*.json)
+с их собственными номерами — как это делает парсер при сохранении.
+"""
+
+import os
+import sys
+import argparse
+import json
+import statistics
+import time
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scraper.html_sanitizer import clean_html_content  # noqa: E402
+from scripts.check_html_sanitizer import default_fixtures  # noqa: E402
+
+
+def load_tasks(paths: list) -> list:
+    tasks = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        for group in data.values():
+            for task in group.get('tasks', []):
+                if task.get('content_html'):
+                    tasks.append((task['content_html'], task.get('task_number')))
+    return tasks
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Бенчмарк clean_html_content')
+    parser.add_argument('fixtures', nargs='*', help='Фикстуры заданий (по умолчанию tasks.json и tasks_html_samples_*.json)')
+    parser.add_argument('--repeat', type=int, default=5, help='Число прогонов по всем заданиям')
+    args = parser.parse_args()
+
+    tasks = load_tasks(args.fixtures or default_fixtures())
+    if not tasks:
+        print('Фикстуры не найдены')
+        return 1
+    total_bytes = sum(len(html.encode('utf-8')) for html, _ in tasks)
+
+    rates = []
+    for _ in range(max(args.repeat, 1)):
+        started = time.perf_counter()
+        for html, task_number in tasks:
+            clean_html_content(html, task_number=task_number)
+        rates.append(len(tasks) / (time.perf_counter() - started))
+
+    print(f'Заданий: {len(tasks)} ({total_bytes / 1024:.0f} КБ HTML), прогонов: {len(rates)}')
+    print(f'Заданий/с: медиана {statistics.median(rates):.1f}, лучший {max(rates):.1f}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка scraper/html_sanitizer.py по эталонам: sha256 результата clean_html_content
+для каждого задания из фикстур (tasks.json, tasks_html_samples_*.json).
+
+  python scripts/check_html_sanitizer.py            # сверить с эталоном
+  python scripts/check_html_sanitizer.py --update   # перезаписать эталон (после осознанной смены правил)
+
+Каждое задание прогоняется со своим номером и с номерами 5, 6, 8 — у них отдельные ветки очистки.
+Код выхода 1, если хотя бы один результат разошёлся с эталоном.
+"""
+
+import os
+import sys
+import argparse
+import glob
+import hashlib
+import json
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from scraper.html_sanitizer import clean_html_content  # noqa: E402
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+GOLDEN_PATH = os.path.join(REPO_ROOT, 'scraper', 'html_sanitizer_golden.json')
+SPECIAL_TASK_NUMBERS = (5, 6, 8)
+
+
+def default_fixtures() -> list:
+    paths = [os.path.join(REPO_ROOT, 'tasks.json')]
+    paths += sorted(glob.glob(os.path.join(REPO_ROOT, 'tasks_html_samples_*.json')))
+    return [p for p in paths if os.path.exists(p)]
+
+
+def iter_cases(paths: list):
+    """(ключ, html, номер задания) для каждого задания фикстур и каждой ветки очистки."""
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        name = os.path.basename(path)
+        for group in data.values():
+            for task in group.get('tasks', []):
+                task_id = task.get('site_task_id') or task.get('task_id')
+                numbers = sorted({task.get('task_number'), *SPECIAL_TASK_NUMBERS}, key=lambda n: (n is None, n))
+                for number in numbers:
+                    yield f'{name}:{task_id}:{number}', task.get('content_html') or '', number
+
+
+def compute_digests(paths: list, clean=clean_html_content) -> dict:
+    digests = {}
+    for key, html, number in iter_cases(paths):
+        result = clean(html, task_number=number)
+        digests[key] = hashlib.sha256((result or '').encode('utf-8')).hexdigest()
+    return digests
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Сверка clean_html_content с эталонными хешами')
+    parser.add_argument('fixtures', nargs='*', help='Фикстуры заданий (по умолчанию tasks.json и tasks_html_samples_*.json)')
+    parser.add_argument('--golden', default=GOLDEN_PATH, help='Файл эталонных хешей')
+    parser.add_argument('--update', action='store_true', help='Перезаписать эталон текущими результатами')
+    args = parser.parse_args()
+
+    paths = args.fixtures or default_fixtures()
+    if not paths:
+        print('Фикстуры не найдены')
+        return 1
+    digests = compute_digests(paths)
+
+    if args.update:
+        with open(args.golden, 'w', encoding='utf-8') as f:
+            json.dump(digests, f, ensure_ascii=False, indent=1, sort_keys=True)
+            f.write('\n')
+        print(f'Эталон обновлён: {len(digests)} результатов -> {args.golden}')
+        return 0
+
+    with open(args.golden, encoding='utf-8') as f:
+        golden = json.load(f)
+    missing = sorted(set(digests) - set(golden))
+    changed = sorted(key for key in digests if key in golden and golden[key] != digests[key])
+    for key in changed[:20]:
+        print(f'  РАСХОЖДЕНИЕ {key}')
+    if missing:
+        print(f'  Нет в эталоне: {len(missing)} (например, {missing[0]})')
+    print(f'Проверено {len(digests)}: расхождений {len(changed)}, без эталона {len(missing)}')
+    return 1 if changed or missing else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
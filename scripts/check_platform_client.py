@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка PlatformClient тренажёра против локального Flask-сервера.
+
+  python scripts/check_platform_client.py
+
+Поднимает в потоке маленькое Flask-приложение с эндпоинтами /internal/trainer/*
+(медленная статистика, «мигающий» 503, счётчики запросов и TCP-соединений) и проверяет:
+keep-alive, склейку одновременных GET, TTL-кеш, инвалидацию истории после save_session,
+ретраи GET и отсутствие ретраев POST.
+"""
+
+import io
+import os
+import sys
+import json
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from flask import Flask, jsonify, request  # noqa: E402
+
+
+def make_keepalive_server(wsgi_app) -> ThreadingHTTPServer:
+    """
+    Минимальный HTTP/1.1 WSGI-сервер с keep-alive (dev-сервер werkzeug всегда закрывает соединение,
+    а нам нужно проверить переиспользование соединений клиентом).
+    """
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, fmt, *args):
+            return
+
+        def _handle(self):
+            url = urlsplit(self.path)
+            body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            environ = {
+                'REQUEST_METHOD': self.command,
+                'PATH_INFO': url.path,
+                'QUERY_STRING': url.query,
+                'CONTENT_TYPE': self.headers.get('Content-Type') or '',
+                'CONTENT_LENGTH': str(len(body)),
+                'SERVER_NAME': '127.0.0.1',
+                'SERVER_PORT': str(self.server.server_port),
+                'SERVER_PROTOCOL': 'HTTP/1.1',
+                'REMOTE_ADDR': self.client_address[0],
+                'REMOTE_PORT': self.client_address[1],
+                'wsgi.version': (1, 0),
+                'wsgi.url_scheme': 'http',
+                'wsgi.input': io.BytesIO(body),
+                'wsgi.errors': sys.stderr,
+                'wsgi.multithread': True,
+                'wsgi.multiprocess': False,
+                'wsgi.run_once': False,
+            }
+            for k, v in self.headers.items():
+                environ['HTTP_' + k.upper().replace('-', '_')] = v
+            started = {}
+
+            def start_response(status, headers, exc_info=None):
+                started['status'], started['headers'] = status, headers
+
+            chunks = wsgi_app(environ, start_response)
+            payload = b''.join(chunks)
+            if hasattr(chunks, 'close'):
+                chunks.close()
+            code, _, reason = started['status'].partition(' ')
+            self.send_response(int(code), reason)
+            for k, v in started['headers']:
+                if k.lower() not in ('content-length', 'connection'):
+                    self.send_header(k, v)
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        do_GET = _handle
+        do_POST = _handle
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    return server
+
+
+def build_server_app(state: dict) -> Flask:
+    app = Flask('fake_platform')
+
+    @app.before_request
+    def _count():
+        state['hits'][request.path] += 1
+        state['ports'].add(request.environ.get('REMOTE_PORT'))
+
+    @app.get('/internal/trainer/me')
+    def me():
+        return jsonify({'success': True, 'user': {'id': 1, 'username': 'tester', 'role': 'student'}})
+
+    @app.get('/internal/trainer/task/stats')
+    def stats():
+        time.sleep(0.3)
+        return jsonify({'success': True, 'counts_by_task_number': {'8': 10, '24': 5}})
+
+    @app.get('/internal/trainer/session/list')
+    def sessions():
+        return jsonify({'success': True, 'sessions': list(state['sessions'])})
+
+    @app.post('/internal/trainer/session/save')
+    def save():
+        data = request.get_json(silent=True) or {}
+        state['sessions'].append({'session_id': len(state['sessions']) + 1, 'task_type': data.get('task_type')})
+        return jsonify({'success': True, 'session_id': len(state['sessions'])})
+
+    @app.get('/internal/trainer/llm/info')
+    def llm_info():
+        # Первые два запроса — 503 (перезапуск воркера), потом ответ
+        if state['flaky_left'] > 0:
+            state['flaky_left'] -= 1
+            return jsonify({'success': False}), 503
+        return jsonify({'success': True, 'llm': {'configured': False}})
+
+    @app.post('/internal/trainer/llm/ping')
+    def llm_ping():
+        return jsonify({'success': False}), 503
+
+    return app
+
+
+def main() -> int:
+    state = {'hits': Counter(), 'ports': set(), 'sessions': [], 'flaky_left': 2}
+    server = make_keepalive_server(build_server_app(state))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    from trainer_app.platform_client import PlatformClient, read_cache
+
+    problems = []
+    report = {}
+
+    # 1) keep-alive и TTL: несколько «rerun» подряд с новым объектом клиента
+    for _ in range(5):
+        PlatformClient(base_url=base_url, token='t' * 32).get_me()
+    if state['hits']['/internal/trainer/me'] != 1:
+        problems.append('get_me was not served from TTL cache')
+    for _ in range(5):
+        PlatformClient(base_url=base_url, token='t' * 32).list_sessions(fresh=True)
+    report['tcp_connections_for_6_sequential_requests'] = len(state['ports'])
+    if len(state['ports']) != 1:
+        problems.append('connections are not reused')
+
+    # 2) склейка: 8 одновременных запросов статистики -> один поход на сервер
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(PlatformClient(base_url=base_url, token='t' * 32).get_task_stats()))
+               for _ in range(8)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    report['stats_8_concurrent_ms'] = int((time.perf_counter() - started) * 1000)
+    report['stats_server_hits'] = state['hits']['/internal/trainer/task/stats']
+    if state['hits']['/internal/trainer/task/stats'] != 1 or len(results) != 8:
+        problems.append('concurrent GETs were not coalesced')
+
+    # 3) другой токен — отдельный кеш
+    PlatformClient(base_url=base_url, token='u' * 32).get_task_stats()
+    if state['hits']['/internal/trainer/task/stats'] != 2:
+        problems.append('cache is shared between tokens')
+
+    # 4) история: кеш + инвалидация после save_session + fresh=True
+    client = PlatformClient(base_url=base_url, token='t' * 32)
+    client.list_sessions()
+    client.list_sessions()
+    client.save_session(task_id=1, task_type=8, language='python', code='print(1)')
+    after_save = client.list_sessions()
+    if state['hits']['/internal/trainer/session/list'] != 6 or len(after_save.get('sessions') or []) != 1:
+        problems.append('session list was not invalidated after save_session')
+    client.list_sessions(fresh=True)
+    if state['hits']['/internal/trainer/session/list'] != 7:
+        problems.append('fresh=True did not bypass cache')
+
+    # 5) GET повторяется на 503, POST — нет
+    info = client.llm_info()
+    report['llm_info_server_hits'] = state['hits']['/internal/trainer/llm/info']
+    if not info.get('success') or state['hits']['/internal/trainer/llm/info'] != 3:
+        problems.append('idempotent GET was not retried')
+    try:
+        client.llm_ping()
+        problems.append('llm_ping 503 did not raise')
+    except Exception:
+        pass
+    if state['hits']['/internal/trainer/llm/ping'] != 1:
+        problems.append('POST was retried')
+
+    report['tcp_connections_total'] = len(state['ports'])
+    report['cache'] = read_cache.stats()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    server.shutdown()
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
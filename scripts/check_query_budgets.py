@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бюджеты SQL-запросов для ключевых страниц на засеянной SQLite-базе.
+
+  python scripts/check_query_budgets.py            # проверка против scripts/query_budgets.json
+  python scripts/check_query_budgets.py --update   # записать текущие значения как новые бюджеты
+
+Поднимает приложение с PROFILE_REQUESTS=1 на временной SQLite, засевает учеников, уроки с ДЗ,
+работу со сдачами и родителя, открывает страницы (первый заход прогревает кеши, считается второй)
+и сравнивает X-Query-Count с бюджетом. Код выхода 1, если бюджет превышен или страница не открылась:
+выросшее число запросов (новый N+1) ломает проверку так же, как упавший тест.
+"""
+
+import os
+import sys
+import argparse
+import json
+import logging
+import tempfile
+from datetime import timedelta
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+DEFAULT_BUDGETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'query_budgets.json')
+
+STUDENTS = 12
+LESSONS_PER_STUDENT = 6
+TASKS_PER_LESSON = 5
+ASSIGNMENT_TASKS = 8
+
+
+def configure_environment(db_path: str) -> None:
+    # Только временная база и без фоновых потоков: счётчики запросов должны быть воспроизводимы
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    for name in ('DATABASE_EXTERNAL_URL', 'POSTGRES_URL', 'RAILWAY_ENVIRONMENT'):
+        os.environ.pop(name, None)
+    os.environ['PROFILE_REQUESTS'] = '1'
+    os.environ['SCHEDULER_MODE'] = 'off'
+    os.environ['GRADING_MODE'] = 'off'
+    os.environ['ENVIRONMENT'] = 'local'
+
+
+def seed(db) -> dict:
+    """Засевает базу и возвращает идентификаторы для страниц."""
+    from werkzeug.security import generate_password_hash
+    from app.models import (
+        Assignment, AssignmentTask, Enrollment, FamilyTie, Lesson, LessonTask, Student, Submission, Tasks, User,
+        moscow_now,
+    )
+
+    now = moscow_now().replace(tzinfo=None, microsecond=0)
+    password = generate_password_hash('budget')
+
+    def make_user(username, role, email=None):
+        user = User(username=username, password_hash=password, role=role, email=email)
+        db.session.add(user)
+        return user
+
+    admin = make_user('budget_admin', 'admin', 'admin@budget.local')
+    tutor = make_user('budget_tutor', 'tutor', 'tutor@budget.local')
+    parent = make_user('budget_parent', 'parent', 'parent@budget.local')
+    db.session.flush()
+
+    tasks = [
+        Tasks(task_number=index % 27 + 1, site_task_id=f'budget-{index}', source_url=f'https://example.local/{index}',
+              content_html=f'<p>Задание {index}: найдите <b>x</b>.</p>', answer=str(index))
+        for index in range(LESSONS_PER_STUDENT * TASKS_PER_LESSON)
+    ]
+    db.session.add_all(tasks)
+
+    students = []
+    for index in range(STUDENTS):
+        email = f'student{index}@budget.local'
+        student_user = make_user(f'budget_student{index}', 'student', email)
+        student = Student(name=f'Ученик {index}', email=email, platform_id=f'budget{index}', category='ЕГЭ')
+        db.session.add(student)
+        db.session.flush()
+        db.session.add(Enrollment(student_id=student_user.id, tutor_id=tutor.id, subject='informatics'))
+        students.append((student, student_user))
+
+        for lesson_index in range(LESSONS_PER_STUDENT):
+            past = lesson_index < LESSONS_PER_STUDENT - 2
+            lesson = Lesson(
+                student_id=student.student_id,
+                lesson_date=now + timedelta(days=(lesson_index - LESSONS_PER_STUDENT + 2) * 7 + 1),
+                status='completed' if past else 'planned',
+                topic=f'Тема {lesson_index}',
+                homework_status='assigned_done' if past else 'not_assigned',
+            )
+            db.session.add(lesson)
+            db.session.flush()
+            for task_index in range(TASKS_PER_LESSON):
+                task = tasks[lesson_index * TASKS_PER_LESSON + task_index]
+                db.session.add(LessonTask(
+                    lesson_id=lesson.lesson_id, task_id=task.task_id, assignment_type='homework',
+                    student_answer=str(task_index) if past else None,
+                    submission_correct=(task_index % 2 == 0) if past else None,
+                ))
+
+    child, child_user = students[0]
+    db.session.add(FamilyTie(parent_id=parent.id, student_id=child_user.id, access_level='full', is_confirmed=True))
+
+    assignment = Assignment(title='Контрольная', assignment_type='homework', created_by_id=tutor.id,
+                            deadline=now + timedelta(days=3))
+    db.session.add(assignment)
+    db.session.flush()
+    for index, task in enumerate(tasks[:ASSIGNMENT_TASKS]):
+        db.session.add(AssignmentTask(assignment_id=assignment.assignment_id, task_id=task.task_id,
+                                      order_index=index, max_score=1))
+    for index, (student, _) in enumerate(students):
+        submission = Submission(assignment_id=assignment.assignment_id, student_id=student.student_id,
+                                status='ASSIGNED')
+        if index % 3 == 0:
+            submission.status = 'GRADED'
+            submission.submitted_at = submission.graded_at = now - timedelta(hours=index + 1)
+            submission.max_score = ASSIGNMENT_TASKS
+            submission.total_score = ASSIGNMENT_TASKS - index % ASSIGNMENT_TASKS
+            submission.percentage = 100.0 * submission.total_score / ASSIGNMENT_TASKS
+        db.session.add(submission)
+    db.session.commit()
+
+    first_lesson = Lesson.query.filter_by(student_id=child.student_id).order_by(Lesson.lesson_date).first()
+    return {
+        'admin': admin.id,
+        'tutor': tutor.id,
+        'parent': parent.id,
+        'student_id': child.student_id,
+        'lesson_id': first_lesson.lesson_id,
+        'assignment_id': assignment.assignment_id,
+    }
+
+
+def page_checks(ids: dict) -> list:
+    """(endpoint, параметры url_for, пользователь) — страницы, для которых действуют бюджеты."""
+    return [
+        ('main.dashboard', {}, ids['admin']),
+        ('lessons.lesson_homework_view', {'lesson_id': ids['lesson_id']}, ids['admin']),
+        ('students.student_analytics', {'student_id': ids['student_id']}, ids['admin']),
+        ('assignments.assignment_view', {'assignment_id': ids['assignment_id']}, ids['tutor']),
+        ('parents.parent_dashboard', {}, ids['parent']),
+    ]
+
+
+def measure(app, ids: dict) -> dict:
+    from flask import url_for
+
+    with app.test_request_context():
+        pages = [(endpoint, url_for(endpoint, **kwargs), user_id) for endpoint, kwargs, user_id in page_checks(ids)]
+
+    results = {}
+    for endpoint, path, user_id in pages:
+        client = app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        client.get(path)
+        response = client.get(path)
+        results[endpoint] = {
+            'path': path,
+            'status': response.status_code,
+            'queries': int(response.headers.get('X-Query-Count', -1)),
+            'duplicates': int(response.headers.get('X-Query-Duplicates', -1)),
+            'db_ms': float(response.headers.get('X-DB-Time-Ms', 0)),
+            'render_ms': float(response.headers.get('X-Render-Time-Ms', 0)),
+        }
+    return results
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Проверка бюджетов SQL-запросов по страницам')
+    parser.add_argument('--budgets', default=DEFAULT_BUDGETS, help='JSON с бюджетами {endpoint: запросов}')
+    parser.add_argument('--update', action='store_true', help='Записать текущие значения как бюджеты')
+    parser.add_argument('--report', help='Сохранить сводку профилировщика по endpoint\'ам (JSON)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        configure_environment(os.path.join(tmp, 'budgets.db'))
+        logging.disable(logging.WARNING)
+        from app import create_app
+        from app.models import db
+        from app.utils.profiling import write_profiling_report
+
+        app = create_app()
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            db.create_all()
+            ids = seed(db)
+        results = measure(app, ids)
+        if args.report:
+            write_profiling_report(args.report)
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        logging.disable(logging.NOTSET)
+
+    if args.update:
+        budgets = {endpoint: result['queries'] for endpoint, result in results.items()}
+        with open(args.budgets, 'w', encoding='utf-8') as f:
+            json.dump(budgets, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f'Бюджеты записаны: {args.budgets}')
+    try:
+        with open(args.budgets, encoding='utf-8') as f:
+            budgets = json.load(f)
+    except FileNotFoundError:
+        budgets = {}
+
+    failures = 0
+    print(f"{'endpoint':40} {'запросов':>8} {'бюджет':>7} {'повторов':>8} {'БД, мс':>8} {'шаблон, мс':>10}")
+    for endpoint, result in results.items():
+        budget = budgets.get(endpoint)
+        problem = None
+        if result['status'] != 200:
+            problem = f"HTTP {result['status']} на {result['path']}"
+        elif budget is None:
+            problem = 'нет бюджета (запустите с --update)'
+        elif result['queries'] > budget:
+            problem = f"превышен бюджет на {result['queries'] - budget}"
+        failures += problem is not None
+        print(f"{endpoint:40} {result['queries']:>8} {budget if budget is not None else '-':>7} "
+              f"{result['duplicates']:>8} {result['db_ms']:>8.1f} {result['render_ms']:>10.1f}"
+              + (f'  FAIL: {problem}' if problem else ''))
+
+    print('OK' if not failures else f'FAIL: {failures} page(s) over budget or broken')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
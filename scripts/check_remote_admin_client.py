@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Проверка клиента удаленной админки против локальных заглушек окружений.
+
+  python scripts/check_remote_admin_client.py
+
+Поднимает несколько HTTP/1.1 серверов-заглушек /internal/remote-admin/status (быстрый, медленный,
+отвечающий 500) плюс «мёртвый» порт и проверяет: параллельный опрос с общим дедлайном,
+переиспользование соединений, кеш статусов с фоновым обновлением и circuit breaker.
+"""
+
+import os
+import sys
+import json
+import socket
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def start_stub(name: str, delay: float = 0.0, status: int = 200, state: dict = None) -> ThreadingHTTPServer:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def setup(self):
+            super().setup()
+            state['connections'][name] += 1
+
+        def log_message(self, fmt, *args):
+            return
+
+        def do_GET(self):
+            state['hits'][name] += 1
+            if self.headers.get('X-Admin-Token') != f'{name}-token':
+                status_code, payload = 403, {'error': 'bad token'}
+            else:
+                if delay:
+                    time.sleep(delay)
+                status_code = status
+                payload = {'status': 'ok', 'stats': {'users': 1}} if status == 200 else {'error': 'boom'}
+            body = json.dumps(payload).encode('utf-8')
+            self.send_response(status_code)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def main() -> int:
+    state = {'hits': Counter(), 'connections': Counter()}
+    fast = start_stub('fast', state=state)
+    slow = start_stub('slow', delay=2.5, state=state)
+    broken = start_stub('broken', status=500, state=state)
+    dead_port = free_port()
+
+    # Только окружения-заглушки
+    for key in [k for k in os.environ if k.startswith('ENV_')] + [
+            'PRODUCTION_URL', 'PRODUCTION_ADMIN_TOKEN', 'SANDBOX_URL', 'SANDBOX_ADMIN_TOKEN', 'ADMIN_URL', 'ADMIN_ADMIN_TOKEN']:
+        os.environ.pop(key, None)
+    for name, url in (('fast', f'http://127.0.0.1:{fast.server_port}'),
+                      ('slow', f'http://127.0.0.1:{slow.server_port}'),
+                      ('broken', f'http://127.0.0.1:{broken.server_port}'),
+                      ('dead', f'http://127.0.0.1:{dead_port}')):
+        os.environ[f'ENV_{name.upper()}_URL'] = url
+        os.environ[f'ENV_{name.upper()}_TOKEN'] = f'{name}-token'
+    os.environ['REMOTE_ADMIN_STATUS_DEADLINE'] = '1.0'
+    os.environ['REMOTE_ADMIN_STATUS_TTL'] = '0.5'
+    os.environ['REMOTE_ADMIN_STATUS_STALE'] = '60'
+    os.environ['REMOTE_ADMIN_BREAKER_FAILURES'] = '2'
+    os.environ['REMOTE_ADMIN_BREAKER_COOLDOWN'] = '1.5'
+
+    from app.remote_admin import remote_client
+    from app.remote_admin.environment_manager import get_all_environments_status, make_remote_request
+
+    problems = []
+    report = {}
+
+    # 1) Параллельный опрос: медленное окружение не задерживает страницу дольше дедлайна
+    started = time.perf_counter()
+    statuses = get_all_environments_status()
+    report['first_page_s'] = round(time.perf_counter() - started, 3)
+    report['first_statuses'] = {k: (v.get('available'), v.get('error')) for k, v in statuses.items()}
+    if report['first_page_s'] > 1.5:
+        problems.append(f"fan-out exceeded deadline: {report['first_page_s']}s")
+    if not statuses['fast'].get('available') or statuses['slow'].get('available') or statuses['dead'].get('available'):
+        problems.append('unexpected availability on first pass')
+
+    # 2) Кеш: повтор в пределах TTL не ходит в сеть
+    hits_before = sum(state['hits'].values())
+    started = time.perf_counter()
+    get_all_environments_status()
+    report['cached_page_ms'] = int((time.perf_counter() - started) * 1000)
+    if sum(state['hits'].values()) != hits_before:
+        problems.append('fresh statuses were not served from cache')
+
+    # 3) Медленный ответ дорабатывает в фоне и попадает в кеш
+    time.sleep(2.0)
+    cached_slow, _ = remote_client.status_cache.lookup('slow')
+    if not (cached_slow or {}).get('available'):
+        problems.append('slow environment status was not cached after background completion')
+
+    # 4) Устаревший статус отдаётся сразу, обновление — в фоне
+    time.sleep(0.6)
+    fast_hits = state['hits']['fast']
+    started = time.perf_counter()
+    get_all_environments_status()
+    report['stale_page_ms'] = int((time.perf_counter() - started) * 1000)
+    time.sleep(0.3)
+    if report['stale_page_ms'] > 200:
+        problems.append('stale page waited for refresh')
+    if state['hits']['fast'] != fast_hits + 1:
+        problems.append('stale status was not refreshed in background')
+
+    # 5) Keep-alive: много запросов к одному окружению — одно соединение
+    conns_before = state['connections']['fast']
+    for _ in range(20):
+        make_remote_request('GET', '/internal/remote-admin/status', env='fast')
+    report['fast_new_connections_for_20_requests'] = state['connections']['fast'] - conns_before
+    if state['connections']['fast'] - conns_before > 1:
+        problems.append('connections to environment are not reused')
+
+    # 6) Circuit breaker: после 2 ошибок окружение не опрашивается до конца cooldown
+    broken_hits = state['hits']['broken']
+    codes = [make_remote_request('GET', '/internal/remote-admin/status', env='broken').status_code for _ in range(6)]
+    report['broken_codes'] = codes
+    report['broken_server_hits'] = state['hits']['broken'] - broken_hits
+    if state['hits']['broken'] - broken_hits > 2:
+        problems.append('breaker did not stop requests to failing environment')
+    dead_started = time.perf_counter()
+    for _ in range(5):
+        make_remote_request('GET', '/internal/remote-admin/status', env='dead')
+    report['dead_5_requests_ms'] = int((time.perf_counter() - dead_started) * 1000)
+    report['breakers'] = {env: remote_client.get_breaker(env).snapshot() for env in ('fast', 'broken', 'dead')}
+
+    # half-open: после cooldown пропускается одна проба
+    time.sleep(1.6)
+    hits = state['hits']['broken']
+    make_remote_request('GET', '/internal/remote-admin/status', env='broken')
+    make_remote_request('GET', '/internal/remote-admin/status', env='broken')
+    if state['hits']['broken'] - hits != 1:
+        problems.append('half-open breaker did not let exactly one probe through')
+
+    report['cache'] = remote_client.status_cache.stats()
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    for server in (fast, slow, broken):
+        server.shutdown()
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Контракт схемы БД на этапе деплоя: сверка моделей с базой и (по флагу) миграции под advisory lock.
+
+  python scripts/check_schema_contract.py            # только проверка
+  python scripts/check_schema_contract.py --migrate  # ensure_schema_columns под блокировкой, затем проверка
+
+Подходит как релизная команда перед запуском веб-процессов с SCHEMA_CONTRACT_MODE=verify.
+Код выхода 1, если контракт нарушен.
+"""
+
+import os
+import sys
+import argparse
+import json
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Проверка контракта схемы БД')
+    parser.add_argument('--migrate', action='store_true', help='Выполнить миграции под advisory lock перед проверкой')
+    args = parser.parse_args()
+
+    # Приложение нужно только ради конфигурации БД: без проверки при старте и фоновых потоков
+    os.environ['SCHEMA_CONTRACT_MODE'] = 'off'
+    os.environ.setdefault('SCHEDULER_MODE', 'off')
+    os.environ.setdefault('GRADING_MODE', 'off')
+    from app import create_app
+    from app.utils.schema_contract import run_schema_contract
+
+    app = create_app()
+    result = run_schema_contract(app, mode='migrate' if args.migrate else 'verify')
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print('OK' if result['ok'] else 'FAIL: schema does not match models')
+    return 0 if result['ok'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
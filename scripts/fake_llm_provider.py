@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальный фейковый LLM-провайдер (Groq/OpenAI-совместимый и Gemini API) для проверки шлюза тренажёра.
+
+  # Сервер для ручной проверки тренажёра / платформы:
+  python scripts/fake_llm_provider.py --port 8799 --latency 0.3 --token-delay 0.05
+  GROQ_API_KEY=fake GROQ_BASE_URL=http://127.0.0.1:8799/openai/v1 ...
+  GEMINI_API_KEY=fake GEMINI_BASE_URL=http://127.0.0.1:8799/v1beta TRAINER_LLM_PROVIDER=gemini ...
+
+  # Самопроверка клиента (keep-alive, ретраи, кеш, стриминг):
+  python scripts/fake_llm_provider.py --selftest
+
+Ответ — эхо последнего сообщения пользователя, разбитое на «токены»;
+--fail-first N отдаёт первые N запросов с 503, чтобы проверить ретраи.
+"""
+
+import os
+import sys
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+class FakeProviderState:
+    def __init__(self, latency: float = 0.0, token_delay: float = 0.0, fail_first: int = 0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.fail_left = fail_first
+        self.connections = 0
+        self.requests = 0
+        self.failures = 0
+        self.lock = threading.Lock()
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {'connections': self.connections, 'requests': self.requests, 'failures': self.failures}
+
+
+def _answer_tokens(prompt: str) -> list:
+    words = (prompt or 'пусто').split()[:30]
+    return ['Подсказка:'] + [f' {w}' for w in words]
+
+
+def make_handler(state: FakeProviderState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def setup(self):
+            super().setup()
+            with state.lock:
+                state.connections += 1
+
+        def log_message(self, fmt, *args):
+            return
+
+        def _json(self, status: int, payload: dict, extra_headers: dict = None):
+            body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            for k, v in (extra_headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _sse(self, events):
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/event-stream')
+            self.send_header('Transfer-Encoding', 'chunked')
+            self.end_headers()
+            for payload in events:
+                chunk = f"data: {payload}\n\n".encode('utf-8')
+                self.wfile.write(f"{len(chunk):x}\r\n".encode('ascii') + chunk + b"\r\n")
+                self.wfile.flush()
+                if state.token_delay:
+                    time.sleep(state.token_delay)
+            self.wfile.write(b"0\r\n\r\n")
+            self.wfile.flush()
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            with state.lock:
+                state.requests += 1
+                fail = state.fail_left > 0
+                if fail:
+                    state.fail_left -= 1
+                    state.failures += 1
+            if fail:
+                self._json(503, {'error': {'message': 'overloaded'}}, {'Retry-After': '0'})
+                return
+            if state.latency:
+                time.sleep(state.latency)
+
+            path = self.path.split('?', 1)[0]
+            if path.endswith('/chat/completions'):
+                users = [m.get('content') or '' for m in body.get('messages') or [] if m.get('role') == 'user']
+                tokens = _answer_tokens(users[-1] if users else '')
+                if body.get('stream'):
+                    events = [json.dumps({'choices': [{'delta': {'content': t}}]}, ensure_ascii=False) for t in tokens]
+                    self._sse(events + ['[DONE]'])
+                else:
+                    self._json(200, {'choices': [{'message': {'role': 'assistant', 'content': ''.join(tokens)}}]})
+                return
+            if ':generateContent' in path or ':streamGenerateContent' in path:
+                users = [''.join(p.get('text') or '' for p in c.get('parts') or [])
+                         for c in body.get('contents') or [] if c.get('role') == 'user']
+                tokens = _answer_tokens(users[-1] if users else '')
+                if ':streamGenerateContent' in path:
+                    self._sse([json.dumps({'candidates': [{'content': {'parts': [{'text': t}]}}]}, ensure_ascii=False)
+                               for t in tokens])
+                else:
+                    self._json(200, {'candidates': [{'content': {'parts': [{'text': ''.join(tokens)}]}}]})
+                return
+            self._json(404, {'error': {'message': f'unknown path {path}'}})
+
+    return Handler
+
+
+def start_server(state: FakeProviderState, port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_selftest() -> int:
+    state = FakeProviderState(latency=0.2, token_delay=0.02)
+    server = start_server(state)
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ['TRAINER_LLM_MAX_ATTEMPTS'] = '4'
+
+    from trainer_app.llm import providers
+    from trainer_app.llm.providers import GroqClient, GeminiClient, response_cache
+
+    problems = []
+    report = {}
+
+    def msgs(text):
+        return [{'role': 'system', 'content': 'Ты репетитор.'}, {'role': 'user', 'content': text}]
+
+    for name, client in (
+        ('groq', GroqClient(api_key='fake', model='fake-model', base_url=f'{base}/openai/v1')),
+        ('gemini', GeminiClient(api_key='fake', model='fake-model', base_url=f'{base}/v1beta')),
+    ):
+        before = state.snapshot()
+        started = time.perf_counter()
+        for i in range(5):
+            client.chat(messages=msgs(f'{name} вопрос {i}'))
+        sequential = time.perf_counter() - started
+        after = state.snapshot()
+        new_connections = after['connections'] - before['connections']
+        if new_connections > 1:
+            problems.append(f'{name}: {new_connections} connections for 5 calls (keep-alive not reused)')
+
+        # Кеш: тот же промпт с другими пробелами — без запроса к провайдеру
+        hits_before = response_cache.hits
+        answer = client.chat(messages=msgs(f'  {name}   вопрос 0 '))
+        if state.snapshot()['requests'] != after['requests'] or response_cache.hits != hits_before + 1:
+            problems.append(f'{name}: normalized prompt was not served from cache')
+
+        # Ретраи: два 503 подряд, затем успех
+        with state.lock:
+            state.fail_left = 2
+        retried = client.chat(messages=msgs(f'{name} ретрай'))
+        if not retried:
+            problems.append(f'{name}: retry did not recover')
+
+        # Стриминг: первый фрагмент раньше полного ответа
+        started = time.perf_counter()
+        first = None
+        parts = []
+        for delta in client.stream_chat(messages=msgs(f'{name} поток из нескольких слов подряд')):
+            if first is None:
+                first = time.perf_counter() - started
+            parts.append(delta)
+        total = time.perf_counter() - started
+        if len(parts) < 2 or first is None or first >= total:
+            problems.append(f'{name}: stream did not deliver incremental chunks')
+        cached_stream = list(client.stream_chat(messages=msgs(f'{name} поток из нескольких слов подряд')))
+        if cached_stream != [''.join(parts)]:
+            problems.append(f'{name}: streamed answer was not cached')
+
+        report[name] = {
+            'connections_for_5_calls': new_connections,
+            'sequential_5_calls_s': round(sequential, 3),
+            'cached_answer': answer[:40],
+            'stream_first_chunk_ms': int((first or 0) * 1000),
+            'stream_total_ms': int(total * 1000),
+            'stream_chunks': len(parts),
+        }
+
+    report['server'] = state.snapshot()
+    report['cache'] = response_cache.stats()
+    report['backoff_samples_s'] = [round(providers._backoff_delay(a), 3) for a in (1, 2, 3, 4)]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    server.shutdown()
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Фейковый LLM-провайдер для шлюза тренажёра')
+    parser.add_argument('--port', type=int, default=8799)
+    parser.add_argument('--latency', type=float, default=0.3, help='Задержка до первого токена, сек')
+    parser.add_argument('--token-delay', type=float, default=0.05, help='Пауза между токенами в стриме, сек')
+    parser.add_argument('--fail-first', type=int, default=0, help='Первые N запросов отвечать 503')
+    parser.add_argument('--selftest', action='store_true', help='Поднять сервер и проверить клиент')
+    args = parser.parse_args()
+
+    if args.selftest:
+        sys.exit(run_selftest())
+
+    state = FakeProviderState(args.latency, args.token_delay, args.fail_first)
+    server = start_server(state, args.port)
+    print(f"Fake LLM provider on http://127.0.0.1:{server.server_address[1]} (groq: /openai/v1, gemini: /v1beta)")
+    try:
+        while True:
+            time.sleep(5)
+            print(state.snapshot())
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Нагрузочный прогон хранилища бота репортов без Telegram.
+
+  python scripts/loadtest_telegram_reports.py --chats 40 --updates 25 --api-latency 0.02
+  python scripts/loadtest_telegram_reports.py --mode async --batch-window-ms 2
+
+Генерирует синтетический поток апдейтов (новый репорт из группы, кнопка статуса у админа,
+/list с фильтром и листанием страниц, просмотр репорта) и проигрывает его на event loop
+так же, как это делают хендлеры telegram_bot/bot.py: те же обращения к БД в том же порядке, вызовы Bot API заменены
+на asyncio.sleep(--api-latency). Сравнивает старый синхронный ReportDatabase (SQLite прямо
+в event loop) и AsyncReportDatabase; печатает p50/p95/p99 латентности хендлеров
+и задержку event loop (насколько опаздывает тикер раз в 5 мс).
+"""
+
+import os
+import sys
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from telegram_bot.models import ReportDatabase, AsyncReportDatabase  # noqa: E402
+
+TAGS = ['#BUG', '#UIFIX', '#FEATURE']
+STATUSES = ['in_progress', 'resolved', 'rejected']
+
+
+class BlockingAdapter:
+    """Старое поведение бота: синхронные вызовы ReportDatabase внутри корутин."""
+
+    def __init__(self, db_path: str):
+        self.db = ReportDatabase(db_path=db_path)
+
+    def __getattr__(self, name):
+        method = getattr(self.db, name)
+
+        async def call(*args, **kwargs):
+            return method(*args, **kwargs)
+        return call
+
+    def close(self):
+        pass
+
+
+def build_updates(chats: int, per_chat: int, seed: int) -> list:
+    """Последовательности апдейтов по чатам: [(chat_id, kind, payload)]."""
+    rnd = random.Random(seed)
+    streams = []
+    for chat in range(chats):
+        stream = []
+        own_reports = []
+        for i in range(per_chat):
+            roll = rnd.random()
+            if roll < 0.45 or not own_reports:
+                report_id = f"{chat}_{i}"
+                own_reports.append(report_id)
+                stream.append((chat, 'report', {'report_id': report_id, 'tag': rnd.choice(TAGS),
+                                                'content': 'Текст репорта ' * rnd.randint(1, 20)}))
+            elif roll < 0.75:
+                stream.append((chat, 'status', {'report_id': rnd.choice(own_reports), 'status': rnd.choice(STATUSES)}))
+            elif roll < 0.9:
+                stream.append((chat, 'list', {'tag': rnd.choice(TAGS + [None]), 'pages': rnd.randint(1, 3)}))
+            else:
+                stream.append((chat, 'view', {'report_id': rnd.choice(own_reports)}))
+        streams.append(stream)
+    return streams
+
+
+async def handle(db, update, api_latency: float):
+    chat, kind, p = update
+    if kind == 'report':
+        # handle_group_message: add_report -> get_report -> send_message -> update_status(admin ids)
+        added = await db.add_report(report_id=p['report_id'], group_message_id=1000 + chat, group_chat_id=-100,
+                                    author_id=chat, author_username=f'user{chat}', author_first_name='Тест',
+                                    tag=p['tag'], content=p['content'])
+        if not added:
+            return
+        await db.get_report(p['report_id'])
+        await asyncio.sleep(api_latency)
+        await db.update_status(report_id=p['report_id'], status='new', admin_message_id=5000 + chat, admin_chat_id=1)
+    elif kind == 'status':
+        # handle_status_callback: get_report -> update_status -> edit_message
+        report = await db.get_report(p['report_id'])
+        if report:
+            await db.update_status(report_id=p['report_id'], status=p['status'])
+        await asyncio.sleep(api_latency)
+    elif kind == 'list':
+        # /list и «Далее ▶️»: страница по keyset-курсору + счётчик -> edit_message
+        after_id = None
+        for _ in range(p['pages']):
+            _reports, after_id = await db.list_reports_page(tag=p['tag'], limit=10, after_id=after_id)
+            await db.count_reports(tag=p['tag'])
+            await asyncio.sleep(api_latency)
+            if after_id is None:
+                break
+    else:
+        await db.get_report(p['report_id'])
+        await asyncio.sleep(api_latency)
+
+
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+    return values[idx]
+
+
+async def replay(db, streams: list, api_latency: float) -> dict:
+    latencies = []
+    lags = []
+    stop = asyncio.Event()
+
+    async def ticker():
+        interval = 0.005
+        expected = time.perf_counter() + interval
+        while not stop.is_set():
+            await asyncio.sleep(interval)
+            now = time.perf_counter()
+            lags.append(max(0.0, now - expected))
+            expected = now + interval
+
+    async def chat_worker(stream):
+        # Апдейты одного чата идут по порядку, разные чаты — параллельно
+        for update in stream:
+            started = time.perf_counter()
+            await handle(db, update, api_latency)
+            latencies.append(time.perf_counter() - started)
+
+    tick = asyncio.create_task(ticker())
+    started = time.perf_counter()
+    await asyncio.gather(*(chat_worker(s) for s in streams))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await tick
+
+    ms = lambda v: round(v * 1000, 2)  # noqa: E731
+    return {
+        'updates': len(latencies),
+        'elapsed_s': round(elapsed, 3),
+        'updates_per_s': round(len(latencies) / elapsed, 1) if elapsed else 0,
+        'handler_ms': {'p50': ms(percentile(latencies, 0.5)), 'p95': ms(percentile(latencies, 0.95)),
+                       'p99': ms(percentile(latencies, 0.99)), 'max': ms(max(latencies or [0]))},
+        'loop_lag_ms': {'mean': ms(statistics.fmean(lags) if lags else 0), 'p99': ms(percentile(lags, 0.99)),
+                        'max': ms(max(lags or [0]))},
+    }
+
+
+def run_mode(mode: str, args, streams: list) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'reports.db')
+        if mode == 'sync':
+            db = BlockingAdapter(path)
+        else:
+            db = AsyncReportDatabase(db_path=path, batch_window_ms=args.batch_window_ms)
+        result = asyncio.run(replay(db, streams, args.api_latency))
+        if mode == 'async':
+            result['storage'] = dict(db.stats)
+        db.close()
+        # Проверка целостности: все репорты записаны, статусы сохранены
+        check = ReportDatabase(db_path=path)
+        result['stored_reports'] = check.count_reports()
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Нагрузочный прогон хранилища бота репортов')
+    parser.add_argument('--chats', type=int, default=40, help='Число одновременно активных чатов')
+    parser.add_argument('--updates', type=int, default=25, help='Апдейтов на чат')
+    parser.add_argument('--api-latency', type=float, default=0.02, help='Имитация вызова Bot API, сек')
+    parser.add_argument('--batch-window-ms', type=float, default=0.0, help='Окно склейки записей AsyncReportDatabase')
+    parser.add_argument('--mode', choices=['sync', 'async', 'both'], default='both')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    streams = build_updates(args.chats, args.updates, args.seed)
+    expected_reports = len({u[2]['report_id'] for s in streams for u in s if u[1] == 'report'})
+    report = {}
+    modes = ['sync', 'async'] if args.mode == 'both' else [args.mode]
+    for mode in modes:
+        report[mode] = run_mode(mode, args, streams)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+    problems = [f'{m}: stored {r["stored_reports"]} of {expected_reports} reports'
+                for m, r in report.items() if r['stored_reports'] != expected_reports]
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Фоновый планировщик задач обслуживания.
+
+Режимы:
+  # Sidecar-процесс (веб-воркеры запускать с SCHEDULER_MODE=sidecar):
+  python scripts/run_scheduler.py
+
+  # Офлайн-прогон на in-memory SQLite с подменой часов (FakeClock):
+  python scripts/run_scheduler.py --simulate-minutes 180
+
+В офлайн-режиме создаётся отдельное Flask-приложение с sqlite:///:memory:,
+засеваются уроки/напоминания/аудит-логи, часы прокручиваются по тикам,
+а в конце проверяются результаты задач и печатаются метрики.
+"""
+
+import os
+import sys
+import argparse
+import json
+import time
+from datetime import datetime, timedelta
+
+# Add repo root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+
+def run_sidecar(tick_seconds: float) -> None:
+    # Веб-часть планировщик не стартует — крутим его в этом процессе в foreground
+    os.environ['SCHEDULER_MODE'] = 'sidecar'
+    from app import create_app
+    from core.scheduler import scheduler
+
+    create_app()
+    scheduler.tick_seconds = tick_seconds
+    print(f"Scheduler sidecar started ({scheduler.lease.owner}), tick={tick_seconds}s")
+    try:
+        while True:
+            executed = scheduler.run_pending()
+            if executed:
+                print(f"{datetime.now():%H:%M:%S} ran: {', '.join(executed)}")
+            time.sleep(tick_seconds)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        with scheduler.app.app_context():
+            scheduler.lease.release()
+
+
+def run_simulation(minutes: int, tick_seconds: int) -> int:
+    from flask import Flask
+    from app.models import db, User, Student, Lesson, Reminder, AuditLog, UserNotification
+    from app.utils.background_jobs import register_maintenance_jobs
+    from core.scheduler import JobScheduler, FakeClock, DbLeaderLease
+
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+
+    start = datetime(2025, 1, 6, 9, 0, 0)
+    clock = FakeClock(start)
+
+    with app.app_context():
+        db.create_all()
+        user = User(username='sim', password_hash='-', role='tutor')
+        db.session.add(user)
+        student = Student(name='Sim Student')
+        db.session.add(student)
+        db.session.flush()
+
+        # Уроки каждые 30 минут: часть закончится в окне симуляции, часть — нет
+        for i in range(12):
+            db.session.add(Lesson(student_id=student.student_id, lesson_date=start + timedelta(minutes=30 * i),
+                                  duration=60, status='planned'))
+        for i in range(6):
+            db.session.add(Reminder(user_id=user.id, title=f'Reminder {i}',
+                                    reminder_time=start + timedelta(minutes=40 * i)))
+        for days_ago in (1, 30, 120, 400):
+            db.session.add(AuditLog(timestamp=start - timedelta(days=days_ago), user_id=user.id,
+                                    action='page_view', status='success'))
+        db.session.commit()
+
+    leader = JobScheduler(app=app, clock=clock, lease=DbLeaderLease(owner='sim-leader'), tick_seconds=tick_seconds)
+    follower = JobScheduler(app=app, clock=clock, lease=DbLeaderLease(owner='sim-follower'), tick_seconds=tick_seconds)
+    register_maintenance_jobs(leader)
+    register_maintenance_jobs(follower)
+
+    follower_runs = 0
+    for _ in range(int(minutes * 60 / tick_seconds) + 1):
+        leader.run_pending()
+        follower_runs += len(follower.run_pending())
+        clock.advance(tick_seconds)
+
+    end = clock.now()
+    with app.app_context():
+        finished_expected = sum(
+            1 for i in range(12) if start + timedelta(minutes=30 * i + 60) <= end - timedelta(seconds=tick_seconds)
+        )
+        completed = Lesson.query.filter_by(status='completed').count()
+        sent = Reminder.query.filter_by(is_sent=True).count()
+        notifications = UserNotification.query.filter_by(kind='reminder').count()
+        audit_left = AuditLog.query.count()
+
+    report = {
+        'simulated_minutes': minutes,
+        'lessons_completed': completed,
+        'lessons_completed_expected_min': finished_expected,
+        'reminders_sent': sent,
+        'reminder_notifications': notifications,
+        'audit_logs_left': audit_left,
+        'follower_job_runs': follower_runs,
+        'leader_metrics': leader.metrics(),
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2, default=str))
+
+    problems = []
+    if follower_runs:
+        problems.append('follower executed jobs while leader lease was held')
+    if completed < finished_expected:
+        problems.append('not all finished lessons were completed')
+    if sent != notifications:
+        problems.append('reminders marked sent without notifications')
+    if audit_left != 2:
+        problems.append('audit retention did not purge old rows')
+    for problem in problems:
+        print(f"FAIL: {problem}")
+    if not problems:
+        print("OK")
+    return 1 if problems else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Планировщик фоновых задач (sidecar / офлайн-симуляция)')
+    parser.add_argument('--simulate-minutes', type=int, default=None,
+                        help='Офлайн-прогон на in-memory SQLite с FakeClock на N минут')
+    parser.add_argument('--tick', type=int, default=5, help='Шаг тика в секундах')
+    args = parser.parse_args()
+
+    if args.simulate_minutes is not None:
+        sys.exit(run_simulation(args.simulate_minutes, args.tick))
+    run_sidecar(args.tick)
+
+
+if __name__ == '__main__':
+    main()
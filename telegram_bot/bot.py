@@ -22,7 +22,7 @@ from telegram.ext import (
     filters
 )
 
-from telegram_bot.models import ReportDatabase
+from telegram_bot.models import AsyncReportDatabase
 
 # Настройка логирования
 # Можно изменить уровень на DEBUG для более детального логирования
@@ -47,7 +47,11 @@ STATUSES = {
 # Инициализация базы данных
 # Путь к БД можно задать через переменную окружения REPORTS_DB_PATH
 db_path = os.getenv('REPORTS_DB_PATH', 'data/reports.db')
-db = ReportDatabase(db_path=db_path)
+# Все обращения к БД идут через отдельный поток и не блокируют event loop
+db = AsyncReportDatabase(
+    db_path=db_path,
+    batch_window_ms=float(os.getenv('REPORTS_DB_BATCH_WINDOW_MS', '0') or 0),
+)
 
 
 def generate_report_id(group_chat_id: int, message_id: int) -> str:
@@ -215,7 +219,7 @@ async def handle_group_message(update: Update, context: ContextTypes.DEFAULT_TYP
         content = message.caption
     
     # Сохраняем репорт в базу данных
-    added = db.add_report(
+    added = await db.add_report(
         report_id=report_id,
         group_message_id=message.message_id,
         group_chat_id=message.chat.id,
@@ -232,7 +236,7 @@ async def handle_group_message(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     # Получаем числовой ID репорта из базы данных для отображения
-    report_data = db.get_report(report_id)
+    report_data = await db.get_report(report_id)
     numeric_id = report_data.get('numeric_id') or report_data.get('id') if report_data else None
     
     # Получаем ID админа из переменных окружения
@@ -349,7 +353,7 @@ async def handle_group_message(update: Update, context: ContextTypes.DEFAULT_TYP
             )
         
         # Сохраняем ID сообщения в личке админа
-        db.update_status(
+        await db.update_status(
             report_id=report_id,
             status='new',
             admin_message_id=sent_message.message_id,
@@ -411,7 +415,7 @@ async def handle_status_callback(update: Update, context: ContextTypes.DEFAULT_T
     logger.info(f"[CALLBACK] Обработка: report_id={report_id}, new_status={new_status}")
     
     # Получаем данные репорта
-    report = db.get_report(report_id)
+    report = await db.get_report(report_id)
     if not report:
         logger.error(f"[CALLBACK] Репорт {report_id} не найден в базе данных")
         await query.edit_message_text("❌ Репорт не найден")
@@ -420,7 +424,7 @@ async def handle_status_callback(update: Update, context: ContextTypes.DEFAULT_T
     logger.info(f"[CALLBACK] Репорт найден: {report_id}, текущий статус: {report['status']}")
     
     # Обновляем статус в базе данных
-    db.update_status(report_id=report_id, status=new_status)
+    await db.update_status(report_id=report_id, status=new_status)
     logger.info(f"[CALLBACK] Статус обновлен в БД: {new_status}")
     
     # Получаем числовой ID для отображения
@@ -562,7 +566,7 @@ async def handle_details_callback(update: Update, context: ContextTypes.DEFAULT_
     report_id = data.replace('details_', '')
     
     # Получаем данные репорта
-    report = db.get_report(report_id)
+    report = await db.get_report(report_id)
     if not report:
         await query.edit_message_text("❌ Репорт не найден")
         return
@@ -622,7 +626,7 @@ async def handle_back_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     report_id = data.replace('back_', '')
     
     # Получаем данные репорта
-    report = db.get_report(report_id)
+    report = await db.get_report(report_id)
     if not report:
         await query.edit_message_text("❌ Репорт не найден")
         return
@@ -759,7 +763,7 @@ async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_T
     
     # Сохраняем репорт в базу данных
     # Для репортов из лички group_chat_id и group_message_id будут ID лички
-    added = db.add_report(
+    added = await db.add_report(
         report_id=report_id,
         group_message_id=message.message_id,
         group_chat_id=message.chat.id,  # ID лички (положительное число)
@@ -777,7 +781,7 @@ async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_T
         return
     
     # Получаем числовой ID репорта из базы данных для отображения
-    report_data = db.get_report(report_id)
+    report_data = await db.get_report(report_id)
     numeric_id = report_data.get('numeric_id') or report_data.get('id') if report_data else None
     
     # Получаем ID админа из переменных окружения
@@ -894,7 +898,7 @@ async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_T
             )
         
         # Сохраняем ID сообщения админу в базу данных
-        db.update_status(
+        await db.update_status(
             report_id=report_id,
             status='new',
             admin_message_id=sent_message.message_id,
@@ -909,6 +913,108 @@ async def handle_private_message(update: Update, context: ContextTypes.DEFAULT_T
         await update.message.reply_text("❌ Ошибка при отправке репорта. Попробуйте позже.")
 
 
+LIST_PAGE_SIZE = 10
+
+
+def list_page_callback(tag: Optional[str], after_id: int, page: int) -> str:
+    """callback_data следующей страницы: keyset-курсор (id последнего показанного репорта) вместо OFFSET"""
+    return f"list_page_{tag or 'all'}_{after_id}_{page}"
+
+
+def parse_list_page_callback(data: str):
+    """Разбор list_page_<tag|all>_<after_id>_<page> -> (tag, after_id, page) или None"""
+    try:
+        tag, after_id, page = data.replace('list_page_', '', 1).rsplit('_', 2)
+        return (None if tag == 'all' else tag), int(after_id), int(page)
+    except ValueError:
+        return None
+
+
+async def build_reports_list(tag_filter: Optional[str], after_id: Optional[int] = None, page: int = 1):
+    """
+    Текст и клавиатура списка репортов (одна страница)
+
+    Args:
+        tag_filter: Фильтр по тегу или None
+        after_id: Курсор страницы (None — первая)
+        page: Номер страницы для подписи
+
+    Returns:
+        (текст сообщения, InlineKeyboardMarkup или None)
+    """
+    reports, next_after_id = await db.list_reports_page(tag=tag_filter, limit=LIST_PAGE_SIZE, after_id=after_id)
+    total_count = await db.count_reports(tag=tag_filter)
+
+    if not reports:
+        filter_text = f" с тегом {tag_filter}" if tag_filter else ""
+        keyboard = [[InlineKeyboardButton("⏮ В начало", callback_data=f"list_tag_{tag_filter}" if tag_filter else "list_all")]] if after_id else []
+        return f"📋 Репортов{filter_text} не найдено", InlineKeyboardMarkup(keyboard) if keyboard else None
+
+    # Формируем сообщение со списком
+    filter_text = f" ({tag_filter})" if tag_filter else ""
+    message_text = f"📋 <b>Список репортов</b>{filter_text}\n\n"
+
+    for report in reports:
+        numeric_id = report.get('numeric_id') or report.get('id', '?')
+        status_emoji = {
+            'new': '🆕',
+            'in_progress': '🔄',
+            'resolved': '✅',
+            'rejected': '❌'
+        }.get(report['status'], '❓')
+
+        status_text = STATUSES.get(report['status'], report['status'])
+        content_preview = report['content'][:60].replace('\n', ' ') + ('...' if len(report['content']) > 60 else '')
+
+        message_text += f"{status_emoji} <b>#{numeric_id}</b> {report['tag']} - {status_text}\n"
+        message_text += f"   {content_preview}\n\n"
+
+    first_index = (page - 1) * LIST_PAGE_SIZE + 1
+    message_text += f"<i>Показано {first_index}–{first_index + len(reports) - 1} из {total_count}</i>"
+
+    # Создаем кнопки для фильтрации и навигации
+    keyboard = []
+
+    # Кнопки фильтров по тегам
+    filter_row = []
+    if tag_filter != '#BUG':
+        filter_row.append(InlineKeyboardButton("🐛 #BUG", callback_data="list_tag_#BUG"))
+    if tag_filter != '#UIFIX':
+        filter_row.append(InlineKeyboardButton("🎨 #UIFIX", callback_data="list_tag_#UIFIX"))
+    if tag_filter != '#FEATURE':
+        filter_row.append(InlineKeyboardButton("✨ #FEATURE", callback_data="list_tag_#FEATURE"))
+    if tag_filter != '#ADM':
+        filter_row.append(InlineKeyboardButton("⚙️ #ADM", callback_data="list_tag_#ADM"))
+    if filter_row:
+        keyboard.append(filter_row)
+
+    # Кнопка "Все репорты"
+    if tag_filter:
+        keyboard.append([InlineKeyboardButton("📋 Все репорты", callback_data="list_all")])
+
+    # Кнопки для просмотра репортов (первые 5)
+    view_row = []
+    for report in reports[:5]:
+        numeric_id = report.get('numeric_id') or report.get('id', '?')
+        view_row.append(InlineKeyboardButton(f"#{numeric_id}", callback_data=f"view_{report['report_id']}"))
+        if len(view_row) == 2:  # По 2 кнопки в ряд
+            keyboard.append(view_row)
+            view_row = []
+    if view_row:
+        keyboard.append(view_row)
+
+    # Навигация по страницам
+    nav_row = []
+    if after_id is not None:
+        nav_row.append(InlineKeyboardButton("⏮ В начало", callback_data=f"list_tag_{tag_filter}" if tag_filter else "list_all"))
+    if next_after_id is not None:
+        nav_row.append(InlineKeyboardButton("Далее ▶️", callback_data=list_page_callback(tag_filter, next_after_id, page + 1)))
+    if nav_row:
+        keyboard.append(nav_row)
+
+    return message_text, InlineKeyboardMarkup(keyboard) if keyboard else None
+
+
 async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /stats - показывает статистику репортов"""
     user_id = update.effective_user.id
@@ -924,11 +1030,10 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("❌ Эта команда недоступна")
         return
     
-    # Получаем статистику по статусам
+    # Получаем статистику по статусам (счётчики хранилища, без выборки самих репортов)
     stats = {}
     for status in STATUSES.keys():
-        reports = db.get_reports_by_status(status)
-        stats[status] = len(reports)
+        stats[status] = await db.count_reports(status=status)
     
     stats_message = f"""
 📊 <b>Статистика репортов</b>
@@ -966,69 +1071,7 @@ async def list_reports_command(update: Update, context: ContextTypes.DEFAULT_TYP
         if tag_arg in ['BUG', 'UIFIX', 'FEATURE', 'ADM']:
             tag_filter = f"#{tag_arg}"
     
-    # Получаем список репортов
-    reports = db.get_all_reports(tag=tag_filter, limit=10, offset=0)
-    total_count = db.count_reports(tag=tag_filter)
-    
-    if not reports:
-        filter_text = f" с тегом {tag_filter}" if tag_filter else ""
-        await update.message.reply_text(f"📋 Репортов{filter_text} не найдено")
-        return
-    
-    # Формируем сообщение со списком
-    filter_text = f" ({tag_filter})" if tag_filter else ""
-    message_text = f"📋 <b>Список репортов</b>{filter_text}\n\n"
-    
-    for report in reports:
-        numeric_id = report.get('numeric_id') or report.get('id', '?')
-        status_emoji = {
-            'new': '🆕',
-            'in_progress': '🔄',
-            'resolved': '✅',
-            'rejected': '❌'
-        }.get(report['status'], '❓')
-        
-        status_text = STATUSES.get(report['status'], report['status'])
-        content_preview = report['content'][:60].replace('\n', ' ') + ('...' if len(report['content']) > 60 else '')
-        
-        message_text += f"{status_emoji} <b>#{numeric_id}</b> {report['tag']} - {status_text}\n"
-        message_text += f"   {content_preview}\n\n"
-    
-    message_text += f"<i>Показано {len(reports)} из {total_count}</i>"
-    
-    # Создаем кнопки для фильтрации и навигации
-    keyboard = []
-    
-    # Кнопки фильтров по тегам
-    filter_row = []
-    if tag_filter != '#BUG':
-        filter_row.append(InlineKeyboardButton("🐛 #BUG", callback_data="list_tag_#BUG"))
-    if tag_filter != '#UIFIX':
-        filter_row.append(InlineKeyboardButton("🎨 #UIFIX", callback_data="list_tag_#UIFIX"))
-    if tag_filter != '#FEATURE':
-        filter_row.append(InlineKeyboardButton("✨ #FEATURE", callback_data="list_tag_#FEATURE"))
-    if tag_filter != '#ADM':
-        filter_row.append(InlineKeyboardButton("⚙️ #ADM", callback_data="list_tag_#ADM"))
-    if filter_row:
-        keyboard.append(filter_row)
-    
-    # Кнопка "Все репорты"
-    if tag_filter:
-        keyboard.append([InlineKeyboardButton("📋 Все репорты", callback_data="list_all")])
-    
-    # Кнопки для просмотра репортов (первые 5)
-    view_row = []
-    for i, report in enumerate(reports[:5]):
-        numeric_id = report.get('numeric_id') or report.get('id', '?')
-        view_row.append(InlineKeyboardButton(f"#{numeric_id}", callback_data=f"view_{report['report_id']}"))
-        if len(view_row) == 2:  # По 2 кнопки в ряд
-            keyboard.append(view_row)
-            view_row = []
-    if view_row:
-        keyboard.append(view_row)
-    
-    reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
-    
+    message_text, reply_markup = await build_reports_list(tag_filter)
     await update.message.reply_text(message_text, parse_mode='HTML', reply_markup=reply_markup)
 
 
@@ -1039,121 +1082,25 @@ async def handle_list_callback(update: Update, context: ContextTypes.DEFAULT_TYP
     
     data = query.data
     
-    # Обработка фильтров по тегам
-    if data.startswith('list_tag_'):
-        tag = data.replace('list_tag_', '')
-        reports = db.get_all_reports(tag=tag, limit=10, offset=0)
-        total_count = db.count_reports(tag=tag)
-        
-        if not reports:
-            await query.edit_message_text(f"📋 Репортов с тегом {tag} не найдено")
-            return
-        
-        message_text = f"📋 <b>Список репортов</b> ({tag})\n\n"
-        
-        for report in reports:
-            numeric_id = report.get('numeric_id') or report.get('id', '?')
-            status_emoji = {
-                'new': '🆕',
-                'in_progress': '🔄',
-                'resolved': '✅',
-                'rejected': '❌'
-            }.get(report['status'], '❓')
-            
-            status_text = STATUSES.get(report['status'], report['status'])
-            content_preview = report['content'][:60].replace('\n', ' ') + ('...' if len(report['content']) > 60 else '')
-            
-            message_text += f"{status_emoji} <b>#{numeric_id}</b> {report['tag']} - {status_text}\n"
-            message_text += f"   {content_preview}\n\n"
-        
-        message_text += f"<i>Показано {len(reports)} из {total_count}</i>"
-        
-        # Кнопки
-        keyboard = []
-        filter_row = []
-        if tag != '#BUG':
-            filter_row.append(InlineKeyboardButton("🐛 #BUG", callback_data="list_tag_#BUG"))
-        if tag != '#UIFIX':
-            filter_row.append(InlineKeyboardButton("🎨 #UIFIX", callback_data="list_tag_#UIFIX"))
-        if tag != '#FEATURE':
-            filter_row.append(InlineKeyboardButton("✨ #FEATURE", callback_data="list_tag_#FEATURE"))
-        if tag != '#ADM':
-            filter_row.append(InlineKeyboardButton("⚙️ #ADM", callback_data="list_tag_#ADM"))
-        if filter_row:
-            keyboard.append(filter_row)
-        
-        keyboard.append([InlineKeyboardButton("📋 Все репорты", callback_data="list_all")])
-        
-        view_row = []
-        for i, report in enumerate(reports[:5]):
-            numeric_id = report.get('numeric_id') or report.get('id', '?')
-            view_row.append(InlineKeyboardButton(f"#{numeric_id}", callback_data=f"view_{report['report_id']}"))
-            if len(view_row) == 2:
-                keyboard.append(view_row)
-                view_row = []
-        if view_row:
-            keyboard.append(view_row)
-        
-        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
-        await query.edit_message_text(message_text, parse_mode='HTML', reply_markup=reply_markup)
-        
-    # Обработка "Все репорты"
-    elif data == 'list_all':
-        reports = db.get_all_reports(limit=10, offset=0)
-        total_count = db.count_reports()
-        
-        if not reports:
-            await query.edit_message_text("📋 Репортов не найдено")
-            return
-        
-        message_text = f"📋 <b>Список всех репортов</b>\n\n"
-        
-        for report in reports:
-            numeric_id = report.get('numeric_id') or report.get('id', '?')
-            status_emoji = {
-                'new': '🆕',
-                'in_progress': '🔄',
-                'resolved': '✅',
-                'rejected': '❌'
-            }.get(report['status'], '❓')
-            
-            status_text = STATUSES.get(report['status'], report['status'])
-            content_preview = report['content'][:60].replace('\n', ' ') + ('...' if len(report['content']) > 60 else '')
-            
-            message_text += f"{status_emoji} <b>#{numeric_id}</b> {report['tag']} - {status_text}\n"
-            message_text += f"   {content_preview}\n\n"
-        
-        message_text += f"<i>Показано {len(reports)} из {total_count}</i>"
-        
-        # Кнопки
-        keyboard = [
-            [
-                InlineKeyboardButton("🐛 #BUG", callback_data="list_tag_#BUG"),
-                InlineKeyboardButton("🎨 #UIFIX", callback_data="list_tag_#UIFIX")
-            ],
-            [
-                InlineKeyboardButton("✨ #FEATURE", callback_data="list_tag_#FEATURE"),
-                InlineKeyboardButton("⚙️ #ADM", callback_data="list_tag_#ADM")
-            ]
-        ]
-        
-        view_row = []
-        for i, report in enumerate(reports[:5]):
-            numeric_id = report.get('numeric_id') or report.get('id', '?')
-            view_row.append(InlineKeyboardButton(f"#{numeric_id}", callback_data=f"view_{report['report_id']}"))
-            if len(view_row) == 2:
-                keyboard.append(view_row)
-                view_row = []
-        if view_row:
-            keyboard.append(view_row)
-        
-        reply_markup = InlineKeyboardMarkup(keyboard) if keyboard else None
+    # Обработка фильтров по тегам, "Все репорты" и перехода по страницам
+    if data.startswith('list_tag_') or data == 'list_all' or data.startswith('list_page_'):
+        if data.startswith('list_tag_'):
+            tag, after_id, page = data.replace('list_tag_', ''), None, 1
+        elif data == 'list_all':
+            tag, after_id, page = None, None, 1
+        else:
+            parsed = parse_list_page_callback(data)
+            if parsed is None:
+                logger.error(f"[CALLBACK] Некорректный курсор списка: {data}")
+                return
+            tag, after_id, page = parsed
+        message_text, reply_markup = await build_reports_list(tag, after_id=after_id, page=page)
         await query.edit_message_text(message_text, parse_mode='HTML', reply_markup=reply_markup)
-    
+
     # Обработка просмотра конкретного репорта
     elif data.startswith('view_'):
         report_id = data.replace('view_', '')
-        report = db.get_report(report_id)
+        report = await db.get_report(report_id)
         
         if not report:
             await query.edit_message_text("❌ Репорт не найден")
@@ -1359,6 +1306,11 @@ def main():
     
     # Запускаем проверку после старта приложения
     application.post_init = check_group_info
+
+    async def close_storage(app):
+        db.close()
+
+    application.post_shutdown = close_storage
     
     application.run_polling(
         allowed_updates=Update.ALL_TYPES,  # Получаем все типы обновлений
@@ -1,77 +1,244 @@
 """
 Модели данных для хранения репортов и их статусов
 """
+import asyncio
+import atexit
+import logging
 import sqlite3
-import json
-from datetime import datetime
-from typing import Optional, List, Dict
+import threading
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional, List, Dict, Any, Callable, Tuple
 from pathlib import Path
 
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# SQL-операции. Принимают открытое соединение (row_factory = sqlite3.Row) и не делают commit —
+# транзакцией управляет вызывающий: синхронный ReportDatabase или поток AsyncReportDatabase.
+# =============================================================================
+
+def _init_schema(conn: sqlite3.Connection) -> None:
+    """Создание таблиц в базе данных, если их нет"""
+    cursor = conn.cursor()
+
+    # Таблица репортов
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS reports (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            report_id TEXT UNIQUE NOT NULL,
+            numeric_id INTEGER,  -- Числовой ID для удобства (будет равен id)
+            group_message_id INTEGER NOT NULL,
+            group_chat_id INTEGER NOT NULL,
+            author_id INTEGER NOT NULL,
+            author_username TEXT,
+            author_first_name TEXT,
+            tag TEXT NOT NULL,
+            content TEXT NOT NULL,
+            status TEXT DEFAULT 'new',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            admin_message_id INTEGER,
+            admin_chat_id INTEGER
+        )
+    """)
+
+    # Добавляем колонку numeric_id, если её нет (для существующих БД)
+    columns = {row[1] for row in cursor.execute("PRAGMA table_info(reports)").fetchall()}
+    if 'numeric_id' not in columns:
+        cursor.execute("ALTER TABLE reports ADD COLUMN numeric_id INTEGER")
+        # Заполняем numeric_id значениями из id для существующих записей
+        cursor.execute("UPDATE reports SET numeric_id = id WHERE numeric_id IS NULL")
+
+    # Составные индексы под списки «фильтр + свежие сверху»: внутри индекса строки уже
+    # упорядочены по (created_at, rowid), поэтому и сортировка, и keyset-курсор идут по индексу.
+    # Одиночные idx_status/idx_tag — префиксы этих индексов, они больше не нужны.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_tag_created ON reports(tag, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_status_created ON reports(status, created_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_created ON reports(created_at)")
+    cursor.execute("DROP INDEX IF EXISTS idx_status")
+    cursor.execute("DROP INDEX IF EXISTS idx_tag")
+
+    # Уникальный индекс для поиска по числовому ID
+    cursor.execute("UPDATE reports SET numeric_id = id WHERE numeric_id IS NULL")
+    try:
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ux_reports_numeric_id ON reports(numeric_id)")
+    except sqlite3.IntegrityError:
+        logger.warning("В reports есть дубли numeric_id — уникальный индекс не создан, используется обычный")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_reports_numeric_id ON reports(numeric_id)")
+
+
+class ReportCounts:
+    """
+    Счётчики репортов по (tag, status) в памяти.
+
+    Загружаются одним GROUP BY при первом обращении, дальше поддерживаются инкрементально
+    операциями записи того же соединения. Имеет смысл только у единственного писателя
+    (поток AsyncReportDatabase); при сбое транзакции сбрасываются и перечитываются.
+    """
+
+    def __init__(self):
+        self._counts: Optional[Dict[Tuple[str, str], int]] = None
+
+    def invalidate(self) -> None:
+        self._counts = None
+
+    def get(self, conn: sqlite3.Connection, tag: Optional[str] = None, status: Optional[str] = None) -> int:
+        if self._counts is None:
+            self._counts = {
+                (row[0], row[1]): row[2]
+                for row in conn.execute("SELECT tag, status, COUNT(*) FROM reports GROUP BY tag, status")
+            }
+        return sum(
+            n for (t, st), n in self._counts.items()
+            if (not tag or t == tag) and (not status or st == status)
+        )
+
+    def moved(self, tag: str, old_status: Optional[str], new_status: Optional[str]) -> None:
+        if self._counts is None or old_status == new_status:
+            return
+        if old_status is not None:
+            self._counts[(tag, old_status)] = self._counts.get((tag, old_status), 0) - 1
+        if new_status is not None:
+            self._counts[(tag, new_status)] = self._counts.get((tag, new_status), 0) + 1
+
+
+def _add_report(conn: sqlite3.Connection, report_id: str, group_message_id: int, group_chat_id: int,
+                author_id: int, author_username: Optional[str], author_first_name: Optional[str],
+                tag: str, content: str, counts: Optional[ReportCounts] = None) -> bool:
+    try:
+        conn.execute("""
+            INSERT INTO reports
+            (report_id, group_message_id, group_chat_id, author_id,
+             author_username, author_first_name, tag, content, status)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'new')
+        """, (
+            report_id, group_message_id, group_chat_id, author_id,
+            author_username, author_first_name, tag, content
+        ))
+    except sqlite3.IntegrityError:
+        # Репорт уже существует (в SQLite откатывается только этот оператор, не вся транзакция)
+        return False
+    # Обновляем numeric_id значением из id
+    conn.execute("UPDATE reports SET numeric_id = id WHERE report_id = ?", (report_id,))
+    if counts is not None:
+        counts.moved(tag, None, 'new')
+    return True
+
+
+def _update_status(conn: sqlite3.Connection, report_id: str, status: str,
+                   admin_message_id: Optional[int] = None, admin_chat_id: Optional[int] = None,
+                   counts: Optional[ReportCounts] = None) -> bool:
+    previous = None
+    if counts is not None:
+        previous = conn.execute("SELECT tag, status FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+    cursor = conn.execute("""
+        UPDATE reports
+        SET status = ?, updated_at = CURRENT_TIMESTAMP,
+            admin_message_id = COALESCE(?, admin_message_id),
+            admin_chat_id = COALESCE(?, admin_chat_id)
+        WHERE report_id = ?
+    """, (status, admin_message_id, admin_chat_id, report_id))
+    if previous is not None:
+        counts.moved(previous['tag'], previous['status'], status)
+    return cursor.rowcount > 0
+
+
+def _get_report(conn: sqlite3.Connection, report_id: str) -> Optional[Dict]:
+    row = conn.execute("SELECT * FROM reports WHERE report_id = ?", (report_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _get_reports_by_status(conn: sqlite3.Connection, status: str) -> List[Dict]:
+    rows = conn.execute("SELECT * FROM reports WHERE status = ? ORDER BY created_at DESC", (status,)).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _get_report_by_numeric_id(conn: sqlite3.Connection, numeric_id: int) -> Optional[Dict]:
+    # Два точечных поиска по индексам вместо OR, который SQLite планирует хуже
+    row = conn.execute("SELECT * FROM reports WHERE numeric_id = ?", (numeric_id,)).fetchone()
+    if row is None:
+        row = conn.execute("SELECT * FROM reports WHERE id = ?", (numeric_id,)).fetchone()
+    return dict(row) if row else None
+
+
+def _filters(tag: Optional[str], status: Optional[str]) -> tuple:
+    where = ""
+    params: list = []
+    if tag:
+        where += " AND tag = ?"
+        params.append(tag)
+    if status:
+        where += " AND status = ?"
+        params.append(status)
+    return where, params
+
+
+def _get_all_reports(conn: sqlite3.Connection, tag: Optional[str] = None, status: Optional[str] = None,
+                     limit: int = 50, offset: int = 0) -> List[Dict]:
+    where, params = _filters(tag, status)
+    rows = conn.execute(
+        f"SELECT * FROM reports WHERE 1=1{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?",
+        params + [limit, offset],
+    ).fetchall()
+    return [dict(row) for row in rows]
+
+
+def _list_reports_page(conn: sqlite3.Connection, tag: Optional[str] = None, status: Optional[str] = None,
+                       limit: int = 10, after_id: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+    where, params = _filters(tag, status)
+    if after_id is not None:
+        # Keyset: строки строго «старше» последней показанной, стоимость не зависит от номера страницы
+        where += " AND (created_at, id) < (SELECT created_at, id FROM reports WHERE id = ?)"
+        params.append(after_id)
+    rows = conn.execute(
+        f"SELECT * FROM reports WHERE 1=1{where} ORDER BY created_at DESC, id DESC LIMIT ?",
+        params + [limit + 1],
+    ).fetchall()
+    reports = [dict(row) for row in rows[:limit]]
+    next_after_id = reports[-1]['id'] if len(rows) > limit else None
+    return reports, next_after_id
+
+
+def _count_reports(conn: sqlite3.Connection, tag: Optional[str] = None, status: Optional[str] = None,
+                   counts: Optional[ReportCounts] = None) -> int:
+    if counts is not None:
+        return counts.get(conn, tag, status)
+    where, params = _filters(tag, status)
+    return conn.execute(f"SELECT COUNT(*) FROM reports WHERE 1=1{where}", params).fetchone()[0]
+
 
 class ReportDatabase:
-    """Класс для работы с базой данных репортов"""
-    
+    """Класс для работы с базой данных репортов (синхронный: соединение на каждый вызов)"""
+
     def __init__(self, db_path: str = "data/reports.db"):
         """
         Инициализация базы данных
-        
+
         Args:
             db_path: Путь к файлу базы данных SQLite
         """
         # Создаем директорию, если её нет
         Path(db_path).parent.mkdir(parents=True, exist_ok=True)
-        
+
         self.db_path = db_path
         self.init_database()
-    
-    def init_database(self):
-        """Создание таблиц в базе данных, если их нет"""
+
+    def _call(self, op: Callable, *args, **kwargs):
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        # Таблица репортов
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reports (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                report_id TEXT UNIQUE NOT NULL,
-                numeric_id INTEGER,  -- Числовой ID для удобства (будет равен id)
-                group_message_id INTEGER NOT NULL,
-                group_chat_id INTEGER NOT NULL,
-                author_id INTEGER NOT NULL,
-                author_username TEXT,
-                author_first_name TEXT,
-                tag TEXT NOT NULL,
-                content TEXT NOT NULL,
-                status TEXT DEFAULT 'new',
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                admin_message_id INTEGER,
-                admin_chat_id INTEGER
-            )
-        """)
-        
-        # Добавляем колонку numeric_id, если её нет (для существующих БД)
+        conn.row_factory = sqlite3.Row
         try:
-            cursor.execute("ALTER TABLE reports ADD COLUMN numeric_id INTEGER")
-            # Заполняем numeric_id значениями из id для существующих записей
-            cursor.execute("UPDATE reports SET numeric_id = id WHERE numeric_id IS NULL")
-        except sqlite3.OperationalError:
-            # Колонка уже существует, ничего не делаем
-            pass
-        
-        # Индекс для быстрого поиска по статусу
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_status ON reports(status)
-        """)
-        
-        # Индекс для поиска по тегу
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_tag ON reports(tag)
-        """)
-        
-        conn.commit()
-        conn.close()
-    
+            result = op(conn, *args, **kwargs)
+            conn.commit()
+            return result
+        finally:
+            conn.close()
+
+    def init_database(self):
+        """Создание таблиц в базе данных, если их нет"""
+        self._call(_init_schema)
+
     def add_report(
         self,
         report_id: str,
@@ -85,7 +252,7 @@ class ReportDatabase:
     ) -> bool:
         """
         Добавление нового репорта в базу данных
-        
+
         Args:
             report_id: Уникальный идентификатор репорта
             group_message_id: ID сообщения в группе
@@ -95,33 +262,13 @@ class ReportDatabase:
             author_first_name: Имя автора
             tag: Тег репорта (#BUG, #UIFIX, #FEATURE)
             content: Текст репорта
-            
+
         Returns:
             True если репорт добавлен, False если уже существует
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        try:
-            cursor.execute("""
-                INSERT INTO reports 
-                (report_id, group_message_id, group_chat_id, author_id, 
-                 author_username, author_first_name, tag, content, status)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, 'new')
-            """, (
-                report_id, group_message_id, group_chat_id, author_id,
-                author_username, author_first_name, tag, content
-            ))
-            # Обновляем numeric_id значением из id
-            cursor.execute("UPDATE reports SET numeric_id = id WHERE report_id = ?", (report_id,))
-            conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            # Репорт уже существует
-            return False
-        finally:
-            conn.close()
-    
+        return self._call(_add_report, report_id, group_message_id, group_chat_id, author_id,
+                          author_username, author_first_name, tag, content)
+
     def update_status(
         self,
         report_id: str,
@@ -131,162 +278,345 @@ class ReportDatabase:
     ) -> bool:
         """
         Обновление статуса репорта
-        
+
         Args:
             report_id: Идентификатор репорта
             status: Новый статус (new, in_progress, resolved, rejected)
             admin_message_id: ID сообщения в личке админа
             admin_chat_id: ID чата админа
-            
+
         Returns:
             True если обновлено успешно
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            UPDATE reports 
-            SET status = ?, updated_at = CURRENT_TIMESTAMP,
-                admin_message_id = COALESCE(?, admin_message_id),
-                admin_chat_id = COALESCE(?, admin_chat_id)
-            WHERE report_id = ?
-        """, (status, admin_message_id, admin_chat_id, report_id))
-        
-        updated = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        
-        return updated
-    
+        return self._call(_update_status, report_id, status, admin_message_id, admin_chat_id)
+
     def get_report(self, report_id: str) -> Optional[Dict]:
         """
         Получение репорта по ID
-        
+
         Args:
             report_id: Идентификатор репорта
-            
+
         Returns:
             Словарь с данными репорта или None
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM reports WHERE report_id = ?", (report_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return dict(row)
-        return None
-    
+        return self._call(_get_report, report_id)
+
     def get_reports_by_status(self, status: str) -> List[Dict]:
         """
         Получение всех репортов с определенным статусом
-        
+
         Args:
             status: Статус для фильтрации
-            
+
         Returns:
             Список словарей с данными репортов
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM reports WHERE status = ? ORDER BY created_at DESC", (status,))
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
-    
+        return self._call(_get_reports_by_status, status)
+
     def get_report_by_numeric_id(self, numeric_id: int) -> Optional[Dict]:
         """
         Получение репорта по числовому ID
-        
+
         Args:
             numeric_id: Числовой идентификатор репорта
-            
+
         Returns:
             Словарь с данными репорта или None
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT * FROM reports WHERE numeric_id = ? OR id = ?", (numeric_id, numeric_id))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if row:
-            return dict(row)
-        return None
-    
+        return self._call(_get_report_by_numeric_id, numeric_id)
+
     def get_all_reports(self, tag: Optional[str] = None, status: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
         """
         Получение списка репортов с фильтрацией
-        
+
         Args:
             tag: Фильтр по тегу (опционально)
             status: Фильтр по статусу (опционально)
             limit: Максимальное количество репортов
             offset: Смещение для пагинации
-            
+
         Returns:
             Список словарей с данными репортов
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        cursor = conn.cursor()
-        
-        # Формируем запрос с фильтрами
-        query = "SELECT * FROM reports WHERE 1=1"
-        params = []
-        
-        if tag:
-            query += " AND tag = ?"
-            params.append(tag)
-        
-        if status:
-            query += " AND status = ?"
-            params.append(status)
-        
-        query += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
-        params.extend([limit, offset])
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in rows]
-    
+        return self._call(_get_all_reports, tag, status, limit, offset)
+
+    def list_reports_page(self, tag: Optional[str] = None, status: Optional[str] = None, limit: int = 10,
+                          after_id: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """
+        Страница репортов (свежие сверху) с keyset-курсором
+
+        Args:
+            tag: Фильтр по тегу (опционально)
+            status: Фильтр по статусу (опционально)
+            limit: Размер страницы
+            after_id: id последнего репорта предыдущей страницы (None — первая страница)
+
+        Returns:
+            (репорты, курсор следующей страницы или None, если это последняя)
+        """
+        return self._call(_list_reports_page, tag, status, limit, after_id)
+
     def count_reports(self, tag: Optional[str] = None, status: Optional[str] = None) -> int:
         """
         Подсчет количества репортов с фильтрацией
-        
+
         Args:
             tag: Фильтр по тегу (опционально)
             status: Фильтр по статусу (опционально)
-            
+
         Returns:
             Количество репортов
         """
-        conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
-        
-        query = "SELECT COUNT(*) FROM reports WHERE 1=1"
-        params = []
-        
-        if tag:
-            query += " AND tag = ?"
-            params.append(tag)
-        
-        if status:
-            query += " AND status = ?"
-            params.append(status)
-        
-        cursor.execute(query, params)
-        count = cursor.fetchone()[0]
-        conn.close()
-        
-        return count
\ No newline at end of file
+        return self._call(_count_reports, tag, status)
+
+
+class _Job:
+    __slots__ = ('op', 'args', 'kwargs', 'write', 'loop', 'future')
+
+    def __init__(self, op, args, kwargs, write, loop, future):
+        self.op = op
+        self.args = args
+        self.kwargs = kwargs
+        self.write = write
+        self.loop = loop
+        self.future = future
+
+
+def _set_future(future, result, exc) -> None:
+    if future.done():
+        return
+    if exc is not None:
+        future.set_exception(exc)
+    else:
+        future.set_result(result)
+
+
+class AsyncReportDatabase:
+    """
+    Неблокирующее хранилище репортов для async-хендлеров бота.
+
+    Вся работа с SQLite идёт в отдельном потоке с одним долгоживущим соединением
+    (WAL, кеш подготовленных выражений sqlite3). Хендлер только ставит задачу в очередь
+    и ждёт future, поэтому диск и ожидание блокировок не останавливают event loop.
+
+    Подряд идущие записи из очереди выполняются одной транзакцией (один commit/fsync на пачку);
+    чтения идут в порядке очереди и видят все записи, поставленные до них.
+    """
+
+    def __init__(self, db_path: str = "data/reports.db", *, batch_max: int = 64, batch_window_ms: float = 0.0):
+        """
+        Args:
+            db_path: Путь к файлу базы данных SQLite
+            batch_max: Максимум записей в одной транзакции
+            batch_window_ms: Сколько подождать следующих записей, если очередь пуста (0 — не ждать)
+        """
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.db_path = db_path
+        self.batch_max = max(1, int(batch_max))
+        self.batch_window = max(0.0, float(batch_window_ms)) / 1000.0
+        self._jobs: deque = deque()
+        self._cv = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self._start_error: Optional[BaseException] = None
+        self._closed = False
+        self.counts = ReportCounts()
+        self.stats = {'reads': 0, 'writes': 0, 'batches': 0, 'max_batch': 0}
+
+    # --- жизненный цикл -----------------------------------------------------
+
+    def start(self) -> None:
+        with self._cv:
+            if self._thread is not None:
+                return
+            self._closed = False
+            self._thread = threading.Thread(target=self._run, name='report-db', daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+        self._ready.wait()
+        if self._start_error is not None:
+            raise self._start_error
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Дожидается выполнения поставленных задач и закрывает соединение."""
+        with self._cv:
+            thread = self._thread
+            self._closed = True
+            self._cv.notify_all()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join(timeout)
+        with self._cv:
+            self._thread = None
+            self._ready.clear()
+
+    def _connect(self) -> sqlite3.Connection:
+        # isolation_level=None — транзакциями управляем сами (BEGIN/COMMIT на пачку)
+        conn = sqlite3.connect(self.db_path, isolation_level=None, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.execute("BEGIN IMMEDIATE")
+        _init_schema(conn)
+        conn.execute("COMMIT")
+        return conn
+
+    def _run(self) -> None:
+        try:
+            conn = self._connect()
+        except BaseException as e:  # noqa: BLE001 - пробрасываем в start()
+            self._start_error = e
+            self._ready.set()
+            return
+        self._ready.set()
+        try:
+            while True:
+                with self._cv:
+                    while not self._jobs and not self._closed:
+                        self._cv.wait()
+                    if not self._jobs:
+                        break
+                    job = self._jobs.popleft()
+                    batch = [job]
+                    if job.write:
+                        if self.batch_window and not self._jobs and not self._closed:
+                            self._cv.wait(self.batch_window)
+                        while self._jobs and self._jobs[0].write and len(batch) < self.batch_max:
+                            batch.append(self._jobs.popleft())
+                if job.write:
+                    self._run_writes(conn, batch)
+                else:
+                    self._run_read(conn, job)
+        finally:
+            conn.close()
+
+    # --- выполнение ---------------------------------------------------------
+
+    @staticmethod
+    def _resolve(job: _Job, result: Any, exc: Optional[BaseException]) -> None:
+        if job.loop is None:
+            _set_future(job.future, result, exc)
+            return
+        try:
+            job.loop.call_soon_threadsafe(_set_future, job.future, result, exc)
+        except RuntimeError:
+            # event loop уже закрыт — ответ никому не нужен
+            pass
+
+    def _run_read(self, conn: sqlite3.Connection, job: _Job) -> None:
+        self.stats['reads'] += 1
+        try:
+            result = job.op(conn, *job.args, **job.kwargs)
+        except Exception as e:
+            self._resolve(job, None, e)
+            return
+        self._resolve(job, result, None)
+
+    def _run_writes(self, conn: sqlite3.Connection, batch: List[_Job]) -> None:
+        self.stats['writes'] += len(batch)
+        self.stats['batches'] += 1
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+        outcomes = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for job in batch:
+                # Своя точка сохранения на задачу: упавшая задача не оставляет в пачке частичных изменений
+                conn.execute("SAVEPOINT job")
+                try:
+                    result = job.op(conn, *job.args, **job.kwargs)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO job")
+                    conn.execute("RELEASE job")
+                    outcomes.append((job, None, e))
+                    continue
+                conn.execute("RELEASE job")
+                outcomes.append((job, result, None))
+            conn.execute("COMMIT")
+        except Exception as e:
+            logger.error(f"Ошибка записи пачки репортов ({len(batch)} шт.): {e}")
+            try:
+                conn.execute("ROLLBACK")
+            except Exception:
+                pass
+            # Счётчики уже учли откаченные изменения — перечитаем при следующем запросе
+            self.counts.invalidate()
+            for job in batch:
+                self._resolve(job, None, e)
+            return
+        for job, result, exc in outcomes:
+            self._resolve(job, result, exc)
+
+    def _enqueue(self, job: _Job) -> None:
+        if self._thread is None:
+            self.start()
+        with self._cv:
+            if self._closed:
+                raise RuntimeError('AsyncReportDatabase is closed')
+            self._jobs.append(job)
+            self._cv.notify()
+
+    async def _submit(self, op: Callable, write: bool, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._enqueue(_Job(op, args, kwargs, write, loop, future))
+        return await future
+
+    def call_sync(self, op: Callable, *args, write: bool = False, **kwargs):
+        """Выполнить операцию из обычного (не async) кода через тот же поток."""
+        future: Future = Future()
+        self._enqueue(_Job(op, args, kwargs, write, None, future))
+        return future.result()
+
+    # --- API (совпадает с ReportDatabase, но async) ---------------------------
+
+    async def add_report(
+        self,
+        report_id: str,
+        group_message_id: int,
+        group_chat_id: int,
+        author_id: int,
+        author_username: Optional[str],
+        author_first_name: Optional[str],
+        tag: str,
+        content: str
+    ) -> bool:
+        """Добавление нового репорта. True если добавлен, False если уже существует"""
+        return await self._submit(_add_report, True, report_id, group_message_id, group_chat_id, author_id,
+                                  author_username, author_first_name, tag, content, counts=self.counts)
+
+    async def update_status(
+        self,
+        report_id: str,
+        status: str,
+        admin_message_id: Optional[int] = None,
+        admin_chat_id: Optional[int] = None
+    ) -> bool:
+        """Обновление статуса репорта"""
+        return await self._submit(_update_status, True, report_id, status, admin_message_id, admin_chat_id,
+                                  counts=self.counts)
+
+    async def get_report(self, report_id: str) -> Optional[Dict]:
+        """Получение репорта по ID"""
+        return await self._submit(_get_report, False, report_id)
+
+    async def get_reports_by_status(self, status: str) -> List[Dict]:
+        """Получение всех репортов с определенным статусом"""
+        return await self._submit(_get_reports_by_status, False, status)
+
+    async def get_report_by_numeric_id(self, numeric_id: int) -> Optional[Dict]:
+        """Получение репорта по числовому ID"""
+        return await self._submit(_get_report_by_numeric_id, False, numeric_id)
+
+    async def get_all_reports(self, tag: Optional[str] = None, status: Optional[str] = None, limit: int = 50, offset: int = 0) -> List[Dict]:
+        """Получение списка репортов с фильтрацией"""
+        return await self._submit(_get_all_reports, False, tag, status, limit, offset)
+
+    async def list_reports_page(self, tag: Optional[str] = None, status: Optional[str] = None, limit: int = 10,
+                                after_id: Optional[int] = None) -> Tuple[List[Dict], Optional[int]]:
+        """Страница репортов с keyset-курсором: (репорты, after_id следующей страницы или None)"""
+        return await self._submit(_list_reports_page, False, tag, status, limit, after_id)
+
+    async def count_reports(self, tag: Optional[str] = None, status: Optional[str] = None) -> int:
+        """Подсчет количества репортов с фильтрацией (из счётчиков в памяти)"""
+        return await self._submit(_count_reports, False, tag, status, counts=self.counts)
@@ -15,7 +15,7 @@ import streamlit.components.v1 as components
 
 from trainer_app.platform_client import PlatformClient, get_platform_base_url
 from trainer_app.analyzers.python_static import analyze_python_code
-from trainer_app.knowledge import load_task_knowledge
+from trainer_app.knowledge import load_task_knowledge, preload_task_knowledge
 from trainer_app.llm.providers import get_llm_client, get_llm_info, build_messages_for_help
 from trainer_app.runner.sandbox import is_runner_enabled, run_python_solve_tests, run_python_program
 
@@ -32,6 +32,9 @@ try:
 except Exception:
     pass
 
+# Knowledge packs are parsed once per process; reruns only stat() the current pack
+preload_task_knowledge()
+
 
 def _inject_css():
     # Streamlit allows limited styling; this keeps UI cleaner and more "product-like".
@@ -729,9 +732,10 @@ def main():
             st.markdown("### История попыток")
             if st.button("Обновить историю", use_container_width=True, key="btn_hist_refresh"):
                 st.session_state['history_loaded'] = False
+                st.session_state['history_fresh'] = True
             if not st.session_state.get('history_loaded'):
                 try:
-                    h = client.list_sessions(limit=25)
+                    h = client.list_sessions(limit=25, fresh=bool(st.session_state.pop('history_fresh', False)))
                     st.session_state['history_items'] = (h.get('sessions') or []) if isinstance(h, dict) else []
                     st.session_state['history_loaded'] = True
                 except Exception as e:
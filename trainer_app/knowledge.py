@@ -2,6 +2,9 @@ from __future__ import annotations
 
 import json
 import os
+import re
+import threading
+from dataclasses import dataclass
 from typing import Any
 import logging
 
@@ -92,15 +95,16 @@ def _validate_task_knowledge(data: dict[str, Any]) -> tuple[bool, list[str]]:
     return (len(errs) == 0), errs
 
 
-def load_task_knowledge(task_id: int) -> dict[str, Any] | None:
-    try:
-        task_id_int = int(task_id)
-    except Exception:
-        return None
+def _strict_mode() -> bool:
+    return (os.environ.get('TRAINER_STRICT_KNOWLEDGE') or '').strip().lower() in ('1', 'true', 'yes', 'on')
 
-    path = os.path.join(_repo_root(), 'trainer_knowledge', 'tasks', f'{task_id_int}.json')
-    if not os.path.exists(path):
-        return None
+
+def _tasks_dir() -> str:
+    return os.path.join(_repo_root(), 'trainer_knowledge', 'tasks')
+
+
+def _read_task_knowledge(path: str, *, strict: bool) -> dict[str, Any] | None:
+    """Read + parse + validate one pack from disk (no caching)."""
     try:
         with open(path, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -110,10 +114,103 @@ def load_task_knowledge(task_id: int) -> dict[str, Any] | None:
         if not ok:
             logger.warning(f'Invalid trainer knowledge file {path}: {errs}')
             # Strict mode: fail fast
-            strict = (os.environ.get('TRAINER_STRICT_KNOWLEDGE') or '').strip().lower() in ('1', 'true', 'yes', 'on')
             if strict:
                 return None
         return data
     except Exception:
         return None
 
+
+@dataclass
+class _KnowledgeEntry:
+    mtime_ns: int
+    size: int
+    strict: bool
+    data: dict[str, Any] | None
+
+
+class KnowledgeStore:
+    """
+    Parsed and validated knowledge packs kept in memory, keyed by task id.
+
+    Every lookup does one os.stat(): if mtime and size match the cached entry the pack is returned
+    as is, otherwise it is re-read and re-validated. Invalid/unreadable packs are cached too
+    (as None), so a broken file is not re-parsed on every rerun until it changes.
+    Returned dicts are shared — treat them as read-only.
+    """
+
+    _PACK_RE = re.compile(r'^(\d+)\.json$')
+
+    def __init__(self, tasks_dir: str | None = None):
+        self.tasks_dir = tasks_dir or _tasks_dir()
+        self._entries: dict[int, _KnowledgeEntry] = {}
+        self._lock = threading.Lock()
+        self._preloaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, task_id: int) -> str:
+        return os.path.join(self.tasks_dir, f'{task_id}.json')
+
+    def get(self, task_id: int) -> dict[str, Any] | None:
+        path = self._path(task_id)
+        try:
+            st = os.stat(path)
+        except OSError:
+            with self._lock:
+                self._entries.pop(task_id, None)
+            return None
+
+        strict = _strict_mode()
+        entry = self._entries.get(task_id)
+        if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size and entry.strict == strict:
+            with self._lock:
+                self.hits += 1
+            return entry.data
+
+        data = _read_task_knowledge(path, strict=strict)
+        with self._lock:
+            self.misses += 1
+            self._entries[task_id] = _KnowledgeEntry(st.st_mtime_ns, st.st_size, strict, data)
+        return data
+
+    def preload(self, *, force: bool = False) -> int:
+        """Loads every `<task_id>.json` pack once per process; returns the number of valid packs."""
+        if self._preloaded and not force:
+            return sum(1 for e in self._entries.values() if e.data is not None)
+        try:
+            names = os.listdir(self.tasks_dir)
+        except OSError:
+            names = []
+        loaded = 0
+        for name in sorted(names):
+            m = self._PACK_RE.match(name)
+            if m and self.get(int(m.group(1))) is not None:
+                loaded += 1
+        self._preloaded = True
+        return loaded
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {
+                'packs': len(self._entries),
+                'valid': sum(1 for e in self._entries.values() if e.data is not None),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+knowledge_store = KnowledgeStore()
+
+
+def preload_task_knowledge(*, force: bool = False) -> int:
+    """Warm the store at trainer startup (cheap no-op on subsequent Streamlit reruns)."""
+    return knowledge_store.preload(force=force)
+
+
+def load_task_knowledge(task_id: int) -> dict[str, Any] | None:
+    try:
+        task_id_int = int(task_id)
+    except Exception:
+        return None
+    return knowledge_store.get(task_id_int)
@@ -1,10 +1,17 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import random
 import re
-from typing import Any, Literal
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Iterator, Literal
 
 import requests
+from requests.adapters import HTTPAdapter
 
 
 ProviderName = Literal['groq', 'gemini']
@@ -22,13 +29,6 @@ def _strip_html(s: str) -> str:
     return s
 
 
-class LlmClient:
-    provider: ProviderName
-
-    def chat(self, *, messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int = 800) -> str:
-        raise NotImplementedError
-
-
 def _env_float(name: str, default: float) -> float:
     v = (os.environ.get(name) or '').strip()
     if not v:
@@ -39,6 +39,51 @@ def _env_float(name: str, default: float) -> float:
         return float(default)
 
 
+def _env_int(name: str, default: int) -> int:
+    v = (os.environ.get(name) or '').strip()
+    if not v:
+        return int(default)
+    try:
+        return int(v)
+    except Exception:
+        return int(default)
+
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Shared keep-alive session for provider calls (TLS handshake is paid once per pooled connection).
+    Pool size: TRAINER_LLM_POOL_SIZE (default 10). Retries are handled by _request_with_retries.
+    """
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                pool_size = max(1, _env_int('TRAINER_LLM_POOL_SIZE', 10))
+                s = requests.Session()
+                adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+                s.mount('https://', adapter)
+                s.mount('http://', adapter)
+                _session = s
+    return _session
+
+
+_RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+def _backoff_delay(attempt: int, *, base: float = 0.5, cap: float = 8.0, retry_after: str | None = None) -> float:
+    """Exponential backoff with full jitter; Retry-After (seconds) wins when the provider sends it."""
+    if retry_after:
+        try:
+            return max(0.0, min(float(retry_after), cap))
+        except (TypeError, ValueError):
+            pass
+    return random.uniform(0, min(cap, base * (2 ** (attempt - 1))))
+
+
 def _request_with_retries(
     method: str,
     url: str,
@@ -47,31 +92,27 @@ def _request_with_retries(
     json_body: Any | None = None,
     timeout: float = 30.0,
     max_attempts: int = 3,
+    stream: bool = False,
 ) -> requests.Response:
     """
     Best-effort retry for transient errors (429/5xx, network issues).
-    No external deps; uses a simple incremental backoff.
+    Uses the shared keep-alive session and jittered exponential backoff.
     """
+    session = get_http_session()
     last_exc: Exception | None = None
     for attempt in range(1, max_attempts + 1):
         try:
-            r = requests.request(method, url, headers=headers, json=json_body, timeout=timeout)
-            if r.status_code in (429, 500, 502, 503, 504) and attempt < max_attempts:
-                try:
-                    import time
-                    time.sleep(0.6 * attempt)
-                except Exception:
-                    pass
+            r = session.request(method, url, headers=headers, json=json_body, timeout=timeout, stream=stream)
+            if r.status_code in _RETRY_STATUSES and attempt < max_attempts:
+                delay = _backoff_delay(attempt, retry_after=r.headers.get('Retry-After'))
+                r.close()
+                time.sleep(delay)
                 continue
             return r
         except Exception as e:
             last_exc = e
             if attempt < max_attempts:
-                try:
-                    import time
-                    time.sleep(0.6 * attempt)
-                except Exception:
-                    pass
+                time.sleep(_backoff_delay(attempt))
                 continue
             raise
     if last_exc:
@@ -79,6 +120,148 @@ def _request_with_retries(
     raise RuntimeError("request_failed")
 
 
+def _iter_sse_data(r: requests.Response) -> Iterator[str]:
+    """Payloads of `data:` lines of a server-sent events response."""
+    # SSE is always UTF-8; without a charset requests would decode text/* as latin-1
+    r.encoding = 'utf-8'
+    for line in r.iter_lines(decode_unicode=True):
+        if not line or not line.startswith('data:'):
+            continue
+        yield line[5:].strip()
+
+
+def normalize_messages(messages: list[dict[str, str]]) -> list[tuple[str, str]]:
+    """
+    Prompt in a canonical form: lower-case roles, trimmed content, no empty messages.
+    Inner whitespace is kept as is: prompts embed student code, where indentation and
+    line breaks change the program.
+    """
+    out: list[tuple[str, str]] = []
+    for m in messages or []:
+        role = (m.get('role') or 'user').strip().lower()
+        content = str(m.get('content') or '').replace('\r\n', '\n').strip()
+        if content:
+            out.append((role, content))
+    return out
+
+
+class LlmResponseCache:
+    """
+    In-process TTL + LRU cache of completed answers.
+    Key: provider, model, sampling params and the normalized prompt (see normalize_messages).
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600.0):
+        self.max_entries = int(max_entries)
+        self.ttl_seconds = float(ttl_seconds)
+        self._items: OrderedDict[str, tuple[float, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.ttl_seconds > 0
+
+    @staticmethod
+    def make_key(*, provider: str, model: str, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> str:
+        raw = json.dumps(
+            [provider, model, round(float(temperature), 3), int(max_tokens), normalize_messages(messages)],
+            ensure_ascii=False,
+            separators=(',', ':'),
+        )
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> str | None:
+        if not self.enabled:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is None or item[0] < now:
+                if item is not None:
+                    del self._items[key]
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key: str, answer: str) -> None:
+        if not self.enabled or not (answer or '').strip():
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl_seconds, answer)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def stats(self) -> dict[str, Any]:
+        with self._lock:
+            return {'size': len(self._items), 'hits': self.hits, 'misses': self.misses}
+
+
+response_cache = LlmResponseCache(
+    max_entries=_env_int('TRAINER_LLM_CACHE_SIZE', 256),
+    ttl_seconds=_env_float('TRAINER_LLM_CACHE_TTL_SECONDS', 600.0),
+)
+
+
+class LlmClient:
+    """
+    Base client. Providers implement `_complete` (whole answer) and `_stream` (text deltas);
+    `chat` / `stream_chat` add the response cache on top.
+    """
+    provider: ProviderName
+    model: str = ''
+
+    def _cache_key(self, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> str:
+        return response_cache.make_key(
+            provider=self.provider, model=self.model, messages=messages,
+            temperature=temperature, max_tokens=max_tokens,
+        )
+
+    def chat(self, *, messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int = 800, use_cache: bool = True) -> str:
+        if not use_cache:
+            return self._complete(messages=messages, temperature=temperature, max_tokens=max_tokens)
+        key = self._cache_key(messages, temperature, max_tokens)
+        cached = response_cache.get(key)
+        if cached is not None:
+            return cached
+        answer = self._complete(messages=messages, temperature=temperature, max_tokens=max_tokens)
+        response_cache.put(key, answer)
+        return answer
+
+    def stream_chat(self, *, messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int = 800) -> Iterator[str]:
+        """Yields answer text as it arrives; a cached answer is yielded as a single chunk."""
+        key = self._cache_key(messages, temperature, max_tokens)
+        cached = response_cache.get(key)
+        if cached is not None:
+            yield cached
+            return
+        parts: list[str] = []
+        for delta in self._stream(messages=messages, temperature=temperature, max_tokens=max_tokens):
+            if delta:
+                parts.append(delta)
+                yield delta
+        response_cache.put(key, ''.join(parts))
+
+    def _complete(self, *, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> str:
+        raise NotImplementedError
+
+    def _stream(self, *, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> Iterator[str]:
+        # Providers without streaming: one chunk with the whole answer
+        yield self._complete(messages=messages, temperature=temperature, max_tokens=max_tokens)
+
+
+def _timeout() -> float:
+    return _env_float('TRAINER_LLM_TIMEOUT_SECONDS', 30.0)
+
+
+def _max_attempts() -> int:
+    return int(os.environ.get('TRAINER_LLM_MAX_ATTEMPTS') or 3)
+
+
 class GroqClient(LlmClient):
     provider: ProviderName = 'groq'
 
@@ -87,14 +270,7 @@ class GroqClient(LlmClient):
         self.model = model
         self.base_url = base_url.rstrip('/')
 
-    def chat(self, *, messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int = 800) -> str:
-        payload = {
-            'model': self.model,
-            'messages': messages,
-            'temperature': float(temperature),
-            'max_tokens': int(max_tokens),
-        }
-        timeout = _env_float('TRAINER_LLM_TIMEOUT_SECONDS', 30.0)
+    def _post(self, payload: dict[str, Any], *, stream: bool = False) -> requests.Response:
         r = _request_with_retries(
             'POST',
             f'{self.base_url}/chat/completions',
@@ -103,8 +279,9 @@ class GroqClient(LlmClient):
                 'Authorization': f'Bearer {self.api_key}',
                 'Content-Type': 'application/json',
             },
-            timeout=timeout,
-            max_attempts=int(os.environ.get('TRAINER_LLM_MAX_ATTEMPTS') or 3),
+            timeout=_timeout(),
+            max_attempts=_max_attempts(),
+            stream=stream,
         )
         if r.status_code >= 400:
             # surface a compact error for UI
@@ -114,21 +291,47 @@ class GroqClient(LlmClient):
             except Exception:
                 msg = r.text
             raise RuntimeError(f'groq_error {r.status_code}: {str(msg)[:500]}')
-        data = r.json()
+        return r
+
+    def _payload(self, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> dict[str, Any]:
+        return {
+            'model': self.model,
+            'messages': messages,
+            'temperature': float(temperature),
+            'max_tokens': int(max_tokens),
+        }
+
+    def _complete(self, *, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> str:
+        data = self._post(self._payload(messages, temperature, max_tokens)).json()
         try:
             return (data.get('choices') or [{}])[0].get('message', {}).get('content', '') or ''
         except Exception:
             return ''
 
+    def _stream(self, *, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> Iterator[str]:
+        payload = self._payload(messages, temperature, max_tokens)
+        payload['stream'] = True
+        with self._post(payload, stream=True) as r:
+            for raw in _iter_sse_data(r):
+                if raw == '[DONE]':
+                    break
+                try:
+                    delta = (json.loads(raw).get('choices') or [{}])[0].get('delta') or {}
+                except Exception:
+                    continue
+                if delta.get('content'):
+                    yield delta['content']
+
 
 class GeminiClient(LlmClient):
     provider: ProviderName = 'gemini'
 
-    def __init__(self, api_key: str, model: str = 'gemini-1.5-flash'):
+    def __init__(self, api_key: str, model: str = 'gemini-1.5-flash', base_url: str = 'https://generativelanguage.googleapis.com/v1beta'):
         self.api_key = api_key
         self.model = model
+        self.base_url = base_url.rstrip('/')
 
-    def chat(self, *, messages: list[dict[str, str]], temperature: float = 0.2, max_tokens: int = 800) -> str:
+    def _body(self, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> dict[str, Any]:
         # Convert OpenAI-like messages -> Gemini contents (+ systemInstruction)
         sys_parts: list[str] = []
         contents = []
@@ -152,26 +355,57 @@ class GeminiClient(LlmClient):
         }
         if sys_parts:
             body['systemInstruction'] = {'parts': [{'text': '\n\n'.join(sys_parts)}]}
-        url = f'https://generativelanguage.googleapis.com/v1beta/models/{self.model}:generateContent?key={self.api_key}'
-        timeout = _env_float('TRAINER_LLM_TIMEOUT_SECONDS', 30.0)
+        return body
+
+    def _post(self, method: str, body: dict[str, Any], *, stream: bool = False) -> requests.Response:
+        query = f'alt=sse&key={self.api_key}' if stream else f'key={self.api_key}'
         r = _request_with_retries(
             'POST',
-            url,
+            f'{self.base_url}/models/{self.model}:{method}?{query}',
             json_body=body,
             headers={'Content-Type': 'application/json'},
-            timeout=timeout,
-            max_attempts=int(os.environ.get('TRAINER_LLM_MAX_ATTEMPTS') or 3),
+            timeout=_timeout(),
+            max_attempts=_max_attempts(),
+            stream=stream,
         )
         if r.status_code >= 400:
             raise RuntimeError(f'gemini_error {r.status_code}: {r.text[:500]}')
-        data = r.json()
+        return r
+
+    @staticmethod
+    def _candidate_text(data: dict[str, Any]) -> str:
+        cand = (data.get('candidates') or [{}])[0]
+        parts = cand.get('content', {}).get('parts') or []
+        return ''.join([p.get('text') or '' for p in parts])
+
+    def _complete(self, *, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> str:
+        data = self._post('generateContent', self._body(messages, temperature, max_tokens)).json()
         try:
-            cand = (data.get('candidates') or [{}])[0]
-            parts = cand.get('content', {}).get('parts') or []
-            return ''.join([p.get('text') or '' for p in parts]).strip()
+            return self._candidate_text(data).strip()
         except Exception:
             return ''
 
+    def _stream(self, *, messages: list[dict[str, str]], temperature: float, max_tokens: int) -> Iterator[str]:
+        with self._post('streamGenerateContent', self._body(messages, temperature, max_tokens), stream=True) as r:
+            for raw in _iter_sse_data(r):
+                try:
+                    text = self._candidate_text(json.loads(raw))
+                except Exception:
+                    continue
+                if text:
+                    yield text
+
+
+def _groq(api_key: str, model: str) -> GroqClient:
+    base_url = (os.environ.get('GROQ_BASE_URL') or '').strip()
+    return GroqClient(api_key=api_key, model=model, base_url=base_url) if base_url else GroqClient(api_key=api_key, model=model)
+
+
+def _gemini(api_key: str, model: str) -> GeminiClient:
+    # *_BASE_URL — self-hosted proxy or the local fake provider (scripts/fake_llm_provider.py)
+    base_url = (os.environ.get('GEMINI_BASE_URL') or '').strip()
+    return GeminiClient(api_key=api_key, model=model, base_url=base_url) if base_url else GeminiClient(api_key=api_key, model=model)
+
 
 def get_llm_client() -> LlmClient | None:
     provider = (os.environ.get('TRAINER_LLM_PROVIDER') or '').strip().lower()
@@ -181,18 +415,18 @@ def get_llm_client() -> LlmClient | None:
 
     if provider == 'gemini' and gemini_key:
         model = (os.environ.get('GEMINI_MODEL') or 'gemini-1.5-flash').strip()
-        return GeminiClient(api_key=gemini_key, model=model)
+        return _gemini(gemini_key, model)
     if provider == 'groq' and groq_key:
         model = (os.environ.get('GROQ_MODEL') or 'llama-3.3-70b-versatile').strip()
-        return GroqClient(api_key=groq_key, model=model)
+        return _groq(groq_key, model)
 
     # Auto pick
     if groq_key:
         model = (os.environ.get('GROQ_MODEL') or 'llama-3.3-70b-versatile').strip()
-        return GroqClient(api_key=groq_key, model=model)
+        return _groq(groq_key, model)
     if gemini_key:
         model = (os.environ.get('GEMINI_MODEL') or 'gemini-1.5-flash').strip()
-        return GeminiClient(api_key=gemini_key, model=model)
+        return _gemini(gemini_key, model)
 
     return None
 
@@ -221,6 +455,7 @@ def get_llm_info() -> dict[str, Any]:
         'picked': picked,
         'timeout_seconds': _env_float('TRAINER_LLM_TIMEOUT_SECONDS', 30.0),
         'max_attempts': int(os.environ.get('TRAINER_LLM_MAX_ATTEMPTS') or 3),
+        'cache': response_cache.stats(),
     }
 
 
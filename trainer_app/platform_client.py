@@ -1,10 +1,169 @@
 from __future__ import annotations
 
+import copy
+import hashlib
 import os
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from typing import Any
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+def _env_int(name: str, default: int) -> int:
+    v = (os.environ.get(name) or '').strip()
+    if not v:
+        return int(default)
+    try:
+        return int(v)
+    except Exception:
+        return int(default)
+
+
+def _env_float(name: str, default: float) -> float:
+    v = (os.environ.get(name) or '').strip()
+    if not v:
+        return float(default)
+    try:
+        return float(v)
+    except Exception:
+        return float(default)
+
+
+# Streamlit re-creates PlatformClient on every rerun, so connections, the read cache and in-flight
+# requests live at module level and are shared by all clients of the process.
+_sessions: dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def _get_session(base_url: str) -> requests.Session:
+    """
+    Keep-alive session per platform URL.
+    - TRAINER_PLATFORM_POOL_SIZE: connections kept per host (default 10)
+    - TRAINER_PLATFORM_RETRIES: retries with exponential backoff for idempotent methods only (default 2)
+    """
+    s = _sessions.get(base_url)
+    if s is not None:
+        return s
+    with _sessions_lock:
+        s = _sessions.get(base_url)
+        if s is None:
+            retry = Retry(
+                total=max(0, _env_int('TRAINER_PLATFORM_RETRIES', 2)),
+                connect=None,
+                read=None,
+                backoff_factor=0.3,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=frozenset({'GET', 'HEAD', 'OPTIONS'}),
+                raise_on_status=False,
+            )
+            pool_size = max(1, _env_int('TRAINER_PLATFORM_POOL_SIZE', 10))
+            adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_size, max_retries=retry)
+            s = requests.Session()
+            s.mount('http://', adapter)
+            s.mount('https://', adapter)
+            _sessions[base_url] = s
+        return s
+
+
+class _InFlight:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class _ReadCache:
+    """
+    Short TTL cache for read endpoints + coalescing of identical in-flight GETs
+    (concurrent reruns/tabs wait for one request instead of sending their own).
+    Keys are per user and per task, so the cache is an LRU bounded by TRAINER_PLATFORM_CACHE_MAX
+    (default 1000 entries); expired entries are dropped on insert.
+    """
+
+    def __init__(self, max_items: int | None = None):
+        self._items: OrderedDict[tuple, tuple[float, Any]] = OrderedDict()
+        self._max_items = max_items
+        self._inflight: dict[tuple, _InFlight] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+    def fetch(self, key: tuple, ttl: float, loader) -> Any:
+        now = time.monotonic()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None and item[0] > now:
+                self._items.move_to_end(key)
+                self.hits += 1
+                return copy.deepcopy(item[1])
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = _InFlight()
+                self._inflight[key] = flight
+                self.misses += 1
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.event.wait()
+            if flight.error is not None:
+                raise flight.error
+            return copy.deepcopy(flight.result)
+
+        try:
+            flight.result = loader()
+            if ttl > 0:
+                with self._lock:
+                    self._store(key, time.monotonic() + ttl, flight.result)
+            return copy.deepcopy(flight.result)
+        except BaseException as e:
+            flight.error = e
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+            flight.event.set()
+
+    def _store(self, key: tuple, expires: float, value: Any) -> None:
+        # Under self._lock
+        self._items[key] = (expires, value)
+        self._items.move_to_end(key)
+        now = time.monotonic()
+        for stale in [k for k, (until, _) in self._items.items() if until <= now]:
+            del self._items[stale]
+        max_items = self._max_items if self._max_items is not None else max(1, _env_int('TRAINER_PLATFORM_CACHE_MAX', 1000))
+        while len(self._items) > max_items:
+            self._items.popitem(last=False)
+
+    def invalidate(self, prefix: tuple) -> None:
+        with self._lock:
+            for key in [k for k in self._items if k[:len(prefix)] == prefix]:
+                del self._items[key]
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {'size': len(self._items), 'hits': self.hits, 'misses': self.misses, 'coalesced': self.coalesced}
+
+
+read_cache = _ReadCache()
+
+# TTL (seconds) of cached read endpoints; TRAINER_PLATFORM_CACHE=0 disables caching (coalescing stays)
+_CACHE_TTL = {
+    'me': 30.0,
+    'task': 60.0,
+    'task_stats': 60.0,
+    'llm_info': 30.0,
+    'sessions': 15.0,
+}
 
 
 @dataclass
@@ -19,30 +178,46 @@ class PlatformClient:
             'Content-Type': 'application/json',
         }
 
-    def get_me(self) -> dict[str, Any]:
-        r = requests.get(f'{self.base_url}/internal/trainer/me', headers=self._headers(), timeout=self.timeout_seconds)
+    @property
+    def _session(self) -> requests.Session:
+        return _get_session(self.base_url)
+
+    def _cache_scope(self) -> tuple:
+        # Кеш разделяется по платформе и пользователю (токену), сам токен в ключе не храним
+        return (self.base_url, hashlib.sha1((self.token or '').encode('utf-8')).hexdigest())
+
+    def _get_json(self, path: str, *, cache: str | None = None, params: dict[str, Any] | None = None, fresh: bool = False) -> dict[str, Any]:
+        def load():
+            r = self._session.get(f'{self.base_url}{path}', params=params, headers=self._headers(), timeout=self.timeout_seconds)
+            r.raise_for_status()
+            return r.json()
+
+        ttl = _CACHE_TTL.get(cache or '', 0.0) if _env_int('TRAINER_PLATFORM_CACHE', 1) else 0.0
+        key = self._cache_scope() + (cache or '', path, tuple(sorted((params or {}).items())))
+        if fresh:
+            read_cache.invalidate(key)
+        return read_cache.fetch(key, ttl, load)
+
+    def _post_json(self, path: str, payload: dict[str, Any], *, timeout: float | None = None) -> dict[str, Any]:
+        # POST не повторяем: stream/act и session/save не идемпотентны
+        r = self._session.post(f'{self.base_url}{path}', json=payload, headers=self._headers(), timeout=timeout or self.timeout_seconds)
         r.raise_for_status()
         return r.json()
 
+    def get_me(self) -> dict[str, Any]:
+        return self._get_json('/internal/trainer/me', cache='me')
+
     def get_task(self, task_id: int) -> dict[str, Any]:
-        r = requests.get(f'{self.base_url}/internal/trainer/task/{int(task_id)}', headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._get_json(f'/internal/trainer/task/{int(task_id)}', cache='task')
 
     def get_task_stats(self) -> dict[str, Any]:
-        r = requests.get(f'{self.base_url}/internal/trainer/task/stats', headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._get_json('/internal/trainer/task/stats', cache='task_stats')
 
     def llm_info(self) -> dict[str, Any]:
-        r = requests.get(f'{self.base_url}/internal/trainer/llm/info', headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._get_json('/internal/trainer/llm/info', cache='llm_info')
 
     def llm_ping(self) -> dict[str, Any]:
-        r = requests.post(f'{self.base_url}/internal/trainer/llm/ping', json={}, headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._post_json('/internal/trainer/llm/ping', {})
 
     def llm_chat(
         self,
@@ -62,9 +237,7 @@ class PlatformClient:
             payload['task_id'] = int(task_id)
         if task_type is not None:
             payload['task_type'] = int(task_type)
-        r = requests.post(f'{self.base_url}/internal/trainer/llm/chat', json=payload, headers=self._headers(), timeout=max(self.timeout_seconds, 30.0))
-        r.raise_for_status()
-        return r.json()
+        return self._post_json('/internal/trainer/llm/chat', payload, timeout=max(self.timeout_seconds, 30.0))
 
     def stream_start(
         self,
@@ -79,17 +252,13 @@ class PlatformClient:
             payload['exclude_task_ids'] = [int(x) for x in exclude_task_ids[:200]]
         if task_id is not None:
             payload['task_id'] = int(task_id)
-        r = requests.post(f'{self.base_url}/internal/trainer/task/stream/start', json=payload, headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._post_json('/internal/trainer/task/stream/start', payload)
 
     def stream_next(self, task_type: int, *, exclude_task_ids: list[int] | None = None) -> dict[str, Any]:
         payload: dict[str, Any] = {'action': 'next', 'task_type': int(task_type)}
         if exclude_task_ids:
             payload['exclude_task_ids'] = [int(x) for x in exclude_task_ids[:200]]
-        r = requests.post(f'{self.base_url}/internal/trainer/task/stream/act', json=payload, headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._post_json('/internal/trainer/task/stream/act', payload)
 
     def save_session(self, *, task_id: int | None, task_type: int | None, language: str, code: str, analysis: Any = None, tests: Any = None, messages: Any = None) -> dict[str, Any]:
         payload = {
@@ -101,19 +270,16 @@ class PlatformClient:
             'tests': tests,
             'messages': messages,
         }
-        r = requests.post(f'{self.base_url}/internal/trainer/session/save', json=payload, headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        resp = self._post_json('/internal/trainer/session/save', payload)
+        # новая попытка должна сразу появиться в истории
+        read_cache.invalidate(self._cache_scope() + ('sessions',))
+        return resp
 
-    def list_sessions(self, *, limit: int = 25) -> dict[str, Any]:
-        r = requests.get(f'{self.base_url}/internal/trainer/session/list', params={'limit': int(limit)}, headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+    def list_sessions(self, *, limit: int = 25, fresh: bool = False) -> dict[str, Any]:
+        return self._get_json('/internal/trainer/session/list', cache='sessions', params={'limit': int(limit)}, fresh=fresh)
 
     def get_session(self, session_id: int) -> dict[str, Any]:
-        r = requests.get(f'{self.base_url}/internal/trainer/session/{int(session_id)}', headers=self._headers(), timeout=self.timeout_seconds)
-        r.raise_for_status()
-        return r.json()
+        return self._get_json(f'/internal/trainer/session/{int(session_id)}')
 
 
 def get_platform_base_url() -> str:
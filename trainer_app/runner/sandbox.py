@@ -1,10 +1,12 @@
 from __future__ import annotations
 
-import base64
+import atexit
 import json
 import os
 import subprocess
 import sys
+import threading
+from collections import deque
 from typing import Any
 
 
@@ -128,37 +130,39 @@ def validate_python_code_for_runner(code: str) -> dict[str, Any]:
     return {'ok': len(issues) == 0, 'issues': issues, 'allowed_imports': sorted(list(allowed))}
 
 
-def run_python_solve_tests(*, code: str, tests: list[dict[str, Any]], timeout_seconds: float = 2.0) -> dict[str, Any]:
-    """
-    Very restricted runner (MVP, feature-flagged):
-    - Requires student code defines solve(s) function.
-    - Executes in subprocess with timeout.
-    - Returns JSON dict with per-test results.
-    """
-    code = code or ''
-    tests = tests or []
-
-    # security gate
-    v = validate_python_code_for_runner(code)
-    if not v.get('ok'):
-        return {'ok': False, 'error': 'security_block', 'details': 'Код содержит запрещённые конструкции.', 'validation': v}
+# Worker program shared by both execution paths.
+# - without arguments: read one job (JSON) from stdin, run it, print the JSON result, exit
+#   (spawn-per-run path);
+# - with "serve": fork server. The booted interpreter reads job lines from stdin and forks a fresh
+#   child per job; the child applies rlimits and a wall-clock alarm, runs the job and exits.
+#   The server itself never executes student code, so isolation stays per run while the
+#   interpreter startup is paid once.
+_WORKER = r"""
+import io, json, os, sys, traceback
 
-    code_b64 = base64.b64encode(code.encode('utf-8')).decode('ascii')
-    tests_json = json.dumps(tests, ensure_ascii=False)
-    allow_imports = _get_allowed_imports()
-    out_limit = _env_int('TRAINER_RUNNER_MAX_OUTPUT_CHARS', 12000)
+try:
+    import resource  # type: ignore
+except Exception:
+    resource = None
 
-    child = r"""
-import base64, json, sys, traceback
 
-ALLOWED_IMPORTS = set(json.loads(sys.argv[2] or "[]"))
-OUT_LIMIT = int(sys.argv[3] or "12000")
+def _apply_limits(job):
+    if resource is None:
+        return
+    try:
+        # 512MB address space
+        resource.setrlimit(resource.RLIMIT_AS, (512 * 1024 * 1024, 512 * 1024 * 1024))
+        # 1MB output files
+        resource.setrlimit(resource.RLIMIT_FSIZE, (1 * 1024 * 1024, 1 * 1024 * 1024))
+        # limit open files
+        resource.setrlimit(resource.RLIMIT_NOFILE, (32, 32))
+        # CPU seconds for this job (on top of what this process has already spent)
+        used = resource.getrusage(resource.RUSAGE_SELF)
+        cpu = int(used.ru_utime + used.ru_stime) + int(job.get('cpu_seconds') or 3)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu, cpu))
+    except Exception:
+        pass
 
-def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
-    top = (name or "").split(".")[0]
-    if top and top in ALLOWED_IMPORTS:
-        return __import__(name, globals, locals, fromlist, level)
-    raise ImportError(f"Import blocked: {top}")
 
 class _CappedIO:
     def __init__(self, limit: int):
@@ -183,24 +187,26 @@ class _CappedIO:
     def getvalue(self):
         return "".join(self.buf)
 
-try:
-    import resource  # type: ignore
-    # CPU seconds
-    resource.setrlimit(resource.RLIMIT_CPU, (3, 3))
-    # 512MB address space
-    resource.setrlimit(resource.RLIMIT_AS, (512 * 1024 * 1024, 512 * 1024 * 1024))
-    # 1MB output files
-    resource.setrlimit(resource.RLIMIT_FSIZE, (1 * 1024 * 1024, 1 * 1024 * 1024))
-    # limit open files
-    resource.setrlimit(resource.RLIMIT_NOFILE, (32, 32))
-except Exception:
-    pass
 
-code = base64.b64decode(sys.argv[1].encode('ascii')).decode('utf-8', errors='replace')
-tests = json.loads(sys.stdin.read() or '[]')
+def _emit(payload):
+    sys.stdout = sys.__stdout__
+    sys.stderr = sys.__stderr__
+    print(json.dumps(payload, ensure_ascii=False))
+    sys.stdout.flush()
+
+
+def _run_job(job):
+    allowed_imports = set(job.get('allow_imports') or [])
+    out_limit = int(job.get('out_limit') or 12000)
+    mode = job.get('mode') or 'solve'
+    sys.stdin = io.StringIO(job.get('stdin') or '')
+
+    def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
+        top = (name or "").split(".")[0]
+        if top and top in allowed_imports:
+            return __import__(name, globals, locals, fromlist, level)
+        raise ImportError(f"Import blocked: {top}")
 
-ns = {}
-try:
     safe_builtins = {
         # basic types / helpers
         "abs": abs, "all": all, "any": any, "bool": bool, "chr": chr, "divmod": divmod,
@@ -213,63 +219,377 @@ try:
         # controlled import
         "__import__": _safe_import,
     }
-    ns["__builtins__"] = safe_builtins
-    # cap output
-    _out = _CappedIO(OUT_LIMIT)
-    _err = _CappedIO(OUT_LIMIT)
-    sys.stdout = _out
-    sys.stderr = _err
-    exec(code, ns, ns)
-except Exception as e:
-    sys.stdout = sys.__stdout__
-    sys.stderr = sys.__stderr__
-    print(json.dumps({'ok': False, 'error': 'exec_error', 'details': traceback.format_exc()}))
-    sys.exit(0)
+    if mode == 'program':
+        safe_builtins["print"] = print
+        safe_builtins["input"] = input
+
+    code = job.get('code') or ''
+    ns = {"__builtins__": safe_builtins}
+    out = _CappedIO(out_limit)
+    err = _CappedIO(out_limit)
+    sys.stdout = out
+    sys.stderr = err
+
+    if mode == 'program':
+        try:
+            exec(code, ns, ns)
+            ok = True
+            details = None
+        except Exception:
+            ok = False
+            details = traceback.format_exc()
+        _emit({
+            "ok": ok,
+            "stdout": out.getvalue(),
+            "stderr": err.getvalue(),
+            "error": None if ok else "exec_error",
+            "details": details,
+        })
+        return
 
-solve = ns.get('solve')
-if not callable(solve):
-    sys.stdout = sys.__stdout__
-    sys.stderr = sys.__stderr__
-    print(json.dumps({'ok': False, 'error': 'no_solve', 'details': 'Define solve(s) function for tests.'}))
-    sys.exit(0)
-
-out = []
-for t in tests:
-    name = (t.get('name') or '')
-    inp = t.get('input')
-    exp = t.get('expected')
     try:
-        res = solve(inp)
-        got = '' if res is None else str(res)
-        out.append({'name': name, 'expected': '' if exp is None else str(exp), 'got': got, 'ok': ('' if exp is None else str(exp)) == got})
+        exec(code, ns, ns)
     except Exception:
-        out.append({'name': name, 'expected': '' if exp is None else str(exp), 'got': None, 'ok': False, 'error': traceback.format_exc()})
+        _emit({'ok': False, 'error': 'exec_error', 'details': traceback.format_exc()})
+        return
+
+    solve = ns.get('solve')
+    if not callable(solve):
+        _emit({'ok': False, 'error': 'no_solve', 'details': 'Define solve(s) function for tests.'})
+        return
 
-sys.stdout = sys.__stdout__
-sys.stderr = sys.__stderr__
-print(json.dumps({'ok': True, 'results': out}, ensure_ascii=False))
+    results = []
+    for t in job.get('tests') or []:
+        name = (t.get('name') or '')
+        inp = t.get('input')
+        exp = t.get('expected')
+        try:
+            res = solve(inp)
+            got = '' if res is None else str(res)
+            results.append({'name': name, 'expected': '' if exp is None else str(exp), 'got': got, 'ok': ('' if exp is None else str(exp)) == got})
+        except Exception:
+            results.append({'name': name, 'expected': '' if exp is None else str(exp), 'got': None, 'ok': False, 'error': traceback.format_exc()})
+
+    _emit({'ok': True, 'results': results})
+
+
+def _child(job, result_fd):
+    try:
+        import signal
+        devnull = os.open(os.devnull, os.O_RDWR)
+        os.dup2(devnull, 0)
+        os.dup2(result_fd, 1)
+        os.dup2(devnull, 2)
+        # no access to the server's pipes or other jobs' result pipes
+        os.closerange(3, 65536)
+        _apply_limits(job)
+        wall = float(job.get('wall_seconds') or 0)
+        if wall > 0:
+            # SIGALRM has no Python handler -> default action terminates the child
+            signal.setitimer(signal.ITIMER_REAL, wall)
+        _run_job(job)
+    finally:
+        os._exit(0)
+
+
+def _serve():
+    import select, signal
+    stdin_fd = sys.stdin.fileno()
+    children = {}  # result read fd -> [pid, job id, wall seconds, chunks]
+    pending = b''
+    stdin_open = True
+
+    def report(job_id, payload):
+        sys.stdout.write(json.dumps({'id': job_id, 'result': payload}, ensure_ascii=False) + '\n')
+        sys.stdout.flush()
+
+    while stdin_open or children:
+        watch = list(children) + ([stdin_fd] if stdin_open else [])
+        readable, _, _ = select.select(watch, [], [])
+        for fd in readable:
+            if fd == stdin_fd:
+                data = os.read(stdin_fd, 65536)
+                if not data:
+                    stdin_open = False
+                    continue
+                pending += data
+                while b'\n' in pending:
+                    line, pending = pending.split(b'\n', 1)
+                    msg = json.loads(line)
+                    r, w = os.pipe()
+                    pid = os.fork()
+                    if pid == 0:
+                        os.close(r)
+                        _child(msg.get('job') or {}, w)
+                    os.close(w)
+                    children[r] = [pid, msg.get('id'), (msg.get('job') or {}).get('wall_seconds'), []]
+                continue
+
+            data = os.read(fd, 65536)
+            if data:
+                children[fd][3].append(data)
+                continue
+            pid, job_id, wall, chunks = children.pop(fd)
+            os.close(fd)
+            _, status = os.waitpid(pid, 0)
+            raw = b''.join(chunks).decode('utf-8', errors='replace').strip()
+            if raw:
+                try:
+                    payload = json.loads(raw)
+                except Exception:
+                    payload = {'ok': False, 'error': 'bad_output', 'details': raw[:2000]}
+            elif os.WIFSIGNALED(status) and os.WTERMSIG(status) == signal.SIGALRM:
+                payload = {'ok': False, 'error': 'timeout', 'details': f'Timeout > {wall}s'}
+            else:
+                payload = {'ok': False, 'error': 'no_output', 'details': ''}
+            report(job_id, payload)
+
+
+if len(sys.argv) > 1 and sys.argv[1] == 'serve':
+    _serve()
+else:
+    _job = json.loads(sys.stdin.read() or '{}')
+    _apply_limits(_job)
+    _run_job(_job)
 """
 
+
+def _worker_argv(*args: str) -> list[str]:
+    return [sys.executable, '-I', '-S', '-c', _WORKER, *args]
+
+
+def _parse_worker_output(stdout: str | None, stderr: str | None) -> dict[str, Any]:
+    raw = (stdout or '').strip()
+    if not raw:
+        return {'ok': False, 'error': 'no_output', 'details': (stderr or '').strip()[:2000]}
+    try:
+        return json.loads(raw)
+    except Exception:
+        return {'ok': False, 'error': 'bad_output', 'details': raw[:2000], 'stderr': (stderr or '').strip()[:2000]}
+
+
+def _timeout_result(timeout_seconds: float) -> dict[str, Any]:
+    return {'ok': False, 'error': 'timeout', 'details': f'Timeout > {timeout_seconds}s'}
+
+
+def _run_spawn(job: dict[str, Any], timeout_seconds: float) -> dict[str, Any]:
+    """Spawn-per-run path: start a fresh interpreter, feed it the job, wait."""
     try:
         p = subprocess.run(
-            [sys.executable, '-I', '-S', '-c', child, code_b64, json.dumps(allow_imports, ensure_ascii=False), str(out_limit)],
-            input=tests_json,
+            _worker_argv(),
+            input=json.dumps(job, ensure_ascii=False),
             text=True,
             capture_output=True,
             timeout=float(timeout_seconds),
         )
     except subprocess.TimeoutExpired:
-        return {'ok': False, 'error': 'timeout', 'details': f'Timeout > {timeout_seconds}s'}
+        return _timeout_result(timeout_seconds)
     except Exception as e:
         return {'ok': False, 'error': 'runner_error', 'details': str(e)}
+    return _parse_worker_output(p.stdout, p.stderr)
 
-    raw = (p.stdout or '').strip()
-    if not raw:
-        return {'ok': False, 'error': 'no_output', 'details': (p.stderr or '').strip()}
-    try:
-        return json.loads(raw)
-    except Exception:
-        return {'ok': False, 'error': 'bad_output', 'details': raw[:2000], 'stderr': (p.stderr or '').strip()[:2000]}
+
+class _PendingJob:
+    __slots__ = ('event', 'result')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result: dict[str, Any] | None = None
+
+
+class SandboxPool:
+    """
+    Pre-forked sandbox: one booted fork server + up to `size` concurrently running job processes.
+
+    Every job runs in its own child forked from the server (rlimits, CPU limit and wall alarm are
+    applied in the child), so a crash or a hung job never affects other runs. If the server dies
+    it is restarted on the next job.
+
+    Back-pressure: at most `size` jobs run at once; at most `max_queue` callers may wait for a slot
+    (each up to `queue_timeout` seconds), everyone else gets `error='busy'` right away.
+    """
+
+    def __init__(self, size: int = 2, max_queue: int = 16, queue_timeout: float = 5.0):
+        self.size = max(1, int(size))
+        self.max_queue = max(0, int(max_queue))
+        self.queue_timeout = float(queue_timeout)
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self._waiting = 0
+        self._proc: subprocess.Popen | None = None
+        self._pending: dict[int, _PendingJob] = {}
+        self._next_id = 0
+        self._closed = False
+        self.stats = {'runs': 0, 'server_starts': 0, 'rejected': 0, 'timeouts': 0}
+
+    def _reader(self, proc: subprocess.Popen) -> None:
+        for line in proc.stdout:
+            try:
+                msg = json.loads(line)
+            except Exception:
+                continue
+            with self._lock:
+                pending = self._pending.pop(msg.get('id'), None)
+            if pending is not None:
+                pending.result = msg.get('result')
+                pending.event.set()
+        # server exited: fail jobs that were sent to it
+        with self._lock:
+            orphaned = [p for p in self._pending.values() if not p.event.is_set()]
+            self._pending.clear()
+        for pending in orphaned:
+            pending.result = {'ok': False, 'error': 'runner_error', 'details': 'sandbox server exited'}
+            pending.event.set()
+
+    def _ensure_server_locked(self) -> subprocess.Popen:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                _worker_argv('serve'),
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                text=True,
+                encoding='utf-8',
+            )
+            self.stats['server_starts'] += 1
+            threading.Thread(target=self._reader, args=(self._proc,), name='sandbox-pool-reader', daemon=True).start()
+        return self._proc
+
+    def prestart(self) -> None:
+        """Boots the fork server ahead of the first job."""
+        with self._lock:
+            if not self._closed:
+                self._ensure_server_locked()
+
+    def _acquire_slot(self) -> bool:
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.max_queue:
+                self.stats['rejected'] += 1
+                return False
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            with self._lock:
+                self.stats['rejected'] += 1
+        return acquired
+
+    def _submit(self, job: dict[str, Any]) -> _PendingJob:
+        with self._lock:
+            self._next_id += 1
+            job_id = self._next_id
+            pending = _PendingJob()
+            self._pending[job_id] = pending
+            line = json.dumps({'id': job_id, 'job': job}, ensure_ascii=False) + '\n'
+            for _attempt in range(2):
+                proc = self._ensure_server_locked()
+                try:
+                    proc.stdin.write(line)
+                    proc.stdin.flush()
+                    return pending
+                except (BrokenPipeError, OSError):
+                    proc.kill()
+                    self._proc = None
+            self._pending.pop(job_id, None)
+        pending.result = {'ok': False, 'error': 'runner_error', 'details': 'sandbox server unavailable'}
+        pending.event.set()
+        return pending
+
+    def run(self, job: dict[str, Any], timeout_seconds: float) -> dict[str, Any]:
+        """Runs one job in a freshly forked child. Wall limit is enforced in the child (SIGALRM)."""
+        if self._closed:
+            return {'ok': False, 'error': 'runner_error', 'details': 'sandbox pool is closed'}
+        if not self._acquire_slot():
+            return {'ok': False, 'error': 'busy', 'details': 'Раннер перегружен, попробуйте ещё раз через несколько секунд.'}
+        try:
+            job = dict(job, wall_seconds=float(timeout_seconds))
+            pending = self._submit(job)
+            # The child kills itself on the wall limit; the extra second only guards against a stuck server
+            if not pending.event.wait(float(timeout_seconds) + 1.0):
+                with self._lock:
+                    self.stats['timeouts'] += 1
+                return _timeout_result(timeout_seconds)
+            result = pending.result or {'ok': False, 'error': 'no_output', 'details': ''}
+            with self._lock:
+                self.stats['runs'] += 1
+                if result.get('error') == 'timeout':
+                    self.stats['timeouts'] += 1
+            return result
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        try:
+            proc.stdin.close()
+            proc.wait(timeout=2)
+        except Exception:
+            proc.kill()
+
+
+_pool: SandboxPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox_pool() -> SandboxPool | None:
+    """
+    Process-wide pool, created lazily from env:
+    - TRAINER_RUNNER_POOL_SIZE — max concurrent runs (default 2; 0 disables the pool -> spawn per run)
+    - TRAINER_RUNNER_QUEUE_MAX (default 16), TRAINER_RUNNER_QUEUE_TIMEOUT (seconds, default 5)
+    """
+    global _pool
+    size = _env_int('TRAINER_RUNNER_POOL_SIZE', 2)
+    if size <= 0 or not hasattr(os, 'fork'):
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                pool = SandboxPool(
+                    size=size,
+                    max_queue=_env_int('TRAINER_RUNNER_QUEUE_MAX', 16),
+                    queue_timeout=_env_float('TRAINER_RUNNER_QUEUE_TIMEOUT', 5.0),
+                )
+                pool.prestart()
+                atexit.register(pool.close)
+                _pool = pool
+    return _pool
+
+
+def _execute(job: dict[str, Any], timeout_seconds: float) -> dict[str, Any]:
+    job.setdefault('allow_imports', _get_allowed_imports())
+    job.setdefault('out_limit', _env_int('TRAINER_RUNNER_MAX_OUTPUT_CHARS', 12000))
+    job.setdefault('cpu_seconds', _env_int('TRAINER_RUNNER_CPU_SECONDS', 3))
+    pool = get_sandbox_pool()
+    if pool is None:
+        return _run_spawn(job, timeout_seconds)
+    return pool.run(job, timeout_seconds)
+
+
+def run_python_solve_tests(*, code: str, tests: list[dict[str, Any]], timeout_seconds: float = 2.0) -> dict[str, Any]:
+    """
+    Very restricted runner (MVP, feature-flagged):
+    - Requires student code defines solve(s) function.
+    - Executes in a sandbox worker with timeout.
+    - Returns JSON dict with per-test results.
+    """
+    code = code or ''
+    tests = tests or []
+
+    # security gate
+    v = validate_python_code_for_runner(code)
+    if not v.get('ok'):
+        return {'ok': False, 'error': 'security_block', 'details': 'Код содержит запрещённые конструкции.', 'validation': v}
+
+    return _execute({'mode': 'solve', 'code': code, 'tests': tests}, timeout_seconds)
 
 
 def run_python_program(*, code: str, stdin: str = '', timeout_seconds: float = 2.0) -> dict[str, Any]:
@@ -283,10 +603,7 @@ def run_python_program(*, code: str, stdin: str = '', timeout_seconds: float = 2
     if len(stdin) > 20000:
         stdin = stdin[:20000]
 
-    # Less strict than solve-tests: allow input() here, but still block dangerous stuff
-    # We'll reuse validator but allow "input" by removing it from banned list via env toggle.
-    # Simpler: temporarily accept input() by not AST-blocking it — so validator above currently blocks input().
-    # For program-run, allow input() calls by skipping validation's input ban:
+    # Less strict than solve-tests: the validator bans input(), but program-run allows it.
     v = validate_python_code_for_runner(code)
     if not v.get('ok'):
         # If only the "input" ban is triggered, allow program-run.
@@ -295,110 +612,4 @@ def run_python_program(*, code: str, stdin: str = '', timeout_seconds: float = 2
         if non_input:
             return {'ok': False, 'error': 'security_block', 'details': 'Код содержит запрещённые конструкции.', 'validation': v}
 
-    code_b64 = base64.b64encode(code.encode('utf-8')).decode('ascii')
-    allow_imports = _get_allowed_imports()
-    out_limit = _env_int('TRAINER_RUNNER_MAX_OUTPUT_CHARS', 12000)
-
-    child = r"""
-import base64, json, sys, traceback
-
-ALLOWED_IMPORTS = set(json.loads(sys.argv[2] or "[]"))
-OUT_LIMIT = int(sys.argv[3] or "12000")
-
-def _safe_import(name, globals=None, locals=None, fromlist=(), level=0):
-    top = (name or "").split(".")[0]
-    if top and top in ALLOWED_IMPORTS:
-        return __import__(name, globals, locals, fromlist, level)
-    raise ImportError(f"Import blocked: {top}")
-
-class _CappedIO:
-    def __init__(self, limit: int):
-        self.limit = int(limit)
-        self.buf = []
-        self.n = 0
-    def write(self, s):
-        s = "" if s is None else str(s)
-        if not s:
-            return 0
-        left = self.limit - self.n
-        if left <= 0:
-            raise RuntimeError("output_limit_exceeded")
-        chunk = s[:left]
-        self.buf.append(chunk)
-        self.n += len(chunk)
-        if len(s) > left:
-            raise RuntimeError("output_limit_exceeded")
-        return len(chunk)
-    def flush(self):  # pragma: no cover
-        return
-    def getvalue(self):
-        return "".join(self.buf)
-
-try:
-    import resource  # type: ignore
-    resource.setrlimit(resource.RLIMIT_CPU, (3, 3))
-    resource.setrlimit(resource.RLIMIT_AS, (512 * 1024 * 1024, 512 * 1024 * 1024))
-    resource.setrlimit(resource.RLIMIT_FSIZE, (1 * 1024 * 1024, 1 * 1024 * 1024))
-    resource.setrlimit(resource.RLIMIT_NOFILE, (32, 32))
-except Exception:
-    pass
-
-code = base64.b64decode(sys.argv[1].encode('ascii')).decode('utf-8', errors='replace')
-
-ns = {}
-out = _CappedIO(OUT_LIMIT)
-err = _CappedIO(OUT_LIMIT)
-sys.stdout = out
-sys.stderr = err
-try:
-    safe_builtins = {
-        "abs": abs, "all": all, "any": any, "bool": bool, "chr": chr, "divmod": divmod,
-        "enumerate": enumerate, "float": float, "int": int, "len": len, "list": list, "map": map,
-        "max": max, "min": min, "pow": pow, "range": range, "str": str, "sum": sum, "zip": zip,
-        "sorted": sorted, "reversed": reversed,
-        "print": print, "input": input,
-        "Exception": Exception, "ValueError": ValueError, "TypeError": TypeError, "RuntimeError": RuntimeError,
-        "IndexError": IndexError, "KeyError": KeyError, "ZeroDivisionError": ZeroDivisionError,
-        "__import__": _safe_import,
-    }
-    ns["__builtins__"] = safe_builtins
-    exec(code, ns, ns)
-    ok = True
-    details = None
-except Exception:
-    ok = False
-    details = traceback.format_exc()
-
-sys.stdout = sys.__stdout__
-sys.stderr = sys.__stderr__
-
-print(json.dumps({
-    "ok": ok,
-    "stdout": out.getvalue(),
-    "stderr": err.getvalue(),
-    "error": None if ok else "exec_error",
-    "details": details,
-}, ensure_ascii=False))
-"""
-
-    try:
-        p = subprocess.run(
-            [sys.executable, '-I', '-S', '-c', child, code_b64, json.dumps(allow_imports, ensure_ascii=False), str(out_limit)],
-            input=stdin,
-            text=True,
-            capture_output=True,
-            timeout=float(timeout_seconds),
-        )
-    except subprocess.TimeoutExpired:
-        return {'ok': False, 'error': 'timeout', 'details': f'Timeout > {timeout_seconds}s'}
-    except Exception as e:
-        return {'ok': False, 'error': 'runner_error', 'details': str(e)}
-
-    raw = (p.stdout or '').strip()
-    if not raw:
-        return {'ok': False, 'error': 'no_output', 'details': (p.stderr or '').strip()[:2000]}
-    try:
-        return json.loads(raw)
-    except Exception:
-        return {'ok': False, 'error': 'bad_output', 'details': raw[:2000], 'stderr': (p.stderr or '').strip()[:2000]}
-
+    return _execute({'mode': 'program', 'code': code, 'stdin': stdin}, timeout_seconds)